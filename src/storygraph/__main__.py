@@ -0,0 +1,4 @@
+"""`python -m storygraph <command>` — see storygraph.cli."""
+from .cli import main
+
+raise SystemExit(main())
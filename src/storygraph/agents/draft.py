@@ -1,25 +1,91 @@
 # src/storygraph/agents/draft.py
 from __future__ import annotations
-from pathlib import Path
+import math
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Dict
-from ..state import StoryState, SceneDraft
+from .. import hooks
+from ..state import StoryState, SceneDraft, Beat
 from ..llm import LLMClient, LLMConfig
+from ..codex_select import select_codex_for_prompt, beat_query, DRAFT_CODEX_BUDGET
+from ..linker import link_scene
+from ..metrics import style_panel
+from ..voice import VoiceMonitor
+from ..validators import beat_within_tolerance
+from ..prompts import get_prompt
 import json
 
-# prompts live at src/prompts/draft.txt (go up to repo root then into src/prompts)
-PROMPT_PATH = Path(__file__).resolve().parents[3] / "src" / "prompts" / "draft.txt"
-PROMPT = PROMPT_PATH.read_text(encoding="utf-8")
+# In-loop length enforcement: out-of-band beats get targeted expand/trim
+# requests (with their current text) instead of a full re-draft.
+BEAT_TOLERANCE = 0.15
+MAX_RESIZE_ATTEMPTS = 2
+RESIZE_CONCURRENCY = 4
 
-def _split(prompt: str):
-    sys = prompt.split("[system]\n", 1)[1].split("[output_schema]", 1)[0].strip()
-    schema = prompt.split("[output_schema]\n", 1)[1].split("[user]", 1)[0].strip()
-    user = prompt.split("[user]\n", 1)[1].strip()
-    return sys, schema, user
+def beat_band(target: int, tol: float = BEAT_TOLERANCE):
+    """Inclusive word range accepted by beat_within_tolerance."""
+    return max(0, math.ceil(target - target * tol)), math.floor(target + target * tol)
+
+def resize_beat(
+    client,
+    beat: Beat,
+    scene: SceneDraft,
+    tol: float = BEAT_TOLERANCE,
+    max_attempts: int = MAX_RESIZE_ATTEMPTS,
+) -> SceneDraft:
+    """
+    Expand or trim one beat toward its target, keeping the closest attempt.
+    Returns the original scene if no attempt gets closer; a beat still out of
+    band after `max_attempts` is flagged with type "length".
+    """
+    prompt = get_prompt("resize")
+    target = beat.target_words
+    lo, hi = beat_band(target, tol)
+    best = scene
+    attempts = 0
+    while attempts < max_attempts and not beat_within_tolerance(best.word_count, target, tol):
+        attempts += 1
+        actual = best.word_count
+        user = prompt.render(
+            beat_id=beat.id,
+            purpose=beat.purpose,
+            actual=actual,
+            n=target,
+            lo=lo,
+            hi=hi,
+            direction="Expand" if actual < target else "Trim",
+            text=best.text,
+        )
+        try:
+            obj = client.complete_json(prompt.system, user, prompt.schema)
+        except Exception as e:
+            print(f"[DRAFT]   {beat.id}: resize attempt {attempts} failed: {e}")
+            break
+        if not obj.get("text"):
+            continue
+        candidate = SceneDraft(scene_id=scene.scene_id, text=obj["text"], flags=list(scene.flags))
+        print(f"[DRAFT]   {beat.id}: resize {attempts}/{max_attempts}: {actual} → {candidate.word_count} words (target {target})")
+        if abs(candidate.word_count - target) < abs(best.word_count - target):
+            best = candidate
+
+    if not beat_within_tolerance(best.word_count, target, tol):
+        best.flags.append({
+            "span": best.text[:80].strip(),
+            "type": "length",
+            "actual": best.word_count,
+            "target": target,
+        })
+    return best
 
 def run(
     state: StoryState,
     model: str = None,
     context: dict = None,
+    tolerance: float = BEAT_TOLERANCE,
+    max_resize_attempts: int = MAX_RESIZE_ATTEMPTS,
+    resize_concurrency: int = None,
+    client: LLMClient = None,
+    on_beat=None,
+    settings=None,
 ) -> StoryState:
     assert state.outline, "Planner must run first"
     assert model, "Draft agent requires model parameter from centralized config"
@@ -28,57 +94,114 @@ def run(
     print(f"[DRAFT] Model: {model}")
     print(f"[DRAFT] Beats to draft: {len(state.outline.beats)}")
     
-    system, output_schema, user_tmpl = _split(PROMPT)
+    prompt = get_prompt("draft")
 
     # Extract context for prompt
-    codex_text = ""
+    codex = None
     notes_fragments = ""
     if context:
-        from ..context_loader import format_codex_for_prompt, extract_notes_fragments
+        from ..context_loader import extract_notes_fragments
         if "codex" in context:
-            codex_text = format_codex_for_prompt(context["codex"])
-            print(f"[DRAFT] Codex context: {len(codex_text)} chars")
+            codex = context["codex"]
         if "notes" in context:
             notes_fragments = extract_notes_fragments(context["notes"])
             print(f"[DRAFT] Notes fragments: {len(notes_fragments)} chars")
 
-    client = LLMClient(LLMConfig(model=model, seed=state.seed))
+    client = client or LLMClient(LLMConfig.for_stage(model, state.seed, settings))
+    if resize_concurrency is None:
+        resize_concurrency = settings.concurrency if settings is not None else RESIZE_CONCURRENCY
     drafts: Dict[str, SceneDraft] = {}
+    voice = VoiceMonitor()
+    beats = {b.id: b for b in state.outline.beats}
 
-    for i, b in enumerate(state.outline.beats, 1):
-        print(f"[DRAFT] Beat {i}/{len(state.outline.beats)}: {b.id} ({b.target_words} words)")
-        
-        user = (
-            user_tmpl.replace("{beat_id}", b.id)
-            .replace("{purpose}", b.purpose)
-            .replace("{n}", str(b.target_words))
-            .replace("{motifs}", ",".join(state.outline.motifs or []))
-            .replace("{codex}", codex_text)
-            .replace("{notes_fragments}", notes_fragments)
-        )
+    # Resizes run in the background while later beats are still drafting
+    pool = ThreadPoolExecutor(max_workers=max(1, resize_concurrency), thread_name_prefix="resize")
+    pending: Dict[str, Future] = {}
+    started: Dict[str, tuple] = {}   # beat id -> (index, perf_counter at beat_started)
+
+    def finish(beat_id: str) -> None:
+        scene = drafts[beat_id]
+        index, t0 = started[beat_id]
+        hooks.emit(hooks.BeatFinished, beat_id=beat_id, index=index, words=scene.word_count,
+                   resized=beat_id in pending, duration_s=time.perf_counter() - t0)
+        # Cheap per-beat stylometrics while drafting; the router recomputes
+        # the whole panel in one batch at the end of the run.
+        state.metrics.setdefault("style", {}).setdefault("beats", {})[beat_id] = style_panel(scene.text)
+        if codex is not None:
+            link_scene(scene, codex)
+            print(f"[DRAFT]   {beat_id} entities: {', '.join(scene.entity_ids()) or 'none'}")
+        if on_beat is not None:
+            on_beat(beat_id, scene)  # e.g. export.BeatStream
+
+    try:
+        for i, b in enumerate(state.outline.beats, 1):
+            print(f"[DRAFT] Beat {i}/{len(state.outline.beats)}: {b.id} ({b.target_words} words)")
+            started[b.id] = (i, time.perf_counter())
+            hooks.emit(hooks.BeatStarted, beat_id=b.id, index=i, target_words=b.target_words)
+
+            # Per-beat codex block: entries ranked against this beat, under budget
+            codex_text = ""
+            if codex is not None:
+                codex_text = select_codex_for_prompt(
+                    codex, beat_query(b.purpose, state.outline.motifs), DRAFT_CODEX_BUDGET
+                )
+                print(f"[DRAFT]   Codex context: {len(codex_text)} chars")
+
+            user = prompt.render(
+                beat_id=b.id,
+                purpose=b.purpose,
+                n=b.target_words,
+                motifs=",".join(state.outline.motifs or []),
+                codex=codex_text,
+                notes_fragments=notes_fragments,
+            )
         
-        print(f"[DRAFT]   Prompt: {len(user)} chars, calling LLM...")
-        obj = client.complete_json(system, user, output_schema)
+            print(f"[DRAFT]   Prompt: {len(user)} chars, calling LLM...")
+            obj = client.complete_json(prompt.system, user, prompt.schema)
 
-        # hard guard: require 'text'
-        if "text" not in obj:
-            raise RuntimeError(
-                f"DraftAgent: model did not return 'text'. Got keys: {list(obj.keys())}. Raw: {str(obj)[:400]}"
+            # hard guard: require 'text'
+            if "text" not in obj:
+                raise RuntimeError(
+                    f"DraftAgent: model did not return 'text'. Got keys: {list(obj.keys())}. Raw: {str(obj)[:400]}"
+                )
+
+            drafts[b.id] = SceneDraft(
+                scene_id=obj.get("scene_id", b.id),
+                text=obj["text"],
+                flags=obj.get("flags", []),
             )
+            print(f"[DRAFT]   ✓ Generated {drafts[b.id].word_count} words")
 
-        word_count = len(obj["text"].split())
-        print(f"[DRAFT]   ✓ Generated {word_count} words")
-        
-        drafts[b.id] = SceneDraft(
-            scene_id=obj.get("scene_id", b.id),
-            text=obj["text"],
-            flags=obj.get("flags", []),
-        )
+            # Score the beat against the voice of the beats accepted so far
+            check = voice.observe(b.id, obj["text"])
+            if check.outlier:
+                drafts[b.id].flags.append(check.as_flag())
+                print(f"[DRAFT]   ⚠ Voice drift: score {check.score:.3f} < {check.threshold:.3f}")
+
+            if max_resize_attempts > 0 and not beat_within_tolerance(drafts[b.id].word_count, b.target_words, tolerance):
+                print(f"[DRAFT]   Out of band ({drafts[b.id].word_count} vs {b.target_words} ±{tolerance:.0%}), resizing in background")
+                pending[b.id] = pool.submit(hooks.bind(resize_beat), client, b, drafts[b.id], tolerance, max_resize_attempts)
+            else:
+                finish(b.id)
+
+        for beat_id, fut in pending.items():
+            drafts[beat_id] = fut.result()
+            finish(beat_id)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    resized = {k: drafts[k].word_count for k in pending}
+    if resized:
+        within = sum(beat_within_tolerance(n, beats[k].target_words, tolerance) for k, n in resized.items())
+        print(f"[DRAFT] Resized {len(resized)} beats, {within} now within tolerance")
+    state.metrics["resized_beats"] = resized
 
     state.drafts = drafts
+    state.metrics["voice"] = voice.summary()
     state.draft_v1_concat = "\n\n".join(d.text for d in drafts.values())
     
-    total_words = len(state.draft_v1_concat.split())
+    # beats are joined with blank lines, so the story count is the sum of beat counts
+    total_words = sum(d.word_count for d in drafts.values())
     print(f"[DRAFT] ✓ Complete: {len(drafts)} scenes, {total_words} total words")
     
     return state
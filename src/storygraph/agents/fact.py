@@ -1,25 +1,19 @@
 from __future__ import annotations
-import json, re, pathlib
+import json, re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List
+from .. import hooks
 from ..state import StoryState        # ✅ ClaimGraph removed
 from ..llm import LLMClient, LLMConfig
 from ..json_utils import coerce_json
+from ..context_store import get_context_store
+from ..corpus import source_head
+from ..codex import ensure_codex
+from ..codex_select import relevant_ids
+from ..linker import link_scene
+from ..prompts import get_prompt
 
 
-# -----------------------------------------------------
-# Load fact-checking prompt
-# -----------------------------------------------------
-
-ROOT = pathlib.Path(__file__).resolve().parents[3]
-PROMPT = (ROOT / "src" / "prompts" / "fact.txt").read_text(encoding="utf-8")
-
-
-def _split(prompt: str):
-    sys = prompt.split("[system]\n", 1)[1].split("[output_schema]", 1)[0].strip()
-    schema = prompt.split("[output_schema]\n", 1)[1].split("[user]", 1)[0].strip()
-    user = prompt.split("[user]\n", 1)[1].strip()
-    return sys, schema, user
-
 def _strip_fences(txt: str) -> str:
     t = txt.strip()
     if t.startswith("```"):
@@ -43,6 +37,21 @@ def _promote_flags_to_claims(obj: Dict) -> Dict:
     return obj
 
 
+def _codex_claims_text(codex, scene_text: str, entity_ids: List[str] = (), limit: int = 20) -> str:
+    """
+    Codex claims most relevant to the scene, as a reference block.
+
+    Linked entity IDs are added to the query so claims about the people and
+    places the scene actually mentions rank first.
+    """
+    query = scene_text + ("\n" + " ".join(entity_ids) if entity_ids else "")
+    ids = relevant_ids(codex, query, "claims", limit)
+    if not ids:
+        return ""
+    print(f"[FACT]   Added {len(ids)} verified claims from codex")
+    return "\n\nVERIFIED CLAIMS FROM CODEX:\n" + "\n".join(codex.get_entry(i).formatted for i in ids)
+
+
 # -----------------------------------------------------
 # Run FactAgent — Phase 1b minimal viable implementation
 # -----------------------------------------------------
@@ -51,7 +60,10 @@ def run(
     state: StoryState,
     model: str = None,
     sources_dir: str = "data/sources",
-    context: dict = None
+    context: dict = None,
+    settings=None,
+    client: LLMClient = None,
+    on_result=None,
 ) -> StoryState:
     """
     Phase-1b FactAgent with codex integration:
@@ -81,25 +93,23 @@ def run(
     # 1) Gather source quotes
     # -------------------------------------------------
     quotes = []
-    src_path = pathlib.Path(sources_dir)
-
-    if src_path.exists():
-        for fp in src_path.glob("*.txt"):
-            quotes.append(
-                {
-                    "id": fp.stem,
-                    "file": fp.name,
-                    "quote": fp.read_text(encoding="utf-8")[:500],
-                }
-            )
+    sources = (context or {}).get("sources")
+    if sources is None:
+        sources = get_context_store().sources(sources_dir)
+
+    for stem in sources:
+        quotes.append(
+            {
+                "id": stem,
+                "file": f"{stem}.txt",
+                "quote": source_head(sources, stem, 500),
+            }
+        )
     
-    # Add codex verified claims as reference
-    codex_claims_text = ""
-    if context and "codex" in context:
-        codex = context["codex"]
-        if codex.get("claims"):
-            codex_claims_text = "\n\nVERIFIED CLAIMS FROM CODEX:\n" + "\n".join(codex["claims"][:20])
-            print(f"[FACT] Added {len(codex['claims'][:20])} verified claims from codex")
+    # Codex verified claims are selected per scene (see _codex_claims_text)
+    codex = None
+    if context and "codex" in context and context["codex"].get("claims"):
+        codex = ensure_codex(context["codex"])
 
     print(f"[FACT] Source quotes: {len(quotes)} files")
     
@@ -107,30 +117,34 @@ def run(
     # 2) Prepare prompt
     # -------------------------------------------------
     assert model, "Fact agent requires model parameter from centralized config"
-    system, output_schema, user_tmpl = _split(PROMPT)
-
-    cfg = LLMConfig(model=model, seed=state.seed)
-    client = LLMClient(cfg)
+    prompt = get_prompt("fact")
 
-    results: List[Dict] = []
+    client = client or LLMClient(LLMConfig.for_stage(model, state.seed, settings))
 
     # -------------------------------------------------
-    # 3) Run scene-by-scene fact checking
+    # 3) Build one request per scene (linking mutates scenes: in order)
     # -------------------------------------------------
+    jobs = []
     for i, (beat_id, scene) in enumerate(state.drafts.items(), 1):
-        print(f"[FACT] Scene {i}/{len(state.drafts)}: {beat_id}")
-
-        user = (
-            user_tmpl
-            .replace("{scene_id}", beat_id)
-            .replace("{scene_text}", scene.text)
-            .replace("{quotes}", json.dumps(quotes, ensure_ascii=False) + codex_claims_text)
+        entity_ids = scene.entity_ids()
+        if codex is not None and not entity_ids:
+            link_scene(scene, codex)
+            entity_ids = scene.entity_ids()
+        codex_claims_text = _codex_claims_text(codex, scene.text, entity_ids) if codex is not None else ""
+
+        user = prompt.render(
+            scene_id=beat_id,
+            scene_text=scene.text,
+            quotes=json.dumps(quotes, ensure_ascii=False) + codex_claims_text,
         )
-        
-        print(f"[FACT]   Prompt: {len(user)} chars, calling LLM...")
+        jobs.append((i, beat_id, entity_ids, user))
+
+    def check(job) -> Dict:
+        i, beat_id, entity_ids, user = job
+        print(f"[FACT] Scene {i}/{len(jobs)}: {beat_id} — prompt {len(user)} chars, calling LLM...")
 
         # LLM call
-        data = client.complete_json(system, user, output_schema)
+        data = client.complete_json(prompt.system, user, prompt.schema)
 
         # Coerce and sanitize
         if isinstance(data, str):
@@ -146,13 +160,26 @@ def run(
         # Minimal guard: ensure keys
         obj.setdefault("scene_id", beat_id)
         obj.setdefault("claims", [])
+        obj["entities"] = entity_ids
         
-        print(f"[FACT]   ✓ Extracted {len(obj.get('claims', []))} claims")
+        print(f"[FACT]   ✓ {beat_id}: extracted {len(obj.get('claims', []))} claims")
+        if on_result is not None:
+            on_result(obj)  # e.g. Pipeline progress events
+        return obj
 
-        results.append(obj)
+    # -------------------------------------------------
+    # 4) Run fact checking (scenes are independent: parallel if configured)
+    # -------------------------------------------------
+    workers = settings.concurrency if settings is not None and settings.batching == "parallel" else 1
+    if workers > 1 and len(jobs) > 1:
+        print(f"[FACT] Checking {len(jobs)} scenes, {workers} at a time")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fact") as pool:
+            results: List[Dict] = list(pool.map(hooks.bind(check), jobs))
+    else:
+        results = [check(job) for job in jobs]
 
     # -------------------------------------------------
-    # 4) Save to StoryState
+    # 5) Save to StoryState
     # -------------------------------------------------
     total_claims = sum(len(r.get('claims', [])) for r in results)
     print(f"[FACT] ✓ Complete: {total_claims} total claims across {len(results)} scenes")
@@ -1,55 +1,47 @@
 # src/storygraph/agents/planner.py
 from __future__ import annotations
-from pathlib import Path
 from ..state import StoryState, Outline, Beat
 from ..llm import LLMClient, LLMConfig
+from ..prompts import Template, compile_template, get_prompt
 
-PROMPT_PATH = Path(__file__).resolve().parents[3] / "src" / "prompts" / "planner.txt"
-PROMPT = PROMPT_PATH.read_text(encoding="utf-8")
-
-def _split(prompt: str):
-    sys = prompt.split("[system]\n", 1)[1].split("[output_schema]", 1)[0].strip()
-    schema = prompt.split("[output_schema]\n", 1)[1].split("[user]", 1)[0].strip()
-    user = prompt.split("[user]\n", 1)[1].strip()
-    return sys, schema, user
-
-def render(user_tmpl: str, premise: str, venue: str,
+def render(user_tmpl, premise: str, venue: str,
            preferred: str = "braided|dual_timeline",
            codex: str = "", notes_fragments: str = "") -> str:
-    return (user_tmpl
-            .replace("{premise}", premise)
-            .replace("{venue}", venue)
-            .replace("{preferred}", preferred)
-            .replace("{codex}", codex)
-            .replace("{notes_fragments}", notes_fragments))
+    tmpl = user_tmpl if isinstance(user_tmpl, Template) else compile_template(user_tmpl)
+    # templates may use any subset of these
+    return tmpl.render(dict(premise=premise, venue=venue, preferred=preferred,
+                            codex=codex, notes_fragments=notes_fragments), strict=False)
 
-def run(state: StoryState, model: str = None, context: dict = None) -> StoryState:
+def run(state: StoryState, model: str = None, context: dict = None, settings=None) -> StoryState:
     assert model, "Planner agent requires model parameter from centralized config"
     
     print("\n[PLANNER] Starting planner agent...")
     print(f"[PLANNER] Model: {model}")
     
-    system, output_schema, user_tmpl = _split(PROMPT)
+    prompt = get_prompt("planner")
     
     # Extract context for prompt
     codex_text = ""
     notes_fragments = ""
     if context:
-        from ..context_loader import format_codex_for_prompt, extract_notes_fragments
+        from ..context_loader import extract_notes_fragments
+        from ..codex_select import select_codex_for_prompt, PLANNER_CODEX_BUDGET
         if "codex" in context:
-            codex_text = format_codex_for_prompt(context["codex"])
+            codex_text = select_codex_for_prompt(
+                context["codex"], f"{state.premise}\n{state.venue}", PLANNER_CODEX_BUDGET, fill=True
+            )
             print(f"[PLANNER] Codex context: {len(codex_text)} chars")
         if "notes" in context:
             notes_fragments = extract_notes_fragments(context["notes"])
             print(f"[PLANNER] Notes fragments: {len(notes_fragments)} chars")
     
-    user = render(user_tmpl, state.premise, state.venue, 
+    user = render(prompt.user, state.premise, state.venue, 
                   codex=codex_text, notes_fragments=notes_fragments)
     
-    print(f"[PLANNER] System prompt: {len(system)} chars")
+    print(f"[PLANNER] System prompt: {len(prompt.system)} chars")
     print(f"[PLANNER] User prompt: {len(user)} chars")
     print(f"[PLANNER] Calling LLM...")
-    obj = LLMClient(LLMConfig(model=model, seed=state.seed)).complete_json(system, user, output_schema)
+    obj = LLMClient(LLMConfig.for_stage(model, state.seed, settings)).complete_json(prompt.system, user, prompt.schema)
 
     if "beats" not in obj or "template" not in obj:
         raise RuntimeError(f"Planner: missing required keys. Got: {list(obj.keys())}")
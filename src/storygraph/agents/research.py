@@ -1,13 +1,14 @@
 from __future__ import annotations
 from ..state import StoryState
-from pathlib import Path
+from ..context_store import get_context_store
 
 
 def run(state: StoryState, sources_dir: str = "data/sources") -> StoryState:
     notes = []
-    for p in Path(sources_dir).glob("*.txt"):
+    corpus = get_context_store().sources(sources_dir)
+    for stem in corpus:
         notes.append(
-            {"id": p.stem, "file": p.name, "quote": p.read_text(encoding="utf-8")[:300]}
+            {"id": stem, "file": f"{stem}.txt", "quote": corpus.head(stem, 300)}
         )
     state.claim_graph = {"quotes": notes, "claims": []}
     return state
@@ -1,41 +1,32 @@
 from __future__ import annotations
-import pathlib
 from ..state import StoryState
 from ..llm import LLMClient, LLMConfig
 from ..json_utils import coerce_json
-
-
-import pathlib
-
-ROOT = pathlib.Path(__file__).resolve().parents[3]
-PROMPT = (ROOT / "src" / "prompts" / "revision.txt").read_text(encoding="utf-8")
+from ..tokens import word_count
+from ..prompts import get_prompt
 
 def run(
-    state: StoryState, model: str = None, targets=None, scope: str = "story"
+    state: StoryState, model: str = None, targets=None, scope: str = "story", settings=None
 ) -> StoryState:
     print("[REVISION] Starting revision agent...")
     print(f"[REVISION] Model: {model}")
     print(f"[REVISION] Scope: {scope}")
-    print(f"[REVISION] Input text: {len(state.draft_v1_concat)} chars")
+    print(f"[REVISION] Input text: {len(state.draft_v1_concat)} chars, {word_count(state.draft_v1_concat)} words")
     
     assert model, "Revision agent requires model parameter from centralized config"
-    system, output_schema, user_tmpl = _split(PROMPT)
-    cfg = LLMConfig(model=model, seed=state.seed)
+    prompt = get_prompt("revision")
+    cfg = LLMConfig.for_stage(model, state.seed, settings)
     client = LLMClient(cfg)
     
-    user = (
-        user_tmpl.replace("{g}", "0.6")
-        .replace("{c}", "0.2")
-        .replace("{w}", "0.4")
-        .replace("{i}", "0.2")
-        .replace("{r}", "0.5")
-        .replace("{scope}", scope)
-        .replace("{text}", state.draft_v1_concat)
+    user = prompt.render(
+        g="0.6", c="0.2", w="0.4", i="0.2", r="0.5",
+        scope=scope,
+        text=state.draft_v1_concat,
     )
     
     print(f"[REVISION] Prompt: {len(user)} chars, calling LLM...")
     
-    data = client.complete_json(system, user, output_schema)
+    data = client.complete_json(prompt.system, user, prompt.schema)
     obj = coerce_json(data)
     
     # naive: apply patches if any, else copy v1
@@ -46,12 +37,5 @@ def run(
         print("[REVISION] No patches needed, copying V1 to V2")
         state.draft_v2_concat = state.draft_v1_concat
     
-    print(f"[REVISION] ✓ Complete: {len(state.draft_v2_concat)} chars")
+    print(f"[REVISION] ✓ Complete: {len(state.draft_v2_concat)} chars, {word_count(state.draft_v2_concat)} words")
     return state
-
-
-def _split(prompt: str):
-    sys = prompt.split("[system]\n", 1)[1].split("[output_schema]", 1)[0].strip()
-    schema = prompt.split("[output_schema]\n", 1)[1].split("[user]", 1)[0].strip()
-    user = prompt.split("[user]\n", 1)[1].strip()
-    return sys, schema, user
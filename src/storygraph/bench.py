@@ -0,0 +1,468 @@
+"""
+Micro-benchmarks for the CPU hot paths, over synthetic inputs at 1x–1000x.
+
+    python -m storygraph bench --save          # record data/bench/baseline.json
+    python -m storygraph bench                 # compare; exit 1 on regression
+    python -m storygraph bench --quick --case json. --case codex.
+
+Each case builds its input once per scale (outside the timing) and returns
+the call to time; `measure` repeats it enough times to run for at least
+`min_time` and reports the best per-call seconds of `repeat` rounds, with
+the garbage collector paused as `timeit` does (the cached 1000x states
+would otherwise make every later case pay for their collection passes).
+
+Timings are compared with the baseline after normalizing for machine
+speed: every report includes `calibration_s`, a fixed pure-Python
+workload (best of a run before and after the cases), and baseline times
+are scaled by the ratio of the two calibrations. A case is a regression
+when it is more than `threshold` (default 25%) slower than its normalized
+baseline; with no baseline recorded the comparison fails outright.
+
+Inputs are deterministic (fixed seeds), so a baseline recorded on one
+commit is comparable with the next.
+"""
+from __future__ import annotations
+import contextlib
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+_ROOT = Path(__file__).resolve().parents[2]  # repo root
+BASELINE = _ROOT / "data" / "bench" / "baseline.json"
+
+SCALES = (1, 10, 100, 1000)
+QUICK_SCALES = (1, 10)
+THRESHOLD = 0.25
+MIN_TIME = 0.05
+REPEAT = 5
+
+_WORDS = (
+    "ridge snow col rope helmet summit gully dawn trailhead glacier scree wind partner descent "
+    "silence light step anchor cornice ice the a of and we she he was were had climbed walked "
+    "slowly quiet cold bright under above before after into across"
+).split()
+
+
+# -----------------------------------------------------------------------------
+# Registry
+# -----------------------------------------------------------------------------
+@dataclass(frozen=True)
+class Case:
+    name: str
+    setup: Callable[[int, Path], Callable[[], Any]]   # (scale, workdir) -> timed call
+    scales: Tuple[int, ...]
+    doc: str = ""
+
+
+CASES: Dict[str, Case] = {}
+
+
+def case(name: str, scales: Sequence[int] = SCALES):
+    def register(setup):
+        CASES[name] = Case(name, setup, tuple(scales), (setup.__doc__ or "").strip())
+        return setup
+    return register
+
+
+def select(patterns: Optional[Iterable[str]] = None) -> List[Case]:
+    """Cases whose name equals or starts with one of `patterns` (all when empty)."""
+    patterns = list(patterns or [])
+    if not patterns:
+        return list(CASES.values())
+    chosen = [c for c in CASES.values() if any(c.name == p or c.name.startswith(p) for p in patterns)]
+    if not chosen:
+        raise ValueError(f"no benchmark matches {patterns} (known: {', '.join(CASES)})")
+    return chosen
+
+
+# -----------------------------------------------------------------------------
+# Synthetic inputs
+# -----------------------------------------------------------------------------
+def _vocabulary(size: int = 4000, seed: int = 1) -> Tuple[List[str], List[float]]:
+    """Words with cumulative Zipf weights: a realistic long tail (a tiny vocabulary makes every word
+    "popular" to difflib's autojunk heuristic and v1/v2 alignment degenerates)."""
+    rng = random.Random(seed)
+    syllables = ["ka", "lo", "ri", "sen", "tor", "va", "mi", "dun", "el", "pra", "sto", "gle", "ash", "wen"]
+    words = list(dict.fromkeys(_WORDS + ["".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(size)]))
+    return words, list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(words))))
+
+
+_VOCAB = _vocabulary()
+
+
+def sentence(rng: random.Random, n: int = 12) -> str:
+    words = rng.choices(_VOCAB[0], cum_weights=_VOCAB[1], k=n)
+    return " ".join(words).capitalize() + "."
+
+
+def prose(rng: random.Random, words: int) -> str:
+    out, n = [], 0
+    while n < words:
+        k = rng.randint(6, 18)
+        out.append(sentence(rng, k))
+        n += k
+    return " ".join(out)
+
+
+@lru_cache(maxsize=8)
+def synthetic_state(beats: int, words_per_beat: int = 400, claims_per_beat: int = 8, seed: int = 7):
+    """StoryState with `beats` drafted beats, a revised v2 and a claim graph (cached: treat as read-only)."""
+    from .document import SEPARATOR
+    from .state import Beat, Outline, SceneDraft, StoryState
+
+    rng = random.Random(seed)
+    s = StoryState(premise="Youth, mountains, and the stillness that follows ascent", venue="Granta", seed=seed)
+    ids = [f"B{i + 1}" for i in range(beats)]
+    s.outline = Outline(template="braided", beats=[Beat(id=b, purpose="p", target_words=words_per_beat) for b in ids])
+    s.drafts = {b: SceneDraft(scene_id=b, text=prose(rng, words_per_beat)) for b in ids}
+    s.draft_v1_concat = SEPARATOR.join(d.text for d in s.drafts.values())
+    s.draft_v2_concat = _revise(s.draft_v1_concat)
+    s.claim_graph = {"quotes": [], "claims_by_scene": [
+        {"scene_id": b, "entities": ["P1", "PL1"], "claims": [
+            {"claim": sentence(rng), "substantiated": rng.random() < 0.6, "evidence_ids": ["S1"]}
+            for _ in range(claims_per_beat)
+        ]}
+        for b in ids
+    ]}
+    s.metrics = {"word_count_v2": beats * words_per_beat, "within_band": True}
+    return s
+
+
+def _revise(text: str) -> str:
+    """A light revision pass: a few word-level edits in every beat."""
+    return text.replace(" slowly ", " ").replace(" the ", " that ")
+
+
+def _beat_texts(beats: int, words_per_beat: int = 400, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    return [prose(rng, words_per_beat) for _ in range(beats)]
+
+
+def write_codex(directory: Path, entries: int, seed: int = 7) -> Path:
+    """docs/codex-style markdown files with `entries` items spread over the four categories."""
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    per = max(1, entries // 4)
+    layout = {"people": ("People", "P"), "places": ("Places", "PL"), "claims": ("Claims", "CL"), "sources": ("Sources", "S")}
+    for cat, (title, prefix) in layout.items():
+        lines = [f"# {title}", ""]
+        if cat == "claims":
+            lines += ["## Verified Factual", ""]
+        for i in range(1, per + 1):
+            name = " ".join(rng.choices(_VOCAB[0], k=2)).title()
+            lines.append(f"- [{prefix}{i}] {name} — {sentence(rng, 20)} See P{rng.randint(1, per)} and PL{rng.randint(1, per)}.")
+        (directory / f"{cat}.md").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return directory
+
+
+def synthetic_notes(sections: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    parts = ["# Notes", ""]
+    for i in range(sections):
+        heading = ("## Fragments", "## Voice Reminders", f"## Scratch {i}")[i % 3]
+        parts.append(heading)
+        parts.extend(f"- {sentence(rng)}" for _ in range(12))
+        parts.append("")
+    return "\n".join(parts)
+
+
+def _fact_response(claims: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    body = {"scene_id": "B3", "claims": [
+        {"claim": sentence(rng), "substantiated": rng.random() < 0.5, "evidence_ids": [f"S{rng.randint(1, 9)}"]}
+        for _ in range(claims)
+    ]}
+    return "```json\n" + json.dumps(body, indent=2, ensure_ascii=False) + "\n```\nLet me know if you need more claims."
+
+
+# -----------------------------------------------------------------------------
+# Cases
+# -----------------------------------------------------------------------------
+def _sanitizer():
+    from .llm import LLMClient
+
+    return LLMClient.__new__(LLMClient)._extract_and_sanitize_json   # no SDK client needed
+
+
+@case("json.sanitize.realistic")
+def _json_realistic(scale: int, workdir: Path):
+    """LLMClient._extract_and_sanitize_json on a fenced fact response with 10·scale claims."""
+    sanitize, text = _sanitizer(), _fact_response(10 * scale)
+    return lambda: sanitize(text)
+
+
+@case("json.sanitize.adversarial")
+def _json_adversarial(scale: int, workdir: Path):
+    """Same, with prose before the JSON, braces inside strings, raw newlines and trailing commas."""
+    rng = random.Random(11)
+    claims = ",\n".join(
+        '{"claim": "%s {see %s\n continued", "substantiated": false, "evidence_ids": ["S1",],}' % (sentence(rng), "}" * (i % 3))
+        for i in range(10 * scale)
+    )
+    text = prose(rng, 40 * scale) + '\n{"scene_id": "B3", "claims": [\n' + claims + ",\n],}\ntrailing {garbage"
+    sanitize = _sanitizer()
+    return lambda: sanitize(text)
+
+
+@case("context.load_cold")
+def _context_cold(scale: int, workdir: Path):
+    """load_all_context from an uncached store; codex of 10·scale entries (10–10k)."""
+    from .context_store import ContextStore
+
+    codex_dir, notes, sources = _context_files(scale, workdir)
+    return lambda: ContextStore(codex_dir, notes, sources).load_all()
+
+
+@case("context.load_warm")
+def _context_warm(scale: int, workdir: Path):
+    """load_all_context from the shared store when nothing changed on disk."""
+    from .context_store import ContextStore
+
+    store = ContextStore(*_context_files(scale, workdir))
+    store.load_all()
+    return store.load_all
+
+
+def _context_files(scale: int, workdir: Path):
+    root = workdir / f"context_{scale}"
+    if not root.exists():
+        write_codex(root / "codex", 10 * scale)
+        (root / "notes.md").write_text(synthetic_notes(3), encoding="utf-8")
+        (root / "sources").mkdir()
+        (root / "sources" / "intent.txt").write_text(prose(random.Random(3), 2000), encoding="utf-8")
+    return root / "codex", root / "notes.md", root / "sources"
+
+
+@case("codex.format_prompt")
+def _codex_format(scale: int, workdir: Path):
+    """format_codex_for_prompt on a compiled codex of 10·scale entries (default 20 per category)."""
+    from .codex import compile_codex
+    from .context_loader import format_codex_for_prompt
+
+    codex = compile_codex(_context_files(scale, workdir)[0], snapshot_path=None)
+    return lambda: format_codex_for_prompt(codex)
+
+
+@case("codex.format_prompt_all")
+def _codex_format_all(scale: int, workdir: Path):
+    """format_codex_for_prompt of every entry of a plain-dict codex of 10·scale entries."""
+    from .codex import compile_codex
+    from .context_loader import format_codex_for_prompt
+
+    codex = dict(compile_codex(_context_files(scale, workdir)[0], snapshot_path=None))
+    return lambda: format_codex_for_prompt(codex, max_items_per_category=10 ** 9)
+
+
+@case("notes.fragments")
+def _notes(scale: int, workdir: Path):
+    """extract_notes_fragments on notes with 3·scale sections (~40·scale lines)."""
+    from .context_loader import extract_notes_fragments
+
+    notes = synthetic_notes(3 * scale)
+    return lambda: extract_notes_fragments(notes)
+
+
+@case("validators.audit_beats")
+def _audit(scale: int, workdir: Path):
+    """audit_beats over `scale` beats of 400 words (plain text: tokenized on every call)."""
+    from .validators import audit_beats
+
+    texts = _beat_texts(scale)
+    drafts = {f"B{i + 1}": t for i, t in enumerate(texts)}
+    targets = {k: 400 for k in drafts}
+    return lambda: audit_beats(drafts, targets)
+
+
+@case("validators.total_words")
+def _total_words(scale: int, workdir: Path):
+    """total_words of a story of 400·scale words."""
+    from .document import SEPARATOR
+    from .validators import total_words
+
+    text = SEPARATOR.join(_beat_texts(scale))
+    return lambda: total_words(text)
+
+
+@case("document.set_view")
+def _set_view(scale: int, workdir: Path):
+    """Recording a revised v2 over `scale` beats (StoryState.draft_v2_concat setter)."""
+    s = synthetic_state(scale).model_copy(deep=True)
+    v2 = s.draft_v2_concat
+
+    def record():
+        s.draft_v2_concat = v2
+    return record
+
+
+@case("export.markdown")
+def _export_md(scale: int, workdir: Path):
+    """Markdown export (export.render_text, v2 view; formerly run_pipeline._mk_markdown) of `scale` beats."""
+    from .export import render_text
+
+    s = synthetic_state(scale)
+    return lambda: render_text(s, "md", "v2")
+
+
+@case("state.json.encode")
+def _json_encode(scale: int, workdir: Path):
+    """StoryState.model_dump_json of `scale` beats with 8 claims each."""
+    return synthetic_state(scale).model_dump_json
+
+
+@case("state.json.decode")
+def _json_decode(scale: int, workdir: Path):
+    """StoryState.model_validate_json of the same."""
+    from .state import StoryState
+
+    raw = synthetic_state(scale).model_dump_json()
+    return lambda: StoryState.model_validate_json(raw)
+
+
+@case("state.binary.encode")
+def _binary_encode(scale: int, workdir: Path):
+    """serialization.dumps (sectioned binary format) of `scale` beats."""
+    from . import serialization
+
+    s = synthetic_state(scale)
+    return lambda: serialization.dumps(s)
+
+
+@case("state.binary.decode")
+def _binary_decode(scale: int, workdir: Path):
+    """serialization.loads of the same."""
+    from . import serialization
+
+    raw = serialization.dumps(synthetic_state(scale))
+    return lambda: serialization.loads(raw)
+
+
+# -----------------------------------------------------------------------------
+# Running
+# -----------------------------------------------------------------------------
+def measure(fn: Callable[[], Any], min_time: float = MIN_TIME, repeat: int = REPEAT) -> float:
+    """Best per-call seconds over `repeat` rounds of enough calls to last `min_time`."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        t0 = time.perf_counter()
+        fn()
+        once = time.perf_counter() - t0
+        number = max(1, int(min_time / once)) if once > 0 else 1000
+        best = float("inf")
+        for _ in range(max(1, repeat)):
+            t0 = time.perf_counter()
+            for _ in range(number):
+                fn()
+            best = min(best, (time.perf_counter() - t0) / number)
+        return best
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def calibrate(min_time: float = MIN_TIME, repeat: int = REPEAT) -> float:
+    """Seconds for a fixed pure-Python workload (string, dict and regex work)."""
+    import re
+
+    words = " ".join(_WORDS * 50)
+    pattern = re.compile(r"\b\w+\b")
+
+    def work():
+        counts: Dict[str, int] = {}
+        for w in pattern.findall(words):
+            counts[w] = counts.get(w, 0) + 1
+        return json.dumps(sorted(counts.items()))
+
+    return measure(work, min_time, repeat)
+
+
+def run(
+    patterns: Optional[Iterable[str]] = None,
+    scales: Optional[Sequence[int]] = None,
+    min_time: float = MIN_TIME,
+    repeat: int = REPEAT,
+    progress: Optional[Callable[[str, float], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Run the selected cases at `scales` (default: each case's own; never above a
+    case's largest scale); returns
+    {"calibration_s", "python", "machine", "results": {"name@scale": seconds}}.
+    """
+    results: Dict[str, float] = {}
+    calibration = calibrate(min_time, repeat)
+    with tempfile.TemporaryDirectory(prefix="storygraph-bench-") as tmp, open(os.devnull, "w") as devnull:
+        for c in select(patterns):
+            for scale in ([x for x in scales if x <= max(c.scales)] if scales else c.scales):
+                with contextlib.redirect_stdout(devnull):   # agents' [DEBUG ...] prints
+                    fn = c.setup(scale, Path(tmp))
+                    seconds = measure(fn, min_time, repeat)
+                key = f"{c.name}@{scale}"
+                results[key] = seconds
+                if progress is not None:
+                    progress(key, seconds)
+    # a cold process calibrates slow; the best of both ends is the machine's speed
+    calibration = min(calibration, calibrate(min_time, repeat))
+    return {
+        "calibration_s": calibration,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+# -----------------------------------------------------------------------------
+# Baselines
+# -----------------------------------------------------------------------------
+def load_baseline(path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    path = Path(path) if path is not None else BASELINE
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_baseline(report: Dict[str, Any], path: Optional[Path] = None) -> Path:
+    """Write `report` as the baseline; results of cases not in `report` are kept."""
+    from .writer import atomic_write
+
+    path = Path(path) if path is not None else BASELINE
+    old = load_baseline(path) or {}
+    merged = dict(report)
+    if old.get("results"):
+        # keep older cases, rescaled to this report's machine speed
+        factor = report["calibration_s"] / old["calibration_s"] if old.get("calibration_s") else 1.0
+        kept = {k: v * factor for k, v in old["results"].items() if k not in report["results"]}
+        merged["results"] = {**kept, **report["results"]}
+    return atomic_write(path, json.dumps(merged, indent=2, sort_keys=True) + "\n")
+
+
+def compare(
+    report: Dict[str, Any], baseline: Dict[str, Any], threshold: float = THRESHOLD
+) -> List[Dict[str, Any]]:
+    """
+    One row per case present in both: {"case", "baseline_s" (normalized),
+    "current_s", "ratio", "regression"}.
+    """
+    factor = 1.0
+    if baseline.get("calibration_s") and report.get("calibration_s"):
+        factor = report["calibration_s"] / baseline["calibration_s"]
+    rows = []
+    for key, current in report["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if base is None:
+            continue
+        expected = base * factor
+        ratio = current / expected if expected > 0 else float("inf")
+        rows.append({
+            "case": key, "baseline_s": expected, "current_s": current,
+            "ratio": ratio, "regression": ratio > 1.0 + threshold,
+        })
+    return rows
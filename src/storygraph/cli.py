@@ -0,0 +1,611 @@
+"""
+Command-line interface: `python -m storygraph <command>`.
+
+    run       run the pipeline once (premise/venue/seed from flags or env)
+    resume    continue a failed or partial run from the run store or a checkpoint file
+    batch     run every premise in a file
+    submit    queue premises as jobs for workers (storygraph.jobs)
+    worker    run queued jobs in worker processes
+    jobs      list queued/running/finished jobs; set per-profile limits
+    export    render stored runs to Markdown/HTML without re-running them
+    runs      list recorded runs
+    bench     hot-path benchmarks against a stored baseline (or serialization of one state)
+    serve     serve the UI and the run/progress API (storygraph.service)
+    fake-provider  local stand-in for the LLM APIs (storygraph.fakeprovider)
+    loadtest  concurrent pipeline runs against the fake provider (storygraph.loadtest)
+
+`run`, `resume`, `batch` and `loadtest` take `--trace events.jsonl` to
+record the lifecycle hooks of their runs (stage, beat, LLM call, retry,
+cache hit, checkpoint events with timings).
+
+Only the standard library is imported up front; each command imports what
+it needs. `export`, `runs` and `--help` never load the LLM SDKs, the agents
+or numpy, so they start in milliseconds, and so do worker processes that
+import storygraph modules.
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+ROOT = Path(__file__).resolve().parents[2]   # repo root
+EXPORTS_DIR = ROOT / "exports"
+OUTPUT_JSON = ROOT / "story_output.json"
+CHECKPOINT = ROOT / "data" / "runs" / "checkpoint.sgst"
+STAGE_NAMES = ("planner", "draft", "fact", "revision")
+
+
+# -----------------------------------------------------------------------------
+# Environment and profile
+# -----------------------------------------------------------------------------
+def _load_env() -> None:
+    try:
+        from dotenv import load_dotenv  # type: ignore
+    except Exception:
+        return
+    load_dotenv(dotenv_path=ROOT / ".env")
+
+
+def _has(var: str) -> str:
+    v = os.getenv(var)
+    return "set" if v and len(v) > 10 else "missing"
+
+
+def _prepare(args, memory=None) -> tuple:
+    """Load .env, resolve the profile and load context; returns (profile, models, context)."""
+    _load_env()
+    os.environ["LLM_PROFILE"] = args.profile
+    from .config_loader import load_profile
+
+    profile = load_profile(args.profile)
+    print("\nModel configuration (profile:", args.profile + "):")
+    for stage, st in profile.stages.items():
+        print(
+            f"  {stage.capitalize()}: {st.model} (concurrency {st.concurrency}, batching {st.batching}, "
+            f"retries {st.retries}, max_tokens {st.max_tokens}, cache {st.cache}"
+            + (f", {st.rate_limit_rpm:g} rpm" if st.rate_limit_rpm else "") + ")"
+        )
+    print("\nAPI keys:")
+    print("  OPENAI_API_KEY:", _has("OPENAI_API_KEY"))
+    print("  ANTHROPIC_API_KEY:", _has("ANTHROPIC_API_KEY"))
+
+    from .context_loader import load_all_context
+
+    with memory.stage("context") if memory is not None else contextlib.nullcontext():
+        context = load_all_context()
+    print("\nLoaded context:")
+    for key in ("people", "places", "claims", "sources"):
+        print(f"  Codex {key}: {len(context['codex'][key])}")
+    print(f"  Notes: {'present' if context['notes'] else 'absent'}")
+    print(f"  Source files: {list(context['sources'].keys())}")
+    return profile, profile.models(), context
+
+
+def _store(args):
+    from .runstore import get_run_store
+
+    return get_run_store(Path(args.db) if args.db else None)
+
+
+def _pipeline(args, profile, seed: int, stream_path: Optional[Path] = None, memory=None):
+    from .router import Pipeline
+    from .writer import get_writer
+
+    return Pipeline(
+        seed=seed, store=_store(args), profile=args.profile, config=profile.as_dict(),
+        writer=get_writer(), checkpoint_path=CHECKPOINT, stream_path=stream_path, settings=profile,
+        memory=memory,
+    )
+
+
+def _memory(args):
+    """MemoryProfiler when --memory (or a budget) is given, else None."""
+    if not (args.memory or args.memory_budget):
+        return None
+    from .memprofile import MemoryProfiler, parse_budgets
+
+    return MemoryProfiler(parse_budgets(args.memory_budget)).start()
+
+
+def _memory_report(memory, out_dir: Path, prefix: str) -> List[str]:
+    """Write <prefix>_memory.json next to the exports; returns the exceeded budgets."""
+    path = memory.write(out_dir / f"{prefix}_memory.json")
+    print(f"\nMemory by stage ({path}):")
+    print(memory.summary())
+    violations = memory.violations()
+    for v in violations:
+        print(f"[MEMORY] ✗ over budget: {v}")
+    return violations
+
+
+@contextlib.contextmanager
+def _trace(args):
+    """Append every lifecycle event of the command's runs to --trace as JSON lines."""
+    path = getattr(args, "trace", None)
+    if not path:
+        yield
+        return
+    from .hooks import JSONLSink, get_hooks
+
+    sink = JSONLSink(path, full=args.trace_full)
+    try:
+        with get_hooks().subscribe(sink):
+            yield
+    finally:
+        sink.close()
+        print(f"[HOOKS] Trace written to {path}")
+
+
+def _report(state, pipe) -> None:
+    print("\nPipeline finished. Metrics:")
+    for k, v in state.metrics.items():
+        print(f"{k}: {v}")
+    print("\nDraft V2 (first 400 chars):")
+    print((state.draft_v2_concat or "")[:400])
+    print(f"\nRecorded run {pipe.run_id} in {pipe.store.path}")
+
+
+def _write_outputs(state, out_dir: Path, prefix: str = "story", memory=None) -> None:
+    """V2/diff Markdown and V2 HTML (V1 is streamed while drafting)."""
+    from .export import export_state
+
+    with memory.stage("export") if memory is not None else contextlib.nullcontext():
+        export_state(state, out_dir / f"{prefix}_v2.md", view="v2")
+        export_state(state, out_dir / f"{prefix}_diff.md", view="diff")
+        export_state(state, out_dir / f"{prefix}_v2.html", view="v2")
+
+
+# -----------------------------------------------------------------------------
+# Commands
+# -----------------------------------------------------------------------------
+def cmd_run(args) -> int:
+    memory = _memory(args)
+    profile, models, context = _prepare(args, memory)
+    from .writer import get_writer
+
+    out_dir = Path(args.out)
+    pipe = _pipeline(args, profile, args.seed, out_dir / "story_v1.md", memory)
+    print("\nRunning planner → draft → fact → revision ...")
+    state = pipe.run_minimal(args.premise, args.venue, models=models, context=context)
+    _report(state, pipe)
+
+    # latest run only; the run store keeps every run
+    writer = get_writer()
+    writer.write(OUTPUT_JSON, state.model_dump_json(indent=2))
+    print(f"\nQueued story output: {OUTPUT_JSON}")
+    _write_outputs(state, out_dir, memory=memory)
+    writer.flush(raise_errors=True)
+    print(f"Saved V1 Markdown to: {out_dir / 'story_v1.md'}")
+    print(f"Saved V2 Markdown to: {out_dir / 'story_v2.md'}")
+    if memory is not None and _memory_report(memory, out_dir, "story"):
+        return 1
+    return 0
+
+
+def cmd_resume(args) -> int:
+    store = _store(args)
+    if args.checkpoint:
+        from .serialization import open_state
+
+        state = open_state(args.checkpoint).to_state()
+        source = args.checkpoint
+    else:
+        run_id = args.run_id
+        if run_id is None:
+            record = store.latest(status="failed")
+            if record is None:
+                print("No failed run to resume.")
+                return 1
+            run_id = record.run_id
+        state = store.replay_state(run_id, args.after)
+        source = f"run {run_id}"
+    from .router import completed_stage
+
+    after = args.after or completed_stage(state)
+    print(f"Resuming {source} after stage: {after or '(none)'}")
+    memory = _memory(args)
+    profile, models, context = _prepare(args, memory)
+    pipe = _pipeline(args, profile, state.seed, memory=memory)
+    state = pipe.resume(state, models=models, context=context, after=after)
+    _report(state, pipe)
+    _write_outputs(state, Path(args.out), prefix=pipe.run_id, memory=memory)
+    if memory is not None and _memory_report(memory, Path(args.out), pipe.run_id):
+        return 1
+    return 0
+
+
+def _read_batch(path: Path, venue: str, seed: int) -> List[Dict]:
+    """JSONL ({"premise", "venue"?, "seed"?} per line) or plain text (one premise per line)."""
+    jobs = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        job = json.loads(line) if line.startswith("{") else {"premise": line}
+        job.setdefault("venue", venue)
+        job.setdefault("seed", seed)
+        jobs.append(job)
+    return jobs
+
+
+def cmd_batch(args) -> int:
+    jobs = _read_batch(Path(args.file), args.venue, args.seed)
+    print(f"Batch: {len(jobs)} premise(s) from {args.file}")
+    memory = _memory(args)
+    profile, models, context = _prepare(args, memory)
+    failed = 0
+    for i, job in enumerate(jobs, 1):
+        print(f"\n[BATCH] {i}/{len(jobs)}: {job['premise']}")
+        if memory is not None:
+            memory.reset()  # each run's report keeps the shared context load
+        pipe = _pipeline(args, profile, int(job["seed"]), memory=memory)
+        try:
+            state = pipe.run_minimal(job["premise"], job["venue"], models=models, context=context)
+        except Exception as e:
+            failed += 1
+            print(f"[BATCH] ✗ run {pipe.run_id} failed: {type(e).__name__}: {e}")
+            if memory is not None:
+                _memory_report(memory, Path(args.out), pipe.run_id)  # includes the stage that raised
+            if args.stop_on_error:
+                break
+            continue
+        _write_outputs(state, Path(args.out), prefix=pipe.run_id, memory=memory)
+        if memory is not None and _memory_report(memory, Path(args.out), pipe.run_id):
+            failed += 1
+            print(f"[BATCH] ✗ run {pipe.run_id} exceeded its memory budget")
+            if args.stop_on_error:
+                break
+            continue
+        print(f"[BATCH] ✓ run {pipe.run_id}")
+    print(f"\nBatch finished: {len(jobs) - failed} ok, {failed} failed")
+    return 1 if failed else 0
+
+
+def _queue(args):
+    from .jobs import JobQueue
+
+    return JobQueue(Path(args.queue) if args.queue else None)
+
+
+def cmd_submit(args) -> int:
+    if args.file:
+        payloads = _read_batch(Path(args.file), args.venue, args.seed)
+    else:
+        payloads = [{"premise": args.premise, "venue": args.venue, "seed": args.seed}]
+    with _queue(args) as queue:
+        ids = queue.submit_many(payloads, profile=args.profile, priority=args.priority, max_attempts=args.max_attempts)
+    for job_id in ids:
+        print(job_id)
+    return 0
+
+
+def cmd_worker(args) -> int:
+    _load_env()
+    from .jobs import JobQueue, Worker, run_workers
+
+    profiles = args.only.split(",") if args.only else None
+    if args.processes > 1:
+        codes = run_workers(
+            args.processes, args.queue, args.db, lease_s=args.lease, profiles=profiles,
+            max_jobs=args.max_jobs, drain=args.drain,
+        )
+        return 1 if any(codes) else 0
+    with JobQueue(Path(args.queue) if args.queue else None) as queue:
+        worker = Worker(queue, lease_s=args.lease, profiles=profiles, db_path=Path(args.db) if args.db else None)
+        try:
+            n = worker.run(max_jobs=args.max_jobs, drain=args.drain)
+        except KeyboardInterrupt:
+            return 130
+    print(f"[WORKER] {worker.worker_id}: {n} job(s) processed")
+    return 0
+
+
+def cmd_jobs(args) -> int:
+    import time
+
+    with _queue(args) as queue:
+        for item in args.set_limit or []:
+            profile, _, n = item.partition("=")
+            queue.set_limit(profile, int(n) if n and n != "none" else None)
+        if args.cancel:
+            for job_id in args.cancel:
+                print(f"{job_id}: {'cancelled' if queue.cancel(job_id) else 'not queued'}")
+            return 0
+        print("  ".join(f"{k}: {v}" for k, v in queue.counts().items()))
+        limits = queue.limits()
+        if limits:
+            print("limits: " + ", ".join(f"{k}={v}" for k, v in sorted(limits.items())))
+        for j in queue.list_jobs(status=args.status, limit=args.limit):
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(j.created_at))
+            print(
+                f"{j.job_id}  {j.status:<8}  p{j.priority:<3} {created}  {j.profile:<10}  "
+                f"{j.attempts}/{j.max_attempts}  {j.run_id or '-'}  {j.payload['premise']}"
+                + (f"  [{j.error}]" if j.error else "")
+            )
+    return 0
+
+
+def cmd_export(args) -> int:
+    from .export import export_runs
+
+    run_ids = list(args.run_ids)
+    if args.latest or not run_ids:
+        record = _store(args).latest(status="done")
+        if record is None:
+            print("No completed run to export.")
+            return 1
+        run_ids.append(record.run_id)
+    written = export_runs(
+        run_ids, args.out, formats=args.format.split(","), views=args.view.split(","),
+        db_path=args.db, processes=args.processes,
+    )
+    for paths in written.values():
+        for p in paths:
+            print(p)
+    return 0
+
+
+def cmd_runs(args) -> int:
+    import time
+
+    for r in _store(args).list_runs(premise=args.premise, profile=args.profile_filter, status=args.status, limit=args.limit):
+        created = time.strftime("%Y-%m-%d %H:%M", time.localtime(r.created_at))
+        print(f"{r.run_id}  {r.status:<8}  {created}  {r.profile or '-':<10}  {r.premise}")
+    return 0
+
+
+def cmd_bench(args) -> int:
+    if args.run_id or args.state:
+        return _bench_state(args)
+    from . import bench
+
+    if args.list:
+        for c in bench.CASES.values():
+            print(f"{c.name:<28}{','.join(map(str, c.scales)):<16}{c.doc}")
+        return 0
+    scales = bench.QUICK_SCALES if args.quick else (tuple(int(x) for x in args.scales.split(",")) if args.scales else None)
+    progress = None if args.json else (lambda key, s: print(f"  {key:<36}{s * 1e3:>12.3f} ms", flush=True))
+    report = bench.run(args.case, scales, repeat=args.repeat, progress=progress)
+    baseline_path = Path(args.baseline) if args.baseline else bench.BASELINE
+    baseline = bench.load_baseline(baseline_path)
+    rows = bench.compare(report, baseline, args.threshold) if baseline else []
+    if args.json:
+        print(json.dumps({**report, "comparison": rows}, indent=2))
+    elif rows:
+        print(f"\n{'case':<36}{'baseline ms':>13}{'now ms':>11}{'ratio':>8}")
+        for r in rows:
+            flag = "  REGRESSION" if r["regression"] else ""
+            print(f"{r['case']:<36}{r['baseline_s'] * 1e3:>13.3f}{r['current_s'] * 1e3:>11.3f}{r['ratio']:>8.2f}{flag}")
+    if args.save:
+        print(f"Saved baseline: {bench.save_baseline(report, baseline_path)}")
+        return 0
+    if baseline is None:
+        # a gate without a baseline would always pass
+        print(f"\n[BENCH] No baseline at {baseline_path} (record one with --save)")
+        return 1
+    regressions = [r for r in rows if r["regression"]]
+    if regressions:
+        print(f"\n[BENCH] {len(regressions)} regression(s) over {args.threshold:.0%}: "
+              + ", ".join(r["case"] for r in regressions))
+        return 1
+    return 0
+
+
+def _bench_state(args) -> int:
+    from . import serialization
+
+    if args.run_id:
+        state = _store(args).load_state(args.run_id)
+    elif str(args.state).endswith(".sgst"):
+        state = serialization.open_state(args.state).to_state()
+    else:
+        from .state import StoryState
+
+        state = StoryState.model_validate_json(Path(args.state).read_bytes())
+    results = serialization.benchmark(state, repeat=args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f"{'format':<22}{'bytes':>10}{'encode ms':>12}{'decode ms':>12}")
+    for name, r in results.items():
+        print(f"{name:<22}{r['bytes']:>10}{r['encode_s'] * 1e3:>12.2f}{r['decode_s'] * 1e3:>12.2f}")
+    return 0
+
+
+def cmd_serve(args) -> int:
+    import asyncio
+    from .service import serve
+
+    _load_env()
+    try:
+        asyncio.run(serve(args.host, args.port, max_runs=args.max_runs, db_path=args.db, ui_dir=Path(args.dir)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _provider_config(args):
+    from .fakeprovider import ProviderConfig
+
+    return ProviderConfig(
+        latency=args.latency, per_word_s=args.per_word, rate_limit=args.rate_limit, overload=args.overload,
+        truncate=args.truncate, malformed=args.malformed, beats=args.beats, words=args.words, seed=args.fault_seed,
+    )
+
+
+def cmd_fake_provider(args) -> int:
+    from .fakeprovider import FakeProvider, client_env, parse_latency
+
+    parse_latency(args.latency)  # fail before binding the port
+    server = FakeProvider(_provider_config(args)).start(args.host, args.port)
+    print(f"[FAKE] Serving the provider APIs at {server.url}; point the clients at it with:")
+    for k, v in client_env(server.url).items():
+        print(f"  export {k}={v}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+def cmd_loadtest(args) -> int:
+    from .fakeprovider import parse_latency
+    from .loadtest import format_report, run_load
+
+    parse_latency(args.latency)
+    report = run_load(
+        runs=args.runs, concurrency=args.concurrency, provider=_provider_config(args), url=args.url,
+        profile=args.profile, backoff_s=None if args.backoff < 0 else args.backoff, quiet=not args.verbose,
+    )
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 1 if report["failed"] else 0
+
+
+# -----------------------------------------------------------------------------
+# Parser
+# -----------------------------------------------------------------------------
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="storygraph", description="Literary nonfiction pipeline")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=None, help="run store path (default: data/runs/runs.sqlite)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def llm_options(p):
+        p.add_argument("--profile", default=os.getenv("LLM_PROFILE", "default"), help="profile in config/llm_profiles.yaml")
+        p.add_argument("--out", default=str(EXPORTS_DIR), help="export directory")
+        p.add_argument("--memory", action="store_true", help="profile memory per stage (<out>/<run>_memory.json)")
+        p.add_argument("--memory-budget", action="append", metavar="KEY=MB",
+                       help="fail the run above this many MB: rss, traced or a stage name (implies --memory)")
+        trace_options(p)
+
+    def trace_options(p):
+        p.add_argument("--trace", metavar="PATH", help="append lifecycle events (storygraph.hooks) to PATH as JSON lines")
+        p.add_argument("--trace-full", action="store_true", help="include beat text, claims and metrics in the trace")
+
+    p = sub.add_parser("run", parents=[common], help="run the pipeline once")
+    p.add_argument("--premise", default=os.getenv("PREMISE", "Youth, mountains, and the stillness that follows ascent"))
+    p.add_argument("--venue", default=os.getenv("VENUE", "Serious literary magazine like Granta"))
+    p.add_argument("--seed", type=int, default=int(os.getenv("SEED", "137")))
+    llm_options(p)
+    p.set_defaults(fn=cmd_run)
+
+    p = sub.add_parser("resume", parents=[common], help="continue a failed or partial run")
+    p.add_argument("run_id", nargs="?", help="run to resume (default: latest failed run)")
+    p.add_argument("--checkpoint", help="resume from a .sgst checkpoint file instead of the run store")
+    p.add_argument("--after", choices=STAGE_NAMES, help="last stage to keep (default: last completed)")
+    llm_options(p)
+    p.set_defaults(fn=cmd_resume)
+
+    p = sub.add_parser("batch", parents=[common], help="run every premise in a file (text lines or JSONL)")
+    p.add_argument("file")
+    p.add_argument("--venue", default=os.getenv("VENUE", "Serious literary magazine like Granta"))
+    p.add_argument("--seed", type=int, default=int(os.getenv("SEED", "137")))
+    p.add_argument("--stop-on-error", action="store_true")
+    llm_options(p)
+    p.set_defaults(fn=cmd_batch)
+
+    queue_opt = argparse.ArgumentParser(add_help=False)
+    queue_opt.add_argument("--queue", default=None, help="job queue path (default: data/runs/jobs.sqlite)")
+
+    p = sub.add_parser("submit", parents=[common, queue_opt], help="queue premises as jobs")
+    p.add_argument("file", nargs="?", help="premises file (text lines or JSONL); default: --premise")
+    p.add_argument("--premise", default=os.getenv("PREMISE", "Youth, mountains, and the stillness that follows ascent"))
+    p.add_argument("--venue", default=os.getenv("VENUE", "Serious literary magazine like Granta"))
+    p.add_argument("--seed", type=int, default=int(os.getenv("SEED", "137")))
+    p.add_argument("--profile", default=os.getenv("LLM_PROFILE", "default"))
+    p.add_argument("--priority", type=int, default=0, help="higher runs first")
+    p.add_argument("--max-attempts", type=int, default=3)
+    p.set_defaults(fn=cmd_submit)
+
+    p = sub.add_parser("worker", parents=[common, queue_opt], help="run queued jobs")
+    p.add_argument("--processes", type=int, default=1)
+    p.add_argument("--lease", type=float, default=120.0, help="lease seconds (renewed while a job runs)")
+    p.add_argument("--only", help="comma-separated profiles this worker takes")
+    p.add_argument("--max-jobs", type=int, default=None, help="per process")
+    p.add_argument("--drain", action="store_true", help="exit once nothing is queued or running")
+    p.set_defaults(fn=cmd_worker)
+
+    p = sub.add_parser("jobs", parents=[common, queue_opt], help="list jobs and set profile limits")
+    p.add_argument("--status", choices=("queued", "running", "done", "failed"))
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--set-limit", action="append", metavar="PROFILE=N", help="max running jobs per profile (N=none clears)")
+    p.add_argument("--cancel", nargs="+", metavar="JOB_ID")
+    p.set_defaults(fn=cmd_jobs)
+
+    p = sub.add_parser("export", parents=[common], help="render stored runs to Markdown/HTML")
+    p.add_argument("run_ids", nargs="*", help="runs to export (default: latest completed run)")
+    p.add_argument("--latest", action="store_true", help="also export the latest completed run")
+    p.add_argument("--out", default=str(EXPORTS_DIR))
+    p.add_argument("--format", default="md", help="comma-separated: md,html")
+    p.add_argument("--view", default="v1,v2", help="comma-separated: v1,v2,diff")
+    p.add_argument("--processes", type=int, default=None)
+    p.set_defaults(fn=cmd_export)
+
+    p = sub.add_parser("runs", parents=[common], help="list recorded runs")
+    p.add_argument("--premise")
+    p.add_argument("--profile", dest="profile_filter")
+    p.add_argument("--status", choices=("running", "done", "failed"))
+    p.add_argument("--limit", type=int, default=20)
+    p.set_defaults(fn=cmd_runs)
+
+    p = sub.add_parser("bench", parents=[common], help="hot-path benchmark suite (or serialization of one state)")
+    p.add_argument("run_id", nargs="?", help="benchmark serialization of this stored run instead")
+    p.add_argument("--state", help="benchmark serialization of story_output.json or a .sgst file instead")
+    p.add_argument("--case", action="append", help="case name or prefix (repeatable; default: all)")
+    p.add_argument("--scales", help="comma-separated input scales (default: 1,10,100,1000)")
+    p.add_argument("--quick", action="store_true", help="scales 1,10 only")
+    p.add_argument("--list", action="store_true", help="list the cases")
+    p.add_argument("--baseline", help="baseline file (default: data/bench/baseline.json)")
+    p.add_argument("--save", action="store_true", help="record this run as the baseline")
+    p.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing (0.25 = 25%%)")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(fn=cmd_bench)
+
+    p = sub.add_parser("serve", parents=[common], help="serve the UI and the run/progress API")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--max-runs", type=int, default=4, help="pipeline runs executing at once (the rest queue)")
+    p.add_argument("--dir", default=str(ROOT / "ui"))
+    p.set_defaults(fn=cmd_serve)
+
+    provider_opts = argparse.ArgumentParser(add_help=False)
+    provider_opts.add_argument("--latency", default="lognormal:0.2:0.5",
+                               help="seconds per request: 0.2, uniform:A:B, exp:MEAN, normal:MEAN:SD, lognormal:MEDIAN:SIGMA")
+    provider_opts.add_argument("--per-word", type=float, default=0.0, help="extra seconds per generated word")
+    provider_opts.add_argument("--rate-limit", type=float, default=0.0, help="probability of a 429")
+    provider_opts.add_argument("--overload", type=float, default=0.0, help="probability of a 529/503")
+    provider_opts.add_argument("--truncate", type=float, default=0.0, help="probability of a cut-off response")
+    provider_opts.add_argument("--malformed", type=float, default=0.0, help="probability of fenced JSON with a trailing comma")
+    provider_opts.add_argument("--beats", type=int, default=6, help="beats per outline")
+    provider_opts.add_argument("--words", type=int, default=300, help="target words per beat")
+    provider_opts.add_argument("--fault-seed", type=int, default=0)
+
+    p = sub.add_parser("fake-provider", parents=[provider_opts], help="local stand-in for the LLM provider APIs")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8100)
+    p.set_defaults(fn=cmd_fake_provider)
+
+    p = sub.add_parser("loadtest", parents=[provider_opts], help="concurrent pipeline runs against the fake provider")
+    p.add_argument("--runs", type=int, default=8)
+    p.add_argument("--concurrency", type=int, default=4, help="pipelines running at once")
+    p.add_argument("--url", help="use a running fake-provider instead of starting one (its own fault options apply)")
+    p.add_argument("--profile", default=os.getenv("LLM_PROFILE", "default"))
+    p.add_argument("--backoff", type=float, default=0.05, help="retry backoff seconds (default 0.05; negative keeps the profile's)")
+    p.add_argument("--verbose", action="store_true", help="show pipeline output")
+    p.add_argument("--json", action="store_true")
+    trace_options(p)
+    p.set_defaults(fn=cmd_loadtest)
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    _load_env()   # before the parser: PREMISE, VENUE, SEED and LLM_PROFILE are flag defaults
+    args = build_parser().parse_args(argv)
+    with _trace(args):
+        return args.fn(args)
@@ -1,40 +1,344 @@
+"""
+Codex store: one compiled, indexed view of docs/codex/*.md.
+
+Every entry line looks like `- [PL1] Canadian Border Peak — description`.
+The markdown is parsed once into `CodexEntry` records and compiled into a
+`Codex` with:
+
+- O(1) access by ID (`codex.get_entry("PL1")`); `codex["places"]` still
+  returns the prompt-formatted list agents have always consumed
+- forward cross-references (IDs mentioned in an entry's text, e.g. the
+  claim `[CL2] P1 died on PL1` refers to P1 and PL1) and the reverse index
+- cached prompt formatting
+
+A compact snapshot is persisted to data/codex.json and rebuilt only when the
+markdown content changes.
+"""
 from __future__ import annotations
-import json, re
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
-CODex_DIR = Path("docs/codex")
-CODex_JSON = Path("data/codex.json")
+_ROOT = Path(__file__).resolve().parents[2]  # repo root
+CODEX_DIR = Path("docs/codex")
+CODEX_JSON = _ROOT / "data" / "codex.json"   # not relative to the cwd: only the repo's data/ is ignored
 
-_ID = re.compile(r"^\s*-\s*\[([A-Za-z]\d+)\]\s*(.+?)\s*$")
+CATEGORIES = ("people", "places", "claims", "sources")
+SNAPSHOT_VERSION = 1
+PROMPT_CACHE_SIZE = 512   # formatted prompt blocks kept per codex (one per beat's id set)
 
-def _parse_list(md_path: Path) -> List[Tuple[str, str]]:
+_ID = re.compile(r"^\s*-\s*\[([A-Z]+\d+)\]\s*(.+?)\s*$")
+_REF = re.compile(r"\b([A-Z]+\d+)\b")
+_LABEL_SEP = re.compile(r"\s+[—–-]\s+")
+
+
+# -----------------------------------------------------------------------------
+# Parsing
+# -----------------------------------------------------------------------------
+def _parse_text(text: str) -> List[Tuple[str, str]]:
+    """Parse markdown lines like `- [P1] Nikita Marwah — description`."""
     items: List[Tuple[str, str]] = []
-    if not md_path.exists():
-        return items
-    for line in md_path.read_text(encoding="utf-8").splitlines():
+    for line in text.splitlines():
         m = _ID.match(line)
         if m:
-            items.append((m.group(1).strip(), m.group(2).strip()))
+            items.append((m.group(1), m.group(2)))
     return items
 
-def load_codex() -> Dict:
-    claims = _parse_list(CODex_DIR / "claims.md")
-    sources = _parse_list(CODex_DIR / "sources.md")
-    people = _parse_list(CODex_DIR / "people.md")
-    places = _parse_list(CODex_DIR / "places.md")
-    data = {
-        "claims": [{"id": i, "text": t, "status": "asserted"} for i, t in claims],
-        "sources": [{"id": i, "label": t} for i, t in sources],
-        "people": [{"id": i, "label": t} for i, t in people],
-        "places": [{"id": i, "label": t} for i, t in places],
-    }
-    CODex_JSON.parent.mkdir(parents=True, exist_ok=True)
-    CODex_JSON.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+def _parse_list(md_path: Path) -> List[Tuple[str, str]]:
+    if not md_path.exists():
+        return []
+    return _parse_text(md_path.read_text(encoding="utf-8"))
+
+
+def _label(text: str) -> str:
+    return _LABEL_SEP.split(text, 1)[0].strip()
+
+
+# -----------------------------------------------------------------------------
+# Entries and compiled codex
+# -----------------------------------------------------------------------------
+@dataclass(frozen=True)
+class CodexEntry:
+    id: str
+    category: str
+    text: str
+    label: str
+    refs: Tuple[str, ...] = ()
+
+    @property
+    def formatted(self) -> str:
+        return f"[{self.id}] {self.text}"
+
+
+@dataclass(frozen=True)
+class _Stamp:
+    mtime_ns: int
+    size: int
+    digest: str
+
+
+class Codex(dict):
+    """
+    Compiled codex.
+
+    As a dict it maps each category to its prompt-formatted lines
+    (`{"people": ["[P1] ...", ...], ...}`), which is the shape agents and
+    `format_codex_for_prompt` have always consumed. The indexes live on
+    attributes.
+    """
+
+    def __init__(self, entries: Iterable[CodexEntry] = (), stamps: Optional[Dict[str, _Stamp]] = None):
+        entries = list(entries)
+        super().__init__({cat: [e.formatted for e in entries if e.category == cat] for cat in CATEGORIES})
+        self.by_id: Dict[str, CodexEntry] = {}
+        for e in entries:
+            self.by_id.setdefault(e.id, e)
+        self._by_category: Dict[str, Tuple[CodexEntry, ...]] = {
+            cat: tuple(e for e in entries if e.category == cat) for cat in CATEGORIES
+        }
+        self.ids_by_category: Dict[str, Tuple[str, ...]] = {
+            cat: tuple(e.id for e in group) for cat, group in self._by_category.items()
+        }
+        referenced_by: Dict[str, List[str]] = {}
+        for e in self.by_id.values():
+            for ref in e.refs:
+                referenced_by.setdefault(ref, []).append(e.id)
+        self.referenced_by: Dict[str, Tuple[str, ...]] = {k: tuple(v) for k, v in referenced_by.items()}
+        self.stamps: Dict[str, _Stamp] = dict(stamps or {})
+        self.fingerprint = hashlib.blake2b(
+            "|".join(f"{k}:{s.digest}" for k, s in sorted(self.stamps.items())).encode("utf-8")
+            if self.stamps else json.dumps([e.formatted for e in entries]).encode("utf-8"),
+            digest_size=8,
+        ).hexdigest()
+        self._prompt_lock = threading.Lock()
+        self._prompt_cache: "OrderedDict[Tuple, str]" = OrderedDict()
+
+    # -------------------------------------------------------------------------
+    # Lookup
+    # -------------------------------------------------------------------------
+    def get_entry(self, entry_id: str) -> Optional[CodexEntry]:
+        return self.by_id.get(entry_id)
+
+    def entries(self, category: Optional[str] = None) -> List[CodexEntry]:
+        cats = (category,) if category else CATEGORIES
+        return [e for cat in cats for e in self._by_category.get(cat, ())]
+
+    def refs(self, entry_id: str, category: Optional[str] = None) -> List[str]:
+        """IDs mentioned by an entry (e.g. claim → people/places/sources)."""
+        e = self.by_id.get(entry_id)
+        if e is None:
+            return []
+        if category is None:
+            return list(e.refs)
+        return [r for r in e.refs if self.by_id[r].category == category]
+
+    def mentions(self, entry_id: str, category: Optional[str] = None) -> List[str]:
+        """IDs of entries that mention `entry_id` (e.g. person → claims)."""
+        ids = self.referenced_by.get(entry_id, ())
+        if category is None:
+            return list(ids)
+        return [i for i in ids if self.by_id[i].category == category]
+
+    def claims_about(self, entity_id: str) -> List[str]:
+        return self.mentions(entity_id, "claims")
+
+    # -------------------------------------------------------------------------
+    # Formatting
+    # -------------------------------------------------------------------------
+    def format_for_prompt(self, max_items_per_category: int = 20, ids: Optional[Iterable[str]] = None) -> str:
+        """
+        Same layout as `context_loader.format_codex_for_prompt`.
+
+        With `ids`, only those entries are rendered (in codex order).
+        Results are cached per (limit, ids), least recently used first out.
+        """
+        key = (max_items_per_category, tuple(ids) if ids is not None else None)
+        with self._prompt_lock:
+            cached = self._prompt_cache.get(key)
+            if cached is not None:
+                self._prompt_cache.move_to_end(key)
+                return cached
+
+        wanted = set(key[1]) if key[1] is not None else None
+        headers = {"people": "PEOPLE:", "places": "PLACES:", "claims": "VERIFIED CLAIMS:", "sources": "SOURCES:"}
+        lines: List[str] = []
+        for cat in CATEGORIES:
+            chosen = [e for e in self._by_category[cat] if wanted is None or e.id in wanted]
+            if not chosen:
+                continue
+            lines.append(headers[cat])
+            lines.extend(e.formatted for e in chosen[:max_items_per_category])
+            lines.append("")
+        out = "\n".join(lines).strip()
+        with self._prompt_lock:
+            self._prompt_cache[key] = out
+            if len(self._prompt_cache) > PROMPT_CACHE_SIZE:
+                self._prompt_cache.popitem(last=False)
+        return out
+
+    # -------------------------------------------------------------------------
+    # Legacy record view + snapshot
+    # -------------------------------------------------------------------------
+    def to_records(self) -> Dict:
+        """Record layout of the old data/codex.json."""
+        return {
+            "claims": [{"id": e.id, "text": e.text, "status": "asserted"} for e in self.entries("claims")],
+            "sources": [{"id": e.id, "label": e.text} for e in self.entries("sources")],
+            "people": [{"id": e.id, "label": e.text} for e in self.entries("people")],
+            "places": [{"id": e.id, "label": e.text} for e in self.entries("places")],
+        }
+
+    def to_snapshot(self) -> Dict:
+        return {
+            "version": SNAPSHOT_VERSION,
+            "files": {k: [s.mtime_ns, s.size, s.digest] for k, s in self.stamps.items()},
+            "entries": [[e.id, e.category, e.text, e.label, list(e.refs)] for e in self.entries()],
+        }
+
+    @classmethod
+    def from_snapshot(cls, data: Dict) -> "Codex":
+        entries = [CodexEntry(i, c, t, lbl, tuple(r)) for i, c, t, lbl, r in data["entries"]]
+        stamps = {k: _Stamp(*v) for k, v in data["files"].items()}
+        return cls(entries, stamps)
+
+
+# -----------------------------------------------------------------------------
+# Compilation
+# -----------------------------------------------------------------------------
+def build_codex(items: Dict[str, List[Tuple[str, str]]], stamps: Optional[Dict[str, _Stamp]] = None) -> Codex:
+    """Compile parsed (id, text) pairs per category into a Codex."""
+    known = {i for cat in CATEGORIES for i, _ in items.get(cat, [])}
+    entries: List[CodexEntry] = []
+    for cat in CATEGORIES:
+        for entry_id, text in items.get(cat, []):
+            refs = tuple(dict.fromkeys(r for r in _REF.findall(text) if r in known and r != entry_id))
+            label = text if cat == "claims" else _label(text)
+            entries.append(CodexEntry(entry_id, cat, text, label, refs))
+    return Codex(entries, stamps)
+
+
+def _stat(path: Path) -> Tuple[int, int]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return (-1, -1)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _read_snapshot(path: Optional[Path]) -> Optional[Dict]:
+    if path is None or not path.exists():
+        return None
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+        return None
     return data
 
+
+def compile_codex(
+    codex_dir: Path = CODEX_DIR,
+    snapshot_path: Optional[Path] = CODEX_JSON,
+    previous: Optional[Codex] = None,
+) -> Codex:
+    """
+    Return the compiled codex for `codex_dir`, doing as little work as possible:
+
+    1. file stats match `previous` → return `previous`
+    2. content digests match `previous` or the snapshot → reuse it
+    3. otherwise parse the markdown and rewrite the snapshot (unless no
+       codex file exists: there is nothing to cache)
+    """
+    codex_dir = Path(codex_dir)
+    paths = {cat: codex_dir / f"{cat}.md" for cat in CATEGORIES}
+    stats = {cat: _stat(p) for cat, p in paths.items()}
+
+    if previous is not None and previous.stamps and all(
+        (previous.stamps[c].mtime_ns, previous.stamps[c].size) == stats[c] for c in CATEGORIES
+    ):
+        return previous
+
+    raw = {cat: (p.read_bytes() if stats[cat][0] >= 0 else b"") for cat, p in paths.items()}
+    stamps = {
+        cat: _Stamp(stats[cat][0], stats[cat][1], hashlib.blake2b(raw[cat], digest_size=16).hexdigest())
+        for cat in CATEGORIES
+    }
+    digests = {c: s.digest for c, s in stamps.items()}
+
+    if previous is not None and previous.stamps and {c: s.digest for c, s in previous.stamps.items()} == digests:
+        previous.stamps = stamps
+        return previous
+
+    snap = _read_snapshot(snapshot_path)
+    if snap is not None and {c: v[2] for c, v in snap["files"].items()} == digests:
+        codex = Codex.from_snapshot(snap)
+        codex.stamps = stamps
+        return codex
+
+    codex = build_codex({cat: _parse_text(raw[cat].decode("utf-8")) for cat in CATEGORIES}, stamps)
+    if snapshot_path is not None and any(size >= 0 for _, size in stats.values()):
+        _write_snapshot(snapshot_path, codex)
+    return codex
+
+
+def _write_snapshot(path: Path, codex: Codex) -> None:
+    from .writer import atomic_write
+
+    atomic_write(path, json.dumps(codex.to_snapshot(), ensure_ascii=False, separators=(",", ":")), fsync=False)
+
+
+_FORMATTED = re.compile(r"^\s*\[([A-Z]+\d+)\]\s*(.+?)\s*$")
+
+
+_converted: "OrderedDict[str, Codex]" = OrderedDict()
+_converted_lock = threading.Lock()
+
+
+def ensure_codex(codex_like: Dict[str, List[str]]) -> Codex:
+    """
+    Return a Codex for either a compiled Codex or a plain dict of formatted lines.
+
+    Dicts are compiled once per content fingerprint, so their selector and
+    prompt caches survive across calls.
+    """
+    if isinstance(codex_like, Codex):
+        return codex_like
+    lines = {cat: list((codex_like or {}).get(cat) or []) for cat in CATEGORIES}
+    key = hashlib.blake2b(json.dumps(lines, ensure_ascii=False).encode("utf-8"), digest_size=8).hexdigest()
+    with _converted_lock:
+        codex = _converted.get(key)
+        if codex is not None:
+            _converted.move_to_end(key)
+            return codex
+    items: Dict[str, List[Tuple[str, str]]] = {}
+    for cat, group in lines.items():
+        for line in group:
+            m = _FORMATTED.match(line)
+            if m:
+                items.setdefault(cat, []).append((m.group(1), m.group(2)))
+    codex = build_codex(items)
+    with _converted_lock:
+        _converted[key] = codex
+        while len(_converted) > 8:
+            _converted.popitem(last=False)
+    return codex
+
+
+# -----------------------------------------------------------------------------
+# Legacy API
+# -----------------------------------------------------------------------------
+def load_codex() -> Dict:
+    """Compiled codex in the record layout of data/codex.json."""
+    return compile_codex().to_records()
+
+
 def get_codex_json() -> Dict:
-    if CODex_JSON.exists():
-        return json.loads(CODex_JSON.read_text(encoding="utf-8"))
     return load_codex()
-
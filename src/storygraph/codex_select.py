@@ -0,0 +1,231 @@
+"""
+Codex selection: rank codex entries against a beat/scene and pack the best
+ones under a token budget.
+
+`format_codex_for_prompt` takes the first N entries per category in file
+order, so every beat gets the same block and relevant entries further down
+the file are cut. The selector instead scores each entry against the query
+(beat purpose, motifs, scene text):
+
+- lexical overlap: IDF-weighted shared terms, length-normalised
+- explicit mentions: the entry's ID or label appears in the query
+- co-occurrence: entries linked through codex cross-references
+  (claim ↔ person/place/source) inherit part of their neighbours' score
+
+The ranked entries are packed greedily under `budget_tokens`, and rankings are
+cached per query fingerprint for each compiled codex.
+"""
+from __future__ import annotations
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from .codex import Codex, ensure_codex
+
+
+# -----------------------------------------------------------------------------
+# Tokens
+# -----------------------------------------------------------------------------
+_TERM = re.compile(r"[a-z0-9]+")
+_STOP = frozenset("""
+a about after again all also an and any are as at be been before being but by can could did do does
+during each for from had has have he her here him his how i if in into is it its just me more most my
+no not of on once only or other our out over own same she should so some such than that the their them
+then there these they this those through to too under until up very was we were what when where which
+while who whom why will with would you your real person people place places
+""".split())
+
+CO_OCCURRENCE_WEIGHT = 0.5
+MENTION_BONUS = 4.0
+HEADER_TOKENS = 4
+
+# Default budgets (tokens) for the codex block in each prompt
+PLANNER_CODEX_BUDGET = 2000
+DRAFT_CODEX_BUDGET = 1200
+
+
+def _terms(text: str) -> List[str]:
+    return [t for t in _TERM.findall(text.lower()) if len(t) > 1 and t not in _STOP]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)."""
+    return max(1, (len(text) + 3) // 4)
+
+
+# -----------------------------------------------------------------------------
+# Selector
+# -----------------------------------------------------------------------------
+class CodexSelector:
+    """Relevance ranking and budget packing for one compiled codex."""
+
+    def __init__(
+        self,
+        codex: Codex,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+        cache_size: int = 512,
+    ):
+        self.codex = codex
+        self.count_tokens = count_tokens
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._rankings: "OrderedDict[str, List[Tuple[str, float]]]" = OrderedDict()
+
+        entries = codex.entries()
+        self._order = {e.id: i for i, e in enumerate(entries)}
+        self._terms: Dict[str, Dict[str, int]] = {}
+        df: Dict[str, int] = {}
+        for e in entries:
+            tf: Dict[str, int] = {}
+            for t in _terms(e.text):
+                tf[t] = tf.get(t, 0) + 1
+            self._terms[e.id] = tf
+            for t in tf:
+                df[t] = df.get(t, 0) + 1
+        n = max(1, len(entries))
+        self._idf = {t: math.log(1 + n / c) for t, c in df.items()}
+        self._cost = {e.id: self.count_tokens(e.formatted) for e in entries}
+        self._labels = {
+            e.id: e.label.lower() for e in entries
+            if e.category in ("people", "places") and len(e.label) > 2
+        }
+
+    # -------------------------------------------------------------------------
+    # Ranking
+    # -------------------------------------------------------------------------
+    def rank(self, query: str) -> List[Tuple[str, float]]:
+        """All entries with a positive score, best first (ties in codex order)."""
+        key = hashlib.blake2b(query.encode("utf-8"), digest_size=12).hexdigest()
+        with self._lock:
+            cached = self._rankings.get(key)
+            if cached is not None:
+                self._rankings.move_to_end(key)
+                return cached
+
+        ranking = self._rank(query)
+
+        with self._lock:
+            self._rankings[key] = ranking
+            if len(self._rankings) > self.cache_size:
+                self._rankings.popitem(last=False)
+        return ranking
+
+    def _rank(self, query: str) -> List[Tuple[str, float]]:
+        q_terms = set(_terms(query))
+        q_lower = query.lower()
+        q_ids = set(re.findall(r"\b[A-Z]+\d+\b", query))
+
+        base: Dict[str, float] = {}
+        for entry_id, tf in self._terms.items():
+            score = 0.0
+            if q_terms and tf:
+                shared = q_terms.intersection(tf)
+                if shared:
+                    score = sum(self._idf[t] for t in shared) / math.sqrt(len(tf))
+            label = self._labels.get(entry_id)
+            if entry_id in q_ids or (label and label in q_lower):
+                score += MENTION_BONUS
+            if score:
+                base[entry_id] = score
+
+        scores = dict(base)
+        for entry_id, score in base.items():
+            neighbours = list(self.codex.refs(entry_id)) + self.codex.mentions(entry_id)
+            for other in neighbours:
+                scores[other] = scores.get(other, 0.0) + CO_OCCURRENCE_WEIGHT * score
+
+        return sorted(scores.items(), key=lambda kv: (-kv[1], self._order.get(kv[0], 0)))
+
+    # -------------------------------------------------------------------------
+    # Packing
+    # -------------------------------------------------------------------------
+    def select(
+        self,
+        query: str,
+        budget_tokens: int,
+        always: Iterable[str] = (),
+        fill: bool = False,
+    ) -> List[str]:
+        """
+        IDs to include, best first, whose formatted lines fit the budget.
+
+        With an empty query (or nothing relevant) entries are taken in codex
+        order, matching the old first-N behaviour. `fill=True` also tops up
+        the remaining budget in codex order after the relevant entries (for
+        prompts that need an overview, like the planner).
+        """
+        ranked = [i for i, _ in self.rank(query)] if query.strip() else []
+        if not ranked or fill:
+            seen = set(ranked)
+            ranked += [e.id for e in self.codex.entries() if e.id not in seen]
+        candidates = [i for i in always if i in self._cost] + ranked
+
+        chosen: List[str] = []
+        picked = set()
+        used_categories = set()
+        used = 0
+        for entry_id in candidates:
+            if entry_id in picked:
+                continue
+            category = self.codex.get_entry(entry_id).category
+            cost = self._cost[entry_id] + (0 if category in used_categories else HEADER_TOKENS)
+            if used + cost > budget_tokens:
+                continue
+            chosen.append(entry_id)
+            picked.add(entry_id)
+            used_categories.add(category)
+            used += cost
+        return chosen
+
+    def format(self, query: str, budget_tokens: int, always: Iterable[str] = (), fill: bool = False) -> str:
+        """Prompt block (same layout as format_codex_for_prompt) for the selection."""
+        ids = self.select(query, budget_tokens, always, fill)
+        if not ids:
+            return ""
+        return self.codex.format_for_prompt(max_items_per_category=len(ids), ids=sorted(ids, key=self._order.get))
+
+
+# -----------------------------------------------------------------------------
+# Shared selectors (one per compiled codex)
+# -----------------------------------------------------------------------------
+_selectors: "OrderedDict[str, CodexSelector]" = OrderedDict()
+_selectors_lock = threading.Lock()
+
+
+def get_selector(codex_like) -> CodexSelector:
+    codex = ensure_codex(codex_like)
+    with _selectors_lock:
+        sel = _selectors.get(codex.fingerprint)
+        if sel is None:
+            sel = _selectors[codex.fingerprint] = CodexSelector(codex)
+            while len(_selectors) > 8:
+                _selectors.popitem(last=False)
+        return sel
+
+
+def beat_query(purpose: str, motifs: Sequence[str] = (), extra: str = "") -> str:
+    """Query text for a beat: purpose, motifs and any extra scene text."""
+    parts = [purpose or "", " ".join(motifs or []), extra or ""]
+    return "\n".join(p for p in parts if p)
+
+
+def relevant_ids(codex_like, query: str, category: str, limit: int) -> List[str]:
+    """Best `limit` IDs of one category for the query (codex order if none match)."""
+    sel = get_selector(codex_like)
+    ids = [i for i, _ in sel.rank(query) if sel.codex.get_entry(i).category == category]
+    if not ids:
+        ids = list(sel.codex.ids_by_category.get(category, ()))
+    return ids[:limit]
+
+
+def select_codex_for_prompt(
+    codex_like,
+    query: str,
+    budget_tokens: int,
+    always: Iterable[str] = (),
+    fill: bool = False,
+) -> str:
+    return get_selector(codex_like).format(query, budget_tokens, always, fill)
@@ -1,98 +1,236 @@
 # src/storygraph/config_loader.py
+"""
+LLM profiles from config/llm_profiles.yaml, resolved once into a validated
+`LLMProfile` with per-stage `StageSettings`.
+
+    profiles:
+      default:
+        apply_to_all: openai/gpt-5        # optional model for every stage
+        params: {retries: 2}              # optional defaults for every stage
+        stages:
+          draft:
+            model: anthropic/claude-sonnet-4-5-20250929
+            params: {temperature: 0.2, max_output_tokens: 12288, concurrency: 4}
+
+Model precedence per stage: LLM_<STAGE>_MODEL env > stages.<stage>(.model)
+> apply_to_all. Stage params override profile params. Without a YAML file
+the env vars alone define the models.
+
+Profiles are cached per (name, env overrides, file mtime), so agents and
+the CLI share one object and editing the YAML takes effect on next load.
+"""
 from __future__ import annotations
 import os, yaml
+import threading
+from dataclasses import asdict, dataclass, field, replace
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Any, Dict, Optional, Tuple
 
 _ROOT = Path(__file__).resolve().parents[2]   # repo root
 _CFG = _ROOT / "config" / "llm_profiles.yaml"
 
+STAGES = ("planner", "draft", "fact", "revision")
+CACHE_POLICIES = ("off", "memory", "disk")
+BATCHING_MODES = ("none", "parallel")
+
+# YAML spellings accepted for StageSettings fields
+_ALIASES = {"max_output_tokens": "max_tokens", "timeout": "timeout_s", "rpm": "rate_limit_rpm"}
+
 _cache: Dict[str, Dict] = {}
+_profiles: Dict[Tuple, "LLMProfile"] = {}
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class StageSettings:
+    """
+    Model and performance settings for one pipeline stage.
+
+    concurrency      max parallel requests the stage issues (draft: resizes; fact: scenes)
+    timeout_s        per-request timeout passed to the provider SDK (None: SDK default)
+    max_tokens       output token cap per request
+    temperature      sampling temperature
+    retries          extra attempts after a failed request (exponential backoff)
+    retry_backoff_s  delay before the first retry
+    rate_limit_rpm   requests per minute for this model, shared by all clients (None: unlimited)
+    cache            response cache: "off", "memory" (process) or "disk" (data/cache/llm)
+    batching         "none" (requests in beat order) or "parallel" (independent
+                     per-beat requests submitted together, up to `concurrency`)
+    """
+    model: str
+    concurrency: int = 1
+    timeout_s: Optional[float] = None
+    max_tokens: int = 16384
+    temperature: float = 0.2
+    retries: int = 0
+    retry_backoff_s: float = 1.0
+    rate_limit_rpm: Optional[float] = None
+    cache: str = "off"
+    batching: str = "none"
+    seed: Optional[int] = None
+    json_mode: bool = True
+
+    def __post_init__(self):
+        _check(self)
+
+
+def _check(s: StageSettings) -> None:
+    def fail(msg: str):
+        raise RuntimeError(f"Invalid stage settings for model '{s.model}': {msg}")
+
+    if not s.model or "/" not in s.model:
+        fail("model must be 'vendor/model'")
+    if s.concurrency < 1:
+        fail("concurrency must be >= 1")
+    if s.timeout_s is not None and s.timeout_s <= 0:
+        fail("timeout_s must be > 0")
+    if s.max_tokens < 1:
+        fail("max_tokens must be >= 1")
+    if not 0.0 <= s.temperature <= 2.0:
+        fail("temperature must be within [0, 2]")
+    if s.retries < 0 or s.retry_backoff_s < 0:
+        fail("retries and retry_backoff_s must be >= 0")
+    if s.rate_limit_rpm is not None and s.rate_limit_rpm <= 0:
+        fail("rate_limit_rpm must be > 0")
+    if s.cache not in CACHE_POLICIES:
+        fail(f"cache must be one of {CACHE_POLICIES}")
+    if s.batching not in BATCHING_MODES:
+        fail(f"batching must be one of {BATCHING_MODES}")
+
+
+_TYPES = {
+    "concurrency": int, "max_tokens": int, "retries": int, "seed": int,
+    "timeout_s": float, "temperature": float, "retry_backoff_s": float, "rate_limit_rpm": float,
+    "cache": str, "batching": str, "json_mode": bool,
+}
+
+
+def _coerce_params(params: Dict[str, Any], where: str) -> Dict[str, Any]:
+    out = {}
+    for key, value in (params or {}).items():
+        name = _ALIASES.get(key, key)
+        if name not in _TYPES:
+            known = sorted(set(_TYPES) | set(_ALIASES))
+            raise RuntimeError(f"Unknown LLM param '{key}' in {where} (known: {', '.join(known)})")
+        if value is None:
+            out[name] = None
+            continue
+        kind = _TYPES[name]
+        try:
+            if kind is bool and not isinstance(value, bool):
+                raise ValueError
+            out[name] = kind(value)
+        except (TypeError, ValueError):
+            raise RuntimeError(f"LLM param '{key}' in {where} must be {kind.__name__}, got {value!r}") from None
+    return out
+
+
+@dataclass(frozen=True)
+class LLMProfile:
+    name: str
+    stages: Dict[str, StageSettings]
+    params: Dict[str, Any] = field(default_factory=dict)   # profile-level params as written
+
+    def stage(self, name: str) -> StageSettings:
+        return self.stages[name]
+
+    def models(self) -> Dict[str, str]:
+        return {k: s.model for k, s in self.stages.items()}
 
+    def with_stage(self, name: str, **changes) -> "LLMProfile":
+        stages = dict(self.stages)
+        stages[name] = replace(stages[name], **changes)
+        return LLMProfile(self.name, stages, self.params)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """{"planner": model, ..., "params": {...}, "settings": {stage: {...}}} (JSON-able)."""
+        out: Dict[str, Any] = dict(self.models())
+        out["params"] = dict(self.params)
+        out["settings"] = {k: asdict(s) for k, s in self.stages.items()}
+        return out
+
+
+# -----------------------------------------------------------------------------
+# Loading
+# -----------------------------------------------------------------------------
 def _load_yaml() -> Dict:
     global _cache
-    if "yaml" in _cache:
+    try:
+        mtime = _CFG.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if _cache.get("mtime") == mtime:
         return _cache["yaml"]
     with _CFG.open("r", encoding="utf-8") as f:
         data = yaml.safe_load(f) or {}
-    _cache["yaml"] = data
+    _cache = {"yaml": data, "mtime": mtime}
     return data
 
-def load_llm_profile(profile_name: str) -> Dict[str, any]:
-    """
-    Load LLM profile and return dict with model assignments and params.
-    Returns: {"planner": "model", "draft": "model", "fact": "model", "revision": "model", "params": {...}}
-    """
-    data = _load_yaml()
-    prof = (data.get("profiles") or {}).get(profile_name)
-    if not prof:
-        raise RuntimeError(f"Profile '{profile_name}' not found in {_CFG}")
+
+def _env_models() -> Dict[str, Optional[str]]:
+    return {stage: os.getenv(f"LLM_{stage.upper()}_MODEL") for stage in STAGES}
+
+
+def _build(profile_name: str, data: Dict, env: Dict[str, Optional[str]]) -> LLMProfile:
+    if not data:
+        # No YAML: environment variables only (no hardcoded defaults)
+        prof: Dict[str, Any] = {}
+    else:
+        prof = (data.get("profiles") or {}).get(profile_name)
+        if not prof:
+            raise RuntimeError(f"Profile '{profile_name}' not found in {_CFG}")
 
     apply_all = (prof.get("apply_to_all") or "").strip() or None
-    stages = prof.get("stages") or {}
+    stages_cfg = prof.get("stages") or {}
     params = prof.get("params") or {}
+    base = _coerce_params(params, f"profile '{profile_name}' params")
 
-    # Build stage map with precedence (env > stages > apply_to_all)
-    model_env = {
-        "planner": os.getenv("LLM_PLANNER_MODEL"),
-        "draft": os.getenv("LLM_DRAFT_MODEL"),
-        "fact": os.getenv("LLM_FACT_MODEL"),
-        "revision": os.getenv("LLM_REVISION_MODEL"),
-    }
-    result = {}
-    for stage in ("planner", "draft", "fact", "revision"):
-        # Handle nested model structure from YAML
-        stage_config = stages.get(stage)
-        if isinstance(stage_config, dict):
-            stage_model = stage_config.get("model")
+    stages = {}
+    for stage in STAGES:
+        stage_cfg = stages_cfg.get(stage)
+        stage_params: Dict[str, Any] = {}
+        if isinstance(stage_cfg, dict):
+            stage_model = stage_cfg.get("model")
+            stage_params = stage_cfg.get("params") or {}
         else:
-            stage_model = stage_config
-            
-        result[stage] = (
-            model_env[stage]
-            or stage_model
-            or apply_all
-        )
-        if not result[stage]:
-            raise RuntimeError(f"No model resolved for stage '{stage}' (profile '{profile_name}')")
-
-    return {"planner": result["planner"], "draft": result["draft"], 
-            "fact": result["fact"], "revision": result["revision"], "params": params}
+            stage_model = stage_cfg
+        model = env[stage] or stage_model or apply_all
+        if not model:
+            raise RuntimeError(
+                f"No model resolved for stage '{stage}' (profile '{profile_name}'). "
+                f"Set LLM_{stage.upper()}_MODEL or configure {_CFG.name}."
+            )
+        merged = {**base, **_coerce_params(stage_params, f"profile '{profile_name}' stage '{stage}'")}
+        stages[stage] = StageSettings(model=model, **merged)
+    return LLMProfile(profile_name, stages, dict(params))
 
-def get_llm_settings() -> Tuple[Dict[str,str], Dict[str,object]]:
+
+def load_profile(profile_name: Optional[str] = None) -> LLMProfile:
+    """Resolved, validated profile (env LLM_PROFILE or 'default' when no name is given); cached."""
+    profile_name = profile_name or os.getenv("LLM_PROFILE", "default")
+    env = _env_models()
+    with _lock:
+        data = _load_yaml()
+        key = (profile_name, tuple(sorted((k, v) for k, v in env.items() if v)), _cache.get("mtime"))
+        profile = _profiles.get(key)
+        if profile is None:
+            profile = _profiles[key] = _build(profile_name, data, env)
+        return profile
+
+
+def load_llm_profile(profile_name: str) -> Dict[str, any]:
     """
-    Returns (models_by_stage, params) from the active profile.
-    Order of precedence for models:
-      1) Per-stage env overrides (LLM_PLANNER_MODEL, LLM_DRAFT_MODEL, LLM_FACT_MODEL, LLM_REVISION_MODEL)
-      2) Profile stages mapping
-      3) Profile apply_to_all
-    Env var LLM_PROFILE selects a profile (default: 'default').
+    Load LLM profile and return dict with model assignments and params.
+    Returns: {"planner": "model", "draft": "model", "fact": "model", "revision": "model",
+              "params": {...}, "settings": {stage: {...}}}
     """
-    data = _load_yaml()
-    prof_name = os.getenv("LLM_PROFILE", "default")
-    prof = (data.get("profiles") or {}).get(prof_name)
-    if not prof:
-        raise RuntimeError(f"Profile '{prof_name}' not found in {_CFG}")
+    return load_profile(profile_name).as_dict()
 
-    apply_all = (prof.get("apply_to_all") or "").strip() or None
-    stages = prof.get("stages") or {}
-    params = prof.get("params") or {}
 
-    # Build stage map with precedence (env > stages > apply_to_all)
-    model_env = {
-        "planner": os.getenv("LLM_PLANNER_MODEL"),
-        "draft": os.getenv("LLM_DRAFT_MODEL"),
-        "fact": os.getenv("LLM_FACT_MODEL"),
-        "revision": os.getenv("LLM_REVISION_MODEL"),
-    }
-    result = {}
-    for stage in ("planner", "draft", "fact", "revision"):
-        result[stage] = (
-            model_env[stage]
-            or stages.get(stage)
-            or apply_all
-        )
-        if not result[stage]:
-            raise RuntimeError(f"No model resolved for stage '{stage}' (profile '{prof_name}')")
-
-    return result, params
+def get_llm_settings() -> Tuple[Dict[str,str], Dict[str,object]]:
+    """
+    Returns (models_by_stage, params) from the active profile (env LLM_PROFILE,
+    default 'default'); same resolution as load_profile.
+    """
+    profile = load_profile()
+    return profile.models(), dict(profile.params)
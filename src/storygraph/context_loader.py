@@ -9,15 +9,17 @@ This module consolidates all author-provided knowledge:
 Output is a structured context dict that agents can consume.
 """
 from __future__ import annotations
-import re
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List
+
+from . import codex as _codex
+from .codex import Codex, compile_codex
 
 
 # -----------------------------------------------------------------------------
 # Paths
 # -----------------------------------------------------------------------------
-CODEX_DIR = Path("docs/codex")
+CODEX_DIR = _codex.CODEX_DIR
 NOTES_PATH = Path("docs/notes.md")
 SOURCES_DIR = Path("data/sources")
 
@@ -25,45 +27,30 @@ SOURCES_DIR = Path("data/sources")
 # -----------------------------------------------------------------------------
 # Helper: parse markdown lists with [ID] prefix
 # -----------------------------------------------------------------------------
-_ID_PATTERN = re.compile(r"^\s*-\s*\[([A-Z]+\d+)\]\s*(.+)")  # Fixed: [A-Z]+ allows multi-letter IDs
-
-
-def _parse_codex_md(md_path: Path) -> List[Tuple[str, str]]:
-    """Parse markdown file with lines like: - [P1] Nikita Marwah — description"""
-    items: List[Tuple[str, str]] = []
-    if not md_path.exists():
-        return items
-    for line in md_path.read_text(encoding="utf-8").splitlines():
-        m = _ID_PATTERN.match(line)
-        if m:
-            items.append((m.group(1).strip(), m.group(2).strip()))
-    return items
+# The single codex parser lives in storygraph.codex (IDs match [A-Z]+\d+, so
+# multi-letter IDs like PL1/CL1 work); these names are kept for callers.
+_parse_codex_text = _codex._parse_text
+_parse_codex_md = _codex._parse_list
 
 
 # -----------------------------------------------------------------------------
 # Load codex files
 # -----------------------------------------------------------------------------
-def load_codex() -> Dict[str, List[str]]:
+def load_codex() -> Codex:
     """
-    Load docs/codex/*.md files and return structured lists.
-    
-    Returns:
+    Load docs/codex/*.md files and return the compiled codex.
+
+    The result is a dict of prompt-formatted lists:
         {
             "people": ["[P1] Nikita Marwah — ...", ...],
             "places": ["[PL1] Canadian Border Peak — ...", ...],
             "claims": ["[CL1] P1 climbed in BC 2020-2023", ...],
             "sources": ["[S1] GoFundMe announcement — ...", ...]
         }
+    with ID lookups and cross-reference indexes on attributes
+    (see storygraph.codex.Codex).
     """
-    def format_items(items: List[Tuple[str, str]]) -> List[str]:
-        return [f"[{id_}] {text}" for id_, text in items]
-    
-    return {
-        "people": format_items(_parse_codex_md(CODEX_DIR / "people.md")),
-        "places": format_items(_parse_codex_md(CODEX_DIR / "places.md")),
-        "claims": format_items(_parse_codex_md(CODEX_DIR / "claims.md")),
-        "sources": format_items(_parse_codex_md(CODEX_DIR / "sources.md")),
-    }
+    return compile_codex(CODEX_DIR, snapshot_path=None)
 
 
 # -----------------------------------------------------------------------------
@@ -87,6 +74,9 @@ def load_notes() -> str:
 def load_sources() -> Dict[str, str]:
     """
     Load all .txt files from data/sources/ directory.
+
+    Eager: every file is decoded into memory. `load_all_context()` hands
+    agents a memory-mapped SourceCorpus instead (see storygraph.corpus).
     
     Returns:
         {
@@ -110,6 +100,9 @@ def load_sources() -> Dict[str, str]:
 def load_all_context() -> Dict:
     """
     Load all available context: codex + notes + sources.
+
+    Served from the shared ContextStore: files are parsed once and only
+    re-read when they change on disk, so repeated calls are cheap.
     
     Returns:
         {
@@ -120,17 +113,11 @@ def load_all_context() -> Dict:
                 "sources": [...]
             },
             "notes": "full notes.md text",
-            "sources": {
-                "life_and_death_of_a_climber": "...",
-                ...
-            }
+            "sources": SourceCorpus  # Mapping[str, str], memory-mapped
         }
     """
-    return {
-        "codex": load_codex(),
-        "notes": load_notes(),
-        "sources": load_sources(),
-    }
+    from .context_store import get_context_store
+    return get_context_store().load_all()
 
 
 # -----------------------------------------------------------------------------
@@ -149,6 +136,9 @@ def format_codex_for_prompt(codex: Dict[str, List[str]], max_items_per_category:
         [PL1] Canadian Border Peak — site of Nikita's final climb
         ...
     """
+    if isinstance(codex, Codex):
+        return codex.format_for_prompt(max_items_per_category)
+
     lines = []
     
     if codex.get("people"):
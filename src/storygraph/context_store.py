@@ -0,0 +1,186 @@
+"""
+Context store: cached, lazily-loaded access to author-provided context.
+
+`load_all_context()` used to re-read and re-parse every codex markdown file,
+docs/notes.md and every source file on each call, and agents re-read
+data/sources on their own. The store keeps the parsed result of each file and
+only re-parses a file when its stamp changes:
+
+- mtime_ns and size are checked on every access (one stat() per file)
+- when they differ, the content hash decides whether a re-parse is needed
+  (a `touch` or a checkout that rewrites identical bytes stays a cache hit)
+
+The codex is compiled as a unit by storygraph.codex (with its own persisted
+snapshot). Sources are not held in memory at all: `sources()` returns a memory-mapped
+SourceCorpus (see storygraph.corpus).
+
+One store is shared per process (see `get_context_store()`), and it is safe to
+use from many pipelines running in threads at the same time.
+"""
+from __future__ import annotations
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .codex import CODEX_JSON, Codex, compile_codex
+from .corpus import SourceCorpus
+
+
+# -----------------------------------------------------------------------------
+# File stamps
+# -----------------------------------------------------------------------------
+@dataclass(frozen=True)
+class FileStamp:
+    mtime_ns: int
+    size: int
+    digest: str = ""
+
+    def same_stat(self, other: "FileStamp") -> bool:
+        return self.mtime_ns == other.mtime_ns and self.size == other.size
+
+
+def _stat(path: Path) -> Optional[FileStamp]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return FileStamp(st.st_mtime_ns, st.st_size)
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+# -----------------------------------------------------------------------------
+# Store
+# -----------------------------------------------------------------------------
+class ContextStore:
+    """
+    Lazily loads and caches codex, notes and source files.
+
+    Values handed out are shared between callers and must be treated as
+    read-only; the top-level containers returned by `load_all()` are fresh.
+    """
+
+    def __init__(
+        self,
+        codex_dir: Optional[Path] = None,
+        notes_path: Optional[Path] = None,
+        sources_dir: Optional[Path] = None,
+        verify_hash: bool = True,
+    ):
+        from . import context_loader as _cl
+
+        # Only the default codex location persists a snapshot (data/codex.json)
+        self.codex_snapshot = CODEX_JSON if codex_dir is None else None
+        self.codex_dir = Path(codex_dir) if codex_dir is not None else _cl.CODEX_DIR
+        self.notes_path = Path(notes_path) if notes_path is not None else _cl.NOTES_PATH
+        self.sources_dir = Path(sources_dir) if sources_dir is not None else _cl.SOURCES_DIR
+        self.verify_hash = verify_hash
+        self._lock = threading.RLock()
+        self._entries: Dict[Tuple[str, str], Tuple[FileStamp, Any]] = {}
+        self._corpora: Dict[str, SourceCorpus] = {}
+        self._codex: Optional[Codex] = None
+        self.hits = 0
+        self.misses = 0
+
+    # -------------------------------------------------------------------------
+    # Core cache
+    # -------------------------------------------------------------------------
+    def get(self, path: Path, parse: Callable[[str], Any], kind: str = "text", default: Any = None) -> Any:
+        """
+        Return parse(file text) for `path`, re-parsing only if the file changed.
+
+        `kind` separates different parses of the same file. Missing files
+        yield `default` (and drop any cached entry).
+        """
+        key = (kind, os.path.abspath(path))
+        with self._lock:
+            stamp = _stat(Path(path))
+            if stamp is None:
+                self._entries.pop(key, None)
+                return default
+
+            cached = self._entries.get(key)
+            if cached is not None and cached[0].same_stat(stamp):
+                self.hits += 1
+                return cached[1]
+
+            raw = Path(path).read_bytes()
+            digest = _digest(raw) if self.verify_hash else ""
+            if cached is not None and digest and cached[0].digest == digest:
+                # Touched but unchanged: keep the parsed value, refresh the stamp
+                self._entries[key] = (FileStamp(stamp.mtime_ns, stamp.size, digest), cached[1])
+                self.hits += 1
+                return cached[1]
+
+            value = parse(raw.decode("utf-8"))
+            self._entries[key] = (FileStamp(stamp.mtime_ns, stamp.size, digest), value)
+            self.misses += 1
+            return value
+
+    def invalidate(self, path: Optional[Path] = None) -> None:
+        """Drop one file (all kinds) or, with no argument, everything."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            target = os.path.abspath(path)
+            for key in [k for k in self._entries if k[1] == target]:
+                del self._entries[key]
+
+    # -------------------------------------------------------------------------
+    # Context accessors
+    # -------------------------------------------------------------------------
+    def codex(self) -> Codex:
+        """Compiled codex; recompiled only when the markdown content changes."""
+        with self._lock:
+            previous = self._codex
+            codex = compile_codex(self.codex_dir, self.codex_snapshot, previous)
+            if codex is previous:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._codex = codex
+            return codex
+
+    def notes(self) -> str:
+        return self.get(self.notes_path, lambda text: text, default="")
+
+    def sources(self, sources_dir: Optional[Path] = None) -> SourceCorpus:
+        """Memory-mapped corpus over a sources directory (one per directory)."""
+        directory = Path(sources_dir) if sources_dir is not None else self.sources_dir
+        key = os.path.abspath(directory)
+        with self._lock:
+            corpus = self._corpora.get(key)
+            if corpus is None:
+                corpus = self._corpora[key] = SourceCorpus(directory)
+            return corpus
+
+    def load_all(self) -> Dict:
+        """Same structure as `context_loader.load_all_context()`."""
+        return {
+            "codex": self.codex(),
+            "notes": self.notes(),
+            "sources": self.sources(),
+        }
+
+
+# -----------------------------------------------------------------------------
+# Shared instance
+# -----------------------------------------------------------------------------
+_default_store: Optional[ContextStore] = None
+_default_lock = threading.Lock()
+
+
+def get_context_store() -> ContextStore:
+    """Return the process-wide store shared by all pipelines and agents."""
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = ContextStore()
+    return _default_store
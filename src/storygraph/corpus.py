@@ -0,0 +1,260 @@
+"""
+Source corpus: lazy, memory-mapped access to data/sources.
+
+`load_sources()` returns every source file as a full in-memory string, and that
+dict travels in the `context` handed to each agent. The corpus keeps files
+memory-mapped instead, so the process only touches the pages it reads:
+
+- `corpus.head(doc_id, n)`         first n characters (quote snippets)
+- `corpus.slice(doc_id, start, end)` zero-copy memoryview over byte offsets
+- `corpus.passage(...)` / `Passage` byte-offset handles that decode on demand
+- `corpus.iter_chunks(...)`        streaming, whitespace-aligned chunking
+- `corpus.find(needle)`            substring search without decoding files
+
+`SourceCorpus` is also a read-only Mapping[str, str] so existing callers that
+do `context["sources"][stem]` keep working (that path decodes the whole file).
+"""
+from __future__ import annotations
+import mmap
+import os
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# -----------------------------------------------------------------------------
+# Helpers
+# -----------------------------------------------------------------------------
+_WHITESPACE = b" \t\r\n"
+
+
+def _align(buf, i: int, size: int) -> int:
+    """Move a byte offset forward to the next UTF-8 character boundary."""
+    while i < size and (buf[i] & 0xC0) == 0x80:
+        i += 1
+    return i
+
+
+# -----------------------------------------------------------------------------
+# Passages
+# -----------------------------------------------------------------------------
+@dataclass(frozen=True)
+class Passage:
+    """A byte range inside one source document. Decoded only on request."""
+    doc_id: str
+    start: int
+    end: int
+
+    def text(self, corpus: "SourceCorpus") -> str:
+        return corpus.text(self.doc_id, self.start, self.end)
+
+
+# -----------------------------------------------------------------------------
+# Documents
+# -----------------------------------------------------------------------------
+class SourceDocument:
+    """One memory-mapped source file; re-mapped when the file changes."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.doc_id = self.path.stem
+        self._lock = threading.Lock()
+        self._stamp: Tuple[int, int] = (-1, -1)
+        self._map: Optional[mmap.mmap] = None
+        self.size = 0
+
+    def buffer(self):
+        """
+        Return a read-only buffer over the file (mmap, or b"" if empty).
+
+        Use len() of the buffer, not `size`: another thread may re-map the
+        file in between. A stale map is never closed, only dropped, so it
+        stays valid for callers still reading it and is unmapped when the
+        last of them lets go of it.
+        """
+        st = os.stat(self.path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if stamp != self._stamp:
+                self._map = None
+                self.size = st.st_size
+                if st.st_size:
+                    with open(self.path, "rb") as fh:
+                        self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+                self._stamp = stamp
+            return self._map if self._map is not None else b""
+
+    def close(self) -> None:
+        with self._lock:
+            self._map = None
+            self._stamp = (-1, -1)
+
+
+# -----------------------------------------------------------------------------
+# Corpus
+# -----------------------------------------------------------------------------
+class SourceCorpus(Mapping):
+    """Read-only view over `*.txt` files in a directory."""
+
+    def __init__(self, directory: Path, pattern: str = "*.txt"):
+        self.directory = Path(directory)
+        self.pattern = pattern
+        self._lock = threading.Lock()
+        self._docs: Dict[str, SourceDocument] = {}
+
+    # -------------------------------------------------------------------------
+    # Directory scan
+    # -------------------------------------------------------------------------
+    def _scan(self) -> Dict[str, SourceDocument]:
+        paths = sorted(self.directory.glob(self.pattern)) if self.directory.exists() else []
+        with self._lock:
+            current = {p.stem: p for p in paths}
+            for stem in [s for s in self._docs if s not in current]:
+                self._docs.pop(stem).close()
+            for stem, p in current.items():
+                if stem not in self._docs:
+                    self._docs[stem] = SourceDocument(p)
+            return dict(self._docs)
+
+    def document(self, doc_id: str) -> SourceDocument:
+        doc = self._docs.get(doc_id)
+        if doc is None or not doc.path.exists():
+            doc = self._scan().get(doc_id)
+        if doc is None:
+            raise KeyError(doc_id)
+        return doc
+
+    # -------------------------------------------------------------------------
+    # Mapping interface (compatibility: decodes whole files)
+    # -------------------------------------------------------------------------
+    def __getitem__(self, doc_id: str) -> str:
+        return self.text(doc_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._scan())
+
+    def __len__(self) -> int:
+        return len(self._scan())
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._scan()
+
+    def __repr__(self) -> str:
+        return f"SourceCorpus({str(self.directory)!r}, docs={list(self)})"
+
+    # -------------------------------------------------------------------------
+    # Offset access
+    # -------------------------------------------------------------------------
+    def size(self, doc_id: str) -> int:
+        return len(self.document(doc_id).buffer())
+
+    def slice(self, doc_id: str, start: int = 0, end: Optional[int] = None) -> memoryview:
+        """Zero-copy view of bytes [start, end) of a document."""
+        buf = self.document(doc_id).buffer()
+        return memoryview(buf)[start:end]
+
+    def text(self, doc_id: str, start: int = 0, end: Optional[int] = None) -> str:
+        """Decode bytes [start, end), snapped forward to UTF-8 boundaries."""
+        buf = self.document(doc_id).buffer()
+        size = len(buf)
+        end = size if end is None else min(end, size)
+        start = _align(buf, max(0, start), size)
+        end = _align(buf, end, size)
+        if start >= end:
+            return ""
+        return bytes(buf[start:end]).decode("utf-8")
+
+    def head(self, doc_id: str, n_chars: int) -> str:
+        """First n_chars characters, reading at most 4 bytes per character."""
+        buf = self.document(doc_id).buffer()
+        raw = bytes(buf[: 4 * n_chars])
+        return raw.decode("utf-8", errors="ignore")[:n_chars]
+
+    def passage(self, doc_id: str, start: int, end: int) -> Passage:
+        return Passage(doc_id, start, end)
+
+    # -------------------------------------------------------------------------
+    # Streaming
+    # -------------------------------------------------------------------------
+    def iter_chunks(
+        self,
+        doc_ids: Optional[Iterable[str]] = None,
+        chunk_bytes: int = 2048,
+        overlap: int = 0,
+    ) -> Iterator[Passage]:
+        """
+        Yield whitespace-aligned passages of roughly chunk_bytes each.
+
+        Only one window of each file is touched at a time, so indexing a
+        multi-gigabyte corpus keeps a constant working set.
+        """
+        if chunk_bytes <= 0:
+            raise ValueError("chunk_bytes must be positive")
+        overlap = max(0, min(overlap, chunk_bytes // 2))
+        for doc_id in (list(doc_ids) if doc_ids is not None else list(self)):
+            buf = self.document(doc_id).buffer()
+            size = len(buf)
+            start = 0
+            while start < size:
+                end = min(size, start + chunk_bytes)
+                if end < size:
+                    # extend to the next whitespace so words are not split
+                    cut = end
+                    while cut < size and buf[cut] not in _WHITESPACE:
+                        cut += 1
+                    end = cut
+                yield Passage(doc_id, start, end)
+                if end >= size:
+                    break
+                nxt = end
+                if overlap:
+                    nxt = end - overlap
+                    while nxt < end and buf[nxt] not in _WHITESPACE:
+                        nxt += 1
+                while nxt < size and buf[nxt] in _WHITESPACE:
+                    nxt += 1
+                start = _align(buf, max(nxt, start + 1), size)
+
+    def find(
+        self,
+        needle: str,
+        doc_ids: Optional[Iterable[str]] = None,
+        context_bytes: int = 200,
+        limit: int = 20,
+    ) -> List[Passage]:
+        """Passages around occurrences of `needle`, searched in mapped bytes."""
+        pattern = needle.encode("utf-8")
+        hits: List[Passage] = []
+        if not pattern:
+            return hits
+        for doc_id in (list(doc_ids) if doc_ids is not None else list(self)):
+            buf = self.document(doc_id).buffer()
+            size = len(buf)
+            if not size:
+                continue
+            pos = buf.find(pattern)
+            while pos != -1 and len(hits) < limit:
+                hits.append(Passage(
+                    doc_id,
+                    max(0, pos - context_bytes),
+                    min(size, pos + len(pattern) + context_bytes),
+                ))
+                pos = buf.find(pattern, pos + len(pattern))
+            if len(hits) >= limit:
+                break
+        return hits
+
+    def close(self) -> None:
+        with self._lock:
+            for doc in self._docs.values():
+                doc.close()
+            self._docs.clear()
+
+
+def source_head(sources: Mapping, doc_id: str, n_chars: int) -> str:
+    """First n_chars of a source from a SourceCorpus or a plain dict of texts."""
+    if isinstance(sources, SourceCorpus):
+        return sources.head(doc_id, n_chars)
+    return sources[doc_id][:n_chars]
@@ -0,0 +1,355 @@
+"""
+Segment-based story document: beats are segments with version history,
+and the whole-story strings are derived views.
+
+StoryState used to hold every beat's text in `drafts`, again in
+`draft_v1_concat`, and a third time in `draft_v2_concat`. Here:
+
+- each beat is a `Segment` whose base text is the SceneDraft text itself
+  (the same str object, so it is not copied)
+- later versions ("v2", ...) are stored as word-level deltas against the
+  previous version of that segment
+- concatenated views are joined lazily; only the most recently used view
+  is cached, so a document holds about one copy of the story text plus
+  deltas. Updating one segment costs O(beat) and drops the cached view
+
+A story-level rewrite (the revision agent returns whole-story text) is
+split on the beat separator; while each beat still spans the same number
+of paragraphs, every beat is diffed against its own previous text only,
+so the cost stays O(beat) per beat. When paragraphs were merged or split
+the whole story is diffed once and the edits are routed to the segments
+they fall in. If an edit crosses a beat boundary the segments no longer
+describe that version, and the label keeps its whole-story text instead.
+
+`deltas(label)` / `set_deltas(deltas, label)` export and re-apply one
+version's per-segment deltas, so a serialized state is restored without
+diffing again.
+
+Segments are immutable and `copy()` is shallow, so copies of a document
+share all text and deltas.
+"""
+from __future__ import annotations
+import re
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+SEPARATOR = "\n\n"
+
+# -----------------------------------------------------------------------------
+# Deltas
+# -----------------------------------------------------------------------------
+_PIECE = re.compile(r"\S+[^\S\n]*|\s+")  # words keep trailing spaces, never newlines
+
+Delta = Tuple[Tuple[int, int, str], ...]  # (start, end, replacement) in the old text, ascending
+
+
+def diff(old: str, new: str) -> Delta:
+    """Word-level edit script turning `old` into `new`."""
+    if old == new:
+        return ()
+    a = _PIECE.findall(old)
+    b = _PIECE.findall(new)
+    a_off = [0]
+    for piece in a:
+        a_off.append(a_off[-1] + len(piece))
+    ops = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b).get_opcodes():
+        if tag != "equal":
+            ops.append((a_off[i1], a_off[i2], "".join(b[j1:j2])))
+    return tuple(ops)
+
+
+def apply(old: str, delta: Delta) -> str:
+    if not delta:
+        return old
+    out, pos = [], 0
+    for start, end, text in delta:
+        out.append(old[pos:start])
+        out.append(text)
+        pos = end
+    out.append(old[pos:])
+    return "".join(out)
+
+
+def delta_size(delta: Delta) -> int:
+    return sum(len(t) for _, _, t in delta) + 16 * len(delta)
+
+
+# -----------------------------------------------------------------------------
+# Segment
+# -----------------------------------------------------------------------------
+class Segment:
+    """One beat: base text plus labelled forward deltas. Immutable."""
+
+    __slots__ = ("id", "base", "labels", "deltas")
+
+    def __init__(self, seg_id: str, base: str, labels: Tuple[str, ...] = ("v1",), deltas: Tuple[Delta, ...] = ()):
+        self.id = seg_id
+        self.base = base
+        self.labels = labels           # label of each version, base first
+        self.deltas = deltas           # deltas[i] turns version i into version i + 1
+
+    @property
+    def head(self) -> str:
+        return self.text(-1)
+
+    def text(self, version: int = -1) -> str:
+        """Text of one version; later versions are rebuilt from the base (not kept in memory)."""
+        if version < 0:
+            version += len(self.labels)
+        text = self.base
+        for d in self.deltas[:version]:
+            text = apply(text, d)
+        return text
+
+    def commit(self, text: str, label: str, delta: Optional[Delta] = None) -> "Segment":
+        """New segment with `text` as its latest version (replacing the head if it has the same label)."""
+        if label == self.labels[-1] and len(self.labels) > 1:
+            prev = self.text(-2)
+            delta = diff(prev, text) if delta is None else delta
+            return Segment(self.id, self.base, self.labels, self.deltas[:-1] + (delta,))
+        if label == self.labels[-1]:
+            return Segment(self.id, text, self.labels)
+        delta = diff(self.head, text) if delta is None else delta
+        return Segment(self.id, self.base, self.labels + (label,), self.deltas + (delta,))
+
+    def nbytes(self) -> int:
+        return len(self.base) + sum(delta_size(d) for d in self.deltas)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Segment) and (self.id, self.labels) == (other.id, other.labels) and self.head == other.head
+
+    def __repr__(self) -> str:
+        return f"Segment({self.id!r}, versions={list(self.labels)}, chars={len(self.head)})"
+
+
+# -----------------------------------------------------------------------------
+# Document
+# -----------------------------------------------------------------------------
+class StoryDocument:
+    """Ordered segments with per-label concatenated views."""
+
+    def __init__(self, segments: Iterable[Segment] = (), labels: Iterable[str] = ()):
+        self._segments: Dict[str, Segment] = {s.id: s for s in segments}
+        self.labels: List[str] = list(labels)
+        for s in self._segments.values():
+            for label in s.labels:
+                if label not in self.labels:
+                    self.labels.append(label)
+        self._story_texts: Dict[str, str] = {}  # label → whole text when edits cross segments
+        self._views: Dict[str, str] = {}
+
+    @classmethod
+    def from_texts(cls, texts: Mapping[str, str], label: str = "v1") -> "StoryDocument":
+        return cls((Segment(k, v, (label,)) for k, v in texts.items()), [label])
+
+    def copy(self) -> "StoryDocument":
+        doc = StoryDocument.__new__(StoryDocument)
+        doc._segments = dict(self._segments)
+        doc.labels = list(self.labels)
+        doc._story_texts = dict(self._story_texts)
+        doc._views = dict(self._views)
+        return doc
+
+    # -------------------------------------------------------------------------
+    # Segments
+    # -------------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._segments)
+
+    def __contains__(self, seg_id) -> bool:
+        return seg_id in self._segments
+
+    def segment(self, seg_id: str) -> Segment:
+        return self._segments[seg_id]
+
+    def _version_for(self, seg: Segment, label: Optional[str]) -> int:
+        """Latest version of `seg` at or before `label` in document label order."""
+        if label is None:
+            return len(seg.labels) - 1
+        rank = self.labels.index(label) if label in self.labels else len(self.labels)
+        version = 0
+        for i, l in enumerate(seg.labels):
+            if l in self.labels and self.labels.index(l) <= rank:
+                version = i
+        return version
+
+    def text(self, seg_id: str, label: Optional[str] = None) -> str:
+        seg = self._segments[seg_id]
+        return seg.text(self._version_for(seg, label))
+
+    def set_segment(self, seg_id: str, text: str, label: Optional[str] = None) -> None:
+        """Add or update one segment; O(beat) plus view invalidation."""
+        label = label or (self.labels[-1] if self.labels else "v1")
+        if label not in self.labels:
+            self.labels.append(label)
+        seg = self._segments.get(seg_id)
+        self._segments[seg_id] = Segment(seg_id, text, (label,)) if seg is None else seg.commit(text, label)
+        self._invalidate(label)
+
+    def _invalidate(self, label: str) -> None:
+        rank = self.labels.index(label)
+        for l in self.labels[rank:]:
+            self._views.pop(l, None)
+
+    # -------------------------------------------------------------------------
+    # Views
+    # -------------------------------------------------------------------------
+    def _segment_view(self, label: Optional[str]) -> str:
+        return SEPARATOR.join(self.text(k, label) for k in self._segments)
+
+    def view(self, label: Optional[str] = None) -> str:
+        """Whole-story text at `label` (latest versions if None), cached."""
+        if label is None and self.labels:
+            label = self.labels[-1]
+        if label in self._story_texts:
+            return self._story_texts[label]
+        cached = self._views.get(label)
+        if cached is None:
+            cached = self._segment_view(label)
+            self._views = {label: cached}
+        return cached
+
+    def set_view(self, text: str, label: str) -> None:
+        """
+        Record a whole-story version. Edits inside a segment become deltas of
+        that segment; if any edit crosses a boundary the label keeps the
+        whole text instead.
+        """
+        if label not in self.labels:
+            self.labels.append(label)
+        self._story_texts.pop(label, None)
+        self._views.pop(label, None)
+        old = {seg_id: self.text(seg_id, label) for seg_id in self._segments}
+        routed = self._split_by_segment(old, text)
+        if routed is None:
+            routed = self._route_edits(old, text)
+        if routed is None:
+            self._story_texts[label] = text
+            return
+        self._commit_deltas(routed, label)
+        self._views = {label: text}
+
+    @staticmethod
+    def _split_by_segment(old: Mapping[str, str], text: str) -> Optional[Dict[str, Delta]]:
+        """Per-segment deltas when `text` keeps every segment's paragraph count, else None."""
+        pieces = text.split(SEPARATOR)
+        counts = [t.count(SEPARATOR) + 1 for t in old.values()]
+        if not counts or sum(counts) != len(pieces):
+            return None
+        routed: Dict[str, Delta] = {}
+        pos = 0
+        for (seg_id, prev), n in zip(old.items(), counts):
+            new = SEPARATOR.join(pieces[pos:pos + n])
+            pos += n
+            if new != prev:
+                routed[seg_id] = diff(prev, new)
+        return routed
+
+    @staticmethod
+    def _route_edits(old: Mapping[str, str], text: str) -> Optional[Dict[str, Delta]]:
+        """Diff against the whole view and route each edit to its segment; None if one crosses a boundary."""
+        delta = diff(SEPARATOR.join(old.values()), text)
+        bounds: List[Tuple[str, int, int]] = []  # segment id, start, end in the old view
+        pos = 0
+        for seg_id, prev in old.items():
+            bounds.append((seg_id, pos, pos + len(prev)))
+            pos += len(prev) + len(SEPARATOR)
+
+        routed: Dict[str, List[Tuple[int, int, str]]] = {}
+        i = 0
+        for start, end, repl in delta:
+            while i < len(bounds) and start > bounds[i][2]:
+                i += 1
+            if i == len(bounds) or start < bounds[i][1] or end > bounds[i][2]:
+                return None
+            seg_id, s0, _ = bounds[i]
+            routed.setdefault(seg_id, []).append((start - s0, end - s0, repl))
+        return {seg_id: tuple(ops) for seg_id, ops in routed.items()}
+
+    def _commit_deltas(self, routed: Mapping[str, Delta], label: str) -> None:
+        for seg_id, ops in routed.items():
+            seg = self._segments[seg_id]
+            prev = seg.text(self._version_for(seg, label))
+            self._segments[seg_id] = seg.commit(apply(prev, ops), label, ops if seg.labels[-1] != label else None)
+        self._invalidate(label)
+
+    def deltas(self, label: str, as_lists: bool = False) -> Optional[Dict[str, Delta]]:
+        """
+        Per-segment deltas that produced `label` from the version before it,
+        or None when they cannot describe it (whole-text label, or a segment
+        that starts at `label`). `as_lists` gives the JSON shape.
+        """
+        if label not in self.labels or label in self._story_texts:
+            return None
+        out: Dict[str, Delta] = {}
+        for seg_id, seg in self._segments.items():
+            if label not in seg.labels:
+                continue
+            i = seg.labels.index(label)
+            if i == 0:
+                return None
+            out[seg_id] = [list(op) for op in seg.deltas[i - 1]] if as_lists else seg.deltas[i - 1]
+        return out
+
+    def set_deltas(self, deltas: Mapping[str, Delta], label: str, expected: Optional[str] = None) -> bool:
+        """
+        Re-apply `deltas(label)` output. With `expected`, the resulting view
+        is checked against it and the label removed again on a mismatch
+        (False); the caller then falls back to `set_view`.
+        """
+        if any(seg_id not in self._segments for seg_id in deltas):
+            return False
+        if label not in self.labels:
+            self.labels.append(label)
+        self._commit_deltas({k: tuple(tuple(op) for op in v) for k, v in deltas.items()}, label)
+        if expected is not None and self.view(label) != expected:
+            self.remove_label(label)
+            return False
+        return True
+
+    def remove_label(self, label: str) -> None:
+        """Drop a version label (segment versions carrying it must be their latest)."""
+        if label not in self.labels:
+            return
+        for seg_id, seg in list(self._segments.items()):
+            if seg.labels[-1] != label:
+                continue
+            if len(seg.labels) > 1:
+                self._segments[seg_id] = Segment(seg_id, seg.base, seg.labels[:-1], seg.deltas[:-1])
+            else:
+                del self._segments[seg_id]
+        self._story_texts.pop(label, None)
+        self._invalidate(label)
+        self.labels.remove(label)
+
+    def is_segmented(self, label: str) -> bool:
+        """True unless `label` had to keep whole-story text (edits crossed segments)."""
+        return label not in self._story_texts
+
+    def clear_views(self) -> None:
+        """Drop cached views (they are rebuilt on demand)."""
+        self._views.clear()
+
+    # -------------------------------------------------------------------------
+    # Introspection
+    # -------------------------------------------------------------------------
+    def nbytes(self) -> int:
+        """Approximate stored characters: segments and whole-text versions (cached views excluded)."""
+        return sum(s.nbytes() for s in self._segments.values()) + sum(len(t) for t in self._story_texts.values())
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, StoryDocument):
+            return NotImplemented
+        return list(self._segments) == list(other._segments) and all(
+            self._view_or_empty(l) == other._view_or_empty(l) for l in set(self.labels) | set(other.labels)
+        )
+
+    def _view_or_empty(self, label: str) -> str:
+        return self.view(label) if label in self.labels else ""
+
+    def __repr__(self) -> str:
+        return f"StoryDocument(segments={len(self)}, labels={self.labels})"
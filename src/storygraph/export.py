@@ -0,0 +1,293 @@
+"""
+Export engine: stream a story to Markdown or HTML, per version.
+
+Views:
+    v1     drafted beats
+    v2     revised beats (falls back to v1 for beats revision left alone)
+    diff   v1 → v2 per beat, with <del>/<ins> marks
+
+Rendering is a generator of chunks written straight to disk, one beat at
+a time; nothing builds the whole document in memory, and the combined
+draft is no longer appended after the beat sections (each file holds the
+story once). When a revision edited across beat boundaries the v2 text is
+exported as a single section.
+
+Sources:
+    export_state(state, path)              an in-memory StoryState
+    BeatStream(path, ...)                  beats as the draft agent finalizes them
+    export_run(run_id, out_dir)            a run persisted in the RunStore
+    export_runs(run_ids, out_dir, ...)     many archived runs in a process pool
+"""
+from __future__ import annotations
+import html
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
+
+from .document import SEPARATOR, diff
+from .state import StoryState
+
+FORMATS = ("md", "html")
+VIEWS = ("v1", "v2", "diff")
+
+
+def format_venue(v: str) -> str:
+    """Return a submission-guidelines safe venue label.
+
+    Rules:
+    - If empty, return empty.
+    - If it already contains the phrase 'submission guidelines', leave unchanged (idempotent).
+    - Otherwise append ' - submission guidelines compatible'.
+    This helps avoid implying official publication while drafting.
+    """
+    v = (v or "").strip()
+    if not v:
+        return ""
+    if "submission guidelines" in v.lower():
+        return v
+    return f"{v} - submission guidelines compatible"
+
+
+# -----------------------------------------------------------------------------
+# Sections
+# -----------------------------------------------------------------------------
+def beat_order(state: StoryState) -> List[str]:
+    """Outline beat order, else draft order."""
+    if state.outline and state.outline.beats:
+        return [b.id for b in state.outline.beats if b.id]
+    return list(state.drafts or {})
+
+
+def _marked_diff(old: str, new: str, fmt: str) -> str:
+    out, pos = [], 0
+    esc = html.escape if fmt == "html" else (lambda t: t)
+    for start, end, text in diff(old, new):
+        out.append(esc(old[pos:start]))
+        if end > start:
+            out.append(f"<del>{esc(old[start:end])}</del>")
+        if text:
+            out.append(f"<ins>{esc(text)}</ins>")
+        pos = end
+    out.append(esc(old[pos:]))
+    return "".join(out)
+
+
+def sections(state: StoryState, view: str = "v2") -> Iterator[Tuple[Optional[str], str]]:
+    """(beat id, text) per beat for a view; one (None, text) section if beats can't be separated."""
+    if view not in VIEWS:
+        raise ValueError(f"unknown view '{view}' (expected one of {VIEWS})")
+    doc = state.document
+    order = beat_order(state)
+    label = "v1" if view == "v1" else "v2"
+    segmented = doc.is_segmented(label) and (view != "diff" or doc.is_segmented("v1"))
+
+    if not order or not segmented or (doc.labels and any(b not in doc for b in order)):
+        # no usable per-beat segments: export the story text as one section
+        v1 = state.draft_v1_concat or SEPARATOR.join(d.text for d in state.drafts.values())
+        v2 = state.draft_v2_concat or v1
+        yield None, _pick(view, v1, v2)
+        return
+
+    for beat_id in order:
+        if beat_id in doc:
+            v1 = doc.text(beat_id, "v1") if "v1" in doc.labels else doc.text(beat_id)
+            v2 = doc.text(beat_id, "v2") if "v2" in doc.labels else v1
+        else:
+            scene = state.drafts.get(beat_id)
+            v1 = v2 = scene.text if scene else ""
+        yield beat_id, _pick(view, v1, v2)
+
+
+def _pick(view: str, v1: str, v2: str):
+    if view == "v1":
+        return v1
+    if view == "v2":
+        return v2
+    return v1, v2
+
+
+# -----------------------------------------------------------------------------
+# Renderers (chunk generators)
+# -----------------------------------------------------------------------------
+_VIEW_LABEL = {"v1": "V1", "v2": "V2", "diff": "V1 → V2"}
+
+
+def _title(state: StoryState) -> Tuple[str, str]:
+    return (state.premise or "Story").strip(), format_venue(state.venue)
+
+
+def markdown_header(title: str, venue: str = "") -> str:
+    return f"# {title}" + (f" — {venue}" if venue else "") + "\n\n"
+
+
+def markdown_beat(beat_id: Optional[str], body: str) -> str:
+    head = f"### BEAT: {beat_id}\n\n" if beat_id else ""
+    return head + ((body.strip() + "\n\n") if body.strip() else "(no scene text recorded)\n\n")
+
+
+def html_header(title: str, venue: str = "", view: str = "v2") -> str:
+    heading = html.escape(title) + (f" — {html.escape(venue)}" if venue else "")
+    return (
+        "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"utf-8\">\n"
+        f"<title>{html.escape(title)} ({_VIEW_LABEL.get(view, view)})</title>\n"
+        "<style>del{color:#a33}ins{color:#262;text-decoration:none;background:#efe}"
+        "section{max-width:40em;margin:2em auto;font-family:Georgia,serif;line-height:1.5}</style>\n"
+        f"</head>\n<body>\n<h1>{heading}</h1>\n"
+    )
+
+
+def html_beat(beat_id: Optional[str], body: str, escaped: bool = False) -> str:
+    paras = [p for p in body.split(SEPARATOR) if p.strip()] or ["(no scene text recorded)"]
+    inner = "".join(f"<p>{p.strip() if escaped else html.escape(p.strip())}</p>\n" for p in paras)
+    head = f"<h3>BEAT: {html.escape(beat_id)}</h3>\n" if beat_id else ""
+    attr = f" id=\"{html.escape(beat_id)}\"" if beat_id else ""
+    return f"<section{attr}>\n{head}{inner}</section>\n"
+
+
+HTML_FOOTER = "</body>\n</html>\n"
+
+
+def render(state: StoryState, fmt: str = "md", view: str = "v2") -> Iterator[str]:
+    """Yield the document in chunks: header, then one chunk per beat."""
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format '{fmt}' (expected one of {FORMATS})")
+    title, venue = _title(state)
+    yield markdown_header(title, venue) if fmt == "md" else html_header(title, venue, view)
+    for beat_id, text in sections(state, view):
+        if view == "diff":
+            body = _marked_diff(text[0], text[1], fmt)
+            yield markdown_beat(beat_id, body) if fmt == "md" else html_beat(beat_id, body, escaped=True)
+        else:
+            yield markdown_beat(beat_id, text) if fmt == "md" else html_beat(beat_id, text)
+    if fmt == "html":
+        yield HTML_FOOTER
+
+
+def render_text(state: StoryState, fmt: str = "md", view: str = "v2") -> str:
+    return "".join(render(state, fmt, view))
+
+
+# -----------------------------------------------------------------------------
+# Writing
+# -----------------------------------------------------------------------------
+class _AtomicFile:
+    """Text file written to a temp path and moved into place on close."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, self._tmp = tempfile.mkstemp(prefix=f".{self.path.name}.", suffix=".tmp", dir=str(self.path.parent))
+        self.f: TextIO = os.fdopen(fd, "w", encoding="utf-8")
+
+    def write(self, chunk: str) -> None:
+        self.f.write(chunk)
+        self.f.flush()  # beats reach the OS as they are produced
+
+    def commit(self) -> Path:
+        self.f.close()
+        os.replace(self._tmp, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        self.f.close()
+        try:
+            os.unlink(self._tmp)
+        except OSError:
+            pass
+
+
+def export_state(state: StoryState, path: Union[str, Path], fmt: Optional[str] = None, view: str = "v2") -> Path:
+    """Stream one view of `state` to `path` (format from the suffix unless given)."""
+    fmt = fmt or ("html" if str(path).endswith((".html", ".htm")) else "md")
+    out = _AtomicFile(path)
+    try:
+        for chunk in render(state, fmt, view):
+            out.write(chunk)
+    except BaseException:
+        out.abort()
+        raise
+    return out.commit()
+
+
+class BeatStream:
+    """
+    Write beats to disk as they are finalized.
+
+    Beats may arrive out of order (e.g. resized beats finish late); each is
+    written as soon as every beat before it in `order` has been written.
+    The file is moved into place on `close()`; `abort()` discards it.
+    """
+
+    def __init__(self, path: Union[str, Path], order: Sequence[str], title: str = "Story", venue: str = "", fmt: Optional[str] = None):
+        self.fmt = fmt or ("html" if str(path).endswith((".html", ".htm")) else "md")
+        self.order = list(order)
+        self._next = 0
+        self._held: Dict[str, str] = {}
+        self._out = _AtomicFile(path)
+        venue = format_venue(venue)
+        self._out.write(markdown_header(title, venue) if self.fmt == "md" else html_header(title, venue, "v1"))
+
+    def add(self, beat_id: str, text: str) -> None:
+        self._held[beat_id] = text
+        while self._next < len(self.order) and self.order[self._next] in self._held:
+            bid = self.order[self._next]
+            body = self._held.pop(bid)
+            self._out.write(markdown_beat(bid, body) if self.fmt == "md" else html_beat(bid, body))
+            self._next += 1
+
+    def close(self) -> Path:
+        for bid in self.order[self._next:]:  # beats that never arrived
+            body = self._held.pop(bid, "")
+            self._out.write(markdown_beat(bid, body) if self.fmt == "md" else html_beat(bid, body))
+        if self.fmt == "html":
+            self._out.write(HTML_FOOTER)
+        return self._out.commit()
+
+    def abort(self) -> None:
+        """Drop the partial file (a failed draft stage); the previous file, if any, is kept."""
+        self._out.abort()
+
+
+# -----------------------------------------------------------------------------
+# Persisted runs
+# -----------------------------------------------------------------------------
+def export_run(
+    run_id: str,
+    out_dir: Union[str, Path],
+    formats: Iterable[str] = ("md",),
+    views: Iterable[str] = ("v1", "v2"),
+    db_path: Optional[Union[str, Path]] = None,
+) -> List[str]:
+    """Render a stored run without re-running the pipeline; returns written paths."""
+    from .runstore import get_run_store
+
+    state = get_run_store(Path(db_path) if db_path else None).load_state(run_id)
+    out_dir = Path(out_dir)
+    written = []
+    for view in views:
+        for fmt in formats:
+            written.append(str(export_state(state, out_dir / f"{run_id}_{view}.{fmt}", fmt, view)))
+    return written
+
+
+def _export_run_job(args) -> List[str]:
+    return export_run(*args)
+
+
+def export_runs(
+    run_ids: Sequence[str],
+    out_dir: Union[str, Path],
+    formats: Iterable[str] = ("md",),
+    views: Iterable[str] = ("v1", "v2"),
+    db_path: Optional[Union[str, Path]] = None,
+    processes: Optional[int] = None,
+) -> Dict[str, List[str]]:
+    """Export many stored runs; with `processes` > 1 the runs are spread over a process pool."""
+    jobs = [(rid, str(out_dir), tuple(formats), tuple(views), str(db_path) if db_path else None) for rid in run_ids]
+    if not processes or processes <= 1 or len(jobs) <= 1:
+        return {job[0]: _export_run_job(job) for job in jobs}
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return dict(zip(run_ids, pool.map(_export_run_job, jobs, chunksize=max(1, len(jobs) // (processes * 4)))))
@@ -0,0 +1,336 @@
+"""
+Local stand-in for the LLM providers, for load tests that cost nothing.
+
+Serves the subset of the provider APIs that LLMClient uses:
+
+    POST /v1/responses          OpenAI Responses (GPT-5 / o-series)
+    POST /v1/chat/completions   OpenAI Chat Completions
+    POST /v1/messages           Anthropic Messages
+    GET  /stats                 request, stage and fault counters
+
+Point the clients at it through the SDKs' base URL variables:
+
+    python -m storygraph fake-provider --port 8100 --latency lognormal:0.4:0.5 --rate-limit 0.05
+    export OPENAI_BASE_URL=http://127.0.0.1:8100/v1 ANTHROPIC_BASE_URL=http://127.0.0.1:8100
+    export OPENAI_API_KEY=fake ANTHROPIC_API_KEY=fake
+
+Responses are synthetic but shaped like the real ones for each stage (the
+stage is recognized from its prompt): an outline of `beats` beats, drafts
+and resizes of the requested length, claims per scene, revision patches.
+Each request sleeps for a latency drawn from the configured distribution
+(plus `per_word_s` for every generated word), then faults are injected
+with the configured probabilities:
+
+    rate_limit   429 with a Retry-After header
+    overload     529 on /v1/messages, 503 on the OpenAI endpoints
+    truncate     the JSON text is cut short (finish/stop reason: length)
+    malformed    the JSON is wrapped in prose and a code fence and gets a
+                 trailing comma (the client's sanitizer should recover it)
+"""
+from __future__ import annotations
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .bench import prose, sentence
+
+ENDPOINTS = ("/v1/responses", "/v1/chat/completions", "/v1/messages")
+
+# stage -> marker in its user prompt (src/prompts/*.txt); first match wins
+STAGE_MARKERS = (
+    ("resize", "Current length:"),
+    ("fact", "Available quotes"),
+    ("planner", "Preferred templates:"),
+    ("revision", "Targets: grit"),
+    ("draft", "Target words:"),
+)
+
+
+# -----------------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------------
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Latency sampler from a spec (seconds):
+
+        0.2 | fixed:0.2          constant
+        uniform:0.1:0.5          uniform between the bounds
+        exp:0.3                  exponential with that mean
+        normal:0.3:0.1           normal (mean, sd), clamped at 0
+        lognormal:0.3:0.6        lognormal (median, sigma): a long tail
+    """
+    kind, _, rest = str(spec).partition(":")
+    try:
+        if not rest:
+            value = float(kind)
+            return lambda rng: value
+        args = [float(x) for x in rest.split(":")]
+        if kind == "fixed" and len(args) == 1:
+            return lambda rng: args[0]
+        if kind == "uniform" and len(args) == 2:
+            return lambda rng: rng.uniform(args[0], args[1])
+        if kind == "exp" and len(args) == 1:
+            return lambda rng: rng.expovariate(1.0 / args[0]) if args[0] > 0 else 0.0
+        if kind == "normal" and len(args) == 2:
+            return lambda rng: max(0.0, rng.gauss(args[0], args[1]))
+        if kind == "lognormal" and len(args) == 2:
+            mu = math.log(args[0]) if args[0] > 0 else float("-inf")
+            return lambda rng: rng.lognormvariate(mu, args[1]) if args[0] > 0 else 0.0
+    except ValueError:
+        pass
+    raise ValueError(f"bad latency spec {spec!r} (e.g. 0.2, uniform:0.1:0.5, exp:0.3, normal:0.3:0.1, lognormal:0.3:0.6)")
+
+
+@dataclass
+class ProviderConfig:
+    latency: str = "lognormal:0.2:0.5"
+    per_word_s: float = 0.0          # extra latency per generated word (streaming speed)
+    rate_limit: float = 0.0          # probability of a 429
+    overload: float = 0.0            # probability of a 529/503
+    truncate: float = 0.0            # probability of a cut-off response
+    malformed: float = 0.0           # probability of fenced JSON with a trailing comma
+    retry_after_s: float = 1.0
+    beats: int = 6                   # beats in the planner's outline
+    words: int = 300                 # target words per beat
+    draft_jitter: float = 0.1        # drafts miss their target by up to this fraction
+    seed: int = 0
+
+
+# -----------------------------------------------------------------------------
+# Synthetic responses
+# -----------------------------------------------------------------------------
+def classify(text: str) -> str:
+    for stage, marker in STAGE_MARKERS:
+        if marker in text:
+            return stage
+    return "unknown"
+
+
+def _match(pattern: str, text: str, default: str) -> str:
+    m = re.search(pattern, text)
+    return m.group(1) if m else default
+
+
+def respond(stage: str, text: str, cfg: ProviderConfig, rng: random.Random) -> Dict[str, Any]:
+    """JSON object a well-behaved model would return for `stage`."""
+    if stage == "planner":
+        return {
+            "template": "braided",
+            "beats": [{"id": f"B{i + 1}", "purpose": sentence(rng, 8), "target_words": cfg.words} for i in range(cfg.beats)],
+            "motifs": ["ridge", "silence", "rope"],
+        }
+    if stage == "draft":
+        beat_id = _match(r"Beat: (\S+)", text, "B1")
+        target = int(_match(r"Target words: (\d+)", text, str(cfg.words)))
+        words = max(1, round(target * (1 + rng.uniform(-cfg.draft_jitter, cfg.draft_jitter))))
+        return {"scene_id": beat_id, "text": prose(rng, words), "flags": []}
+    if stage == "resize":
+        beat_id = _match(r"Beat: (\S+)", text, "B1")
+        target = int(_match(r"Target length: (\d+)", text, str(cfg.words)))
+        return {"scene_id": beat_id, "text": prose(rng, target)}
+    if stage == "fact":
+        scene_id = _match(r"Scene ID: (\S+)", text, "B1")
+        return {"scene_id": scene_id, "claims": [
+            {"claim": sentence(rng), "substantiated": rng.random() < 0.6, "evidence_ids": [f"S{rng.randint(1, 3)}"]}
+            for _ in range(rng.randint(5, 8))
+        ]}
+    if stage == "revision":
+        return {"patches": [
+            {"span_id": f"B{rng.randint(1, cfg.beats)}", "before": sentence(rng, 6), "after": sentence(rng, 5), "rationale": "compression"}
+            for _ in range(rng.randint(0, 3))
+        ]}
+    return {}
+
+
+def _prompt_text(body: Dict[str, Any]) -> str:
+    """Everything the model would read: system, input and messages."""
+    def text(content) -> str:
+        if isinstance(content, list):  # content blocks
+            return " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+        return str(content or "")
+
+    parts = [text(body.get("system")), text(body.get("instructions"))]
+    if isinstance(body.get("input"), str):
+        parts.append(body["input"])
+    for msg in body.get("messages") or body.get("input") or []:
+        if isinstance(msg, dict):
+            parts.append(text(msg.get("content")))
+    return "\n".join(parts)
+
+
+def _envelope(path: str, model: str, text: str, truncated: bool, words: int) -> Dict[str, Any]:
+    """Provider-shaped success body for `text`."""
+    usage_in, usage_out = 1000, int(words * 1.3) + 20
+    rid = uuid.uuid4().hex[:24]
+    if path == "/v1/messages":
+        return {
+            "id": f"msg_{rid}", "type": "message", "role": "assistant", "model": model,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "max_tokens" if truncated else "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": usage_in, "output_tokens": usage_out},
+        }
+    if path == "/v1/chat/completions":
+        return {
+            "id": f"chatcmpl-{rid}", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                         "finish_reason": "length" if truncated else "stop"}],
+            "usage": {"prompt_tokens": usage_in, "completion_tokens": usage_out, "total_tokens": usage_in + usage_out},
+        }
+    return {
+        "id": f"resp_{rid}", "object": "response", "created_at": int(time.time()), "model": model,
+        "status": "incomplete" if truncated else "completed",
+        "incomplete_details": {"reason": "max_output_tokens"} if truncated else None,
+        "output": [{"type": "message", "id": f"msg_{rid}", "role": "assistant", "status": "completed",
+                    "content": [{"type": "output_text", "text": text, "annotations": []}]}],
+        "usage": {"input_tokens": usage_in, "output_tokens": usage_out, "total_tokens": usage_in + usage_out},
+    }
+
+
+def client_env(url: str) -> Dict[str, str]:
+    """Environment that points both SDKs (and LLMClient's stdlib transport) at `url`."""
+    url = url.rstrip("/")
+    return {
+        "OPENAI_BASE_URL": f"{url}/v1", "ANTHROPIC_BASE_URL": url,
+        "OPENAI_API_KEY": "fake-provider-key", "ANTHROPIC_API_KEY": "fake-provider-key",
+    }
+
+
+def _error(path: str, kind: str, message: str) -> Dict[str, Any]:
+    if path == "/v1/messages":
+        return {"type": "error", "error": {"type": kind, "message": message}}
+    return {"error": {"message": message, "type": kind, "param": None, "code": kind}}
+
+
+# -----------------------------------------------------------------------------
+# Server
+# -----------------------------------------------------------------------------
+class FakeProvider:
+    """Threaded HTTP server; one handler thread per connection (latency is a sleep)."""
+
+    def __init__(self, config: Optional[ProviderConfig] = None):
+        self.config = config or ProviderConfig()
+        self.latency = parse_latency(self.config.latency)
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._stats: Counter = Counter()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # -- lifecycle ---------------------------------------------------------------
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeProvider":
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                status, body, headers = provider.handle(self.path, raw)
+                self._reply(status, body, headers)
+
+            def do_GET(self):
+                if self.path == "/stats":
+                    self._reply(200, provider.stats(), {})
+                else:
+                    self._reply(404, {"error": {"message": "not found", "type": "not_found"}}, {})
+
+            def _reply(self, status, body, headers):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, fmt, *args):  # quiet: load tests make thousands of requests
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-provider", daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self) -> None:
+        self._thread.join()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeProvider":
+        return self if self._server is not None else self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -- requests ----------------------------------------------------------------
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, *keys: str) -> None:
+        with self._lock:
+            self._stats.update(keys)
+
+    def handle(self, path: str, raw: bytes) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+        """(status, JSON body, extra headers) for one request, after its latency."""
+        path = path.split("?", 1)[0]
+        if path not in ENDPOINTS:
+            return 404, {"error": {"message": f"no endpoint {path}", "type": "not_found"}}, {}
+        try:
+            body = json.loads(raw or b"{}")
+        except ValueError:
+            return 400, _error(path, "invalid_request_error", "body is not JSON"), {}
+        prompt = _prompt_text(body)
+        stage = classify(prompt)
+        cfg = self.config
+        with self._lock:  # one shared generator: a fixed seed replays the same fault sequence
+            delay = self.latency(self._rng)
+            fault = self._rng.random()
+            payload_fault = self._rng.random()
+            obj = respond(stage, prompt, cfg, self._rng)
+            cut = self._rng.uniform(0.3, 0.9)
+        self._count("requests", f"endpoint:{path}", f"stage:{stage}")
+
+        if fault < cfg.rate_limit:
+            time.sleep(min(delay, 0.05))
+            self._count("fault:rate_limit")
+            return 429, _error(path, "rate_limit_error", "Rate limit reached (fake provider)"), \
+                {"Retry-After": f"{cfg.retry_after_s:g}"}
+        if fault < cfg.rate_limit + cfg.overload:
+            time.sleep(delay)
+            self._count("fault:overload")
+            status = 529 if path == "/v1/messages" else 503
+            return status, _error(path, "overloaded_error", "Overloaded (fake provider)"), {}
+
+        text = json.dumps(obj, ensure_ascii=False)
+        words = len(obj.get("text", "").split())
+        time.sleep(delay + cfg.per_word_s * words)
+        truncated = False
+        if payload_fault < cfg.truncate:
+            text, truncated = text[: max(1, int(len(text) * cut))], True
+            self._count("fault:truncate")
+        elif payload_fault < cfg.truncate + cfg.malformed:
+            text = "Here is the JSON you asked for:\n```json\n" + text[:-1] + ",}\n```\nLet me know if you need changes."
+            self._count("fault:malformed")
+        self._count("ok")
+        return 200, _envelope(path, body.get("model", ""), text, truncated, words), {}
@@ -0,0 +1,479 @@
+"""
+Pipeline lifecycle hooks: typed events, subscribers and built-in sinks.
+
+Every Pipeline has a `HookBus` (`pipe.hooks`) whose events also reach the
+process-wide bus (`get_hooks()`), so a subscriber can watch one run or
+every run in the process:
+
+    pipe = Pipeline(...)
+    pipe.hooks.subscribe(print, kinds=("stage_finished", "beat_finished"))
+    get_hooks().subscribe(JSONLSink("trace.jsonl"))
+
+Events are frozen dataclasses with `run_id`, `stage` and a wall-clock `t`;
+`kind` names the event and `as_dict()` gives {"type": kind, ...fields}:
+
+    run_started / run_finished / run_failed     duration_s, error
+    stage_started / stage_finished              duration_s
+    beat_started / beat_finished                beat_id, index, words, duration_s
+    llm_call_started / llm_call_finished        model, attempts, ok, cached, duration_s
+    retry                                       model, attempt, delay_s, error
+    cache_hit                                   model, policy
+    checkpoint_written                          path, bytes, duration_s
+    outline, beat_drafted, claims_extracted, metrics   progress payloads (UI)
+
+Code that does not know its run (LLMClient, the agents) calls the module
+level `emit(EventClass, **fields)`: the bus, run id and stage come from
+the current `scope()`, which Pipeline sets for the run and each stage
+(`bind()` carries it into worker threads). Without a subscriber for the
+kind, emitting is a context-variable read and a dict lookup; the event
+object is never built. Subscribers run synchronously on the emitting
+thread, and one that raises is reported and skipped.
+
+Sinks: `LogSink` (logging), `JSONLSink` (trace file, one event per line)
+and `PrometheusSink` (counters and histograms in the text exposition
+format, served by `storygraph serve` at /metrics).
+"""
+from __future__ import annotations
+import contextlib
+import contextvars
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Any, Callable, ClassVar, Dict, Iterable, Iterator, List, Optional, Tuple, Type, Union
+
+Subscriber = Callable[["Event"], Any]
+
+
+# -----------------------------------------------------------------------------
+# Events
+# -----------------------------------------------------------------------------
+@dataclass(frozen=True, slots=True, kw_only=True)
+class Event:
+    kind: ClassVar[str] = "event"
+    BULK: ClassVar[Tuple[str, ...]] = ()   # large payload fields (omitted by brief sinks)
+    run_id: Optional[str] = None
+    stage: Optional[str] = None
+    t: float = field(default_factory=time.time)
+
+    def as_dict(self, brief: bool = False) -> Dict[str, Any]:
+        out = {"type": self.kind}
+        for f in fields(self):
+            if not (brief and f.name in self.BULK):
+                out[f.name] = getattr(self, f.name)
+        return out
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class RunStarted(Event):
+    kind: ClassVar[str] = "run_started"
+    premise: str = ""
+    venue: str = ""
+    stages: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class RunFinished(Event):
+    kind: ClassVar[str] = "run_finished"
+    duration_s: float = 0.0
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class RunFailed(Event):
+    kind: ClassVar[str] = "run_failed"
+    error: str = ""
+    duration_s: float = 0.0
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class StageStarted(Event):
+    kind: ClassVar[str] = "stage_started"
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class StageFinished(Event):
+    kind: ClassVar[str] = "stage_finished"
+    duration_s: float = 0.0
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class BeatStarted(Event):
+    kind: ClassVar[str] = "beat_started"
+    beat_id: str = ""
+    index: int = 0
+    target_words: int = 0
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class BeatFinished(Event):
+    kind: ClassVar[str] = "beat_finished"
+    beat_id: str = ""
+    index: int = 0
+    words: int = 0
+    resized: bool = False
+    duration_s: float = 0.0          # from beat_started until the beat is final (resizes included)
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class LLMCallStarted(Event):
+    kind: ClassVar[str] = "llm_call_started"
+    model: str = ""
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class LLMCallFinished(Event):
+    kind: ClassVar[str] = "llm_call_finished"
+    model: str = ""
+    ok: bool = True
+    cached: bool = False
+    attempts: int = 0                # provider requests made (0 for a cache hit)
+    error: Optional[str] = None
+    duration_s: float = 0.0          # rate-limit waits and retry backoff included
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class Retry(Event):
+    kind: ClassVar[str] = "retry"
+    model: str = ""
+    attempt: int = 0                 # the retry about to be made (1 = first retry)
+    delay_s: float = 0.0
+    error: str = ""
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class CacheHit(Event):
+    kind: ClassVar[str] = "cache_hit"
+    model: str = ""
+    policy: str = ""
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class CheckpointWritten(Event):
+    kind: ClassVar[str] = "checkpoint_written"
+    path: str = ""
+    bytes: int = 0
+    duration_s: float = 0.0          # render + atomic write on the writer thread
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class OutlineReady(Event):
+    kind: ClassVar[str] = "outline"
+    BULK: ClassVar[Tuple[str, ...]] = ("beats",)
+    template: str = ""
+    beats: List[Dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class BeatDrafted(Event):
+    kind: ClassVar[str] = "beat_drafted"
+    BULK: ClassVar[Tuple[str, ...]] = ("text", "flags")
+    beat_id: str = ""
+    text: str = ""
+    words: int = 0
+    flags: List[Dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class ClaimsExtracted(Event):
+    kind: ClassVar[str] = "claims_extracted"
+    BULK: ClassVar[Tuple[str, ...]] = ("claims",)
+    scene_id: str = ""
+    claims: List[Dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class MetricsUpdated(Event):
+    kind: ClassVar[str] = "metrics"
+    BULK: ClassVar[Tuple[str, ...]] = ("metrics",)
+    metrics: Dict[str, Any] = field(default_factory=dict)
+
+
+EVENTS: Dict[str, Type[Event]] = {cls.kind: cls for cls in (
+    RunStarted, RunFinished, RunFailed, StageStarted, StageFinished, BeatStarted, BeatFinished,
+    LLMCallStarted, LLMCallFinished, Retry, CacheHit, CheckpointWritten,
+    OutlineReady, BeatDrafted, ClaimsExtracted, MetricsUpdated,
+)}
+
+# what Pipeline(on_event=...) has always received
+PROGRESS = ("run_started", "stage_started", "stage_finished", "metrics", "outline",
+            "beat_drafted", "claims_extracted", "run_finished", "run_failed")
+
+
+# -----------------------------------------------------------------------------
+# Bus
+# -----------------------------------------------------------------------------
+class Subscription:
+    """Handle returned by HookBus.subscribe; close() (or leaving a `with`) unsubscribes."""
+
+    def __init__(self, bus: "HookBus", fn: Subscriber, kinds: Optional[Tuple[str, ...]]):
+        self.bus, self.fn, self.kinds = bus, fn, kinds
+
+    def close(self) -> None:
+        self.bus._remove(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class HookBus:
+    """
+    Subscribers by event kind. Subscribing replaces immutable tuples under a
+    lock, so emitting reads them without one. Events go to this bus's
+    subscribers, then to the parent's.
+    """
+
+    def __init__(self, parent: Optional["HookBus"] = None):
+        self.parent = parent
+        self._lock = threading.Lock()
+        self._subs: Tuple[Subscription, ...] = ()
+        self._by_kind: Dict[str, Tuple[Subscriber, ...]] = {}
+        self._all: Tuple[Subscriber, ...] = ()
+
+    def subscribe(self, fn: Subscriber, kinds: Optional[Iterable[Union[str, Type[Event]]]] = None) -> Subscription:
+        """Call `fn(event)` for events of `kinds` (names or Event classes; None: every kind)."""
+        names = None if kinds is None else tuple(k if isinstance(k, str) else k.kind for k in kinds)
+        unknown = [k for k in names or () if k not in EVENTS]
+        if unknown:
+            raise ValueError(f"unknown event kind(s) {unknown} (known: {', '.join(EVENTS)})")
+        sub = Subscription(self, fn, names)
+        with self._lock:
+            self._subs += (sub,)
+            self._rebuild()
+        return sub
+
+    def _remove(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subs = tuple(s for s in self._subs if s is not sub)
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        by_kind: Dict[str, Tuple[Subscriber, ...]] = {}
+        for s in self._subs:
+            for kind in s.kinds or ():
+                by_kind[kind] = by_kind.get(kind, ()) + (s.fn,)
+        self._by_kind = by_kind
+        self._all = tuple(s.fn for s in self._subs if s.kinds is None)
+
+    def wants(self, kind: str) -> bool:
+        return bool(self._all or kind in self._by_kind or (self.parent is not None and self.parent.wants(kind)))
+
+    def emit(self, event: Event) -> None:
+        for fn in self._by_kind.get(event.kind, ()) + self._all:
+            try:
+                fn(event)
+            except Exception as e:  # a broken subscriber must not fail the run
+                print(f"[HOOKS] subscriber {getattr(fn, '__name__', fn)!r} failed on {event.kind}: {type(e).__name__}: {e}")
+        if self.parent is not None:
+            self.parent.emit(event)
+
+
+_global = HookBus()
+
+
+def get_hooks() -> HookBus:
+    """The process-wide bus: receives the events of every run."""
+    return _global
+
+
+# -----------------------------------------------------------------------------
+# Scope: which bus / run / stage code that emits is running for
+# -----------------------------------------------------------------------------
+_scope: contextvars.ContextVar[Tuple[HookBus, Optional[str], Optional[str]]] = \
+    contextvars.ContextVar("storygraph_hooks_scope", default=(_global, None, None))
+
+
+@contextlib.contextmanager
+def scope(bus: Optional[HookBus] = None, run_id: Optional[str] = None, stage: Optional[str] = None) -> Iterator[None]:
+    """Route `emit()` calls in this context to `bus`, stamped with `run_id`/`stage` (None keeps the outer value)."""
+    outer_bus, outer_run, outer_stage = _scope.get()
+    token = _scope.set((bus or outer_bus, run_id or outer_run, stage or outer_stage))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def bind(fn: Callable) -> Callable:
+    """`fn` running in the caller's scope from any thread (e.g. a ThreadPoolExecutor task)."""
+    captured = _scope.get()
+
+    def run(*args, **kwargs):
+        token = _scope.set(captured)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _scope.reset(token)
+    return run
+
+
+def wants(cls: Type[Event]) -> bool:
+    return _scope.get()[0].wants(cls.kind)
+
+
+def emit(cls: Type[Event], **fields: Any) -> None:
+    """Emit `cls(**fields)` on the current scope's bus, if anything subscribes to it."""
+    bus, run_id, stage = _scope.get()
+    if bus.wants(cls.kind):
+        fields.setdefault("stage", stage)
+        bus.emit(cls(run_id=run_id, **fields))
+
+
+# -----------------------------------------------------------------------------
+# Sinks
+# -----------------------------------------------------------------------------
+def _brief(event: Event) -> str:
+    parts = []
+    for k, v in event.as_dict(brief=True).items():
+        if k in ("type", "run_id", "stage", "t") or v is None:
+            continue
+        parts.append(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}")
+    return " ".join(parts)
+
+
+class LogSink:
+    """One log record per event: `[run/stage] kind key=value ...` (payload fields omitted)."""
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger("storygraph.hooks")
+        self.level = level
+
+    def __call__(self, event: Event) -> None:
+        if self.logger.isEnabledFor(self.level):
+            where = "/".join(x for x in (event.run_id, event.stage) if x) or "-"
+            self.logger.log(self.level, "[%s] %s %s", where, event.kind, _brief(event))
+
+
+class JSONLSink:
+    """Appends each event as a JSON line; `full=True` keeps payload fields (beat text, claims)."""
+
+    def __init__(self, path: Union[str, Path], full: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.full = full
+        self._lock = threading.Lock()
+        self._f = open(self.path, "a", encoding="utf-8")
+
+    def __call__(self, event: Event) -> None:
+        line = json.dumps(event.as_dict(brief=not self.full), ensure_ascii=False, default=str)
+        with self._lock:
+            if self._f is not None:
+                self._f.write(line + "\n")
+                self._f.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class PrometheusSink:
+    """
+    Aggregates events into counters and histograms; `render()` returns the
+    Prometheus text exposition format (version 0.0.4).
+    """
+
+    KINDS = ("run_started", "run_finished", "run_failed", "stage_finished", "beat_finished",
+             "llm_call_started", "llm_call_finished", "retry", "cache_hit", "checkpoint_written")
+
+    def __init__(self, prefix: str = "storygraph", buckets: Tuple[float, ...] = BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._gauges: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._hists: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+
+    def attach(self, bus: Optional[HookBus] = None) -> Subscription:
+        return (bus or get_hooks()).subscribe(self, self.KINDS)
+
+    def _inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def _gauge(self, name: str, delta: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        self._gauges[key] = self._gauges.get(key, 0.0) + delta
+
+    def _observe(self, name: str, value: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        h = self._hists.get(key)
+        if h is None:
+            h = self._hists[key] = [0.0] * (len(self.buckets) + 2)   # buckets..., sum, count
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                h[i] += 1
+        h[-2] += value
+        h[-1] += 1
+
+    def __call__(self, event: Event) -> None:
+        kind = event.kind
+        with self._lock:
+            if kind in ("run_started", "run_finished", "run_failed"):
+                self._inc("runs_total", status=kind[4:])
+                if kind != "run_started":
+                    self._observe("run_duration_seconds", event.duration_s, status=kind[4:])
+            elif kind == "stage_finished":
+                self._observe("stage_duration_seconds", event.duration_s, stage=event.stage or "")
+            elif kind == "beat_finished":
+                self._inc("beats_total", resized=str(event.resized).lower())
+                self._observe("beat_duration_seconds", event.duration_s)
+            elif kind == "llm_call_started":
+                self._gauge("llm_calls_in_flight", 1, model=event.model)
+            elif kind == "llm_call_finished":
+                self._gauge("llm_calls_in_flight", -1, model=event.model)
+                outcome = "cached" if event.cached else ("ok" if event.ok else "error")
+                self._inc("llm_calls_total", model=event.model, stage=event.stage or "", outcome=outcome)
+                self._inc("llm_requests_total", event.attempts, model=event.model)
+                if not event.cached:
+                    self._observe("llm_call_duration_seconds", event.duration_s, model=event.model)
+            elif kind == "retry":
+                self._inc("llm_retries_total", model=event.model)
+            elif kind == "cache_hit":
+                self._inc("llm_cache_hits_total", model=event.model, policy=event.policy)
+            elif kind == "checkpoint_written":
+                self._inc("checkpoints_total")
+                self._inc("checkpoint_bytes_total", event.bytes)
+                self._observe("checkpoint_duration_seconds", event.duration_s)
+
+    def render(self) -> str:
+        def labels(pairs, extra=()) -> str:
+            items = [*pairs, *extra]
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+        out: List[str] = []
+        with self._lock:
+            for kind, series in (("counter", self._counters), ("gauge", self._gauges)):
+                seen = set()
+                for (name, pairs), value in sorted(series.items()):
+                    full = f"{self.prefix}_{name}"
+                    if name not in seen:
+                        seen.add(name)
+                        out.append(f"# TYPE {full} {kind}")
+                    out.append(f"{full}{labels(pairs)} {value:g}")
+            seen = set()
+            for (name, pairs), h in sorted(self._hists.items()):
+                full = f"{self.prefix}_{name}"
+                if name not in seen:
+                    seen.add(name)
+                    out.append(f"# TYPE {full} histogram")
+                for bound, n in zip(self.buckets, h):
+                    out.append(f"{full}_bucket{labels(pairs, [('le', f'{bound:g}')])} {n:g}")
+                out.append(f"{full}_bucket{labels(pairs, [('le', '+Inf')])} {h[-1]:g}")
+                out.append(f"{full}_sum{labels(pairs)} {h[-2]:g}")
+                out.append(f"{full}_count{labels(pairs)} {h[-1]:g}")
+        return "\n".join(out) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -0,0 +1,487 @@
+"""
+Job queue: durable pipeline jobs in SQLite, run by worker processes.
+
+    queue = JobQueue()
+    queue.submit("Youth, mountains", "Granta", seed=7, priority=5)
+    queue.set_limit("default", 2)          # at most 2 running jobs for the profile
+    run_workers(4)                         # 4 worker processes until interrupted
+
+No broker: every worker opens the same database file and claims jobs in a
+short `BEGIN IMMEDIATE` transaction, so a job is handed to exactly one
+worker. Claims follow priority (higher first), then submission order, and
+skip profiles that already have their limit of running jobs; limits live
+in the database, so they hold across all workers and processes.
+
+A claimed job carries a lease. The worker renews it from a heartbeat
+thread while the pipeline runs; if the worker dies, the lease expires and
+the next claim puts the job back in the queue (or fails it once
+`max_attempts` is used up). A worker that loses its lease can no longer
+complete the job. Each attempt is a separate run in the run store
+(`Job.run_id` is the latest).
+
+Throughput scales with worker processes until provider rate limits bind
+(see `rate_limit_rpm` in config/llm_profiles.yaml); the queue itself costs
+one small transaction per claim. Workers on other hosts can share the file
+only on a filesystem with working POSIX locks (SQLite's requirement).
+
+Tables:
+    jobs     one row per job: status (queued | running | done | failed),
+             priority, profile, payload, attempts, lease owner/expiry, run id
+    limits   profile → max running jobs
+"""
+from __future__ import annotations
+import json
+import os
+import secrets
+import socket
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+_ROOT = Path(__file__).resolve().parents[2]  # repo root
+DEFAULT_QUEUE = _ROOT / "data" / "runs" / "jobs.sqlite"
+
+LEASE_S = 120.0        # lease length; renewed every LEASE_S / 3 while a job runs
+POLL_S = 1.0           # idle worker poll interval
+RETRY_DELAY_S = 5.0    # delay before a failed attempt is retried
+STATUSES = ("queued", "running", "done", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    profile TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    available_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    run_id TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS limits (
+    profile TEXT PRIMARY KEY,
+    max_running INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs(status, priority DESC);
+CREATE INDEX IF NOT EXISTS jobs_running ON jobs(status, profile);
+"""
+
+_COLUMNS = (
+    "job_id, created_at, status, priority, profile, payload, attempts, max_attempts, "
+    "available_at, started_at, finished_at, lease_owner, lease_expires, run_id, error"
+)
+
+
+def new_job_id() -> str:
+    return "job-" + time.strftime("%Y%m%dT%H%M%S", time.gmtime()) + "-" + secrets.token_hex(4)
+
+
+def new_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{secrets.token_hex(2)}"
+
+
+@dataclass
+class Job:
+    job_id: str
+    created_at: float
+    status: str
+    priority: int
+    profile: str
+    payload: Dict[str, Any] = field(default_factory=dict)   # {"premise", "venue", "seed"}
+    attempts: int = 0
+    max_attempts: int = 3
+    available_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    lease_owner: Optional[str] = None
+    lease_expires: Optional[float] = None
+    run_id: Optional[str] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row) -> "Job":
+        values = list(row)
+        values[5] = json.loads(values[5])
+        return cls(*values)
+
+
+# -----------------------------------------------------------------------------
+# Queue
+# -----------------------------------------------------------------------------
+class JobQueue:
+    """SQLite job queue; one instance per process (safe to share across threads)."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path is not None else DEFAULT_QUEUE
+        if str(self.path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "JobQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run fn inside an immediate (write-locked) transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    # -------------------------------------------------------------------------
+    # Producers
+    # -------------------------------------------------------------------------
+    def submit(
+        self,
+        premise: str,
+        venue: str = "",
+        seed: int = 137,
+        profile: Optional[str] = None,
+        priority: int = 0,
+        max_attempts: int = 3,
+    ) -> str:
+        return self.submit_many([{"premise": premise, "venue": venue, "seed": seed}], profile, priority, max_attempts)[0]
+
+    def submit_many(
+        self,
+        payloads: List[Dict[str, Any]],
+        profile: Optional[str] = None,
+        priority: int = 0,
+        max_attempts: int = 3,
+    ) -> List[str]:
+        """Queue one job per {"premise", "venue"?, "seed"?, "profile"?, "priority"?}; returns job ids."""
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be >= 1")
+        now = time.time()
+        rows = []
+        for p in payloads:
+            if not str(p.get("premise") or "").strip():
+                raise ValueError("every job needs a premise")
+            payload = {"premise": p["premise"], "venue": p.get("venue", ""), "seed": int(p.get("seed", 137))}
+            rows.append((
+                new_job_id(), now, "queued", int(p.get("priority", priority)),
+                p.get("profile") or profile or "default", json.dumps(payload, ensure_ascii=False),
+                max_attempts, now,
+            ))
+        self._write(lambda c: c.executemany(
+            "INSERT INTO jobs(job_id, created_at, status, priority, profile, payload, max_attempts, available_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows,
+        ))
+        return [r[0] for r in rows]
+
+    def set_limit(self, profile: str, max_running: Optional[int]) -> None:
+        """Cap concurrently running jobs for a profile (None removes the cap)."""
+        if max_running is None:
+            self._write(lambda c: c.execute("DELETE FROM limits WHERE profile = ?", (profile,)))
+            return
+        if max_running < 1:
+            raise ValueError("max_running must be >= 1")
+        self._write(lambda c: c.execute(
+            "INSERT INTO limits(profile, max_running) VALUES (?, ?) "
+            "ON CONFLICT(profile) DO UPDATE SET max_running = excluded.max_running", (profile, max_running),
+        ))
+
+    def limits(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT profile, max_running FROM limits").fetchall())
+
+    def cancel(self, job_id: str) -> bool:
+        """Fail a queued job; running jobs are left to finish."""
+        cur = self._write(lambda c: c.execute(
+            "UPDATE jobs SET status = 'failed', error = 'cancelled', finished_at = ? "
+            "WHERE job_id = ? AND status = 'queued'", (time.time(), job_id),
+        ))
+        return cur.rowcount == 1
+
+    # -------------------------------------------------------------------------
+    # Workers
+    # -------------------------------------------------------------------------
+    def claim(self, worker_id: str, lease_s: float = LEASE_S, profiles: Optional[List[str]] = None) -> Optional[Job]:
+        """Lease the next runnable job (optionally only for `profiles`); None when nothing is runnable."""
+
+        def claim(c: sqlite3.Connection) -> Optional[Job]:
+            now = time.time()
+            _expire(c, now)
+            only = ""
+            args: List[Any] = [now]
+            if profiles:
+                only = f" AND j.profile IN ({','.join('?' * len(profiles))})"
+                args.extend(profiles)
+            row = c.execute(
+                "SELECT j.job_id FROM jobs j LEFT JOIN limits l ON l.profile = j.profile"
+                " WHERE j.status = 'queued' AND j.available_at <= ?" + only +
+                " AND (l.max_running IS NULL OR l.max_running >"
+                "      (SELECT COUNT(*) FROM jobs r WHERE r.status = 'running' AND r.profile = j.profile))"
+                " ORDER BY j.priority DESC, j.rowid LIMIT 1",  # rowid: submission order
+                args,
+            ).fetchone()
+            if row is None:
+                return None
+            c.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, "
+                "lease_owner = ?, lease_expires = ?, error = NULL WHERE job_id = ?",
+                (now, worker_id, now + lease_s, row[0]),
+            )
+            return Job.from_row(c.execute(f"SELECT {_COLUMNS} FROM jobs WHERE job_id = ?", (row[0],)).fetchone())
+
+        return self._write(claim)
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_s: float = LEASE_S) -> bool:
+        """Extend the lease; False if the worker no longer holds it."""
+        return self._owned_update(job_id, worker_id, "lease_expires = ?", (time.time() + lease_s,))
+
+    def set_run_id(self, job_id: str, worker_id: str, run_id: str) -> bool:
+        return self._owned_update(job_id, worker_id, "run_id = ?", (run_id,))
+
+    def complete(self, job_id: str, worker_id: str, run_id: Optional[str] = None) -> bool:
+        return self._owned_update(
+            job_id, worker_id,
+            "status = 'done', finished_at = ?, lease_owner = NULL, lease_expires = NULL, run_id = COALESCE(?, run_id)",
+            (time.time(), run_id),
+        )
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry: bool = True, delay_s: float = RETRY_DELAY_S) -> bool:
+        """Requeue after `delay_s` while attempts remain (and retry is True), else mark failed."""
+        now = time.time()
+        return self._owned_update(
+            job_id, worker_id,
+            "status = CASE WHEN ? AND attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+            "finished_at = CASE WHEN ? AND attempts < max_attempts THEN NULL ELSE ? END, "
+            "available_at = ?, error = ?, lease_owner = NULL, lease_expires = NULL",
+            (retry, retry, now, now + delay_s, error),
+        )
+
+    def _owned_update(self, job_id: str, worker_id: str, assignments: str, args) -> bool:
+        cur = self._write(lambda c: c.execute(
+            f"UPDATE jobs SET {assignments} WHERE job_id = ? AND status = 'running' AND lease_owner = ?",
+            (*args, job_id, worker_id),
+        ))
+        return cur.rowcount == 1
+
+    def requeue_expired(self) -> int:
+        """Release jobs whose lease ran out (claims do this too); returns the number of jobs touched."""
+        return self._write(lambda c: _expire(c, time.time()))
+
+    # -------------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------------
+    def get(self, job_id: str) -> Job:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"job {job_id} not found in {self.path}")
+        return Job.from_row(row)
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 100) -> List[Job]:
+        """Jobs in claim order (queued/running) or newest first (otherwise)."""
+        where = " WHERE status = ?" if status else ""
+        order = "priority DESC, rowid" if status in ("queued", "running") else "rowid DESC"
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM jobs{where} ORDER BY {order} LIMIT ?",
+                (*([status] if status else []), limit),
+            ).fetchall()
+        return [Job.from_row(r) for r in rows]
+
+    def next_available(self, profiles: Optional[List[str]] = None) -> Optional[float]:
+        """When the earliest queued job (optionally only for `profiles`) may be claimed; None if none is queued."""
+        only, args = "", []
+        if profiles:
+            only = f" AND profile IN ({','.join('?' * len(profiles))})"
+            args = list(profiles)
+        with self._lock:
+            row = self._conn.execute(f"SELECT MIN(available_at) FROM jobs WHERE status = 'queued'{only}", args).fetchone()
+        return row[0]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {s: 0 for s in STATUSES} | dict(rows)
+
+
+def _expire(c: sqlite3.Connection, now: float) -> int:
+    cur = c.execute(
+        "UPDATE jobs SET "
+        "status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+        "finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE ? END, "
+        "error = 'lease expired (worker ' || COALESCE(lease_owner, '?') || ')', "
+        "available_at = ?, lease_owner = NULL, lease_expires = NULL "
+        "WHERE status = 'running' AND lease_expires < ?",
+        (now, now, now),
+    )
+    return cur.rowcount
+
+
+# -----------------------------------------------------------------------------
+# Worker
+# -----------------------------------------------------------------------------
+_context: Optional[dict] = None
+_context_lock = threading.Lock()
+
+
+def run_job(job: Job, run_id: str, db_path: Optional[Path] = None) -> None:
+    """Default job runner: the full pipeline, recorded in the run store as `run_id`."""
+    global _context
+    from .config_loader import load_profile
+    from .router import Pipeline
+    from .runstore import get_run_store
+
+    profile = load_profile(job.profile)
+    with _context_lock:
+        if _context is None:
+            from .context_loader import load_all_context
+            _context = load_all_context()
+    pipe = Pipeline(
+        seed=int(job.payload.get("seed", 137)), store=get_run_store(db_path), profile=profile.name,
+        config=profile.as_dict(), settings=profile, run_id=run_id,
+    )
+    pipe.run_minimal(job.payload["premise"], job.payload.get("venue", ""), models=profile.models(), context=_context)
+
+
+class Worker:
+    """Claims and runs jobs one at a time, renewing the lease from a heartbeat thread."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        runner: Optional[Callable[[Job, str], Any]] = None,
+        worker_id: Optional[str] = None,
+        lease_s: float = LEASE_S,
+        poll_s: float = POLL_S,
+        profiles: Optional[List[str]] = None,
+        db_path: Optional[Path] = None,
+        retry_delay_s: float = RETRY_DELAY_S,
+    ):
+        self.queue = queue
+        self.runner = runner or (lambda job, run_id: run_job(job, run_id, db_path))
+        self.worker_id = worker_id or new_worker_id()
+        self.lease_s = lease_s
+        self.poll_s = poll_s
+        self.profiles = profiles
+        self.retry_delay_s = retry_delay_s
+        self.stop = threading.Event()
+
+    def run_one(self) -> Optional[Job]:
+        """Claim and run one job; returns it (final status in the queue) or None if none was runnable."""
+        from .runstore import new_run_id
+
+        job = self.queue.claim(self.worker_id, self.lease_s, self.profiles)
+        if job is None:
+            return None
+        run_id = new_run_id()
+        self.queue.set_run_id(job.job_id, self.worker_id, run_id)
+        print(f"[WORKER] {self.worker_id}: job {job.job_id} (attempt {job.attempts}/{job.max_attempts}) → run {run_id}")
+
+        done = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job, done), daemon=True)
+        beat.start()
+        try:
+            self.runner(job, run_id)
+        except KeyboardInterrupt:
+            self.queue.fail(job.job_id, self.worker_id, "interrupted", delay_s=0.0)
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if not self.queue.fail(job.job_id, self.worker_id, error, delay_s=self.retry_delay_s):
+                print(f"[WORKER] {self.worker_id}: lost the lease on job {job.job_id}; failure not recorded")
+            print(f"[WORKER] ✗ job {job.job_id}: {error}")
+        else:
+            if not self.queue.complete(job.job_id, self.worker_id, run_id):
+                print(f"[WORKER] {self.worker_id}: lost the lease on job {job.job_id}; result not recorded")
+            else:
+                print(f"[WORKER] ✓ job {job.job_id}")
+        finally:
+            done.set()
+            beat.join()
+        return self.queue.get(job.job_id)
+
+    def _heartbeat(self, job: Job, done: threading.Event) -> None:
+        while not done.wait(self.lease_s / 3):
+            if not self.queue.heartbeat(job.job_id, self.worker_id, self.lease_s):
+                print(f"[WORKER] {self.worker_id}: lease on job {job.job_id} was taken over")
+                return
+
+    def run(self, max_jobs: Optional[int] = None, drain: bool = False) -> int:
+        """Process jobs until stopped, `max_jobs` are done, or (drain) nothing is queued or running."""
+        n = 0
+        while not self.stop.is_set() and (max_jobs is None or n < max_jobs):
+            if self.run_one() is not None:
+                n += 1
+                continue
+            # queued jobs may be waiting out a retry delay: sleep until the first is due
+            due = self.queue.next_available(self.profiles)
+            if drain and due is None and not self.queue.counts()["running"]:
+                break
+            delay = due - time.time() if due is not None else self.poll_s
+            self.stop.wait(delay if 0 < delay < self.poll_s else self.poll_s)
+        return n
+
+
+# -----------------------------------------------------------------------------
+# Worker processes
+# -----------------------------------------------------------------------------
+def _worker_main(queue_path: str, db_path: Optional[str], lease_s: float, poll_s: float,
+                 profiles: Optional[List[str]], max_jobs: Optional[int], drain: bool) -> None:
+    import signal
+
+    with JobQueue(Path(queue_path)) as queue:
+        worker = Worker(queue, lease_s=lease_s, poll_s=poll_s, profiles=profiles,
+                        db_path=Path(db_path) if db_path else None)
+        # Ctrl-C reaches the parent, which sends SIGTERM: stop after the current job
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop.set())
+        worker.run(max_jobs=max_jobs, drain=drain)
+
+
+def run_workers(
+    processes: int,
+    queue_path: Optional[Path] = None,
+    db_path: Optional[Path] = None,
+    lease_s: float = LEASE_S,
+    poll_s: float = POLL_S,
+    profiles: Optional[List[str]] = None,
+    max_jobs: Optional[int] = None,
+    drain: bool = False,
+) -> List[int]:
+    """Run `processes` worker processes on one queue until they exit; returns their exit codes."""
+    import multiprocessing
+
+    ctx = multiprocessing.get_context("spawn")  # no inherited SQLite handles or SDK clients
+    args = (str(queue_path or DEFAULT_QUEUE), str(db_path) if db_path else None, lease_s, poll_s, profiles, max_jobs, drain)
+    procs = [ctx.Process(target=_worker_main, args=args, name=f"worker-{i}") for i in range(processes)]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()  # SIGTERM: each worker finishes its current job
+        for p in procs:
+            p.join()
+    return [p.exitcode for p in procs]
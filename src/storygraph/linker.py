@@ -0,0 +1,210 @@
+"""
+Entity linker: tag draft text with codex IDs in one linear pass.
+
+An Aho-Corasick automaton is compiled from codex labels and aliases
+("Nikita Marwah", "Nikita", "Canadian Border Peak", "Tomyhoi", ...) and run
+over each SceneDraft. Matching is case-insensitive and word-bounded; when
+aliases overlap ("Canadian Border Peak" vs "Border Peak") the longest,
+leftmost match wins.
+
+The compiled linker is cached per codex fingerprint, so it is rebuilt only
+when the codex changes.
+"""
+from __future__ import annotations
+import re
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .codex import Codex, ensure_codex
+
+LINKED_CATEGORIES = ("people", "places")
+MAX_LABEL_WORDS = 6
+
+# Generic words that are never useful aliases on their own
+_GENERIC = frozenset("""
+narrator family peak mount mountain village trailheads camps the a an
+""".split())
+_QUALIFIER = re.compile(r"^(?:mount|mt\.?)\s+", re.IGNORECASE)
+_POSSESSIVE = re.compile(r"[’']s$")
+
+
+# -----------------------------------------------------------------------------
+# Aliases
+# -----------------------------------------------------------------------------
+def aliases_for(label: str, category: str) -> List[str]:
+    """
+    Alias strings for a codex label.
+
+    - the full label ("Nikita Marwah", "Forbidden Peak West Ridge")
+    - for people, the first name ("Nikita")
+    - for places, the name without "Mount" and trailing feature words
+      ("Wedge", "Forbidden Peak", "Forbidden", "Whistler")
+    """
+    label = label.strip(" ,.;:")
+    out = [label]
+    words = label.split()
+    if category == "people" and len(words) > 1:
+        out.append(_POSSESSIVE.split(words[0])[0])
+    if category == "places":
+        names = [_QUALIFIER.sub("", label)]
+        for suffix in (" West Ridge", " Peak", " Village"):
+            cur = names[-1]
+            if cur.endswith(suffix) and len(cur) > len(suffix):
+                names.append(cur[: -len(suffix)])
+        out.extend(names)
+    aliases: List[str] = []
+    for alias in out:
+        alias = alias.strip()
+        if len(alias) < 3 or alias.lower() in _GENERIC or alias in aliases:
+            continue
+        aliases.append(alias)
+    return aliases
+
+
+def codex_aliases(codex: Codex) -> Dict[str, List[str]]:
+    """Aliases per entity ID for linked categories, plus '(Alias)' hints in claims."""
+    aliases: Dict[str, List[str]] = {}
+    for e in codex.entries():
+        # relationship rows ("P1 ↔ P2") and free-text notes are not names
+        if e.category not in LINKED_CATEGORIES or e.refs or len(e.label.split()) > MAX_LABEL_WORDS:
+            continue
+        aliases.setdefault(e.id, []).extend(aliases_for(e.label, e.category))
+    # claims like "P1 (Nikita)" or "PL2 (Tomyhoi)" name their referents
+    for e in codex.entries("claims"):
+        for m in re.finditer(r"\b([A-Z]+\d+)\s*\(([^)]+)\)", e.text):
+            ref, alias = m.group(1), m.group(2).strip()
+            target = codex.get_entry(ref)
+            if target is not None and target.category in LINKED_CATEGORIES and alias not in aliases.get(ref, []):
+                if len(alias) >= 3 and alias.lower() not in _GENERIC:
+                    aliases.setdefault(ref, []).append(alias)
+    return aliases
+
+
+# -----------------------------------------------------------------------------
+# Aho-Corasick automaton
+# -----------------------------------------------------------------------------
+@dataclass(frozen=True)
+class EntityMention:
+    entity_id: str
+    start: int
+    end: int
+    surface: str
+
+    def as_dict(self) -> Dict:
+        return {"id": self.entity_id, "start": self.start, "end": self.end, "text": self.surface}
+
+
+class EntityLinker:
+    """Case-insensitive multi-pattern matcher over codex aliases."""
+
+    def __init__(self, patterns: Dict[str, Iterable[str]]):
+        # state 0 is the root; goto is a list of dicts, fail/out are parallel lists
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]  # (pattern length, entity id)
+        self.patterns: Dict[str, str] = {}
+
+        for entity_id, aliases in patterns.items():
+            for alias in aliases:
+                key = alias.lower()
+                if not key or key in self.patterns:
+                    continue
+                self.patterns[key] = entity_id
+                self._add(key, entity_id)
+        self._build()
+
+    def _add(self, key: str, entity_id: str) -> None:
+        state = 0
+        for ch in key:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(key), entity_id))
+
+    def _build(self) -> None:
+        queue = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    # -------------------------------------------------------------------------
+    # Matching
+    # -------------------------------------------------------------------------
+    def find(self, text: str) -> List[EntityMention]:
+        """Word-bounded, non-overlapping mentions (longest leftmost wins)."""
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # keep offsets aligned when lowercasing changes string length
+            lowered = "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+        n = len(text)
+        raw: List[Tuple[int, int, str]] = []
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(lowered):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                end = i + 1
+                if end < n and lowered[end].isalnum():
+                    continue
+                for length, entity_id in out[state]:
+                    start = end - length
+                    if start > 0 and lowered[start - 1].isalnum():
+                        continue
+                    raw.append((start, end, entity_id))
+
+        raw.sort(key=lambda m: (m[0], -(m[1] - m[0])))
+        mentions: List[EntityMention] = []
+        last_end = -1
+        for start, end, entity_id in raw:
+            if start < last_end:
+                continue
+            mentions.append(EntityMention(entity_id, start, end, text[start:end]))
+            last_end = end
+        return mentions
+
+    def entity_ids(self, text: str) -> List[str]:
+        """Distinct entity IDs mentioned, in order of first appearance."""
+        return list(dict.fromkeys(m.entity_id for m in self.find(text)))
+
+
+# -----------------------------------------------------------------------------
+# Shared linkers (one per compiled codex)
+# -----------------------------------------------------------------------------
+_linkers: "OrderedDict[str, EntityLinker]" = OrderedDict()
+_linkers_lock = threading.Lock()
+
+
+def get_linker(codex_like) -> EntityLinker:
+    codex = ensure_codex(codex_like)
+    with _linkers_lock:
+        linker = _linkers.get(codex.fingerprint)
+        if linker is None:
+            linker = _linkers[codex.fingerprint] = EntityLinker(codex_aliases(codex))
+            while len(_linkers) > 8:
+                _linkers.popitem(last=False)
+        return linker
+
+
+def link_scene(scene, codex_like, linker: Optional[EntityLinker] = None):
+    """Populate `scene.entities` with codex mentions; returns the scene."""
+    linker = linker or get_linker(codex_like)
+    scene.entities = [m.as_dict() for m in linker.find(scene.text)]
+    return scene
@@ -1,20 +1,23 @@
 from __future__ import annotations
+import hashlib
 import json
 import os
 import re
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any, Dict, Tuple
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Optional, Tuple
 
-# Optional backends
-try:
-    from openai import OpenAI  # openai>=1.43
-except Exception:
-    OpenAI = None
+from . import hooks
 
-try:
-    import anthropic  # anthropic>=0.34
-except Exception:
-    anthropic = None
+# Optional backends (openai>=1.43, anthropic>=0.34) are imported in
+# _select_backend, so importing this module does not load either SDK.
+# Both SDKs honor OPENAI_BASE_URL / ANTHROPIC_BASE_URL (e.g. the local
+# storygraph.fakeprovider); without the SDK, a base URL is served by the
+# minimal stdlib transport below.
 
 
 # ------------------------------------------------------------
@@ -26,6 +29,170 @@ class LLMConfig:
     model: str
     seed: int = 137
     temperature: float = 0.2
+    max_tokens: int = 16384
+    timeout_s: Optional[float] = None
+    retries: int = 0
+    retry_backoff_s: float = 1.0
+    rate_limit_rpm: Optional[float] = None
+    cache: str = "off"            # "off" | "memory" | "disk"
+    json_mode: bool = True
+
+    @classmethod
+    def for_stage(cls, model: str, seed: int = 137, settings=None) -> "LLMConfig":
+        """Config for one stage from a config_loader.StageSettings (defaults if None)."""
+        if settings is None:
+            return cls(model=model, seed=seed)
+        return cls(
+            model=model or settings.model,
+            seed=settings.seed if settings.seed is not None else seed,
+            temperature=settings.temperature,
+            max_tokens=settings.max_tokens,
+            timeout_s=settings.timeout_s,
+            retries=settings.retries,
+            retry_backoff_s=settings.retry_backoff_s,
+            rate_limit_rpm=settings.rate_limit_rpm,
+            cache=settings.cache,
+            json_mode=settings.json_mode,
+        )
+
+
+# ------------------------------------------------------------
+# RATE LIMITS + RESPONSE CACHE (shared by all clients)
+# ------------------------------------------------------------
+
+class RateLimiter:
+    """Evenly spaced requests: at most `rpm` per minute across threads."""
+
+    def __init__(self, rpm: float):
+        self.interval = 60.0 / rpm
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Block until the next slot; returns seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+_limiters: Dict[Tuple[str, float], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def rate_limiter(model: str, rpm: float) -> RateLimiter:
+    with _limiters_lock:
+        limiter = _limiters.get((model, rpm))
+        if limiter is None:
+            limiter = _limiters[(model, rpm)] = RateLimiter(rpm)
+        return limiter
+
+
+CACHE_DIR = Path(__file__).resolve().parents[2] / "data" / "cache" / "llm"
+MEMORY_CACHE_SIZE = 256
+
+_memory_cache: "OrderedDict[str, str]" = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def _cache_get(key: str, policy: str) -> Optional[Dict[str, Any]]:
+    with _memory_lock:
+        raw = _memory_cache.get(key)
+        if raw is not None:
+            _memory_cache.move_to_end(key)
+    if raw is None and policy == "disk":
+        path = CACHE_DIR / f"{key}.json"
+        if path.exists():
+            raw = path.read_text(encoding="utf-8")
+    return json.loads(raw) if raw is not None else None  # fresh copy; agents mutate results
+
+
+def _cache_put(key: str, obj: Dict[str, Any], policy: str) -> None:
+    raw = json.dumps(obj, ensure_ascii=False)
+    with _memory_lock:
+        _memory_cache[key] = raw
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+    if policy == "disk":
+        from .writer import atomic_write
+        atomic_write(CACHE_DIR / f"{key}.json", raw, fsync=False)
+
+
+# ------------------------------------------------------------
+# STDLIB HTTP TRANSPORT (base URL without the provider SDK)
+# ------------------------------------------------------------
+
+class ProviderHTTPError(RuntimeError):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+class HTTPTransport:
+    """
+    The subset of the OpenAI/Anthropic SDK surface LLMClient uses
+    (responses.create, chat.completions.create, messages.create), over
+    urllib. Only used when the SDK is not installed but a base URL is set,
+    e.g. for load tests against storygraph.fakeprovider.
+    """
+
+    def __init__(self, provider: str, base_url: str, api_key: str, timeout: Optional[float] = None):
+        self.provider = provider
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout or 600.0
+        self.responses = SimpleNamespace(create=self._responses)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+        self.messages = SimpleNamespace(create=self._messages)
+
+    def _post(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        import urllib.error
+        import urllib.request
+
+        if self.provider == "anthropic":
+            headers = {"x-api-key": self.api_key, "anthropic-version": "2023-06-01"}
+        else:
+            headers = {"Authorization": f"Bearer {self.api_key}"}
+        req = urllib.request.Request(
+            self.base_url + path, data=json.dumps(body).encode("utf-8"), method="POST",
+            headers={"Content-Type": "application/json", **headers},
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            raw = e.read().decode("utf-8", "replace")
+            try:
+                message = json.loads(raw)["error"]["message"]
+            except Exception:
+                message = raw[:200]
+            raise ProviderHTTPError(e.code, message) from None
+
+    def _responses(self, **body):
+        data = self._post("/responses", body)
+        text = "".join(
+            part.get("text", "") for item in data.get("output", []) for part in item.get("content", [])
+            if part.get("type") == "output_text"
+        )
+        return SimpleNamespace(output_text=text, status=data.get("status"))
+
+    def _chat(self, **body):
+        data = self._post("/chat/completions", body)
+        choices = [
+            SimpleNamespace(message=SimpleNamespace(content=c["message"].get("content")), finish_reason=c.get("finish_reason"))
+            for c in data.get("choices", [])
+        ]
+        return SimpleNamespace(choices=choices)
+
+    def _messages(self, **body):
+        data = self._post("/v1/messages", body)
+        content = [SimpleNamespace(**part) for part in data.get("content", [])]
+        return SimpleNamespace(content=content, stop_reason=data.get("stop_reason"))
 
 
 # ------------------------------------------------------------
@@ -45,6 +212,7 @@ class LLMClient:
     def __init__(self, cfg: LLMConfig):
         self.cfg = cfg
         self.backend, self.client = self._select_backend(cfg.model)
+        self.limiter = rate_limiter(cfg.model, cfg.rate_limit_rpm) if cfg.rate_limit_rpm else None
 
     def _select_backend(self, model: str) -> Tuple[str, Any]:
         """
@@ -52,18 +220,32 @@ class LLMClient:
         """
 
         if model.startswith("openai/"):
-            if not OpenAI:
-                raise RuntimeError("openai package not installed")
+            try:
+                from openai import OpenAI
+            except Exception:
+                OpenAI = None
+                if not os.getenv("OPENAI_BASE_URL"):
+                    raise RuntimeError("openai package not installed")
             if not os.getenv("OPENAI_API_KEY"):
                 raise RuntimeError("OPENAI_API_KEY is not set")
-            return ("openai", OpenAI(api_key=os.getenv("OPENAI_API_KEY")))
+            if OpenAI is None:
+                return ("openai", HTTPTransport("openai", os.environ["OPENAI_BASE_URL"], os.environ["OPENAI_API_KEY"], self.cfg.timeout_s))
+            kwargs = {"timeout": self.cfg.timeout_s} if self.cfg.timeout_s else {}
+            return ("openai", OpenAI(api_key=os.getenv("OPENAI_API_KEY"), **kwargs))
 
         if model.startswith("anthropic/"):
-            if not anthropic:
-                raise RuntimeError("anthropic package not installed")
+            try:
+                import anthropic
+            except Exception:
+                anthropic = None
+                if not os.getenv("ANTHROPIC_BASE_URL"):
+                    raise RuntimeError("anthropic package not installed")
             if not os.getenv("ANTHROPIC_API_KEY"):
                 raise RuntimeError("ANTHROPIC_API_KEY is not set")
-            return ("anthropic", anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY")))
+            if anthropic is None:
+                return ("anthropic", HTTPTransport("anthropic", os.environ["ANTHROPIC_BASE_URL"], os.environ["ANTHROPIC_API_KEY"], self.cfg.timeout_s))
+            kwargs = {"timeout": self.cfg.timeout_s} if self.cfg.timeout_s else {}
+            return ("anthropic", anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"), **kwargs))
 
         raise RuntimeError(f"Unknown backend for model: {model}")
 
@@ -72,6 +254,53 @@ class LLMClient:
     # ------------------------------------------------------------
 
     def complete_json(self, system: str, user: str, schema_hint: str) -> Dict[str, Any]:
+        """
+        JSON response for one request, honoring the config's cache policy,
+        rate limit and retries (exponential backoff from retry_backoff_s).
+        Emits llm_call_started/finished, cache_hit and retry hooks.
+        """
+        model = self.cfg.model
+        t0 = time.perf_counter()
+        hooks.emit(hooks.LLMCallStarted, model=model)
+        key = self._cache_key(system, user, schema_hint) if self.cfg.cache != "off" else None
+        if key is not None:
+            hit = _cache_get(key, self.cfg.cache)
+            if hit is not None:
+                hooks.emit(hooks.CacheHit, model=model, policy=self.cfg.cache)
+                hooks.emit(hooks.LLMCallFinished, model=model, cached=True, duration_s=time.perf_counter() - t0)
+                return hit
+
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                obj = self._complete(system, user, schema_hint)
+                break
+            except Exception as e:
+                if attempt >= self.cfg.retries:
+                    hooks.emit(hooks.LLMCallFinished, model=model, ok=False, attempts=attempt + 1,
+                               error=f"{type(e).__name__}: {e}"[:500], duration_s=time.perf_counter() - t0)
+                    raise
+                delay = self.cfg.retry_backoff_s * (2 ** attempt)
+                attempt += 1
+                hooks.emit(hooks.Retry, model=model, attempt=attempt, delay_s=delay, error=f"{type(e).__name__}: {e}"[:500])
+                print(f"[LLM] {self.cfg.model}: {type(e).__name__}: {e} — retry {attempt}/{self.cfg.retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+        if key is not None:
+            _cache_put(key, obj, self.cfg.cache)
+        hooks.emit(hooks.LLMCallFinished, model=model, attempts=attempt + 1, duration_s=time.perf_counter() - t0)
+        return obj
+
+    def _cache_key(self, system: str, user: str, schema_hint: str) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        for part in (self.cfg.model, str(self.cfg.temperature), str(self.cfg.max_tokens), str(self.cfg.seed), system, user, schema_hint):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def _complete(self, system: str, user: str, schema_hint: str) -> Dict[str, Any]:
         if self.backend == "openai":
             return self._openai_json(system, user, schema_hint)
         if self.backend == "anthropic":
@@ -107,7 +336,7 @@ class LLMClient:
             resp = self.client.responses.create(
                 model=model_name,
                 input=combined,
-                max_output_tokens=16384,  # Increased for larger outputs
+                max_output_tokens=self.cfg.max_tokens,
             )
 
             raw = resp.output_text or ""
@@ -137,7 +366,9 @@ class LLMClient:
                 {"role": "system", "content": system},
                 {"role": "user", "content": user},
             ],
-            response_format={"type": "json_object"},
+            temperature=self.cfg.temperature,
+            max_tokens=self.cfg.max_tokens,
+            **({"response_format": {"type": "json_object"}} if self.cfg.json_mode else {}),
         )
 
         raw = resp.choices[0].message.content
@@ -174,7 +405,7 @@ class LLMClient:
             model=self.cfg.model.split("/", 1)[1],
             temperature=self.cfg.temperature,
             system=sys,
-            max_tokens=16384,  # Increased further for large revision outputs  
+            max_tokens=self.cfg.max_tokens,
             messages=[{"role": "user", "content": user}],
         )
 
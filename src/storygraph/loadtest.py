@@ -0,0 +1,198 @@
+"""
+Load test: N concurrent Pipeline runs against the fake provider.
+
+    python -m storygraph loadtest --runs 16 --concurrency 4 --latency lognormal:0.3:0.6 --rate-limit 0.05
+    python -m storygraph loadtest --url http://127.0.0.1:8100     # an already running fake-provider
+
+Each run is a full pipeline (planner, draft, fact, revision) with the
+chosen profile's concurrency, retry and rate-limit settings, so the report
+shows how those settings behave under provider latency and faults:
+
+    throughput       finished runs per minute of wall time
+    stages           p50/p95/p99 seconds per stage (stage_finished hooks)
+    llm              client calls, attempts, retries and failed calls
+                     (llm_call_finished/retry hooks); retry_rate = retries / attempts
+    provider         requests and injected faults as counted by the server
+    errors           failed runs by error; error_rate = failed / runs
+
+Retry backoff defaults to 0.05 s instead of the profile's, so injected
+faults cost retries rather than wall time (--backoff -1 keeps the
+profile's value). Response caching is turned off, and runs are not
+recorded in the run store.
+"""
+from __future__ import annotations
+import contextlib
+import math
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from .fakeprovider import FakeProvider, ProviderConfig, client_env
+
+PREMISE = "Youth, mountains, and the stillness that follows ascent"
+VENUE = "Serious literary magazine like Granta"
+BACKOFF_S = 0.05
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0–100) of a non-empty sequence."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    if not values:
+        return {"n": 0}
+    return {
+        "n": len(values), "mean": sum(values) / len(values),
+        "p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+@contextlib.contextmanager
+def _patched_env(env: Dict[str, str]) -> Iterator[None]:
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+def _fetch_stats(url: str) -> Dict[str, int]:
+    import json
+    import urllib.request
+
+    with urllib.request.urlopen(url.rstrip("/") + "/stats", timeout=10) as resp:
+        return json.loads(resp.read())
+
+
+def run_load(
+    runs: int = 8,
+    concurrency: int = 4,
+    provider: Optional[ProviderConfig] = None,
+    url: Optional[str] = None,
+    profile: Optional[str] = None,
+    backoff_s: Optional[float] = BACKOFF_S,
+    context: bool = True,
+    premise: str = PREMISE,
+    venue: str = VENUE,
+    seed: int = 137,
+    quiet: bool = True,
+) -> Dict[str, Any]:
+    """
+    Run `runs` pipelines, `concurrency` at a time, against the fake provider
+    at `url` (or one started here with `provider`); returns the report.
+    """
+    from . import hooks
+    from .config_loader import load_profile
+    from .router import Pipeline
+
+    settings = load_profile(profile)
+    for stage in list(settings.stages):
+        changes = {"cache": "off"}   # every run should reach the provider
+        if backoff_s is not None:
+            changes["retry_backoff_s"] = backoff_s
+        settings = settings.with_stage(stage, **changes)
+    ctx: Dict[str, Any] = {}
+    if context:
+        from .context_loader import load_all_context
+        ctx = load_all_context()
+
+    stage_times: Dict[str, List[float]] = defaultdict(list)
+    call_times: List[float] = []
+    run_times: List[float] = []
+    calls: Counter = Counter()
+    errors: Counter = Counter()
+    lock = threading.Lock()
+
+    def on_event(event: hooks.Event) -> None:
+        with lock:
+            if event.kind == "stage_finished":
+                stage_times[event.stage].append(event.duration_s)
+            elif event.kind == "retry":
+                calls["retries"] += 1
+            elif event.kind == "llm_call_finished" and not event.cached:
+                calls["calls"] += 1
+                calls["attempts"] += event.attempts
+                calls["failures"] += not event.ok
+                call_times.append(event.duration_s)
+
+    def one(i: int) -> None:
+        pipe = Pipeline(seed=seed + i, profile=settings.name, settings=settings)
+        t0 = time.perf_counter()
+        try:
+            pipe.run_minimal(premise, venue, models=settings.models(), context=ctx)
+        except Exception as e:
+            with lock:
+                errors[f"{type(e).__name__}: {str(e).splitlines()[0][:120] if str(e) else ''}"] += 1
+            return
+        with lock:
+            run_times.append(time.perf_counter() - t0)
+
+    with contextlib.ExitStack() as stack:
+        server = None
+        if url is None:
+            server = stack.enter_context(FakeProvider(provider).start())
+            url = server.url
+        stack.enter_context(_patched_env(client_env(url)))
+        if quiet:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        before = server.stats() if server is not None else _fetch_stats(url)
+        stack.enter_context(hooks.get_hooks().subscribe(on_event, ("stage_finished", "llm_call_finished", "retry")))
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="load") as pool:
+            list(pool.map(one, range(runs)))
+        wall = time.perf_counter() - started
+        after = server.stats() if server is not None else _fetch_stats(url)
+
+    failed = sum(errors.values())
+    return {
+        "runs": runs,
+        "concurrency": concurrency,
+        "ok": runs - failed,
+        "failed": failed,
+        "wall_s": wall,
+        "throughput_runs_per_min": (runs - failed) / wall * 60 if wall > 0 else 0.0,
+        "run_s": summarize(run_times),
+        "stages": {name: summarize(stage_times[name]) for name in ("planner", "draft", "fact", "revision") if stage_times[name]},
+        "llm": {
+            **{k: calls[k] for k in ("calls", "attempts", "retries", "failures")},
+            "retry_rate": calls["retries"] / calls["attempts"] if calls["attempts"] else 0.0,
+            "call_s": summarize(call_times),
+        },
+        "provider": {k: after.get(k, 0) - before.get(k, 0) for k in sorted(after) if after.get(k, 0) != before.get(k, 0)},
+        "errors": dict(errors.most_common()),
+        "error_rate": failed / runs if runs else 0.0,
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"{report['runs']} runs, {report['concurrency']} at a time: {report['ok']} ok, {report['failed']} failed "
+        f"in {report['wall_s']:.1f}s ({report['throughput_runs_per_min']:.1f} runs/min)",
+        "",
+        f"{'stage':<12}{'n':>5}{'p50 s':>10}{'p95 s':>10}{'p99 s':>10}{'max s':>10}",
+    ]
+    for name, s in [*report["stages"].items(), ("llm call", report["llm"]["call_s"]), ("run", report["run_s"])]:
+        if s["n"]:
+            lines.append(f"{name:<12}{s['n']:>5}{s['p50']:>10.3f}{s['p95']:>10.3f}{s['p99']:>10.3f}{s['max']:>10.3f}")
+    c = report["llm"]
+    lines += [
+        "",
+        f"LLM calls {c['calls']}, attempts {c['attempts']}, retries {c['retries']} "
+        f"(retry rate {c['retry_rate']:.1%}), failed calls {c['failures']}",
+        "provider: " + ", ".join(f"{k}={v}" for k, v in report["provider"].items()),
+        f"error rate {report['error_rate']:.1%}",
+    ]
+    lines += [f"  {n} × {err}" for err, n in report["errors"].items()]
+    return "\n".join(lines)
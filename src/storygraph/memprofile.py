@@ -0,0 +1,242 @@
+"""
+Memory profile of a pipeline run: tracemalloc and RSS at stage boundaries.
+
+    python -m storygraph run --memory                     # exports/story_memory.json
+    python -m storygraph batch premises.txt --memory --memory-budget rss=1500 --memory-budget draft=300
+
+The profiler subscribes to a Pipeline's stage_started/stage_finished hooks
+(`Pipeline(memory=...)`); the CLI wraps context loading and export in
+`MemoryProfiler.stage(name)`. For each stage (context, planner, draft,
+fact, revision, export) it records:
+
+    traced_mb        Python allocations still held when the stage ends
+    growth_mb        net change of traced_mb over the stage
+    peak_mb          highest traced memory while the stage ran
+    rss_mb           resident set size when the stage ends (Linux /proc)
+    rss_peak_mb      peak RSS of this run so far (see below)
+    top              call sites with the largest net growth over the stage
+    failed           the stage raised (closed by the run_failed hook)
+
+Budgets are megabytes keyed by stage name (that stage's peak_mb), `traced`
+(peak_mb of any stage) or `rss` (the run's peak RSS). `violations()` lists
+the budgets a run exceeded; the CLI fails such runs.
+
+The process high-water mark (getrusage) never decreases, so after a batch's
+first large run it would charge every later run. `reset()` records it: a
+run that pushes it higher is charged the new mark, any other run the
+highest RSS sampled at its own stage boundaries.
+
+tracemalloc slows allocation-heavy code down several times and sees the
+whole process, so profile one run per process (run, batch, resume), not
+a service with concurrent runs.
+"""
+from __future__ import annotations
+import contextlib
+import linecache
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+MB = 1024 * 1024
+TOP = 10
+FRAMES = 1
+
+# allocations made by the profiler itself or the import system are not call sites of interest
+_IGNORED = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>")
+
+
+def rss_mb() -> Optional[float]:
+    """Current resident set size (None where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / MB
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def rss_peak_mb() -> Optional[float]:
+    """Peak resident set size of this process so far."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MB if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB elsewhere
+
+
+def parse_budgets(items: Optional[List[str]]) -> Dict[str, float]:
+    """["rss=1500", "draft=300"] -> {"rss": 1500.0, "draft": 300.0}"""
+    budgets = {}
+    for item in items or []:
+        key, sep, value = item.partition("=")
+        try:
+            if not sep or not key.strip():
+                raise ValueError
+            budgets[key.strip()] = float(value)
+        except ValueError:
+            raise RuntimeError(f"memory budget must be KEY=MB (rss, traced or a stage), got {item!r}") from None
+    return budgets
+
+
+@dataclass
+class StageMemory:
+    stage: str
+    duration_s: float
+    traced_mb: float
+    growth_mb: float
+    peak_mb: float
+    rss_mb: Optional[float]
+    rss_peak_mb: Optional[float]
+    top: List[Dict[str, Any]] = field(default_factory=list)
+    failed: bool = False
+
+
+class MemoryProfiler:
+    def __init__(self, budgets: Optional[Dict[str, float]] = None, top: int = TOP, frames: int = FRAMES):
+        self.budgets = dict(budgets or {})
+        self.top = top
+        self.frames = frames
+        self.stages: List[StageMemory] = []
+        self._started = False
+        self._open: Dict[str, tuple] = {}   # stage -> (snapshot, traced bytes, perf_counter) at its start
+        self._rss_floor = rss_peak_mb()     # process high-water mark before this run
+        self._rss_sampled: Optional[float] = None
+
+    def start(self) -> "MemoryProfiler":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started = True
+        return self
+
+    def stop(self) -> None:
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def reset(self, keep=("context",)) -> None:
+        """Forget the stage records except `keep` (e.g. context shared by a batch's runs)."""
+        self.stages = [s for s in self.stages if s.stage in keep]
+        self._open.clear()
+        self._rss_floor = rss_peak_mb()
+        self._rss_sampled = None
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def begin(self, name: str) -> None:
+        self.start()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        self._sample_rss()
+        self._open[name] = (before, tracemalloc.get_traced_memory()[0], time.perf_counter())
+
+    def end(self, name: str, failed: bool = False) -> None:
+        if name not in self._open:
+            return
+        before, start_bytes, t0 = self._open.pop(name)
+        duration = time.perf_counter() - t0
+        current, peak = tracemalloc.get_traced_memory()
+        # per-line statistics are filtered, not the traces: Snapshot.filter_traces
+        # is pure Python per allocation and would dominate a profiled run
+        stats = [s for s in tracemalloc.take_snapshot().compare_to(before, "lineno")
+                 if s.size_diff > 0 and s.traceback[0].filename not in _IGNORED]
+        self.stages.append(StageMemory(
+            stage=name, duration_s=duration, traced_mb=current / MB, growth_mb=(current - start_bytes) / MB,
+            peak_mb=peak / MB, rss_mb=self._sample_rss(), rss_peak_mb=self.run_rss_peak_mb(),
+            top=[_site(s) for s in stats[: self.top]], failed=failed,
+        ))
+
+    def _sample_rss(self) -> Optional[float]:
+        rss = rss_mb()
+        if rss is not None:
+            self._rss_sampled = max(rss, self._rss_sampled or 0.0)
+        return rss
+
+    def run_rss_peak_mb(self) -> Optional[float]:
+        """Peak RSS since `reset()` (or construction)."""
+        peak = rss_peak_mb()
+        if peak is not None and (self._rss_floor is None or peak > self._rss_floor):
+            return peak   # this run set the process high-water mark
+        return self._rss_sampled
+
+    # -- hooks -------------------------------------------------------------------
+    def attach(self, bus):
+        """Profile the stages of the run that emits on `bus` (a Pipeline's hooks)."""
+        return bus.subscribe(self, ("stage_started", "stage_finished", "run_failed"))
+
+    def __call__(self, event) -> None:
+        if event.kind == "stage_started":
+            self.begin(event.stage)
+        elif event.kind == "stage_finished":
+            self.end(event.stage)
+        else:
+            # the stage that raised never finished; record it as far as it got
+            for name in list(self._open):
+                self.end(name, failed=True)
+
+    # -- budgets and report ------------------------------------------------------
+    def violations(self) -> List[str]:
+        out = []
+        for key, limit in self.budgets.items():
+            if key == "rss":
+                peaks = [s.rss_peak_mb for s in self.stages if s.rss_peak_mb is not None]
+                value = max(peaks, default=0.0)
+            elif key == "traced":
+                value = max((s.peak_mb for s in self.stages), default=0.0)
+            else:
+                value = max((s.peak_mb for s in self.stages if s.stage == key), default=0.0)
+            if value > limit:
+                out.append(f"{key}: {value:.1f} MB > budget {limit:g} MB")
+        return out
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "stages": [asdict(s) for s in self.stages],
+            "peak_mb": max((s.peak_mb for s in self.stages), default=0.0),
+            "rss_peak_mb": self.run_rss_peak_mb(),
+            "budgets": self.budgets,
+            "violations": self.violations(),
+        }
+
+    def write(self, path: Path) -> Path:
+        import json
+        from .writer import atomic_write
+
+        atomic_write(Path(path), json.dumps(self.report(), indent=2), fsync=False)
+        return Path(path)
+
+    def summary(self) -> str:
+        lines = [f"{'stage':<10}{'seconds':>9}{'held MB':>10}{'growth MB':>11}{'peak MB':>10}{'RSS MB':>9}  top call site"]
+        for s in self.stages:
+            site = f"{s.top[0]['site']} (+{s.top[0]['size_mb']:.1f} MB)" if s.top else "-"
+            rss = f"{s.rss_mb:.0f}" if s.rss_mb is not None else "-"
+            lines.append(f"{s.stage:<10}{s.duration_s:>9.2f}{s.traced_mb:>10.1f}{s.growth_mb:>11.1f}{s.peak_mb:>10.1f}{rss:>9}  {site}")
+        return "\n".join(lines)
+
+
+def _site(stat: tracemalloc.StatisticDiff) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    return {
+        "site": f"{_short(frame.filename)}:{frame.lineno}",
+        "code": linecache.getline(frame.filename, frame.lineno).strip(),
+        "size_mb": stat.size_diff / MB,
+        "count": stat.count_diff,
+    }
+
+
+def _short(filename: str) -> str:
+    """Path relative to the package or site-packages, for readable reports."""
+    for marker in ("/storygraph/", "/site-packages/", "/lib/python"):
+        i = filename.rfind(marker)
+        if i != -1:
+            return filename[i + 1:]
+    return filename
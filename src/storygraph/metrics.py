@@ -1,7 +1,201 @@
-from collections import Counter
+"""
+Stylometrics: a vectorized metrics panel over scenes and stories.
+
+Each text is tokenized once (shared storygraph.tokens cache); all texts in a
+batch are then concatenated into flat NumPy arrays (token ids, document
+index, sentence index) and every metric is computed from those shared
+arrays with bincount/unique reductions, so a batch of thousands of beats
+costs roughly one pass over the tokens.
+
+Panel (per text):
+    words, sentences
+    sentence_length_mean / _std / _median / _p90
+    type_token_ratio, root_ttr            (types / tokens, types / sqrt(tokens))
+    function_word_rate, function_words    (share of tokens; per-1000 profile)
+    passive_ratio                         (sentences with a be + participle)
+    concrete_density                      (concrete nouns per 100 words)
+    dialogue_ratio                        (share of characters inside quotes)
+"""
+from __future__ import annotations
 import re
+from typing import Dict, List, Mapping, Sequence, Tuple, Union
+
+import numpy as np
+
+from .tokens import tokenize
 
 
 def sentence_lengths(text: str):
     sents = re.split(r"(?<=[.!?])\s+", text.strip()) if text.strip() else []
     return [len(s.split()) for s in sents if s]
+
+
+# -----------------------------------------------------------------------------
+# Lexicons
+# -----------------------------------------------------------------------------
+FUNCTION_WORDS: Tuple[str, ...] = tuple("""
+the a an and but or nor so yet for of in on at by to from with without into onto over under
+above below up down out off through across after before during until while as than that this
+these those it its he she they we you i me him her them us my his their our your
+is was were be been being am are has had have do did does not no if then when where which who
+""".split())
+
+_BE = frozenset("is was were be been being am are".split())
+_IRREGULAR_PARTICIPLES = frozenset("""
+born borne broken brought built bought caught chosen come done drawn driven eaten fallen felt
+found forgotten forgiven frozen given gone grown heard held hidden hit hung hurt kept known laid
+led left lent lost made meant met paid put read ridden risen run said seen sent set shaken shown
+shut sold spent spoken spun stood stolen struck sung sunk taken taught thrown told thought torn
+understood woken won worn written
+""".split())
+_CONCRETE_NOUNS = frozenset("""
+rock rocks stone stones snow ice glacier ridge ridges summit peak peaks gully gullies scree moraine
+boulder boulders cliff cliffs slope slopes trail trails trailhead camp tent stove rope ropes helmet
+harness axe crampons boots boot gloves pack backpack jacket hood water bottle cup coffee bread
+car truck bus road highway phone door window table chair bed floor wall roof light lamp fire
+smoke wind rain fog cloud clouds sun moon star stars sky tree trees branch branches leaf leaves
+river creek lake valley forest grass mud dust sand hand hands finger fingers face eyes eye hair
+mouth breath shoulder shoulders knee knees feet foot arm arms leg legs skin blood bone bones
+map compass watch clock headlamp sleeping bag dawn morning night snowfield crevasse crevasses
+""".split())
+
+_QUOTED = re.compile(r"“[^”]*”|\"[^\"]*\"")
+
+_FW_INDEX = {w: i for i, w in enumerate(FUNCTION_WORDS)}
+
+
+# -----------------------------------------------------------------------------
+# Batch panel
+# -----------------------------------------------------------------------------
+def _empty_panel() -> Dict:
+    return {
+        "words": 0, "sentences": 0,
+        "sentence_length_mean": 0.0, "sentence_length_std": 0.0,
+        "sentence_length_median": 0.0, "sentence_length_p90": 0.0,
+        "type_token_ratio": 0.0, "root_ttr": 0.0,
+        "function_word_rate": 0.0, "function_words": {},
+        "passive_ratio": 0.0, "concrete_density": 0.0, "dialogue_ratio": 0.0,
+    }
+
+
+def style_panels(texts: Sequence[str]) -> List[Dict]:
+    """Compute the metrics panel for every text in one vectorized batch."""
+    n_docs = len(texts)
+    if n_docs == 0:
+        return []
+
+    vocab: Dict[str, int] = {}
+    tok_ids: List[np.ndarray] = []
+    doc_ids: List[np.ndarray] = []
+    sent_ids: List[np.ndarray] = []
+    sent_offset = 0
+    sents_per_doc = np.zeros(n_docs, dtype=np.int64)
+
+    for d, text in enumerate(texts):
+        tok = tokenize(text or "")
+        words = tok.words
+        ids = np.fromiter((vocab.setdefault(w, len(vocab)) for w in words), dtype=np.int64, count=len(words))
+        local = tok.sentence_ids
+        n_sents = tok.sentence_count
+        tok_ids.append(ids)
+        doc_ids.append(np.full(len(words), d, dtype=np.int64))
+        sent_ids.append(local + sent_offset)
+        sents_per_doc[d] = n_sents
+        sent_offset += n_sents
+
+    tokens = np.concatenate(tok_ids)
+    docs = np.concatenate(doc_ids)
+    sents = np.concatenate(sent_ids)
+    V = max(1, len(vocab))
+    words_per_doc = np.bincount(docs, minlength=n_docs)
+
+    # Lexicon lookups as vocabulary-level boolean/int arrays, gathered per token
+    inv = sorted(vocab, key=vocab.get)
+    fw_of_vocab = np.fromiter((_FW_INDEX.get(w, -1) for w in inv), dtype=np.int64, count=len(inv))
+    be_of_vocab = np.fromiter((w in _BE for w in inv), dtype=bool, count=len(inv))
+    pp_of_vocab = np.fromiter(
+        ((w.endswith("ed") and len(w) > 3) or w in _IRREGULAR_PARTICIPLES for w in inv), dtype=bool, count=len(inv))
+    ly_of_vocab = np.fromiter((w.endswith("ly") for w in inv), dtype=bool, count=len(inv))
+    concrete_of_vocab = np.fromiter((w in _CONCRETE_NOUNS for w in inv), dtype=bool, count=len(inv))
+
+    fw = fw_of_vocab[tokens] if len(tokens) else np.zeros(0, dtype=np.int64)
+    K = len(FUNCTION_WORDS)
+    fw_mask = fw >= 0
+    fw_counts = np.bincount(docs[fw_mask] * K + fw[fw_mask], minlength=n_docs * K).reshape(n_docs, K)
+
+    # Types per document: unique (doc, token) pairs
+    types_per_doc = np.bincount(np.unique(docs * V + tokens) // V, minlength=n_docs) if len(tokens) else np.zeros(n_docs, dtype=np.int64)
+
+    # Sentence lengths: tokens per global sentence id, and owning document
+    sent_len = np.bincount(sents, minlength=sent_offset)
+    sent_doc = np.repeat(np.arange(n_docs), sents_per_doc)
+
+    # Passive: be-verb followed by participle (optionally one -ly adverb between), same sentence
+    passive_sent = np.zeros(sent_offset, dtype=bool)
+    if len(tokens) > 1:
+        be = be_of_vocab[tokens]
+        pp = pp_of_vocab[tokens]
+        ly = ly_of_vocab[tokens]
+        same1 = sents[:-1] == sents[1:]
+        hit = be[:-1] & pp[1:] & same1
+        if len(tokens) > 2:
+            same2 = same1[:-1] & same1[1:]
+            hit[:-1] |= be[:-2] & ly[1:-1] & pp[2:] & same2
+        passive_sent[sents[:-1][hit]] = True
+    passive_per_doc = np.bincount(sent_doc[passive_sent], minlength=n_docs) if sent_offset else np.zeros(n_docs, dtype=np.int64)
+
+    concrete_per_doc = np.bincount(docs[concrete_of_vocab[tokens]], minlength=n_docs) if len(tokens) else np.zeros(n_docs, dtype=np.int64)
+
+    panels: List[Dict] = []
+    bounds = np.concatenate([[0], np.cumsum(sents_per_doc)])
+    for d, text in enumerate(texts):
+        n_words = int(words_per_doc[d])
+        if n_words == 0:
+            panels.append(_empty_panel())
+            continue
+        lens = sent_len[bounds[d]:bounds[d + 1]]
+        lens = lens[lens > 0]
+        quoted = sum(len(m.group(0)) for m in _QUOTED.finditer(text))
+        types = int(types_per_doc[d])
+        panels.append({
+            "words": n_words,
+            "sentences": int(len(lens)),
+            "sentence_length_mean": round(float(lens.mean()), 3),
+            "sentence_length_std": round(float(lens.std()), 3),
+            "sentence_length_median": float(np.median(lens)),
+            "sentence_length_p90": float(np.percentile(lens, 90)),
+            "type_token_ratio": round(types / n_words, 4),
+            "root_ttr": round(types / float(np.sqrt(n_words)), 3),
+            "function_word_rate": round(float(fw_counts[d].sum()) / n_words, 4),
+            "function_words": {
+                FUNCTION_WORDS[k]: round(1000.0 * float(c) / n_words, 2)
+                for k, c in enumerate(fw_counts[d]) if c
+            },
+            "passive_ratio": round(float(passive_per_doc[d]) / max(1, len(lens)), 4),
+            "concrete_density": round(100.0 * float(concrete_per_doc[d]) / n_words, 3),
+            "dialogue_ratio": round(quoted / max(1, len(text)), 4),
+        })
+    return panels
+
+
+def style_panel(text: str) -> Dict:
+    return style_panels([text])[0]
+
+
+def style_metrics(
+    drafts: Union[Mapping[str, str], Sequence[str]],
+    story_text: str = "",
+) -> Dict:
+    """
+    Per-beat panels plus a story-level panel, computed in a single batch.
+
+    `drafts` maps beat id → text. The story panel uses `story_text` when given
+    (e.g. the revised draft), otherwise the beats joined in order.
+    """
+    if not isinstance(drafts, Mapping):
+        drafts = {str(i): t for i, t in enumerate(drafts)}
+    ids = list(drafts)
+    texts = [drafts[i] for i in ids]
+    story = story_text or "\n\n".join(texts)
+    panels = style_panels(texts + [story])
+    return {"beats": dict(zip(ids, panels[:-1])), "story": panels[-1]}
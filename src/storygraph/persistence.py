@@ -1,10 +1,15 @@
-import json, time
 from pathlib import Path
+from typing import Optional
+
 from .state import StoryState
+from .runstore import get_run_store
+
+
+def save_state(state: StoryState, runs_dir: str = "data/runs", profile: Optional[str] = None, config: Optional[dict] = None) -> str:
+    """Record a state in the run store under `runs_dir`; returns the run id."""
+    store = get_run_store(Path(runs_dir) / "runs.sqlite")
+    return store.save_run(state, profile=profile, config=config)
 
 
-def save_state(state: StoryState, runs_dir: str = "data/runs") -> str:
-    ts = int(time.time())
-    path = Path(runs_dir) / f"state_{ts}.json"
-    path.write_text(state.model_dump_json(indent=2), encoding="utf-8")
-    return str(path)
+def load_state(run_id: str, runs_dir: str = "data/runs") -> StoryState:
+    return get_run_store(Path(runs_dir) / "runs.sqlite").load_state(run_id)
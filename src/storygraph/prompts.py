@@ -0,0 +1,210 @@
+"""
+Prompt registry: src/prompts/*.txt parsed once, compiled, hot-reloaded.
+
+Each prompt file has three sections:
+
+    [system]
+    ...
+    [output_schema]
+    ...
+    [user]
+    ... {placeholder} ...
+
+Agents used to split the file on every run and fill the user template with
+chained `.replace()` calls, copying the whole prompt (codex and scene text
+included) once per placeholder; a substituted value that itself contained
+`{name}` could be substituted again by a later replace. Here the user
+template is compiled into literal/placeholder segments once, and rendering
+is a single join:
+
+- values are inserted as-is and never re-scanned
+- a placeholder without a value raises PromptError; with strict=True so
+  does a value the template does not use (usually a typo)
+- only `{identifier}` is a placeholder; other braces are literal text
+
+The registry re-reads a file when its mtime/size changes (checked at most
+every `check_interval` seconds), and `Prompt.fingerprint` identifies the
+file content, e.g. for cache keys.
+
+    prompt = get_prompt("draft")
+    user = prompt.render(beat_id="B1", purpose="...", n=400, ...)
+"""
+from __future__ import annotations
+import hashlib
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Mapping, Optional, Tuple, Union
+
+PROMPTS_DIR = Path(__file__).resolve().parents[1] / "prompts"   # src/prompts
+
+_PLACEHOLDER = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+_SECTIONS = ("system", "output_schema", "user")
+
+
+class PromptError(ValueError):
+    pass
+
+
+# -----------------------------------------------------------------------------
+# Templates
+# -----------------------------------------------------------------------------
+class Template:
+    """User template compiled to alternating literal text and placeholder names."""
+
+    __slots__ = ("source", "literals", "names", "fields")
+
+    def __init__(self, source: str):
+        self.source = source
+        parts = _PLACEHOLDER.split(source)
+        self.literals: Tuple[str, ...] = tuple(parts[0::2])   # len(names) + 1
+        self.names: Tuple[str, ...] = tuple(parts[1::2])
+        self.fields: FrozenSet[str] = frozenset(self.names)
+
+    def render(self, values: Optional[Mapping[str, Any]] = None, strict: bool = True, **kwargs: Any) -> str:
+        """Fill every placeholder in one pass; values are str()-ed and inserted verbatim."""
+        if values is None:
+            values = kwargs
+        elif kwargs:
+            values = {**values, **kwargs}
+        missing = self.fields.difference(values)
+        if missing:
+            raise PromptError(f"missing prompt values: {', '.join(sorted(missing))}")
+        if strict:
+            unused = set(values).difference(self.fields)
+            if unused:
+                raise PromptError(f"unknown prompt values: {', '.join(sorted(unused))}")
+        out = [self.literals[0]]
+        for name, literal in zip(self.names, self.literals[1:]):
+            value = values[name]
+            out.append(value if isinstance(value, str) else str(value))
+            out.append(literal)
+        return "".join(out)
+
+    def __repr__(self) -> str:
+        return f"Template(fields={sorted(self.fields)})"
+
+
+@lru_cache(maxsize=64)
+def compile_template(source: str) -> Template:
+    """Compiled template for an ad-hoc string (cached by content)."""
+    return Template(source)
+
+
+# -----------------------------------------------------------------------------
+# Prompt files
+# -----------------------------------------------------------------------------
+def parse_sections(text: str, name: str = "prompt") -> Dict[str, str]:
+    """{"system", "output_schema", "user"} from a prompt file (each stripped)."""
+    positions = []
+    for section in _SECTIONS:
+        marker = f"[{section}]\n"
+        pos = text.find(marker)
+        if pos < 0:
+            raise PromptError(f"{name}: missing [{section}] section")
+        positions.append((pos, section, len(marker)))
+    positions.sort()
+    out = {}
+    for i, (pos, section, n) in enumerate(positions):
+        end = positions[i + 1][0] if i + 1 < len(positions) else len(text)
+        out[section] = text[pos + n: end].strip()
+    return out
+
+
+class Prompt:
+    """One parsed prompt file: system text, output schema and compiled user template."""
+
+    __slots__ = ("name", "path", "system", "schema", "user", "fingerprint", "_stamp")
+
+    def __init__(self, name: str, text: str, path: Optional[Path] = None, stamp: Tuple[int, int] = (0, 0)):
+        sections = parse_sections(text, name)
+        self.name = name
+        self.path = path
+        self.system = sections["system"]
+        self.schema = sections["output_schema"]
+        self.user = Template(sections["user"])
+        self.fingerprint = hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+        self._stamp = stamp
+
+    @classmethod
+    def from_file(cls, name: str, path: Path) -> "Prompt":
+        st = path.stat()
+        return cls(name, path.read_text(encoding="utf-8"), path, (st.st_mtime_ns, st.st_size))
+
+    @property
+    def fields(self) -> FrozenSet[str]:
+        return self.user.fields
+
+    def render(self, values: Optional[Mapping[str, Any]] = None, strict: bool = True, **kwargs: Any) -> str:
+        """Rendered user message."""
+        return self.user.render(values, strict, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"Prompt({self.name!r}, fields={sorted(self.fields)}, fingerprint={self.fingerprint})"
+
+
+# -----------------------------------------------------------------------------
+# Registry
+# -----------------------------------------------------------------------------
+class PromptRegistry:
+    """Prompts by name from a directory; reloaded when a file changes."""
+
+    def __init__(self, root: Union[str, Path] = PROMPTS_DIR, check_interval: float = 1.0):
+        self.root = Path(root)
+        self.check_interval = check_interval
+        self._prompts: Dict[str, Prompt] = {}
+        self._checked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def path(self, name: str) -> Path:
+        return self.root / f"{name}.txt"
+
+    def get(self, name: str) -> Prompt:
+        now = time.monotonic()
+        with self._lock:
+            prompt = self._prompts.get(name)
+            if prompt is not None and now - self._checked.get(name, 0.0) < self.check_interval:
+                return prompt
+            path = self.path(name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                raise PromptError(f"prompt '{name}' not found in {self.root}") from None
+            if prompt is None or prompt._stamp != (st.st_mtime_ns, st.st_size):
+                if prompt is not None:
+                    print(f"[PROMPTS] Reloaded {path.name}")
+                prompt = self._prompts[name] = Prompt.from_file(name, path)
+            self._checked[name] = now
+            return prompt
+
+    def fingerprint(self, name: str) -> str:
+        return self.get(name).fingerprint
+
+    def loaded(self) -> Dict[str, str]:
+        """{name: fingerprint} of the prompts loaded so far."""
+        with self._lock:
+            return {k: p.fingerprint for k, p in self._prompts.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._prompts.clear()
+            self._checked.clear()
+
+
+_registry: Optional[PromptRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> PromptRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PromptRegistry()
+        return _registry
+
+
+def get_prompt(name: str) -> Prompt:
+    return get_registry().get(name)
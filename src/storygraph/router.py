@@ -1,28 +1,195 @@
+import time
+
+from . import hooks
+from .hooks import HookBus, get_hooks
 from .state import StoryState
 from .agents import planner, draft, fact, revision, research
 from .validators import total_words, within_band, audit_beats
+from .metrics import style_metrics
+from .snapshots import Checkpoints
+from . import serialization
+from .export import BeatStream
+
+STAGES = ("planner", "draft", "fact", "revision")
 
 
 class Pipeline:
-    def __init__(self, seed: int = 137):
+    def __init__(
+        self,
+        seed: int = 137,
+        store=None,
+        profile: str = None,
+        config: dict = None,
+        writer=None,
+        checkpoint_path=None,
+        stream_path=None,
+        settings=None,
+        run_id: str = None,
+        on_event=None,
+        memory=None,
+    ):
         self.state = StoryState(seed=seed)
+        # optional RunStore: each stage and the final state are recorded
+        self.store = store
+        self.profile = profile
+        self.config = config
+        self.run_id = run_id  # preassigned id for the run store (default: generated)
+        # copy-on-write checkpoint after every stage (for diffs, branching, resume)
+        self.checkpoints = Checkpoints()
+        # optional BackgroundWriter: the latest checkpoint is kept at checkpoint_path
+        self.writer = writer
+        self.checkpoint_path = checkpoint_path
+        # optional Markdown/HTML path that receives beats as the draft agent finalizes them
+        self.stream_path = stream_path
+        # optional config_loader.LLMProfile: per-stage performance settings
+        self.settings = settings
+        # lifecycle events of this run (storygraph.hooks); they also reach get_hooks()
+        self.hooks = HookBus(parent=get_hooks())
+        # optional callback receiving progress events as dicts ({"type": kind, ...}):
+        #   run_started, stage_started, outline, beat_drafted, claims_extracted,
+        #   stage_finished, metrics, run_finished, run_failed
+        # called from the pipeline thread (and from fact's worker threads)
+        self.on_event = on_event
+        if on_event is not None:
+            self.hooks.subscribe(lambda event: on_event(event.as_dict()), hooks.PROGRESS)
+        # optional memprofile.MemoryProfiler: tracemalloc/RSS record of every stage
+        self.memory = memory
+        if memory is not None:
+            memory.attach(self.hooks)
+
+    def _emit(self, cls, **fields) -> None:
+        if self.hooks.wants(cls.kind):
+            self.hooks.emit(cls(run_id=self.run_id, **fields))
+
+    def _settings(self, name: str):
+        return self.settings.stage(name) if self.settings is not None else None
+
+    def _stage(self, name: str, fn, s: StoryState, **kwargs) -> StoryState:
+        started = time.time()
+        self._emit(hooks.StageStarted, stage=name)
+        t0 = time.perf_counter()
+        with hooks.scope(stage=name):
+            s = fn(s, **kwargs)
+        duration = time.perf_counter() - t0
+        snap = self.checkpoints.take(s, name)
+        self._emit(hooks.StageFinished, stage=name, duration_s=duration)
+        if "metrics" in snap.changed:
+            self._emit(hooks.MetricsUpdated, stage=name, metrics=s.metrics)
+        if self.store is not None:
+            # only the fields this stage changed are written
+            self.store.record_stage(self.run_id, name, started_at=started, duration_s=duration, output=snap.delta())
+        if self.writer is not None and self.checkpoint_path is not None:
+            # rendered on the writer thread from the immutable snapshot
+            on_written = None
+            if self.hooks.wants(hooks.CheckpointWritten.kind):
+                run_id = self.run_id
+
+                def on_written(path, size, seconds):
+                    self.hooks.emit(hooks.CheckpointWritten(
+                        run_id=run_id, stage=name, path=str(path), bytes=size, duration_s=seconds))
+            self.writer.write(self.checkpoint_path, lambda: serialization.dumps(snap.restore()), on_written=on_written)
+        return s
 
     def run_minimal(self, premise: str, venue: str, models: dict = None, context: dict = None):
         s = self.state
         s.premise, s.venue = premise, venue
+        return self._run(s, STAGES, models, context)
+
+    def resume(self, state: StoryState, models: dict = None, context: dict = None, after: str = None):
+        """Continue from a checkpointed state with the stages after `after` (default: last completed)."""
+        after = after if after is not None else completed_stage(state)
+        rest = STAGES[STAGES.index(after) + 1:] if after else STAGES
+        self.state = state
+        return self._run(state, rest, models, context)
+
+    def _run(self, s: StoryState, stages, models: dict = None, context: dict = None):
         models = models or {}
         context = context or {}
-        s = planner.run(s, model=models.get("planner"), context=context)
-        s = draft.run(s, model=models.get("draft"), context=context)
-        s = fact.run(s, model=models.get("fact"), context=context)
-        s = revision.run(s, model=models.get("revision"))
-        # metrics
-        drafts = {k: v.text for k, v in s.drafts.items()}
-        targets = {b.id: b.target_words for b in s.outline.beats}
-        s.metrics["beat_within"] = audit_beats(drafts, targets, 0.15)
-        s.metrics["word_count_v2"] = total_words(s.draft_v2_concat)
-        s.metrics["within_band"] = within_band(
-            s.metrics["word_count_v2"], s.word_target_low, s.word_target_high
-        )
+        if self.store is not None:
+            self.run_id = self.store.begin_run(
+                s.premise, s.venue, self.profile, s.seed, self.config or models, run_id=self.run_id
+            )
+        with hooks.scope(self.hooks, run_id=self.run_id):
+            return self._run_stages(s, stages, models, context)
+
+    def _run_stages(self, s: StoryState, stages, models: dict, context: dict):
+        t0 = time.perf_counter()
+        self._emit(hooks.RunStarted, premise=s.premise, venue=s.venue, stages=tuple(stages))
+        try:
+            for name in stages:
+                s = self._run_stage(name, s, models, context)
+            # metrics
+            targets = {b.id: b.target_words for b in s.outline.beats}
+            s.metrics["beat_within"] = audit_beats(s.drafts, targets, draft.BEAT_TOLERANCE)
+            s.metrics["word_count_v2"] = total_words(s.draft_v2_concat)
+            s.metrics["within_band"] = within_band(
+                s.metrics["word_count_v2"], s.word_target_low, s.word_target_high
+            )
+            s.metrics["style"] = style_metrics({k: v.text for k, v in s.drafts.items()}, s.draft_v2_concat)
+            if self.store is not None:
+                self.store.finish_run(self.run_id, s)
+        except Exception as e:
+            if self.store is not None:
+                self.store.fail_run(self.run_id, f"{type(e).__name__}: {e}")
+            self._emit(hooks.RunFailed, error=f"{type(e).__name__}: {e}", duration_s=time.perf_counter() - t0)
+            raise
         self.state = s
+        self._emit(hooks.MetricsUpdated, stage="final", metrics=s.metrics)
+        self._emit(hooks.RunFinished, duration_s=time.perf_counter() - t0)
         return s
+
+    def _run_stage(self, name: str, s: StoryState, models: dict, context: dict) -> StoryState:
+        if name == "planner":
+            s = self._stage("planner", planner.run, s, model=models.get("planner"), context=context,
+                            settings=self._settings("planner"))
+            if self.hooks.wants(hooks.OutlineReady.kind):
+                self._emit(hooks.OutlineReady, stage=name, template=s.outline.template,
+                           beats=[b.model_dump() for b in s.outline.beats])
+            return s
+        if name == "draft":
+            stream = None
+            if self.stream_path is not None:
+                stream = BeatStream(self.stream_path, [b.id for b in s.outline.beats], s.premise or "Story", s.venue)
+
+            def on_beat(beat_id, scene):
+                if stream is not None:
+                    stream.add(beat_id, scene.text)
+                self._emit(hooks.BeatDrafted, stage=name, beat_id=beat_id, text=scene.text,
+                           words=scene.word_count, flags=list(scene.flags))
+
+            try:
+                s = self._stage(
+                    "draft", draft.run, s, model=models.get("draft"), context=context,
+                    on_beat=on_beat if (stream is not None or self.hooks.wants(hooks.BeatDrafted.kind)) else None,
+                    settings=self._settings("draft"),
+                )
+            except BaseException:
+                if stream is not None:
+                    stream.abort()
+                raise
+            if stream is not None:
+                stream.close()
+            return s
+        if name == "fact":
+            return self._stage(
+                "fact", fact.run, s, model=models.get("fact"), context=context, settings=self._settings("fact"),
+                on_result=(lambda obj: self._emit(hooks.ClaimsExtracted, stage=name, scene_id=obj["scene_id"], claims=obj["claims"]))
+                if self.hooks.wants(hooks.ClaimsExtracted.kind) else None,
+            )
+        if name == "revision":
+            return self._stage("revision", revision.run, s, model=models.get("revision"),
+                               settings=self._settings("revision"))
+        raise ValueError(f"unknown stage '{name}'")
+
+
+def completed_stage(state: StoryState):
+    """Last stage whose output is present in `state` (None if nothing ran)."""
+    if state.draft_v2_concat:
+        return "revision"
+    if state.claim_graph:
+        return "fact"
+    if state.drafts:
+        return "draft"
+    if state.outline and state.outline.beats:
+        return "planner"
+    return None
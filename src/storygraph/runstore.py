@@ -0,0 +1,655 @@
+"""
+Run store: an append-only SQLite index over pipeline runs.
+
+Every run records its final state, the output of each stage, per-stage
+telemetry, scalar metrics and the fingerprint of the config it ran with.
+Large payloads (states, stage outputs, configs) are stored once as
+content-addressed, zlib-compressed blobs; the relational tables only hold
+digests and indexed columns, so comparing hundreds of runs is a query:
+
+    store = RunStore()
+    store.list_runs(premise="Youth, mountains", limit=20)
+    store.query_metric("word_count_v2", min_value=3000)
+    store.load_state(run_id)
+    store.page_claims(run_id, scene_id="B3", substantiated=False, limit=50)
+
+Tables:
+    blobs      digest → compressed JSON (never overwritten)
+    runs       one row per run: premise, venue, profile, seed, config
+               fingerprint, created/finished timestamps, final state digest
+    stages     run × stage: timing and output digest
+    metrics    run × dotted metric name → numeric value
+    beats      run × view (v1/v2) × position: beat id, word count, text
+    claims     run × position: scene, claim id, substantiated, text, JSON
+    claim_refs claim → entity / evidence ids (for filtering)
+    results    runs whose final state is indexed into beats/claims
+
+Beats and claims of a finished run are indexed when it is recorded (older
+runs on first access), so result pages are keyset queries over the
+indexed tables (`page_beats`, `page_claims`, `page_metrics`) and never
+load or decode the whole state.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:  # pydantic is only imported by the calls that decode states
+    from .state import StoryState
+
+_ROOT = Path(__file__).resolve().parents[2]  # repo root
+DEFAULT_DB = _ROOT / "data" / "runs" / "runs.sqlite"
+
+SCHEMA_VERSION = 3
+METRIC_DEPTH = 3  # "style.story.words" is indexed; per-beat panels are not
+
+# StoryState fields each stage produces; stage outputs store only these
+STAGE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "planner": ("outline",),
+    "draft": ("drafts", "draft_v1_concat"),
+    "fact": ("drafts", "claim_graph"),
+    "revision": ("draft_v2_concat", "draft_v2_deltas"),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL,
+    premise TEXT NOT NULL,
+    venue TEXT NOT NULL,
+    profile TEXT,
+    seed INTEGER,
+    config_fingerprint TEXT,
+    state_digest TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    seq INTEGER NOT NULL,
+    stage TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    duration_s REAL NOT NULL,
+    output_digest TEXT,
+    PRIMARY KEY (run_id, seq)
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    name TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, name)
+);
+CREATE TABLE IF NOT EXISTS beats (
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    view TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    beat_id TEXT,
+    words INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (run_id, view, seq)
+);
+CREATE TABLE IF NOT EXISTS claims (
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    seq INTEGER NOT NULL,
+    scene_id TEXT NOT NULL,
+    claim_id TEXT NOT NULL,
+    substantiated INTEGER,
+    text TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (run_id, seq)
+);
+CREATE TABLE IF NOT EXISTS claim_refs (
+    run_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (run_id, kind, ref, seq)
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id TEXT PRIMARY KEY REFERENCES runs(run_id),
+    state_digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_premise ON runs(premise);
+CREATE INDEX IF NOT EXISTS runs_profile ON runs(profile, created_at);
+CREATE INDEX IF NOT EXISTS runs_created ON runs(created_at);
+CREATE INDEX IF NOT EXISTS runs_config ON runs(config_fingerprint);
+CREATE INDEX IF NOT EXISTS stages_stage ON stages(stage, duration_s);
+CREATE INDEX IF NOT EXISTS metrics_value ON metrics(name, value);
+CREATE INDEX IF NOT EXISTS claims_scene ON claims(run_id, scene_id, seq);
+CREATE INDEX IF NOT EXISTS claims_status ON claims(run_id, substantiated, seq);
+"""
+
+RESULT_VIEWS = ("v1", "v2")
+CLAIM_REFS = ("entity", "evidence")
+
+
+# -----------------------------------------------------------------------------
+# Helpers
+# -----------------------------------------------------------------------------
+def _canonical(obj: Any) -> bytes:
+    return json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _digest(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=20).hexdigest()
+
+
+def config_fingerprint(config: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Stable digest of a resolved profile (models + params); also its blob digest."""
+    if not config:
+        return None
+    return _digest(_canonical(config))
+
+
+def new_run_id() -> str:
+    """Sortable, collision-safe run id (timestamp + random suffix)."""
+    return time.strftime("%Y%m%dT%H%M%S", time.gmtime()) + "-" + secrets.token_hex(4)
+
+
+def flatten_metrics(metrics: Dict[str, Any], depth: int = METRIC_DEPTH) -> Dict[str, float]:
+    """Numeric/bool leaves of a metrics dict as dotted names, up to `depth` levels."""
+    out: Dict[str, float] = {}
+
+    def walk(prefix: str, value: Any, level: int) -> None:
+        if isinstance(value, bool):
+            out[prefix] = float(value)
+        elif isinstance(value, (int, float)):
+            out[prefix] = float(value)
+        elif isinstance(value, dict) and level < depth:
+            for k, v in value.items():
+                walk(f"{prefix}.{k}" if prefix else str(k), v, level + 1)
+
+    walk("", metrics or {}, 0)
+    return out
+
+
+def result_rows(state: StoryState) -> Tuple[List[tuple], List[tuple], List[tuple]]:
+    """(beats, claims, claim_refs) rows of a state, without the run id column."""
+    from .export import sections
+    from .tokens import word_count
+
+    beats = []
+    for view in RESULT_VIEWS:
+        for seq, (beat_id, text) in enumerate(sections(state, view)):
+            beats.append((view, seq, beat_id, word_count(text), text))
+    claims, refs = [], []
+    for scene in (state.claim_graph or {}).get("claims_by_scene", []):
+        scene_id = str(scene.get("scene_id") or "")
+        entities = [str(e) for e in scene.get("entities") or []]
+        for n, claim in enumerate(scene.get("claims") or [], 1):
+            if not isinstance(claim, dict):
+                claim = {"claim": str(claim)}
+            seq = len(claims)
+            sub = claim.get("substantiated")
+            claims.append((
+                seq, scene_id, str(claim.get("id") or f"{scene_id}.{n}"),
+                None if sub is None else int(bool(sub)),
+                str(claim.get("claim") or claim.get("text") or ""),
+                json.dumps(claim, ensure_ascii=False),
+            ))
+            refs.extend(("entity", e, seq) for e in dict.fromkeys(entities))
+            refs.extend(("evidence", str(e), seq) for e in dict.fromkeys(claim.get("evidence_ids") or []))
+    return beats, claims, refs
+
+
+@dataclass
+class RunRecord:
+    run_id: str
+    created_at: float
+    finished_at: Optional[float]
+    status: str
+    premise: str
+    venue: str
+    profile: Optional[str]
+    seed: Optional[int]
+    config_fingerprint: Optional[str]
+    state_digest: Optional[str]
+    error: Optional[str] = None
+
+
+# -----------------------------------------------------------------------------
+# Store
+# -----------------------------------------------------------------------------
+class RunStore:
+    """SQLite run index with content-addressed blobs. Safe to share across threads."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path is not None else DEFAULT_DB
+        if str(self.path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+            # version 2 only adds tables (results of older runs are indexed on first access);
+            # version 3 counts beat words with storygraph.tokens, so older result rows are re-indexed
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            if row is not None and int(row[0]) < 3:
+                self._conn.execute("DELETE FROM results")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta(key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "RunStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -------------------------------------------------------------------------
+    # Blobs
+    # -------------------------------------------------------------------------
+    def put_blob(self, payload: Any) -> str:
+        """Store a JSON-able payload (or raw bytes); returns its content digest."""
+        raw = payload if isinstance(payload, bytes) else _canonical(payload)
+        digest = _digest(raw)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO blobs(digest, size, data) VALUES (?, ?, ?)",
+                (digest, len(raw), zlib.compress(raw, 6)),
+            )
+        return digest
+
+    def get_blob(self, digest: str) -> bytes:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(f"blob {digest} not found in {self.path}")
+        return zlib.decompress(row[0])
+
+    def get_json(self, digest: str) -> Any:
+        return json.loads(self.get_blob(digest))
+
+    # -------------------------------------------------------------------------
+    # Runs
+    # -------------------------------------------------------------------------
+    def begin_run(
+        self,
+        premise: str = "",
+        venue: str = "",
+        profile: Optional[str] = None,
+        seed: Optional[int] = None,
+        config: Optional[Dict[str, Any]] = None,
+        run_id: Optional[str] = None,
+    ) -> str:
+        run_id = run_id or new_run_id()
+        fingerprint = config_fingerprint(config)
+        if config:
+            self.put_blob(config)  # fingerprint == blob digest, so get_json(fingerprint) returns it
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO runs(run_id, created_at, status, premise, venue, profile, seed, config_fingerprint) "
+                "VALUES (?, ?, 'running', ?, ?, ?, ?, ?)",
+                (run_id, time.time(), premise or "", venue or "", profile, seed, fingerprint),
+            )
+        return run_id
+
+    def record_stage(
+        self,
+        run_id: str,
+        stage: str,
+        state: Optional[StoryState] = None,
+        started_at: Optional[float] = None,
+        duration_s: float = 0.0,
+        output: Any = None,
+    ) -> Optional[str]:
+        """Append one stage: its timing and the state fields it produced."""
+        if output is None and state is not None:
+            fields = STAGE_FIELDS.get(stage)
+            output = state.model_dump(mode="json", include=set(fields)) if fields else None
+        digest = self.put_blob(output) if output is not None else None
+        with self._lock:
+            seq = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), -1) + 1 FROM stages WHERE run_id = ?", (run_id,)
+            ).fetchone()[0]
+            self._conn.execute(
+                "INSERT INTO stages(run_id, seq, stage, started_at, duration_s, output_digest) VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, seq, stage, started_at if started_at is not None else time.time(), duration_s, digest),
+            )
+        return digest
+
+    def finish_run(self, run_id: str, state: StoryState, status: str = "done") -> str:
+        """Store the final state and index its scalar metrics."""
+        digest = self.put_blob(state.model_dump(mode="json"))
+        rows = [(run_id, k, v) for k, v in flatten_metrics(state.metrics).items()]
+        results = result_rows(state)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "UPDATE runs SET finished_at = ?, status = ?, state_digest = ? WHERE run_id = ?",
+                    (time.time(), status, digest, run_id),
+                )
+                self._conn.executemany("INSERT OR REPLACE INTO metrics(run_id, name, value) VALUES (?, ?, ?)", rows)
+                self._index_results(run_id, digest, results)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return digest
+
+    def fail_run(self, run_id: str, error: str = "") -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE runs SET finished_at = ?, status = 'failed', error = ? WHERE run_id = ?",
+                (time.time(), error[:2000] or None, run_id),
+            )
+
+    def save_run(
+        self,
+        state: StoryState,
+        profile: Optional[str] = None,
+        config: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Record a finished state in one call (no stage rows)."""
+        run_id = self.begin_run(state.premise, state.venue, profile, state.seed, config)
+        self.finish_run(run_id, state)
+        return run_id
+
+    # -------------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------------
+    def get_run(self, run_id: str) -> RunRecord:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT run_id, created_at, finished_at, status, premise, venue, profile, seed, "
+                "config_fingerprint, state_digest, error FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"run {run_id} not found in {self.path}")
+        return RunRecord(*row)
+
+    def list_runs(
+        self,
+        premise: Optional[str] = None,
+        profile: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        status: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[RunRecord]:
+        """Runs matching the filters, newest first."""
+        where, args = [], []
+        for column, value in (("premise", premise), ("profile", profile), ("status", status)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                args.append(value)
+        if since is not None:
+            where.append("created_at >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("created_at < ?")
+            args.append(until)
+        sql = (
+            "SELECT run_id, created_at, finished_at, status, premise, venue, profile, seed, "
+            "config_fingerprint, state_digest, error FROM runs"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + " ORDER BY created_at DESC, run_id DESC LIMIT ?"
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, (*args, limit)).fetchall()
+        return [RunRecord(*r) for r in rows]
+
+    def query_metric(
+        self,
+        name: str,
+        min_value: Optional[float] = None,
+        max_value: Optional[float] = None,
+        limit: int = 100,
+    ) -> List[Tuple[str, float]]:
+        """(run_id, value) pairs for one metric within a range, highest first."""
+        where, args = ["name = ?"], [name]
+        if min_value is not None:
+            where.append("value >= ?")
+            args.append(min_value)
+        if max_value is not None:
+            where.append("value <= ?")
+            args.append(max_value)
+        sql = f"SELECT run_id, value FROM metrics WHERE {' AND '.join(where)} ORDER BY value DESC LIMIT ?"
+        with self._lock:
+            return [tuple(r) for r in self._conn.execute(sql, (*args, limit)).fetchall()]
+
+    def metrics(self, run_id: str) -> Dict[str, float]:
+        with self._lock:
+            rows = self._conn.execute("SELECT name, value FROM metrics WHERE run_id = ?", (run_id,)).fetchall()
+        return dict(rows)
+
+    def compare(self, run_ids: Iterable[str], names: Iterable[str]) -> Dict[str, Dict[str, float]]:
+        """Metric table {run_id: {name: value}} for side-by-side comparison."""
+        run_ids, names = list(run_ids), list(names)
+        if not run_ids or not names:
+            return {}
+        sql = (
+            f"SELECT run_id, name, value FROM metrics WHERE run_id IN ({','.join('?' * len(run_ids))}) "
+            f"AND name IN ({','.join('?' * len(names))})"
+        )
+        out: Dict[str, Dict[str, float]] = {r: {} for r in run_ids}
+        with self._lock:
+            for run_id, name, value in self._conn.execute(sql, (*run_ids, *names)):
+                out[run_id][name] = value
+        return out
+
+    def stages(self, run_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, stage, started_at, duration_s, output_digest FROM stages WHERE run_id = ? ORDER BY seq",
+                (run_id,),
+            ).fetchall()
+        return [
+            {"seq": s, "stage": st, "started_at": t, "duration_s": d, "output_digest": o}
+            for s, st, t, d, o in rows
+        ]
+
+    def stage_output(self, run_id: str, stage: str) -> Any:
+        """Output of the last execution of `stage` in a run."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT output_digest FROM stages WHERE run_id = ? AND stage = ? ORDER BY seq DESC LIMIT 1",
+                (run_id, stage),
+            ).fetchone()
+        if row is None or row[0] is None:
+            raise KeyError(f"no output for stage '{stage}' in run {run_id}")
+        return self.get_json(row[0])
+
+    # -------------------------------------------------------------------------
+    # Result pages (keyset pagination: pass the returned cursor as `after`)
+    # -------------------------------------------------------------------------
+    def _index_results(self, run_id: str, digest: str, results) -> None:
+        beats, claims, refs = results
+        for table in ("beats", "claims", "claim_refs"):
+            self._conn.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+        self._conn.executemany(
+            "INSERT INTO beats(run_id, view, seq, beat_id, words, text) VALUES (?, ?, ?, ?, ?, ?)",
+            [(run_id, *r) for r in beats],
+        )
+        self._conn.executemany(
+            "INSERT INTO claims(run_id, seq, scene_id, claim_id, substantiated, text, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(run_id, *r) for r in claims],
+        )
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO claim_refs(run_id, kind, ref, seq) VALUES (?, ?, ?, ?)",
+            [(run_id, *r) for r in refs],
+        )
+        self._conn.execute("INSERT OR REPLACE INTO results(run_id, state_digest) VALUES (?, ?)", (run_id, digest))
+
+    def result_digest(self, run_id: str) -> str:
+        """Digest of the indexed final state (indexes it first if needed); identifies every result page."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT r.state_digest, x.state_digest FROM runs r LEFT JOIN results x ON x.run_id = r.run_id "
+                "WHERE r.run_id = ?", (run_id,),
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"run {run_id} not found in {self.path}")
+        digest, indexed = row
+        if not digest:
+            raise KeyError(f"run {run_id} has no final state yet")
+        if indexed != digest:
+            from .state import StoryState
+
+            results = result_rows(StoryState.model_validate_json(self.get_blob(digest)))
+            with self._lock:
+                self._conn.execute("BEGIN")
+                try:
+                    self._index_results(run_id, digest, results)
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        return digest
+
+    def page_beats(
+        self, run_id: str, view: str = "v2", after: Optional[int] = None, limit: int = 20
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Beats of a finished run in story order; returns (page, cursor for the next page or None)."""
+        if view not in RESULT_VIEWS:
+            raise ValueError(f"view must be one of {RESULT_VIEWS}")
+        self.result_digest(run_id)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, beat_id, words, text FROM beats WHERE run_id = ? AND view = ? AND seq > ? "
+                "ORDER BY seq LIMIT ?", (run_id, view, -1 if after is None else after, limit + 1),
+            ).fetchall()
+        page = [{"seq": q, "beat_id": b, "words": w, "text": t} for q, b, w, t in rows[:limit]]
+        return page, (page[-1]["seq"] if len(rows) > limit else None)
+
+    def page_claims(
+        self,
+        run_id: str,
+        scene_id: Optional[str] = None,
+        substantiated: Optional[bool] = None,
+        entity: Optional[str] = None,
+        evidence: Optional[str] = None,
+        after: Optional[int] = None,
+        limit: int = 50,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int], int]:
+        """Filtered claims of a finished run; returns (page, next cursor or None, total matches)."""
+        self.result_digest(run_id)
+        where, args = ["c.run_id = ?"], [run_id]
+        if scene_id is not None:
+            where.append("c.scene_id = ?")
+            args.append(scene_id)
+        if substantiated is not None:
+            where.append("c.substantiated = ?")
+            args.append(int(substantiated))
+        for kind, ref in (("entity", entity), ("evidence", evidence)):
+            if ref is not None:
+                where.append(
+                    "EXISTS (SELECT 1 FROM claim_refs r WHERE r.run_id = c.run_id AND r.kind = ? AND r.ref = ? AND r.seq = c.seq)"
+                )
+                args.extend((kind, ref))
+        cond = " AND ".join(where)
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM claims c WHERE {cond}", args).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT c.seq, c.scene_id, c.claim_id, c.substantiated, c.text, c.data FROM claims c "
+                f"WHERE {cond} AND c.seq > ? ORDER BY c.seq LIMIT ?",
+                (*args, -1 if after is None else after, limit + 1),
+            ).fetchall()
+        page = [
+            {"seq": q, "scene_id": sc, "claim_id": cid, "substantiated": None if sub is None else bool(sub),
+             "claim": text, "data": json.loads(data)}
+            for q, sc, cid, sub, text, data in rows[:limit]
+        ]
+        return page, (page[-1]["seq"] if len(rows) > limit else None), total
+
+    def claim_facets(self, run_id: str) -> Dict[str, Dict[str, int]]:
+        """Claim counts per scene, status, entity and evidence id (for filter menus)."""
+        self.result_digest(run_id)
+        with self._lock:
+            scenes = self._conn.execute(
+                "SELECT scene_id, COUNT(*) FROM claims WHERE run_id = ? GROUP BY scene_id ORDER BY MIN(seq)", (run_id,)
+            ).fetchall()
+            status = self._conn.execute(
+                "SELECT substantiated, COUNT(*) FROM claims WHERE run_id = ? GROUP BY substantiated", (run_id,)
+            ).fetchall()
+            refs = self._conn.execute(
+                "SELECT kind, ref, COUNT(*) FROM claim_refs WHERE run_id = ? GROUP BY kind, ref ORDER BY kind, ref",
+                (run_id,),
+            ).fetchall()
+        names = {1: "substantiated", 0: "unsubstantiated", None: "unknown"}
+        out: Dict[str, Dict[str, int]] = {"scene": dict(scenes), "status": {names[k]: n for k, n in status}}
+        for kind in CLAIM_REFS:
+            out[kind] = {ref: n for k, ref, n in refs if k == kind}
+        return out
+
+    def page_metrics(
+        self, run_id: str, prefix: Optional[str] = None, after: Optional[str] = None, limit: int = 200
+    ) -> Tuple[Dict[str, float], Optional[str]]:
+        """Indexed metrics of a run by name; returns ({name: value}, next cursor or None)."""
+        where, args = ["run_id = ?", "name > ?"], [run_id, after or ""]
+        if prefix:
+            where.append("name >= ? AND name < ?")
+            args.extend((prefix, prefix + "\uffff"))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT name, value FROM metrics WHERE {' AND '.join(where)} ORDER BY name LIMIT ?", (*args, limit + 1)
+            ).fetchall()
+        page = dict(rows[:limit])
+        return page, (rows[limit - 1][0] if len(rows) > limit else None)
+
+    def load_state(self, run_id: str) -> StoryState:
+        from .state import StoryState
+
+        record = self.get_run(run_id)
+        if not record.state_digest:
+            raise KeyError(f"run {run_id} has no final state (status: {record.status})")
+        return StoryState.model_validate_json(self.get_blob(record.state_digest))
+
+    def replay_state(self, run_id: str, upto: Optional[str] = None) -> StoryState:
+        """State after stage `upto` (default: last recorded) rebuilt from stage outputs; works for failed runs."""
+        from .state import StoryState
+
+        data: Dict[str, Any] = {}
+        for st in self.stages(run_id):
+            if st["output_digest"]:
+                data.update(self.get_json(st["output_digest"]))
+            if st["stage"] == upto:
+                break
+        if not data:
+            raise KeyError(f"run {run_id} has no recorded stage output")
+        return StoryState.model_validate(data)
+
+    def latest(self, **filters) -> Optional[RunRecord]:
+        runs = self.list_runs(limit=1, **filters)
+        return runs[0] if runs else None
+
+
+# -----------------------------------------------------------------------------
+# Shared store (one per database path)
+# -----------------------------------------------------------------------------
+_stores: Dict[str, RunStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_run_store(path: Optional[Path] = None) -> RunStore:
+    key = str(Path(path).resolve()) if path is not None else str(DEFAULT_DB)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = RunStore(Path(key))
+        return store
@@ -0,0 +1,302 @@
+"""
+Compact, sectioned binary serialization for StoryState.
+
+Layout (little-endian):
+
+    b"SGST" | version u8 | header length u32 | header (JSON) | section bytes ...
+
+The header lists every section as [name, offset, compressed length, raw
+length] plus the payload format and compression codec. Each section is
+encoded and compressed on its own, so a reader can pull the outline,
+metrics or claim graph without touching draft text:
+
+    reader = open_state("run.sgst")
+    reader.metrics          # decodes only the "metrics" section
+    reader.to_state()       # full StoryState
+
+Payload format is msgpack when installed, else orjson, else json; the
+codec is zstd when `zstandard` is installed, else zlib. Both are recorded
+in the header, so files stay readable wherever the same libraries exist.
+
+`draft_v1_concat` is normally the beats joined with blank lines; in that
+case it is not stored again but rebuilt from `drafts` on load. The small
+per-beat v2 edit list (`draft_v2_deltas`) rides in "meta", so loading
+applies it instead of diffing the revised story again.
+"""
+from __future__ import annotations
+import json
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .state import StoryState
+
+# Optional backends
+try:
+    import msgpack  # msgpack>=1.0
+except Exception:
+    msgpack = None
+
+try:
+    import orjson  # orjson>=3.8
+except Exception:
+    orjson = None
+
+try:
+    import zstandard  # zstandard>=0.21
+except Exception:
+    zstandard = None
+
+MAGIC = b"SGST"
+VERSION = 1
+_PREFIX = struct.Struct("<4sBI")
+
+JOINED = {"$derived": "join_drafts"}  # marker for a draft_v1_concat rebuilt from drafts
+
+# Section → StoryState fields; anything not listed lands in "meta"
+SECTIONS: Dict[str, Tuple[str, ...]] = {
+    "outline": ("outline",),
+    "metrics": ("metrics",),
+    "claim_graph": ("claim_graph",),
+    "drafts": ("drafts",),
+    "draft_v1": ("draft_v1_concat",),
+    "draft_v2": ("draft_v2_concat",),
+}
+
+
+# -----------------------------------------------------------------------------
+# Codecs
+# -----------------------------------------------------------------------------
+def default_format() -> str:
+    return "msgpack" if msgpack else ("orjson" if orjson else "json")
+
+
+def default_codec() -> str:
+    return "zstd" if zstandard else "zlib"
+
+
+def _encode(obj: Any, fmt: str) -> bytes:
+    if fmt == "msgpack":
+        if not msgpack:
+            raise RuntimeError("msgpack package not installed")
+        return msgpack.packb(obj, use_bin_type=True)
+    if fmt == "orjson":
+        if not orjson:
+            raise RuntimeError("orjson package not installed")
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _decode(raw: bytes, fmt: str) -> Any:
+    if fmt == "msgpack":
+        if not msgpack:
+            raise RuntimeError("msgpack package not installed")
+        return msgpack.unpackb(raw, raw=False)
+    if fmt == "orjson" and orjson:
+        return orjson.loads(raw)
+    return json.loads(raw)  # orjson output is plain JSON
+
+
+def _compress(raw: bytes, codec: str, level: int) -> bytes:
+    if codec == "zstd":
+        if not zstandard:
+            raise RuntimeError("zstandard package not installed")
+        return zstandard.ZstdCompressor(level=level).compress(raw)
+    return zlib.compress(raw, min(level, 9))
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if not zstandard:
+            raise RuntimeError("zstandard package not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+# -----------------------------------------------------------------------------
+# Writing
+# -----------------------------------------------------------------------------
+def _joined_drafts(drafts: Dict[str, Any]) -> str:
+    return "\n\n".join(d["text"] for d in drafts.values())
+
+
+def split_sections(state: StoryState) -> Dict[str, Any]:
+    """StoryState as {section name: JSON-able payload}."""
+    data = state.model_dump(mode="json")
+    sections: Dict[str, Any] = {}
+    for name, fields in SECTIONS.items():
+        sections[name] = data.pop(fields[0]) if len(fields) == 1 else {f: data.pop(f) for f in fields}
+    if sections["draft_v1"] and sections["draft_v1"] == _joined_drafts(sections["drafts"]):
+        sections["draft_v1"] = JOINED
+    sections["meta"] = data
+    return sections
+
+
+def dumps(
+    state: StoryState,
+    fmt: Optional[str] = None,
+    codec: Optional[str] = None,
+    level: int = 6,
+) -> bytes:
+    fmt = fmt or default_format()
+    codec = codec or default_codec()
+    index: List[List[Any]] = []
+    blobs: List[bytes] = []
+    offset = 0
+    for name, payload in split_sections(state).items():
+        raw = _encode(payload, fmt)
+        blob = _compress(raw, codec, level)
+        index.append([name, offset, len(blob), len(raw)])
+        blobs.append(blob)
+        offset += len(blob)
+    header = json.dumps({"format": fmt, "codec": codec, "sections": index}, separators=(",", ":")).encode("utf-8")
+    return b"".join([_PREFIX.pack(MAGIC, VERSION, len(header)), header, *blobs])
+
+
+def save(state: StoryState, path: Union[str, Path], **kwargs) -> Path:
+    from .writer import atomic_write
+
+    # a unique temp file per call: concurrent saves to one path never share it
+    return atomic_write(path, dumps(state, **kwargs), fsync=False)
+
+
+# -----------------------------------------------------------------------------
+# Reading
+# -----------------------------------------------------------------------------
+class StateReader:
+    """
+    Lazy view over a serialized state. Sections are read (from bytes or
+    from the file, by offset) and decoded on first access, then cached.
+    """
+
+    def __init__(self, source: Union[bytes, str, Path]):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._data: Optional[bytes] = bytes(source)
+            self.path: Optional[Path] = None
+            prefix = self._data[: _PREFIX.size]
+        else:
+            self._data = None
+            self.path = Path(source)
+            with self.path.open("rb") as f:
+                prefix = f.read(_PREFIX.size)
+        magic, version, header_len = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError("not a serialized StoryState (bad magic)")
+        if version > VERSION:
+            raise ValueError(f"unsupported StoryState format version {version}")
+        header_bytes = self._read(_PREFIX.size, header_len)
+        header = json.loads(header_bytes)
+        self.format: str = header["format"]
+        self.codec: str = header["codec"]
+        base = _PREFIX.size + header_len
+        self._index = {name: (base + off, clen, rlen) for name, off, clen, rlen in header["sections"]}
+        self._cache: Dict[str, Any] = {}
+
+    def _read(self, offset: int, length: int) -> bytes:
+        if self._data is not None:
+            return self._data[offset: offset + length]
+        with self.path.open("rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    @property
+    def sections(self) -> List[str]:
+        return list(self._index)
+
+    def section_size(self, name: str) -> Tuple[int, int]:
+        """(compressed, raw) byte sizes of one section."""
+        _, clen, rlen = self._index[name]
+        return clen, rlen
+
+    def section(self, name: str) -> Any:
+        if name not in self._cache:
+            offset, clen, _ = self._index[name]
+            payload = _decode(_decompress(self._read(offset, clen), self.codec), self.format)
+            if name == "draft_v1" and payload == JOINED:
+                payload = _joined_drafts(self.section("drafts"))
+            self._cache[name] = payload
+        return self._cache[name]
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return self.section("meta")
+
+    @property
+    def outline(self) -> Any:
+        return self.section("outline")
+
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        return self.section("metrics")
+
+    @property
+    def claim_graph(self) -> Dict[str, Any]:
+        return self.section("claim_graph")
+
+    @property
+    def drafts(self) -> Dict[str, Any]:
+        return self.section("drafts")
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = dict(self.meta)
+        for name, fields in SECTIONS.items():
+            data[fields[0]] = self.section(name)
+        return data
+
+    def to_state(self) -> StoryState:
+        return StoryState.model_validate(self.to_dict())
+
+
+def loads(data: bytes) -> StoryState:
+    return StateReader(data).to_state()
+
+
+def open_state(path: Union[str, Path]) -> StateReader:
+    return StateReader(path)
+
+
+# -----------------------------------------------------------------------------
+# Benchmark
+# -----------------------------------------------------------------------------
+def _best_of(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def benchmark(state: StoryState, repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """
+    Size and best-of-`repeat` encode/decode seconds for the current pretty
+    JSON path, compact JSON, and the sectioned binary format (full decode
+    and metrics-only decode).
+    """
+    pretty = state.model_dump_json(indent=2)
+    compact = state.model_dump_json()
+    binary = dumps(state)
+    return {
+        "json_pretty": {
+            "bytes": len(pretty.encode("utf-8")),
+            "encode_s": _best_of(lambda: state.model_dump_json(indent=2), repeat),
+            "decode_s": _best_of(lambda: StoryState.model_validate_json(pretty), repeat),
+        },
+        "json": {
+            "bytes": len(compact.encode("utf-8")),
+            "encode_s": _best_of(state.model_dump_json, repeat),
+            "decode_s": _best_of(lambda: StoryState.model_validate_json(compact), repeat),
+        },
+        "binary": {
+            "bytes": len(binary),
+            "encode_s": _best_of(lambda: dumps(state), repeat),
+            "decode_s": _best_of(lambda: loads(binary), repeat),
+        },
+        "binary_metrics_only": {
+            "bytes": len(binary),
+            "encode_s": 0.0,
+            "decode_s": _best_of(lambda: StateReader(binary).metrics, repeat),
+        },
+    }
@@ -0,0 +1,474 @@
+"""
+Asyncio HTTP service: start pipeline runs and stream their progress as
+Server-Sent Events; results are served from the run store.
+
+    GET  /                           UI (ui/index.html, script.js, style.css)
+    GET  /api/runs                   recent runs (?limit=&status=&premise=)
+    POST /api/runs                   start a run {"premise", "venue", "seed"?, "profile"?} → 202 {"run_id"}
+    GET  /api/runs/<id>              run record and stage timings
+    GET  /api/runs/<id>/events       SSE progress stream
+    GET  /api/runs/<id>/state        final (or latest partial) StoryState
+    GET  /api/runs/<id>/export       ?view=v1|v2|diff&format=md|html
+    GET  /api/runs/<id>/beats        ?view=v1|v2&limit=&cursor=
+    GET  /api/runs/<id>/claims       ?scene=&status=substantiated|unsubstantiated&entity=&evidence=&limit=&cursor=
+    GET  /api/runs/<id>/claims/facets  claim counts per scene, status, entity, evidence id
+    GET  /api/runs/<id>/metrics      ?prefix=&limit=&cursor=
+    GET  /metrics                    Prometheus counters and histograms of this process's runs
+
+One event loop serves every connection. Pipeline runs block on provider
+calls, so each runs in a worker thread (`max_runs` at a time; the rest
+queue). Their events are handed to the loop with call_soon_threadsafe,
+buffered per run and fanned out to subscribers: a client that connects
+late, or reconnects with Last-Event-ID, gets the history first. Runs that
+are not live in this process (finished earlier, or started by the CLI)
+are replayed from the run store; for a run still in progress elsewhere
+the stream ends after the replay and the browser's EventSource reconnects.
+/metrics aggregates the lifecycle hooks (storygraph.hooks) of every run in
+the process: runs, stage/beat/LLM call durations, retries, cache hits.
+
+Result pages (beats, claims, metrics) of finished runs are keyset queries
+over the run store's indexed tables: `{"items", "next", ...}`, where
+`next` is an opaque cursor for the following page (null on the last).
+Each page has an ETag derived from the run's final state digest and the
+query, so a browser revalidating an unchanged page gets a bodiless 304.
+Unfinished runs answer 409; their progress comes from the event stream.
+
+Only the standard library is used (no web framework dependency).
+"""
+from __future__ import annotations
+import asyncio
+import base64
+import hashlib
+import json
+import mimetypes
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .hooks import PrometheusSink, get_hooks
+
+UI_DIR = Path(__file__).resolve().parents[2] / "ui"
+MAX_BODY = 1 << 20
+KEEPALIVE_S = 15.0
+RETRY_MS = 3000
+TERMINAL = ("run_finished", "run_failed")
+
+_REASONS = {200: "OK", 202: "Accepted", 204: "No Content", 304: "Not Modified", 400: "Bad Request",
+            404: "Not Found", 405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+            500: "Internal Server Error"}
+
+# (run_id, request, on_event) -> None; blocking, runs in a worker thread
+Runner = Callable[[str, Dict[str, Any], Callable[[Dict[str, Any]], None]], Any]
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(message or _REASONS.get(status, ""))
+        self.status = status
+
+
+def _frame(event_id: int, kind: str, data: str) -> bytes:
+    return f"id: {event_id}\nevent: {kind}\ndata: {data}\n\n".encode("utf-8")
+
+
+# -----------------------------------------------------------------------------
+# Per-run event channel (event-loop thread only)
+# -----------------------------------------------------------------------------
+class RunChannel:
+    """Event history of one live run plus its SSE subscribers."""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.frames: List[Tuple[str, bytes]] = []
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.done = False
+
+    def publish(self, kind: str, data: str) -> None:
+        if self.done:
+            return
+        item = (kind, _frame(len(self.frames), kind, data))
+        self.frames.append(item)
+        self.done = kind in TERMINAL
+        for q in self.subscribers:
+            q.put_nowait(item)
+
+
+def replay_events(store, run_id: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    (kind, data) events reconstructing a stored run's progress.
+
+    Finished runs are summarized (claim counts per scene, then run_finished);
+    their beats, claims and metrics are read page by page from the result
+    endpoints. Unfinished runs are replayed in full from their stage outputs.
+    """
+    record = store.get_run(run_id)
+    finished = bool(record.state_digest)
+    yield "run_started", {"run_id": run_id, "premise": record.premise, "venue": record.venue,
+                          "replayed": True, "paged": finished}
+    if finished:
+        for scene_id, count in store.claim_facets(run_id)["scene"].items():
+            yield "claims_extracted", {"run_id": run_id, "scene_id": scene_id, "count": count}
+    else:
+        try:
+            state = store.replay_state(run_id)
+        except KeyError:
+            state = None
+        if state is not None:
+            if state.outline:
+                yield "outline", {"run_id": run_id, "template": state.outline.template,
+                                  "beats": [b.model_dump() for b in state.outline.beats]}
+            for beat_id, scene in state.drafts.items():
+                yield "beat_drafted", {"run_id": run_id, "beat_id": beat_id, "text": scene.text,
+                                       "words": scene.word_count, "flags": scene.flags}
+            for obj in (state.claim_graph or {}).get("claims_by_scene", []):
+                yield "claims_extracted", {"run_id": run_id, "scene_id": obj.get("scene_id"), "claims": obj.get("claims", [])}
+    if record.status == "done":
+        yield "run_finished", {"run_id": run_id}
+    elif record.status == "failed":
+        yield "run_failed", {"run_id": run_id, "error": record.error}
+
+
+def encode_cursor(after: Any) -> Optional[str]:
+    if after is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(after).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Any:
+    if not cursor:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPError(400, "invalid cursor")
+
+
+def _int(query: Dict[str, str], name: str, default: int, maximum: int) -> int:
+    try:
+        value = int(query.get(name, default))
+    except ValueError:
+        raise HTTPError(400, f"{name} must be an integer")
+    return max(1, min(value, maximum))
+
+
+# -----------------------------------------------------------------------------
+# Service
+# -----------------------------------------------------------------------------
+class StoryService:
+    def __init__(
+        self,
+        store=None,
+        runner: Optional[Runner] = None,
+        max_runs: int = 4,
+        ui_dir: Path = UI_DIR,
+        keep_finished: int = 64,
+    ):
+        if store is None:
+            from .runstore import get_run_store
+            store = get_run_store()
+        self.store = store
+        self.runner = runner or self.run_pipeline
+        self.ui_dir = Path(ui_dir).resolve()
+        self.keep_finished = keep_finished
+        self.channels: "OrderedDict[str, RunChannel]" = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_runs), thread_name_prefix="run")
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._llm_lock = threading.Lock()
+        self._context: Optional[dict] = None
+        self.metrics = PrometheusSink()
+        self._metrics_sub = self.metrics.attach(get_hooks())
+
+    # -------------------------------------------------------------------------
+    # Runs
+    # -------------------------------------------------------------------------
+    def run_pipeline(self, run_id: str, request: Dict[str, Any], on_event) -> None:
+        """Default runner: the full pipeline with the requested (or default) profile."""
+        from .config_loader import load_profile
+        from .router import Pipeline
+
+        profile = load_profile(request.get("profile"))
+        with self._llm_lock:
+            if self._context is None:
+                from .context_loader import load_all_context
+                self._context = load_all_context()
+        pipe = Pipeline(
+            seed=int(request.get("seed", 137)), store=self.store, profile=profile.name,
+            config=profile.as_dict(), settings=profile, run_id=run_id, on_event=on_event,
+        )
+        pipe.run_minimal(request["premise"], request.get("venue", ""), models=profile.models(), context=self._context)
+
+    def start_run(self, request: Dict[str, Any]) -> str:
+        """Queue a run (call on the event loop); returns its run id immediately."""
+        from .runstore import new_run_id
+
+        if not isinstance(request, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        if not str(request.get("premise") or "").strip():
+            raise HTTPError(400, "premise is required")
+        try:
+            int(request.get("seed", 0))  # fail here, not later on the worker thread
+        except (TypeError, ValueError):
+            raise HTTPError(400, "seed must be an integer")
+        loop = asyncio.get_running_loop()
+        run_id = new_run_id()
+        channel = self.channels[run_id] = RunChannel(run_id)
+        channel.publish("queued", json.dumps({"run_id": run_id}))
+
+        def on_event(event: Dict[str, Any]) -> None:
+            # encode on the pipeline thread: the state keeps changing after this returns
+            data = json.dumps(event, ensure_ascii=False, default=str)
+            loop.call_soon_threadsafe(channel.publish, event["type"], data)
+
+        def finished(fut) -> None:
+            exc = fut.exception()
+            if not channel.done:  # the runner failed before the pipeline could report it
+                error = f"{type(exc).__name__}: {exc}" if exc else "run ended without a result"
+                channel.publish("run_failed", json.dumps({"run_id": run_id, "error": error}))
+            self._evict()
+
+        fut = loop.run_in_executor(self._executor, self.runner, run_id, request, on_event)
+        fut.add_done_callback(finished)
+        return run_id
+
+    def _evict(self) -> None:
+        done = [rid for rid, ch in self.channels.items() if ch.done and not ch.subscribers]
+        for rid in done[: max(0, len(done) - self.keep_finished)]:
+            del self.channels[rid]
+
+    # -------------------------------------------------------------------------
+    # HTTP
+    # -------------------------------------------------------------------------
+    async def start(self, host: str = "127.0.0.1", port: int = 8000) -> asyncio.AbstractServer:
+        self._server = await asyncio.start_server(self._handle, host, port, limit=64 * 1024)
+        return self._server
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1] if self._server else 0
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._metrics_sub.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            method, target, _ = lines[0].split(" ", 2)
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    k, v = line.split(":", 1)
+                    headers[k.strip().lower()] = v.strip()
+            length = int(headers.get("content-length") or 0)
+            if length > MAX_BODY:
+                raise HTTPError(413)
+            body = await reader.readexactly(length) if length else b""
+            url = urlsplit(target)
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            await self._route(method.upper(), unquote(url.path), query, headers, body, writer)
+        except HTTPError as e:
+            await self._send_json(writer, e.status, {"error": str(e)})
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        except Exception as e:
+            print(f"[SERVICE] {type(e).__name__}: {e}")
+            try:
+                await self._send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str], body: bytes, writer) -> None:
+        parts = [p for p in path.split("/") if p]
+        if parts[:2] != ["api", "runs"]:
+            if method != "GET":
+                raise HTTPError(405)
+            if parts == ["metrics"]:
+                return await self._send(writer, 200, self.metrics.render().encode("utf-8"), "text/plain; version=0.0.4")
+            return await self._static(writer, path)
+
+        if len(parts) == 2:
+            if method == "POST":
+                try:
+                    request = json.loads(body or b"{}")
+                except ValueError:
+                    raise HTTPError(400, "body must be JSON")
+                run_id = self.start_run(request)
+                return await self._send_json(writer, 202, {"run_id": run_id, "events": f"/api/runs/{run_id}/events"})
+            if method == "GET":
+                runs = await asyncio.to_thread(
+                    self.store.list_runs, premise=query.get("premise"), status=query.get("status"),
+                    limit=_int(query, "limit", 50, 500),
+                )
+                return await self._send_json(writer, 200, {"runs": [r.__dict__ for r in runs]})
+            raise HTTPError(405)
+
+        if method != "GET":
+            raise HTTPError(405)
+        run_id, action = parts[2], (parts[3] if len(parts) > 3 else "")
+        if action == "events":
+            return await self._events(writer, run_id, headers.get("last-event-id"))
+        if run_id not in self.channels:
+            await self._get_record(run_id)  # 404 for unknown runs
+        if action == "":
+            record = await self._get_record(run_id)
+            stages = await asyncio.to_thread(self.store.stages, run_id)
+            return await self._send_json(writer, 200, {"run": record.__dict__, "stages": stages})
+        if action == "state":
+            state = await asyncio.to_thread(self._state, run_id)
+            return await self._send(writer, 200, state.model_dump_json().encode("utf-8"), "application/json")
+        if action == "export":
+            from .export import FORMATS, VIEWS, render_text
+
+            fmt, view = query.get("format", "md"), query.get("view", "v2")
+            if fmt not in FORMATS or view not in VIEWS:
+                raise HTTPError(400, f"format must be one of {FORMATS}, view one of {VIEWS}")
+            state = await asyncio.to_thread(self._state, run_id)
+            text = await asyncio.to_thread(render_text, state, fmt, view)
+            ctype = "text/html; charset=utf-8" if fmt == "html" else "text/markdown; charset=utf-8"
+            return await self._send(writer, 200, text.encode("utf-8"), ctype)
+        if action in ("beats", "claims", "metrics"):
+            return await self._results(writer, run_id, "/".join(parts[3:]), query, headers)
+        raise HTTPError(404)
+
+    async def _results(self, writer, run_id: str, action: str, query: Dict[str, str], headers: Dict[str, str]) -> None:
+        record = await self._get_record(run_id)
+        if not record.state_digest:
+            raise HTTPError(409, f"run {run_id} is {record.status}; results are available once it finishes")
+        digest = await asyncio.to_thread(self.store.result_digest, run_id)
+        key = action + "?" + "&".join(f"{k}={v}" for k, v in sorted(query.items()))
+        etag = '"%s.%s"' % (digest[:20], hashlib.blake2b(key.encode("utf-8"), digest_size=6).hexdigest())
+        if etag in [t.strip() for t in headers.get("if-none-match", "").split(",")]:
+            return await self._send(writer, 304, b"", "application/json", {"ETag": etag})
+
+        after = decode_cursor(query.get("cursor"))
+        if after is not None and not isinstance(after, str if action == "metrics" else int):
+            raise HTTPError(400, "invalid cursor")
+        store = self.store
+        if action == "beats":
+            view = query.get("view", "v2")
+            if view not in ("v1", "v2"):
+                raise HTTPError(400, "view must be v1 or v2")
+            items, nxt = await asyncio.to_thread(store.page_beats, run_id, view, after, _int(query, "limit", 20, 100))
+            body = {"items": items, "next": encode_cursor(nxt)}
+        elif action == "claims":
+            status = query.get("status")
+            if status not in (None, "substantiated", "unsubstantiated"):
+                raise HTTPError(400, "status must be substantiated or unsubstantiated")
+            items, nxt, total = await asyncio.to_thread(
+                store.page_claims, run_id, query.get("scene"), None if status is None else status == "substantiated",
+                query.get("entity"), query.get("evidence"), after, _int(query, "limit", 50, 500),
+            )
+            body = {"items": items, "next": encode_cursor(nxt), "total": total}
+        elif action == "claims/facets":
+            body = await asyncio.to_thread(store.claim_facets, run_id)
+        elif action == "metrics":
+            items, nxt = await asyncio.to_thread(
+                store.page_metrics, run_id, query.get("prefix"), after, _int(query, "limit", 200, 1000)
+            )
+            body = {"items": items, "next": encode_cursor(nxt)}
+        else:
+            raise HTTPError(404)
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        await self._send(writer, 200, data, "application/json", {"ETag": etag})
+
+    async def _get_record(self, run_id: str):
+        try:
+            return await asyncio.to_thread(self.store.get_run, run_id)
+        except KeyError:
+            raise HTTPError(404, f"run {run_id} not found")
+
+    def _state(self, run_id: str):
+        record = self.store.get_run(run_id)
+        try:
+            return self.store.load_state(run_id) if record.state_digest else self.store.replay_state(run_id)
+        except KeyError:
+            raise HTTPError(404, f"run {run_id} has no output yet")
+
+    async def _events(self, writer, run_id: str, last_event_id: Optional[str]) -> None:
+        channel = self.channels.get(run_id)
+        if channel is None:
+            await self._get_record(run_id)
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+            b"Connection: close\r\nX-Accel-Buffering: no\r\n\r\n" + f"retry: {RETRY_MS}\n\n".encode()
+        )
+        if channel is None:
+            events = await asyncio.to_thread(lambda: list(replay_events(self.store, run_id)))
+            for i, (kind, data) in enumerate(events):
+                writer.write(_frame(i, kind, json.dumps(data, ensure_ascii=False, default=str)))
+            await writer.drain()
+            return
+
+        start = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+        # history and subscription happen without an await in between: no event is missed
+        backlog = [frame for _, frame in channel.frames[start:]]
+        queue: Optional[asyncio.Queue] = None
+        if not channel.done:
+            queue = asyncio.Queue()
+            channel.subscribers.add(queue)
+        try:
+            for frame in backlog:
+                writer.write(frame)
+            await writer.drain()
+            while queue is not None:
+                try:
+                    kind, frame = await asyncio.wait_for(queue.get(), KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    writer.write(b": keep-alive\n\n")
+                    await writer.drain()
+                    continue
+                writer.write(frame)
+                await writer.drain()
+                if kind in TERMINAL:
+                    break
+        finally:
+            if queue is not None:
+                channel.subscribers.discard(queue)
+
+    async def _static(self, writer, path: str) -> None:
+        rel = path.lstrip("/") or "index.html"
+        target = (self.ui_dir / rel).resolve()
+        if self.ui_dir not in target.parents or not target.is_file():
+            raise HTTPError(404)
+        ctype = mimetypes.guess_type(target.name)[0] or "application/octet-stream"
+        if ctype.startswith("text/") or ctype.endswith("javascript"):
+            ctype += "; charset=utf-8"
+        data = await asyncio.to_thread(target.read_bytes)
+        await self._send(writer, 200, data, ctype)
+
+    async def _send(self, writer, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        extra = "".join(f"{k}: {v}\r\n" for k, v in (headers or {}).items())
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nCache-Control: no-cache\r\n{extra}Connection: close\r\n\r\n".encode("latin-1")
+            + body
+        )
+        await writer.drain()
+
+    async def _send_json(self, writer, status: int, obj: Any) -> None:
+        await self._send(writer, status, json.dumps(obj, ensure_ascii=False, default=str).encode("utf-8"), "application/json")
+
+
+# -----------------------------------------------------------------------------
+# Entry point
+# -----------------------------------------------------------------------------
+async def serve(host: str = "127.0.0.1", port: int = 8000, max_runs: int = 4, db_path=None, ui_dir: Path = UI_DIR) -> None:
+    from .runstore import get_run_store
+
+    service = StoryService(get_run_store(Path(db_path) if db_path else None), max_runs=max_runs, ui_dir=ui_dir)
+    server = await service.start(host, port)
+    print(f"Serving at: http://{host or 'localhost'}:{service.port}  ({max_runs} concurrent runs)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
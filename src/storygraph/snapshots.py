@@ -0,0 +1,246 @@
+"""
+Copy-on-write StoryState snapshots for per-stage checkpoints, diffs and
+branches.
+
+Agents mutate the shared StoryState in place, so keeping a stage's output
+used to mean deep-copying the whole model, draft text included. A
+`Snapshot` instead freezes each field into an immutable structure
+(dicts → FrozenDict, lists → tuples, models → FrozenDict of fields):
+
+- strings are never copied; every snapshot shares the same str objects
+- each frozen node caches its hash, so comparing a field against the
+  parent snapshot is a hash check, and unchanged fields reuse the
+  parent's frozen value (no new memory)
+- the beat document (already copy-on-write) is kept by reference
+
+`Snapshot.changed` lists the fields that differ from the parent and
+`Snapshot.delta()` serializes only those, so a chain of checkpoints costs
+the first full state plus what each stage changed. `restore()` rebuilds a
+StoryState for branching or resume; `diff()` compares any two snapshots.
+
+    checkpoints = Checkpoints()
+    checkpoints.take(state, "planner")
+    ...
+    checkpoints.diff("draft", "fact")       # {"drafts": ..., "claim_graph": ...}
+    branch = checkpoints["draft"].restore()
+"""
+from __future__ import annotations
+import time
+from collections.abc import Mapping as _MappingABC
+from typing import Any, Dict, FrozenSet, Iterator, List, Mapping, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .document import StoryDocument
+from .state import StoryState
+
+# Derived views are carried by the document, not as fields
+VIEW_FIELDS = ("draft_v1_concat", "draft_v2_concat")
+
+
+# -----------------------------------------------------------------------------
+# Frozen values
+# -----------------------------------------------------------------------------
+class FrozenDict(_MappingABC):
+    """Immutable, hashable mapping with a cached hash."""
+
+    __slots__ = ("_data", "_hash")
+
+    def __init__(self, items: Any = ()):
+        self._data = dict(items)
+        self._hash: Optional[int] = None
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self) -> Iterator:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __hash__(self) -> int:
+        if self._hash is None:
+            self._hash = hash(tuple(self._data.items()))
+        return self._hash
+
+    def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if isinstance(other, FrozenDict):
+            return hash(self) == hash(other) and self._data == other._data
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"FrozenDict({self._data!r})"
+
+
+def freeze(value: Any) -> Any:
+    """Immutable, hashable copy of `value`; strings and numbers are shared, not copied."""
+    if value is None or isinstance(value, (str, int, float, bool, bytes, FrozenDict)):
+        return value
+    if isinstance(value, BaseModel):
+        return FrozenDict((name, freeze(getattr(value, name))) for name in type(value).model_fields)
+    if isinstance(value, Mapping):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(v) for v in value)
+    raise TypeError(f"cannot snapshot value of type {type(value).__name__}")
+
+
+def thaw(value: Any) -> Any:
+    """Plain (mutable, JSON-able) form of a frozen value."""
+    if isinstance(value, FrozenDict):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    if isinstance(value, frozenset):
+        return [thaw(v) for v in value]
+    return value
+
+
+def _doc_views(doc: StoryDocument) -> Dict[str, Any]:
+    out: Dict[str, Any] = {f"draft_{label}_concat": doc.view(label) for label in doc.labels if f"draft_{label}_concat" in VIEW_FIELDS}
+    if "draft_v2_concat" in out:
+        out["draft_v2_deltas"] = doc.deltas("v2", as_lists=True)  # restored without re-diffing
+    return out
+
+
+# -----------------------------------------------------------------------------
+# Snapshot
+# -----------------------------------------------------------------------------
+class Snapshot:
+    """Immutable checkpoint of a StoryState; shares everything unchanged with its parent."""
+
+    __slots__ = ("label", "created_at", "fields", "document", "parent", "changed")
+
+    def __init__(
+        self,
+        label: str,
+        fields: Mapping[str, Any],
+        document: StoryDocument,
+        parent: Optional["Snapshot"] = None,
+        changed: FrozenSet[str] = frozenset(),
+    ):
+        self.label = label
+        self.created_at = time.time()
+        self.fields = fields
+        self.document = document
+        self.parent = parent
+        self.changed = changed
+
+    @classmethod
+    def take(cls, state: StoryState, label: str = "", parent: Optional["Snapshot"] = None) -> "Snapshot":
+        fields: Dict[str, Any] = {}
+        changed = set()
+        for name in StoryState.model_fields:
+            frozen = freeze(getattr(state, name))
+            if parent is not None:
+                prev = parent.fields.get(name)
+                if prev is frozen or (hash(prev) == hash(frozen) and prev == frozen):
+                    fields[name] = prev  # share the parent's structure
+                    continue
+            fields[name] = frozen
+            changed.add(name)
+        doc = state.document
+        if parent is None or (doc is not parent.document and doc != parent.document):
+            changed.update(VIEW_FIELDS)
+        elif doc is not parent.document:
+            doc = parent.document
+        return cls(label, fields, doc, parent, frozenset(changed))
+
+    def __getitem__(self, name: str) -> Any:
+        if name in VIEW_FIELDS:
+            label = name[len("draft_"): -len("_concat")]
+            return self.document.view(label) if label in self.document.labels else ""
+        return self.fields[name]
+
+    def restore(self) -> StoryState:
+        """A new StoryState with this snapshot's content (strings shared)."""
+        state = StoryState.model_validate({k: thaw(v) for k, v in self.fields.items()})
+        state._document = self.document
+        return state
+
+    def delta(self) -> Dict[str, Any]:
+        """JSON-able dict of only the fields changed since the parent."""
+        out = {name: thaw(self.fields[name]) for name in self.changed if name in self.fields}
+        if self.changed.intersection(VIEW_FIELDS):
+            out.update(_doc_views(self.document))
+        return out
+
+    def diff(self, other: "Snapshot") -> Dict[str, Tuple[Any, Any]]:
+        """{field: (value here, value there)} for every field that differs."""
+        out: Dict[str, Tuple[Any, Any]] = {}
+        for name in set(self.fields) | set(other.fields):
+            a, b = self.fields.get(name), other.fields.get(name)
+            if a is not b and not (hash(a) == hash(b) and a == b):
+                out[name] = (thaw(a), thaw(b))
+        if self.document is not other.document and self.document != other.document:
+            for name in VIEW_FIELDS:
+                a, b = self[name], other[name]
+                if a != b:
+                    out[name] = (a, b)
+        return out
+
+    def changed_keys(self, other: "Snapshot", name: str) -> List[str]:
+        """Keys of a mapping field (e.g. drafts) whose values differ between snapshots."""
+        a, b = self.fields.get(name) or FrozenDict(), other.fields.get(name) or FrozenDict()
+        keys = list(dict.fromkeys([*a, *b]))
+        return [k for k in keys if a.get(k) is not b.get(k) and a.get(k) != b.get(k)]
+
+    def __repr__(self) -> str:
+        return f"Snapshot({self.label!r}, changed={sorted(self.changed)})"
+
+
+# -----------------------------------------------------------------------------
+# Checkpoint chain
+# -----------------------------------------------------------------------------
+class Checkpoints:
+    """Ordered snapshots of one run; each is taken against the previous one."""
+
+    def __init__(self):
+        self._snapshots: List[Snapshot] = []
+
+    def take(self, state: StoryState, label: str) -> Snapshot:
+        snap = Snapshot.take(state, label, self._snapshots[-1] if self._snapshots else None)
+        self._snapshots.append(snap)
+        return snap
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+    def __iter__(self) -> Iterator[Snapshot]:
+        return iter(self._snapshots)
+
+    def __getitem__(self, label: str) -> Snapshot:
+        for snap in reversed(self._snapshots):
+            if snap.label == label:
+                return snap
+        raise KeyError(label)
+
+    @property
+    def latest(self) -> Optional[Snapshot]:
+        return self._snapshots[-1] if self._snapshots else None
+
+    @property
+    def labels(self) -> List[str]:
+        return [s.label for s in self._snapshots]
+
+    def diff(self, a: str, b: str) -> Dict[str, Tuple[Any, Any]]:
+        return self[a].diff(self[b])
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """One record per checkpoint holding only the fields it changed."""
+        return [{"label": s.label, "created_at": s.created_at, "changed": s.delta()} for s in self._snapshots]
+
+    @staticmethod
+    def replay(records: List[Dict[str, Any]], upto: Optional[str] = None) -> StoryState:
+        """Rebuild the state at checkpoint `upto` (default: last) from `to_records()` output."""
+        data: Dict[str, Any] = {}
+        for rec in records:
+            data.update(rec["changed"])
+            if rec["label"] == upto:
+                break
+        return StoryState.model_validate(data)
@@ -1,6 +1,11 @@
 from __future__ import annotations
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from pydantic import BaseModel, Field, PrivateAttr, computed_field, model_validator
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
+
+from .document import StoryDocument
+
+if TYPE_CHECKING:  # tokens pulls in numpy; imported on first use
+    from .tokens import Tokenization
 
 
 class Beat(BaseModel):
@@ -19,6 +24,26 @@ class SceneDraft(BaseModel):
     scene_id: str
     text: str
     flags: List[Dict[str, Any]] = []
+    entities: List[Dict[str, Any]] = []  # codex mentions: {id, start, end, text}
+
+    _tokens: Optional[Tokenization] = PrivateAttr(default=None)
+    _tokens_for: Optional[str] = PrivateAttr(default=None)
+
+    @property
+    def tokens(self) -> Tokenization:
+        """Shared tokenization of the current text (recomputed only if text changes)."""
+        if self._tokens is None or self._tokens_for is not self.text:
+            from .tokens import tokenize
+            self._tokens = tokenize(self.text)
+            self._tokens_for = self.text
+        return self._tokens
+
+    @property
+    def word_count(self) -> int:
+        return self.tokens.word_count
+
+    def entity_ids(self) -> List[str]:
+        return list(dict.fromkeys(e["id"] for e in self.entities))
 
 
 class StoryState(BaseModel):
@@ -27,9 +52,76 @@ class StoryState(BaseModel):
     venue: str = ""
     outline: Optional[Outline] = None
     drafts: Dict[str, SceneDraft] = {}
-    draft_v1_concat: str = ""
-    draft_v2_concat: str = ""
     claim_graph: Dict[str, Any] = {}
     metrics: Dict[str, Any] = {}
     word_target_low: int = 3000
     word_target_high: int = 7500
+
+    # Beat segments with version history ("v1" = drafted, "v2" = revised).
+    # The *_concat strings are views over it; segments share the SceneDraft
+    # strings and later versions are stored as deltas. The v2 deltas are
+    # serialized too (draft_v2_deltas), so decoding does not diff again.
+    _document: StoryDocument = PrivateAttr(default_factory=StoryDocument)
+
+    @model_validator(mode="wrap")
+    @classmethod
+    def _load_views(cls, data, handler):
+        v1 = v2 = ""
+        v2_deltas = None
+        if isinstance(data, dict) and ("draft_v1_concat" in data or "draft_v2_concat" in data or "draft_v2_deltas" in data):
+            data = dict(data)
+            v1 = data.pop("draft_v1_concat", "") or ""
+            v2 = data.pop("draft_v2_concat", "") or ""
+            v2_deltas = data.pop("draft_v2_deltas", None)
+        state = handler(data)
+        if v1 or v2:
+            state._set_views(v1, v2, v2_deltas)
+        return state
+
+    def _set_views(self, v1: str, v2: str, v2_deltas: Optional[Dict[str, Any]] = None) -> None:
+        doc = StoryDocument.from_texts({k: d.text for k, d in self.drafts.items()}, "v1") if v1 else StoryDocument()
+        if v1 and doc.view("v1") != v1:
+            doc.set_view(v1, "v1")
+        if v2 and not (v2_deltas is not None and doc.set_deltas(v2_deltas, "v2", expected=v2)):
+            doc.set_view(v2, "v2")
+        self._document = doc
+
+    @property
+    def document(self) -> StoryDocument:
+        return self._document
+
+    @computed_field
+    @property
+    def draft_v1_concat(self) -> str:
+        return self._document.view("v1") if "v1" in self._document.labels else ""
+
+    @draft_v1_concat.setter
+    def draft_v1_concat(self, value: str) -> None:
+        self._set_views(value or "", self.draft_v2_concat)
+
+    @computed_field
+    @property
+    def draft_v2_concat(self) -> str:
+        return self._document.view("v2") if "v2" in self._document.labels else ""
+
+    @draft_v2_concat.setter
+    def draft_v2_concat(self, value: str) -> None:
+        doc = self._document.copy()
+        doc.remove_label("v2")
+        if value:
+            doc.set_view(value, "v2")
+        self._document = doc
+
+    @computed_field
+    @property
+    def draft_v2_deltas(self) -> Optional[Dict[str, List[List[Any]]]]:
+        """Per-beat [start, end, replacement] edits from v1 to v2 (None if v2 is not segmented)."""
+        return self._document.deltas("v2", as_lists=True)
+
+    def set_beat_text(self, beat_id: str, text: str, label: str = "v2") -> None:
+        """Update one beat in a version; O(beat), the views are rebuilt lazily."""
+        doc = self._document.copy()
+        if label not in doc.labels and "v1" not in doc.labels and label != "v1":
+            raise ValueError(f"no v1 view to revise; set draft_v1_concat before '{label}'")
+        doc.set_segment(beat_id, text, label)
+        self._document = doc
@@ -0,0 +1,102 @@
+"""
+Shared tokenization: one word/sentence segmentation per text version.
+
+Validators, agents and metrics used to re-tokenize the same drafts with two
+different word definitions (`\\w+` in validators, `str.split()` in agents).
+`tokenize(text)` is now the single definition, and its result is cached by
+content hash, so every consumer of the same text version shares one pass:
+
+- word offsets (start/end arrays) and `word_count`
+- sentence end offsets and per-word sentence ids
+- lowercased words (built lazily, for metrics)
+
+SceneDraft exposes the same result as `scene.tokens`.
+"""
+from __future__ import annotations
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from functools import cached_property
+from typing import List, Optional
+
+import numpy as np
+
+# A word is a run of word characters, with internal apostrophes kept
+# ("don't", "Nikita’s" are one word each).
+WORD = re.compile(r"\w+(?:['’]\w+)*")
+SENTENCE_END = re.compile(r"[.!?]+[\"'”’)]*(?=\s|$)")
+
+CACHE_SIZE = 1024
+
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# -----------------------------------------------------------------------------
+# Tokenization result
+# -----------------------------------------------------------------------------
+class Tokenization:
+    """Word and sentence boundaries of one text. Treat as immutable."""
+
+    def __init__(self, text: str, digest: Optional[str] = None):
+        self.text = text
+        self.digest = digest or content_hash(text)
+        spans = [m.span() for m in WORD.finditer(text)]
+        arr = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        self.starts = arr[:, 0]
+        self.ends = arr[:, 1]
+        self.sentence_ends = np.asarray([m.end() for m in SENTENCE_END.finditer(text)], dtype=np.int64)
+
+    @property
+    def word_count(self) -> int:
+        return int(len(self.starts))
+
+    @cached_property
+    def words(self) -> List[str]:
+        """Lowercased words with typographic apostrophes normalised."""
+        text = self.text
+        return [text[s:e].lower().replace("’", "'") for s, e in zip(self.starts.tolist(), self.ends.tolist())]
+
+    @cached_property
+    def sentence_ids(self) -> np.ndarray:
+        """Sentence index of each word (text after the last full stop counts as one more)."""
+        return np.searchsorted(self.sentence_ends, self.starts, side="right")
+
+    @property
+    def sentence_count(self) -> int:
+        return int(self.sentence_ids[-1]) + 1 if self.word_count else 0
+
+
+# -----------------------------------------------------------------------------
+# Cache
+# -----------------------------------------------------------------------------
+_cache: "OrderedDict[str, Tokenization]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def tokenize(text: str) -> Tokenization:
+    """Tokenization of `text`, shared across callers by content hash."""
+    text = text or ""
+    digest = content_hash(text)
+    with _lock:
+        hit = _cache.get(digest)
+        if hit is not None:
+            _cache.move_to_end(digest)
+            return hit
+    tok = Tokenization(text, digest)
+    with _lock:
+        _cache[digest] = tok
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return tok
+
+
+def word_count(text: str) -> int:
+    return tokenize(text).word_count
+
+
+def clear_cache() -> None:
+    with _lock:
+        _cache.clear()
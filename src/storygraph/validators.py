@@ -1,11 +1,13 @@
 # src/storygraph/validators.py
-import re
-from typing import Dict
+from typing import TYPE_CHECKING, Mapping, Union
 
-WORD = re.compile(r"\w+")
+from .tokens import WORD, tokenize  # noqa: F401  (WORD re-exported)
+
+if TYPE_CHECKING:
+    from .state import SceneDraft
 
 def total_words(text: str) -> int:
-    return len(WORD.findall(text or ""))
+    return tokenize(text).word_count
 
 def within_band(n: int, lo: int, hi: int) -> bool:
     return lo <= n <= hi
@@ -14,6 +16,10 @@ def beat_within_tolerance(actual: int, target: int, tol: float = 0.15) -> bool:
     # Use target-based tolerance to keep quotas meaningful
     return abs(actual - target) <= target * tol
 
-def audit_beats(drafts: Dict[str, str], targets: Dict[str, int], tol: float = 0.15) -> Dict[str, bool]:
-    return {sid: beat_within_tolerance(total_words(txt), targets.get(sid, 0), tol)
-            for sid, txt in drafts.items()}
+def _count(draft) -> int:
+    # SceneDraft carries its own cached tokenization; plain strings hit the shared cache
+    return draft.word_count if hasattr(draft, "word_count") else total_words(draft)
+
+def audit_beats(drafts: Mapping[str, Union[str, "SceneDraft"]], targets: Mapping[str, int], tol: float = 0.15) -> Mapping[str, bool]:
+    return {sid: beat_within_tolerance(_count(d), targets.get(sid, 0), tol)
+            for sid, d in drafts.items()}
@@ -0,0 +1,149 @@
+"""
+Voice-drift monitor: score each drafted beat against a rolling stylistic
+profile of the beats accepted so far.
+
+Every beat is turned into a fixed-size feature vector in one pass over its
+text:
+
+- hashed character 3-grams (orthography, punctuation habits)
+- hashed word unigrams and bigrams (diction, phrasing)
+- function-word frequencies (the classic stylometric voice signal)
+
+Each block is L2-normalised; the profile keeps the running sum of accepted
+vectors, so scoring a new beat is a dot product against the centroid and
+costs O(beat length) regardless of how many beats came before. A beat whose
+similarity falls well below the similarities seen so far is an outlier:
+it is reported (and the draft agent flags the SceneDraft) but not folded
+into the profile.
+"""
+from __future__ import annotations
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .metrics import FUNCTION_WORDS
+from .tokens import tokenize
+
+CHAR_DIM = 4096
+WORD_DIM = 4096
+BLOCK_WEIGHTS = (0.4, 0.3, 0.3)  # char n-grams, word n-grams, function words
+SPAN_CHARS = 80  # opening of the beat quoted in the flag
+
+_FW_INDEX = {w: i for i, w in enumerate(FUNCTION_WORDS)}
+_P1, _P2 = 1_000_003, 7_919
+
+
+def _unit(v: np.ndarray) -> np.ndarray:
+    n = float(np.linalg.norm(v))
+    return v / n if n else v
+
+
+# -----------------------------------------------------------------------------
+# Features
+# -----------------------------------------------------------------------------
+def voice_features(text: str, char_dim: int = CHAR_DIM, word_dim: int = WORD_DIM) -> np.ndarray:
+    """Concatenated, block-normalised [char 3-grams | word 1-2 grams | function words]."""
+    raw = np.frombuffer(text.lower().encode("utf-8"), dtype=np.uint8).astype(np.int64)
+    if len(raw) >= 3:
+        h = (raw[:-2] * _P1 + raw[1:-1] * _P2 + raw[2:]) % char_dim
+        chars = np.bincount(h, minlength=char_dim).astype(np.float64)
+    else:
+        chars = np.zeros(char_dim)
+
+    words = tokenize(text).words
+    if words:
+        ids = np.fromiter((zlib.crc32(w.encode("utf-8")) for w in words), dtype=np.int64, count=len(words))
+        hashed = ids % word_dim
+        if len(ids) > 1:
+            hashed = np.concatenate([hashed, (ids[:-1] * _P2 + ids[1:]) % word_dim])
+        wvec = np.bincount(hashed, minlength=word_dim).astype(np.float64)
+        fw = np.fromiter((_FW_INDEX.get(w, -1) for w in words), dtype=np.int64, count=len(words))
+        fvec = np.bincount(fw[fw >= 0], minlength=len(FUNCTION_WORDS)).astype(np.float64) / len(words)
+    else:
+        wvec = np.zeros(word_dim)
+        fvec = np.zeros(len(FUNCTION_WORDS))
+
+    wc, ww, wf = BLOCK_WEIGHTS
+    return np.concatenate([np.sqrt(wc) * _unit(chars), np.sqrt(ww) * _unit(wvec), np.sqrt(wf) * _unit(fvec)])
+
+
+# -----------------------------------------------------------------------------
+# Rolling profile
+# -----------------------------------------------------------------------------
+@dataclass
+class VoiceCheck:
+    beat_id: str
+    score: float
+    threshold: Optional[float]
+    outlier: bool
+    span: str = ""
+
+    def as_flag(self) -> Dict:
+        """SceneDraft flag, same shape as the draft prompt's flags."""
+        return {
+            "span": self.span,
+            "type": "voice_drift",
+            "score": round(self.score, 4),
+            "threshold": round(self.threshold, 4) if self.threshold is not None else None,
+        }
+
+
+class VoiceMonitor:
+    """
+    Rolling voice profile of accepted beats.
+
+    `min_beats`  accepted beats before anything can be flagged
+    `k`          outlier if score < mean - k * std of accepted scores
+    `min_std`    floor on the spread, so very uniform beats don't make
+                 the threshold hair-trigger
+    """
+
+    def __init__(self, min_beats: int = 2, k: float = 2.5, min_std: float = 0.03, floor: float = 0.0):
+        self.min_beats = min_beats
+        self.k = k
+        self.min_std = min_std
+        self.floor = floor
+        self._sum: Optional[np.ndarray] = None
+        self._count = 0
+        self._scores: List[float] = []
+        self.checks: Dict[str, VoiceCheck] = {}
+
+    @property
+    def accepted(self) -> int:
+        return self._count
+
+    def threshold(self) -> Optional[float]:
+        if self._count < self.min_beats or not self._scores:
+            return None
+        scores = np.asarray(self._scores)
+        return max(self.floor, float(scores.mean()) - self.k * max(self.min_std, float(scores.std())))
+
+    def score(self, vec: np.ndarray) -> float:
+        if self._sum is None:
+            return 1.0
+        return float(np.dot(vec, _unit(self._sum)) / (np.linalg.norm(vec) or 1.0))
+
+    def observe(self, beat_id: str, text: str) -> VoiceCheck:
+        """Score a beat; accept it into the profile unless it is an outlier."""
+        vec = voice_features(text)
+        score = self.score(vec)
+        threshold = self.threshold()
+        outlier = threshold is not None and score < threshold
+        if not outlier:
+            self._sum = vec.copy() if self._sum is None else self._sum + vec
+            if self._count:
+                self._scores.append(score)
+            self._count += 1
+        check = VoiceCheck(beat_id, score, threshold, outlier, text[:SPAN_CHARS].strip())
+        self.checks[beat_id] = check
+        return check
+
+    def summary(self) -> Dict:
+        return {
+            "accepted": self._count,
+            "threshold": self.threshold(),
+            "scores": {k: round(c.score, 4) for k, c in self.checks.items()},
+            "outliers": [k for k, c in self.checks.items() if c.outlier],
+        }
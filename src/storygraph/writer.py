@@ -0,0 +1,166 @@
+"""
+Background writer for checkpoints and exports.
+
+Writing story_output.json and the Markdown exports inline blocks the
+pipeline on disk I/O; with per-stage checkpoints that cost lands on every
+stage. `BackgroundWriter` moves it to one worker thread:
+
+- bounded queue: when it is full, `write()` blocks (backpressure) instead
+  of buffering without limit
+- coalescing: a path that is already queued just gets its payload
+  replaced, so rapid successive writes of one artifact cost one write
+- atomic: each file is written to a temp file in the same directory,
+  flushed, fsynced and moved into place with os.replace
+- flush-on-exit: `flush()` waits for everything queued; the shared writer
+  flushes at interpreter exit
+
+Payloads are bytes, str, or a zero-argument callable returning either. A
+callable is rendered on the worker thread, so it must not read state the
+pipeline is still mutating (render from a Snapshot or serialize first).
+An optional `on_written(path, nbytes, seconds)` callback runs on the
+worker thread once the file is in place (e.g. for hooks).
+"""
+from __future__ import annotations
+import atexit
+import os
+import queue
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+Payload = Union[bytes, str, Callable[[], Union[bytes, str]]]
+OnWritten = Callable[[Path, int, float], None]
+
+
+def atomic_write(path: Union[str, Path], data: Union[bytes, str], fsync: bool = True) -> Path:
+    """Write `data` to `path` via a temp file + os.replace (readers never see partial files)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    raw = data.encode("utf-8") if isinstance(data, str) else data
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(raw)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return path
+
+
+class BackgroundWriter:
+    """Single-thread, coalescing, atomic file writer."""
+
+    def __init__(self, max_pending: int = 64, fsync: bool = True, name: str = "storygraph-writer"):
+        self.fsync = fsync
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=max_pending)
+        self._pending: Dict[str, Tuple[Payload, Optional[OnWritten]]] = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._inflight = 0
+        self._closed = False
+        self.writes = 0
+        self.coalesced = 0
+        self.errors: List[Tuple[str, BaseException]] = []
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    # -------------------------------------------------------------------------
+    # Producer side
+    # -------------------------------------------------------------------------
+    def write(self, path: Union[str, Path], payload: Payload, on_written: Optional[OnWritten] = None) -> None:
+        """Queue `payload` for `path`; replaces a not-yet-written payload for the same path."""
+        key = str(Path(path))
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BackgroundWriter is closed")
+            if key in self._pending:
+                self._pending[key] = (payload, on_written)
+                self.coalesced += 1
+                return
+            self._pending[key] = (payload, on_written)
+            self._inflight += 1
+        self._queue.put(key)  # blocks while the queue is full
+
+    def flush(self, timeout: Optional[float] = None, raise_errors: bool = False) -> bool:
+        """Wait until every queued write has finished. Returns False on timeout."""
+        with self._idle:
+            done = self._idle.wait_for(lambda: self._inflight == 0, timeout)
+            errors = []
+            if raise_errors:
+                errors, self.errors = self.errors, []
+        if errors:
+            path, exc = errors[0]
+            raise RuntimeError(f"background write to {path} failed: {exc}") from exc
+        return done
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self.flush(timeout)
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return self._inflight
+
+    def __enter__(self) -> "BackgroundWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -------------------------------------------------------------------------
+    # Worker
+    # -------------------------------------------------------------------------
+    def _run(self) -> None:
+        while True:
+            key = self._queue.get()
+            if key is None:
+                return
+            with self._lock:
+                payload, on_written = self._pending.pop(key)
+            try:
+                t0 = time.perf_counter()
+                data = payload() if callable(payload) else payload
+                path = atomic_write(key, data, fsync=self.fsync)
+                self.writes += 1
+                if on_written is not None:
+                    on_written(path, path.stat().st_size, time.perf_counter() - t0)
+            except BaseException as e:  # keep the worker alive; report on flush
+                print(f"[WRITER] Failed to write {key}: {e}")
+                with self._lock:
+                    self.errors.append((key, e))
+            finally:
+                with self._idle:
+                    self._inflight -= 1
+                    if self._inflight == 0:
+                        self._idle.notify_all()
+
+
+# -----------------------------------------------------------------------------
+# Shared writer (flushed at interpreter exit)
+# -----------------------------------------------------------------------------
+_writer: Optional[BackgroundWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> BackgroundWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BackgroundWriter()
+            atexit.register(_writer.close)
+        return _writer
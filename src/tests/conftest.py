@@ -0,0 +1,34 @@
+"""
+Shared fixtures.
+"""
+import copy
+
+import pytest
+
+from storygraph.state import Beat, Outline, SceneDraft, StoryState
+
+BEAT = {"B1": "We left before dawn."}
+
+
+def _build_state(premise="Youth, mountains", beats=None, *, venue="Granta", seed=7, target_words=10,
+                 v2=None, **fields):
+    """
+    A drafted StoryState: one outline beat and draft per `beats` item (id → text),
+    V1 joined from them and V2 equal to V1 unless given. Any other StoryState
+    field (metrics, claim_graph, ...) can be set by keyword.
+    """
+    beats = beats or BEAT
+    s = StoryState(premise=premise, venue=venue, seed=seed)
+    s.outline = Outline(template="t", beats=[Beat(id=k, purpose="p", target_words=target_words) for k in beats])
+    s.drafts = {k: SceneDraft(scene_id=k, text=v) for k, v in beats.items()}
+    s.draft_v1_concat = "\n\n".join(beats.values())
+    s.draft_v2_concat = s.draft_v1_concat if v2 is None else v2
+    for name, value in fields.items():
+        setattr(s, name, copy.deepcopy(value))   # states never share nested dicts
+    return s
+
+
+@pytest.fixture
+def make_state():
+    """Factory for test states; see `_build_state` for the arguments."""
+    return _build_state
@@ -3,6 +3,7 @@ Unit tests for agent context integration.
 
 Tests that agents receive and use context correctly, without making LLM calls.
 """
+from collections.abc import Mapping
 from pathlib import Path
 from storygraph.context_loader import load_all_context, format_codex_for_prompt, extract_notes_fragments
 from storygraph.agents import planner, draft
@@ -153,8 +154,8 @@ class TestPipelineContextFlow:
         context = load_all_context()
         sources = context["sources"]
         
-        # Should be a dict
-        assert isinstance(sources, dict)
+        # Should be a mapping (memory-mapped corpus)
+        assert isinstance(sources, Mapping)
         
         # If life_and_death_of_a_climber.txt exists, it should be loaded
         sources_dir = Path("data/sources")
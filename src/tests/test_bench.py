@@ -0,0 +1,51 @@
+"""
+Unit tests for the benchmark suite: every case runs, baselines round-trip,
+and regressions are detected after normalizing for machine speed.
+"""
+import json
+
+from storygraph import bench
+from storygraph.cli import main
+
+
+def test_every_case_runs_at_smallest_scale():
+    report = bench.run(scales=(1,), min_time=0.0, repeat=1)
+    assert set(report["results"]) == {f"{name}@1" for name in bench.CASES}
+    assert all(s > 0 for s in report["results"].values()) and report["calibration_s"] > 0
+
+
+def test_scales_are_capped_per_case(monkeypatch):
+    monkeypatch.setitem(bench.CASES, "capped", bench.Case("capped", lambda scale, workdir: (lambda: None), (1, 10)))
+    report = bench.run(["capped", "validators.total_words"], scales=(1, 1000), min_time=0.0, repeat=1)
+    assert sorted(report["results"]) == ["capped@1", "validators.total_words@1", "validators.total_words@1000"]
+
+
+def test_whole_state_cases_run_to_1000x():
+    assert all(bench.CASES[name].scales == bench.SCALES for name in bench.CASES if name.startswith(("state.", "document.")))
+
+
+def test_compare_normalizes_for_machine_speed():
+    baseline = {"calibration_s": 1.0, "results": {"a@1": 1.0, "b@1": 1.0, "gone@1": 1.0}}
+    # this machine is twice as slow: 2.2 s is within 25%, 3.0 s is not
+    report = {"calibration_s": 2.0, "results": {"a@1": 2.2, "b@1": 3.0, "new@1": 1.0}}
+    rows = {r["case"]: r for r in bench.compare(report, baseline)}
+    assert set(rows) == {"a@1", "b@1"}
+    assert not rows["a@1"]["regression"] and rows["b@1"]["regression"]
+    assert rows["b@1"]["baseline_s"] == 2.0
+
+
+def test_bench_command_saves_and_flags_regressions(tmp_path, capsys):
+    path = tmp_path / "baseline.json"
+    args = ["bench", "--case", "notes.", "--scales", "1", "--repeat", "1", "--baseline", str(path)]
+    assert main(args) == 1   # no baseline: the gate fails rather than passing vacuously
+    assert "No baseline" in capsys.readouterr().out
+    assert main(args + ["--save"]) == 0
+    saved = json.loads(path.read_text())
+    assert list(saved["results"]) == ["notes.fragments@1"]
+
+    saved["results"]["notes.fragments@1"] /= 1000  # pretend it used to be 1000x faster
+    path.write_text(json.dumps(saved))
+    capsys.readouterr()
+    assert main(args) == 1
+    assert "REGRESSION" in capsys.readouterr().out
+    assert main(args + ["--threshold", "1e9"]) == 0
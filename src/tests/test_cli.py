@@ -0,0 +1,109 @@
+"""
+Unit tests for the command-line interface and lazy imports.
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+from storygraph.cli import _read_batch, main
+from storygraph.router import completed_stage
+from storygraph.runstore import RunStore
+from storygraph.state import Beat, Outline, SceneDraft, StoryState
+
+SRC = Path(__file__).resolve().parents[1]
+
+
+def _imported(*args: str):
+    """(module → cumulative µs) for everything `python *args` imports, via -X importtime (a statement runs as -c)."""
+    if not args[0].startswith("-"):
+        args = ("-c", *args)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True, text=True, cwd=str(SRC), env={"PYTHONPATH": str(SRC)}, check=True,
+    )
+    out = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line and "cumulative" not in line:
+            _, cumulative, name = line.split("|")
+            out[name.strip()] = int(cumulative)
+    return out
+
+
+def test_cli_import_is_stdlib_only():
+    mods = _imported("import storygraph.cli")
+    heavy = [m for m in mods if m.split(".")[0] in ("openai", "anthropic", "numpy", "pydantic", "yaml")]
+    assert not heavy
+    assert "storygraph.agents" not in mods and "storygraph.router" not in mods
+    assert mods["storygraph.cli"] < 200_000  # µs, generous bound for slow CI
+
+
+def test_runs_command_is_stdlib_only(tmp_path):
+    mods = _imported("-m", "storygraph", "runs", "--db", str(tmp_path / "runs.sqlite"))
+    assert "storygraph.runstore" in mods
+    assert not [m for m in mods if m.split(".")[0] in ("pydantic", "numpy", "openai", "anthropic")]
+    assert "storygraph.state" not in mods
+
+
+def test_llm_and_export_imports_stay_light():
+    mods = _imported("import storygraph.llm, storygraph.export")
+    assert not [m for m in mods if m.split(".")[0] in ("openai", "anthropic", "numpy")]
+    assert "storygraph.agents" not in mods
+
+
+def test_agents_read_prompts_on_first_use():
+    proc = subprocess.run(
+        [sys.executable, "-c", "from storygraph.agents import draft; from storygraph.prompts import get_registry; print(len(get_registry().loaded()))"],
+        capture_output=True, text=True, cwd=str(SRC), env={"PYTHONPATH": str(SRC)}, check=True,
+    )
+    assert proc.stdout.strip() == "0"
+
+
+def test_completed_stage_and_replay(tmp_path):
+    s = StoryState(premise="p")
+    assert completed_stage(s) is None
+    s.outline = Outline(template="t", beats=[Beat(id="B1", purpose="open", target_words=10)])
+    assert completed_stage(s) == "planner"
+    s.drafts = {"B1": SceneDraft(scene_id="B1", text="x")}
+    assert completed_stage(s) == "draft"
+
+    with RunStore(tmp_path / "runs.sqlite") as store:
+        rid = store.begin_run("p", "v", None, 1, {})
+        store.record_stage(rid, "planner", output={"premise": "p", "outline": s.outline.model_dump()})
+        store.record_stage(rid, "draft", output={"drafts": {"B1": {"scene_id": "B1", "text": "x"}}})
+        store.fail_run(rid, "boom")
+        assert completed_stage(store.replay_state(rid)) == "draft"
+        assert completed_stage(store.replay_state(rid, "planner")) == "planner"
+
+
+def test_export_and_runs_commands(tmp_path, capsys, make_state):
+    db = tmp_path / "runs.sqlite"
+    with RunStore(db) as store:
+        rid = store.save_run(make_state())
+    assert main(["export", rid, "--db", str(db), "--out", str(tmp_path / "out"), "--format", "md,html"]) == 0
+    assert (tmp_path / "out" / f"{rid}_v2.html").exists()
+    assert main(["runs", "--db", str(db)]) == 0
+    assert rid in capsys.readouterr().out
+
+
+def test_dotenv_sets_flag_defaults(tmp_path, monkeypatch):
+    from storygraph import cli
+
+    (tmp_path / ".env").write_text("PREMISE=From dotenv\nSEED=42\n", encoding="utf-8")
+    for var in ("PREMISE", "SEED"):
+        monkeypatch.setenv(var, "")
+        monkeypatch.delenv(var)
+    monkeypatch.setattr(cli, "ROOT", tmp_path)
+    seen = []
+    monkeypatch.setattr(cli, "cmd_run", lambda args: seen.append((args.premise, args.seed)) or 0)
+    assert main(["run"]) == 0
+    assert seen == [("From dotenv", 42)]
+
+
+def test_read_batch(tmp_path):
+    f = tmp_path / "premises.txt"
+    f.write_text('# comment\nFirst premise\n{"premise": "Second", "seed": 3}\n\n', encoding="utf-8")
+    jobs = _read_batch(f, "Granta", 137)
+    assert jobs == [
+        {"premise": "First premise", "venue": "Granta", "seed": 137},
+        {"premise": "Second", "venue": "Granta", "seed": 3},
+    ]
@@ -0,0 +1,100 @@
+"""
+Unit tests for the compiled codex store.
+"""
+import json
+import os
+
+from storygraph import codex as codex_mod
+from storygraph.codex import Codex, compile_codex, load_codex
+from storygraph.context_loader import format_codex_for_prompt
+
+
+def _write(tmp_path, name, text):
+    (tmp_path / f"{name}.md").write_text(text, encoding="utf-8")
+
+
+def _tree(tmp_path):
+    _write(tmp_path, "people", "- [P1] Nikita Marwah — climber\n- [P2] Chris — partner\n")
+    _write(tmp_path, "places", "- [PL1] Canadian Border Peak — final climb\n- [C1] Sea-to-Sky Corridor\n")
+    _write(tmp_path, "claims", "- [CL1] P1 died on PL1.\n- [CL2] P2 (Chris) climbed with P1; see S1.\n")
+    _write(tmp_path, "sources", "- [S1] GoFundMe announcement\n")
+    return tmp_path
+
+
+class TestCompileCodex:
+    def test_multi_letter_ids_and_lookup(self, tmp_path):
+        codex = compile_codex(_tree(tmp_path), snapshot_path=None)
+        assert codex.ids_by_category["places"] == ("PL1", "C1")
+        assert codex.ids_by_category["claims"] == ("CL1", "CL2")
+        assert codex.get_entry("PL1").label == "Canadian Border Peak"
+        assert codex.get_entry("P1").label == "Nikita Marwah"
+        assert codex["people"][0] == "[P1] Nikita Marwah — climber"
+
+    def test_cross_reference_indexes(self, tmp_path):
+        codex = compile_codex(_tree(tmp_path), snapshot_path=None)
+        assert codex.refs("CL1") == ["P1", "PL1"]
+        assert codex.refs("CL2", "sources") == ["S1"]
+        assert codex.claims_about("P1") == ["CL1", "CL2"]
+        assert codex.mentions("S1") == ["CL2"]
+
+    def test_format_matches_legacy_lists(self, tmp_path):
+        codex = compile_codex(_tree(tmp_path), snapshot_path=None)
+        legacy = {k: list(v) for k, v in codex.items()}
+        assert format_codex_for_prompt(codex) == format_codex_for_prompt(legacy)
+        assert codex.format_for_prompt(ids=["PL1"]) == "PLACES:\n[PL1] Canadian Border Peak — final climb"
+
+    def test_prompt_cache_is_bounded(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(codex_mod, "PROMPT_CACHE_SIZE", 2)
+        codex = compile_codex(_tree(tmp_path), snapshot_path=None)
+        first = codex.format_for_prompt(ids=["P1"])
+        assert codex.format_for_prompt(ids=["P1"]) is first
+        for ids in (["P2"], ["PL1"], ["CL1"]):
+            codex.format_for_prompt(ids=ids)
+        assert len(codex._prompt_cache) == 2 and (20, ("P1",)) not in codex._prompt_cache
+
+    def test_snapshot_written_once_and_reused(self, tmp_path):
+        (tmp_path / "codex").mkdir()
+        src = _tree(tmp_path / "codex")
+        snap = tmp_path / "codex.json"
+        first = compile_codex(src, snapshot_path=snap)
+        data = json.loads(snap.read_text(encoding="utf-8"))
+        assert data["version"] == 1 and len(data["entries"]) == 7
+
+        mtime = os.stat(snap).st_mtime_ns
+        second = compile_codex(src, snapshot_path=snap)
+        assert os.stat(snap).st_mtime_ns == mtime
+        assert second.fingerprint == first.fingerprint
+        assert second.refs("CL1") == ["P1", "PL1"]
+
+    def test_no_snapshot_without_codex_files(self, tmp_path):
+        snap = tmp_path / "codex.json"
+        assert compile_codex(tmp_path / "missing", snapshot_path=snap).entries() == []
+        assert not snap.exists()
+        # the default snapshot lives in the repo's data/, whatever the cwd
+        assert codex_mod.CODEX_JSON.is_absolute() and codex_mod.CODEX_JSON.parent.name == "data"
+
+    def test_previous_reused_until_content_changes(self, tmp_path):
+        src = _tree(tmp_path)
+        first = compile_codex(src, snapshot_path=None)
+        assert compile_codex(src, snapshot_path=None, previous=first) is first
+
+        _write(src, "people", "- [P1] Nikita Marwah — climber\n")
+        changed = compile_codex(src, snapshot_path=None, previous=first)
+        assert changed is not first
+        assert changed.fingerprint != first.fingerprint
+        assert changed.get_entry("P2") is None
+
+
+def test_load_codex_records_layout():
+    records = load_codex()
+    assert set(records) == {"claims", "sources", "people", "places"}
+    if records["claims"]:
+        assert set(records["claims"][0]) == {"id", "text", "status"}
+
+
+def test_real_codex_is_compiled():
+    from storygraph.context_loader import load_codex as load_lists
+    codex = load_lists()
+    assert isinstance(codex, Codex)
+    if codex.get_entry("CL2"):
+        assert "PL1" in codex.refs("CL2")
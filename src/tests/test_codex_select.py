@@ -0,0 +1,67 @@
+"""
+Unit tests for relevance-ranked, budgeted codex selection.
+"""
+from storygraph.codex import build_codex, ensure_codex
+from storygraph.codex_select import CodexSelector, beat_query, get_selector, relevant_ids, select_codex_for_prompt
+
+
+def _codex(n_filler: int = 60):
+    people = [(f"P{i}", f"Filler Person {i} — a baker in town number {i}") for i in range(1, n_filler)]
+    people.append(("P99", "Nikita Marwah — climber on Canadian Border Peak"))
+    return build_codex({
+        "people": people,
+        "places": [("PL1", "Canadian Border Peak — loose ridges, steep snow gullies"),
+                   ("PL2", "Whistler Village — bus terminals, coffee smell")],
+        "claims": [("CL1", "P99 died on PL1 after reaching the summit solo."),
+                   ("CL2", "P3 opened a bakery.")],
+        "sources": [("S1", "GoFundMe announcement")],
+    })
+
+
+class TestCodexSelector:
+    def test_relevant_entry_late_in_file_is_selected(self):
+        sel = CodexSelector(_codex())
+        ids = sel.select(beat_query("Nikita alone on the summit ridge", ["snow gullies"]), budget_tokens=120)
+        assert "P99" in ids
+        assert "PL1" in ids
+        assert "P1" not in ids
+
+    def test_co_occurrence_pulls_in_linked_claims(self):
+        sel = CodexSelector(_codex())
+        ranking = dict(sel.rank("Canadian Border Peak"))
+        assert ranking["CL1"] > 0
+        assert "CL2" not in ranking
+
+    def test_budget_is_respected(self):
+        sel = CodexSelector(_codex())
+        block = sel.format("", budget_tokens=50)
+        assert sel.count_tokens(block) <= 60
+        assert block.startswith("PEOPLE:")
+
+    def test_empty_query_falls_back_to_codex_order(self):
+        sel = CodexSelector(_codex())
+        assert sel.select("", budget_tokens=40)[0] == "P1"
+
+    def test_fill_tops_up_after_relevant_entries(self):
+        sel = CodexSelector(_codex())
+        ids = sel.select("Whistler", budget_tokens=10_000, fill=True)
+        assert ids[0] == "PL2"
+        assert len(ids) == len(sel.codex.by_id)
+
+    def test_rankings_are_cached_per_query(self):
+        sel = CodexSelector(_codex())
+        assert sel.rank("Whistler coffee") is sel.rank("Whistler coffee")
+
+
+def test_plain_dict_codex_is_accepted():
+    legacy = {"people": ["[P1] Nikita — climber"], "places": ["[PL1] Tomyhoi Peak"], "claims": [], "sources": []}
+    block = select_codex_for_prompt(legacy, "Tomyhoi", budget_tokens=100)
+    assert block == "PLACES:\n[PL1] Tomyhoi Peak"
+    assert relevant_ids(legacy, "anything", "people", 5) == ["P1"]
+
+
+def test_plain_dict_codex_is_compiled_once_per_content():
+    legacy = {"people": ["[P1] Nikita — climber"], "places": ["[PL1] Tomyhoi Peak"]}
+    assert ensure_codex(legacy) is ensure_codex(dict(legacy))
+    assert get_selector(legacy) is get_selector(dict(legacy))
+    assert ensure_codex({**legacy, "places": ["[PL2] Slesse"]}) is not ensure_codex(legacy)
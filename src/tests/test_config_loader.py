@@ -0,0 +1,92 @@
+"""
+Unit tests for resolved LLM profiles and per-stage settings.
+"""
+import time
+
+import pytest
+
+from storygraph import config_loader
+from storygraph.agents import fact
+from storygraph.config_loader import StageSettings, get_llm_settings, load_llm_profile, load_profile
+from storygraph.state import SceneDraft, StoryState
+
+YAML = """
+profiles:
+  default:
+    apply_to_all: openai/gpt-5
+    params: {retries: 2}
+    stages:
+      draft:
+        model: anthropic/claude-sonnet-4-5-20250929
+        params: {max_output_tokens: 12288, concurrency: 4}
+      fact: openai/gpt-4o
+  broken:
+    apply_to_all: openai/gpt-5
+    stages:
+      draft: {model: openai/gpt-5, params: {concurency: 4}}
+"""
+
+
+@pytest.fixture
+def cfg(tmp_path, monkeypatch):
+    path = tmp_path / "llm_profiles.yaml"
+    path.write_text(YAML, encoding="utf-8")
+    monkeypatch.setattr(config_loader, "_CFG", path)
+    monkeypatch.setattr(config_loader, "_cache", {})
+    monkeypatch.setattr(config_loader, "_profiles", {})
+    for stage in config_loader.STAGES:
+        monkeypatch.delenv(f"LLM_{stage.upper()}_MODEL", raising=False)
+    monkeypatch.delenv("LLM_PROFILE", raising=False)
+    return path
+
+
+def test_stage_settings_resolution(cfg):
+    p = load_profile("default")
+    draft = p.stage("draft")
+    assert draft.model == "anthropic/claude-sonnet-4-5-20250929"
+    assert (draft.max_tokens, draft.concurrency, draft.retries) == (12288, 4, 2)
+    assert p.stage("fact").model == "openai/gpt-4o"
+    assert p.stage("planner").model == "openai/gpt-5"
+    assert load_profile("default") is p  # cached
+
+
+def test_legacy_helpers_agree_on_nested_models(cfg):
+    models, params = get_llm_settings()
+    assert models["draft"] == "anthropic/claude-sonnet-4-5-20250929"  # nested stages.<stage>.model
+    assert params == {"retries": 2}
+    legacy = load_llm_profile("default")
+    assert {k: legacy[k] for k in models} == models
+    assert legacy["settings"]["draft"]["concurrency"] == 4
+
+
+def test_env_override_and_validation(cfg, monkeypatch):
+    monkeypatch.setenv("LLM_FACT_MODEL", "anthropic/claude-haiku-4-5")
+    assert load_profile("default").stage("fact").model == "anthropic/claude-haiku-4-5"
+    with pytest.raises(RuntimeError, match="Unknown LLM param 'concurency'"):
+        load_profile("broken")
+    with pytest.raises(RuntimeError, match="not found"):
+        load_profile("nope")
+    with pytest.raises(RuntimeError, match="batching must be one of"):
+        StageSettings(model="openai/gpt-5", batching="sometimes")
+
+
+def test_yaml_edit_is_picked_up(cfg):
+    p1 = load_profile("default")
+    cfg.write_text(YAML.replace("concurrency: 4", "concurrency: 8") + "\n", encoding="utf-8")
+    assert load_profile("default").stage("draft").concurrency == 8
+    assert p1.stage("draft").concurrency == 4
+
+
+class _EchoClient:
+    def complete_json(self, system, user, schema):
+        scene_id = user.split("Scene ID: ", 1)[1].split()[0]
+        time.sleep(0.01 * (6 - int(scene_id[1:])))  # later scenes finish first
+        return {"scene_id": scene_id, "claims": [{"claim": scene_id, "substantiated": True}]}
+
+
+def test_fact_parallel_batching_keeps_scene_order():
+    s = StoryState()
+    s.drafts = {f"B{i}": SceneDraft(scene_id=f"B{i}", text=f"Scene {i} text.") for i in range(6)}
+    settings = StageSettings(model="fake/model", concurrency=3, batching="parallel")
+    out = fact.run(s, model="fake/model", context={"sources": {}}, settings=settings, client=_EchoClient())
+    assert [r["scene_id"] for r in out.claim_graph["claims_by_scene"]] == list(s.drafts)
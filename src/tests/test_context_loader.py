@@ -4,6 +4,7 @@ Unit tests for context_loader module.
 Tests context loading without making LLM calls.
 """
 import pytest
+from collections.abc import Mapping
 from pathlib import Path
 from storygraph.context_loader import (
     load_codex,
@@ -157,7 +158,7 @@ class TestLoadAllContext:
         
         assert isinstance(context["codex"], dict)
         assert isinstance(context["notes"], str)
-        assert isinstance(context["sources"], dict)
+        assert isinstance(context["sources"], Mapping)
     
     def test_load_all_context_codex_complete(self):
         """Test codex in unified context has all categories."""
@@ -0,0 +1,92 @@
+"""
+Unit tests for the cached context store.
+"""
+import os
+import threading
+from pathlib import Path
+
+from storygraph.context_store import ContextStore, get_context_store
+from storygraph.context_loader import load_all_context
+
+
+def _make_tree(tmp_path: Path) -> ContextStore:
+    codex = tmp_path / "codex"
+    codex.mkdir()
+    (codex / "people.md").write_text("- [P1] Nikita Marwah — climber\n", encoding="utf-8")
+    (codex / "places.md").write_text("- [PL1] Canadian Border Peak\n", encoding="utf-8")
+    notes = tmp_path / "notes.md"
+    notes.write_text("## Fragments\n- wind\n", encoding="utf-8")
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    (sources / "a.txt").write_text("AUTHOR INTENT", encoding="utf-8")
+    return ContextStore(codex_dir=codex, notes_path=notes, sources_dir=sources)
+
+
+def _bump_mtime(path: Path) -> None:
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+class TestContextStore:
+    def test_load_all_structure(self, tmp_path):
+        ctx = _make_tree(tmp_path).load_all()
+        assert ctx["codex"]["people"] == ["[P1] Nikita Marwah — climber"]
+        assert ctx["codex"]["places"] == ["[PL1] Canadian Border Peak"]
+        assert ctx["codex"]["claims"] == []
+        assert ctx["notes"].startswith("## Fragments")
+        assert dict(ctx["sources"]) == {"a": "AUTHOR INTENT"}
+
+    def test_second_load_is_cached(self, tmp_path):
+        store = _make_tree(tmp_path)
+        first = store.load_all()
+        misses = store.misses
+        second = store.load_all()
+        assert store.misses == misses
+        assert first["codex"]["people"] is second["codex"]["people"]
+
+    def test_changed_file_is_reparsed(self, tmp_path):
+        store = _make_tree(tmp_path)
+        store.load_all()
+        people = tmp_path / "codex" / "people.md"
+        people.write_text("- [P1] Nikita\n- [P2] Chris\n", encoding="utf-8")
+        _bump_mtime(people)
+        assert store.codex()["people"] == ["[P1] Nikita", "[P2] Chris"]
+
+    def test_touch_without_change_keeps_parse(self, tmp_path):
+        store = _make_tree(tmp_path)
+        before = store.codex()["people"]
+        misses = store.misses
+        _bump_mtime(tmp_path / "codex" / "people.md")
+        after = store.codex()["people"]
+        assert after is before
+        assert store.misses == misses
+
+    def test_new_and_removed_sources(self, tmp_path):
+        store = _make_tree(tmp_path)
+        (tmp_path / "sources" / "b.txt").write_text("B", encoding="utf-8")
+        assert set(store.sources()) == {"a", "b"}
+        (tmp_path / "sources" / "a.txt").unlink()
+        assert set(store.sources()) == {"b"}
+
+    def test_concurrent_loads_share_results(self, tmp_path):
+        store = _make_tree(tmp_path)
+        results = []
+
+        def worker():
+            ctx = store.load_all()
+            results.append((ctx["codex"]["people"], ctx["sources"]))
+
+        threads = [threading.Thread(target=worker) for _ in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(results) == 16
+        assert all(r[0] is results[0][0] and r[1] is results[0][1] for r in results)
+        assert store.misses == 2  # codex, notes
+
+
+def test_load_all_context_uses_shared_store():
+    assert get_context_store() is get_context_store()
+    ctx = load_all_context()
+    assert set(ctx) == {"codex", "notes", "sources"}
@@ -0,0 +1,72 @@
+"""
+Unit tests for the memory-mapped source corpus.
+"""
+import os
+
+from storygraph.corpus import Passage, SourceCorpus, source_head
+
+
+def _corpus(tmp_path, **files):
+    for name, text in files.items():
+        (tmp_path / f"{name}.txt").write_text(text, encoding="utf-8")
+    return SourceCorpus(tmp_path)
+
+
+class TestSourceCorpus:
+    def test_mapping_interface(self, tmp_path):
+        corpus = _corpus(tmp_path, a="alpha text", b="beta")
+        assert sorted(corpus) == ["a", "b"]
+        assert len(corpus) == 2
+        assert "a" in corpus
+        assert corpus["a"] == "alpha text"
+
+    def test_head_and_slice(self, tmp_path):
+        corpus = _corpus(tmp_path, a="Nikita — Tomyhoi Peak")
+        assert corpus.head("a", 8) == "Nikita —"
+        view = corpus.slice("a", 0, 6)
+        assert isinstance(view, memoryview)
+        assert bytes(view) == b"Nikita"
+
+    def test_text_snaps_to_utf8_boundaries(self, tmp_path):
+        corpus = _corpus(tmp_path, a="ab—cd")
+        # byte 3 is inside the 3-byte em dash
+        assert corpus.text("a", 3, 7) == "cd"
+
+    def test_iter_chunks_cover_document_on_word_boundaries(self, tmp_path):
+        words = " ".join(f"word{i}" for i in range(500))
+        corpus = _corpus(tmp_path, a=words)
+        chunks = list(corpus.iter_chunks(chunk_bytes=100))
+        assert len(chunks) > 10
+        rebuilt = " ".join(c.text(corpus) for c in chunks)
+        assert rebuilt.split() == words.split()
+
+    def test_find_returns_passages(self, tmp_path):
+        corpus = _corpus(tmp_path, a="x " * 200 + "Canadian Border Peak" + " y" * 200)
+        hits = corpus.find("Border Peak", context_bytes=10)
+        assert len(hits) == 1
+        assert isinstance(hits[0], Passage)
+        assert "Border Peak" in hits[0].text(corpus)
+
+    def test_reflects_file_changes(self, tmp_path):
+        corpus = _corpus(tmp_path, a="old")
+        assert corpus["a"] == "old"
+        (tmp_path / "a.txt").write_text("new and longer", encoding="utf-8")
+        assert corpus["a"] == "new and longer"
+
+    def test_remap_leaves_a_held_buffer_usable(self, tmp_path):
+        corpus = _corpus(tmp_path, a="old text " * 100)
+        held = corpus.document("a").buffer()   # e.g. a find() running on another thread
+        new = tmp_path / "new.tmp"
+        new.write_text("replaced", encoding="utf-8")
+        os.replace(new, tmp_path / "a.txt")
+        assert corpus.head("a", 20) == "replaced"   # re-maps the document
+        assert held.find(b"text") == 4 and bytes(held[:8]) == b"old text"
+
+    def test_empty_file(self, tmp_path):
+        corpus = _corpus(tmp_path, a="")
+        assert corpus["a"] == ""
+        assert list(corpus.iter_chunks()) == []
+
+
+def test_source_head_accepts_plain_dict():
+    assert source_head({"a": "abcdef"}, "a", 3) == "abc"
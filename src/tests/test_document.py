@@ -0,0 +1,131 @@
+"""
+Unit tests for the segment document model behind StoryState's draft views.
+"""
+from storygraph import document
+from storygraph.document import StoryDocument, apply, diff
+from storygraph.state import SceneDraft, StoryState
+
+BEATS = {
+    "B1": "We left the trailhead before dawn. The snow was hard.",
+    "B2": "At the col the wind picked up.\n\nShe pointed at the summit.",
+    "B3": "The descent was slower than we had planned.",
+}
+
+
+def _state():
+    s = StoryState(drafts={k: SceneDraft(scene_id=k, text=v) for k, v in BEATS.items()})
+    s.draft_v1_concat = "\n\n".join(BEATS.values())
+    return s
+
+
+def test_diff_apply_round_trip():
+    old = "The snow was hard under our boots."
+    new = "The snow was soft and deep under our worn boots!"
+    assert apply(old, diff(old, new)) == new
+    assert diff(old, old) == ()
+
+
+def test_v1_segments_share_draft_strings():
+    s = _state()
+    assert s.draft_v1_concat == "\n\n".join(BEATS.values())
+    for k, d in s.drafts.items():
+        assert s.document.segment(k).base is d.text
+
+
+def test_story_level_revision_becomes_segment_deltas():
+    s = _state()
+    v1 = s.draft_v1_concat
+    v2 = v1.replace("hard", "soft").replace("slower", "much slower")
+    s.draft_v2_concat = v2
+    doc = s.document
+    assert s.draft_v2_concat == v2
+    assert s.draft_v1_concat == v1
+    assert doc.segment("B1").labels == ("v1", "v2")
+    assert doc.segment("B2").labels == ("v1",)
+    assert doc.text("B2", "v2") == BEATS["B2"]
+    assert doc.nbytes() < len(v1) + 64
+
+
+def test_edit_across_beats_keeps_whole_text():
+    s = _state()
+    v2 = s.draft_v1_concat.replace("hard.\n\nAt the col", "hard at the col")
+    s.draft_v2_concat = v2
+    assert s.draft_v2_concat == v2
+    assert s.draft_v1_concat == "\n\n".join(BEATS.values())
+
+
+def test_per_beat_update_invalidates_only_views():
+    s = _state()
+    s.draft_v2_concat = s.draft_v1_concat
+    s.set_beat_text("B3", "The descent took all afternoon.")
+    assert s.draft_v2_concat.endswith("The descent took all afternoon.")
+    assert s.draft_v1_concat.endswith(BEATS["B3"])
+
+
+def test_copies_do_not_share_updates():
+    s = _state()
+    s.draft_v2_concat = s.draft_v1_concat
+    c = s.model_copy()
+    c.draft_v2_concat = "rewritten"
+    assert s.draft_v2_concat == s.draft_v1_concat
+    assert c.draft_v2_concat == "rewritten"
+
+
+def test_json_round_trip_and_equality():
+    s = _state()
+    s.draft_v2_concat = s.draft_v1_concat.replace("dawn", "first light")
+    data = s.model_dump_json()
+    again = StoryState.model_validate_json(data)
+    assert again == s
+    assert again.draft_v2_concat == s.draft_v2_concat
+    assert StoryState() == StoryState.model_validate({"draft_v1_concat": "", "draft_v2_concat": ""})
+
+
+def test_document_labels_fall_back_to_earlier_versions():
+    doc = StoryDocument.from_texts({"a": "one", "b": "two"})
+    doc.set_segment("a", "uno", "v2")
+    assert doc.view("v1") == "one\n\ntwo"
+    assert doc.view("v2") == "uno\n\ntwo"
+    doc.remove_label("v2")
+    assert doc.view() == "one\n\ntwo"
+
+
+def test_story_revision_diffs_each_beat_on_its_own(monkeypatch):
+    s = _state()
+    seen = []
+    monkeypatch.setattr(document, "diff", lambda old, new: seen.append(old) or diff(old, new))
+    s.draft_v2_concat = s.draft_v1_concat.replace("hard", "soft").replace("wind", "gale")
+    assert sorted(seen) == sorted([BEATS["B1"], BEATS["B2"]])
+    assert s.document.segment("B3").labels == ("v1",)
+
+
+def test_paragraph_merge_inside_a_beat_is_still_segmented():
+    s = _state()
+    v2 = s.draft_v1_concat.replace("picked up.\n\nShe", "picked up. She")
+    s.draft_v2_concat = v2
+    assert s.draft_v2_concat == v2 and s.document.is_segmented("v2")
+    assert s.document.segment("B2").labels == ("v1", "v2")
+
+
+def test_decode_applies_stored_deltas_without_diffing(monkeypatch):
+    s = _state()
+    s.draft_v2_concat = s.draft_v1_concat.replace("dawn", "first light")
+    data = s.model_dump_json()
+    assert s.draft_v2_deltas == {"B1": [[29, 35, "first light. "]]}
+
+    def no_diff(old, new):
+        raise AssertionError("decode diffed")
+    monkeypatch.setattr(document, "diff", no_diff)
+    again = StoryState.model_validate_json(data)
+    assert again.draft_v2_concat == s.draft_v2_concat
+    assert again.document.segment("B1").labels == ("v1", "v2")
+
+
+def test_stale_deltas_fall_back_to_diffing():
+    s = _state()
+    s.draft_v2_concat = s.draft_v1_concat.replace("dawn", "first light")
+    data = s.model_dump(mode="json")
+    data["draft_v2_deltas"] = {"B1": [[0, 2, "They"]]}
+    assert StoryState.model_validate(data).draft_v2_concat == s.draft_v2_concat
+    data["draft_v2_deltas"] = {"B9": []}
+    assert StoryState.model_validate(data).draft_v2_concat == s.draft_v2_concat
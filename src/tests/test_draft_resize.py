@@ -0,0 +1,68 @@
+"""
+Unit tests for in-loop beat length enforcement in the draft agent.
+"""
+import threading
+
+from storygraph.agents import draft
+from storygraph.state import Beat, Outline, SceneDraft, StoryState
+
+
+def _words(n: int) -> str:
+    return " ".join(["snow"] * n) + "."
+
+
+class FakeClient:
+    """Returns scripted word counts: drafts first, then resizes per beat."""
+
+    def __init__(self, drafted, resized):
+        self.drafted = dict(drafted)
+        self.resized = {k: list(v) for k, v in resized.items()}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def complete_json(self, system, user, schema_hint):
+        beat_id = user.split("Beat: ", 1)[1].split(" ", 1)[0]
+        with self._lock:
+            if "CURRENT TEXT" in user:
+                self.calls.append(("resize", beat_id))
+                return {"scene_id": beat_id, "text": _words(self.resized[beat_id].pop(0))}
+            self.calls.append(("draft", beat_id))
+            return {"scene_id": beat_id, "text": _words(self.drafted[beat_id]), "flags": []}
+
+
+def _state(*targets):
+    beats = [Beat(id=f"B{i}", purpose=f"purpose {i}", target_words=t) for i, t in enumerate(targets, 1)]
+    return StoryState(outline=Outline(template="t", beats=beats))
+
+
+def test_band_matches_tolerance():
+    lo, hi = draft.beat_band(100, 0.15)
+    assert (lo, hi) == (85, 115)
+
+
+def test_only_out_of_band_beats_are_resized():
+    client = FakeClient({"B1": 100, "B2": 40, "B3": 200}, {"B2": [95], "B3": [108]})
+    state = draft.run(_state(100, 100, 100), model="fake/model", client=client)
+    resizes = [c for c in client.calls if c[0] == "resize"]
+    assert sorted(resizes) == [("resize", "B2"), ("resize", "B3")]
+    assert state.drafts["B2"].word_count == 95
+    assert state.drafts["B3"].word_count == 108
+    assert list(state.drafts) == ["B1", "B2", "B3"]
+    assert set(state.metrics["resized_beats"]) == {"B2", "B3"}
+    assert set(state.metrics["style"]["beats"]) == {"B1", "B2", "B3"}
+
+
+def test_attempts_are_capped_and_best_attempt_kept():
+    client = FakeClient({}, {"B1": [60, 70, 99]})
+    beat = Beat(id="B1", purpose="p", target_words=100)
+    out = draft.resize_beat(client, beat, SceneDraft(scene_id="B1", text=_words(40)), max_attempts=2)
+    assert len(client.calls) == 2
+    assert out.word_count == 70
+    assert out.flags[-1]["type"] == "length"
+
+
+def test_resizing_can_be_disabled():
+    client = FakeClient({"B1": 10}, {})
+    state = draft.run(_state(100), model="fake/model", client=client, max_resize_attempts=0)
+    assert client.calls == [("draft", "B1")]
+    assert state.metrics["resized_beats"] == {}
@@ -0,0 +1,102 @@
+"""
+Unit tests for the streaming Markdown/HTML export engine.
+"""
+import pytest
+
+from storygraph.export import BeatStream, export_run, export_runs, export_state, render_text, sections
+from storygraph.runstore import RunStore
+
+BEATS = {
+    "B1": "We left the trailhead before dawn. The snow was hard.",
+    "B2": "At the col the wind picked up.",
+    "B3": "The descent was slower than we had planned.",
+}
+
+
+V2 = "\n\n".join(BEATS.values()).replace("hard", "soft")
+
+
+@pytest.fixture
+def state(make_state):
+    return make_state(beats=BEATS, v2=V2)
+
+
+def test_markdown_views_have_one_section_per_beat(state):
+    v1 = render_text(state, "md", "v1")
+    v2 = render_text(state, "md", "v2")
+    assert v1.startswith("# Youth, mountains — Granta - submission guidelines compatible")
+    assert [line for line in v2.splitlines() if line.startswith("### BEAT:")] == [f"### BEAT: {k}" for k in BEATS]
+    assert "snow was hard" in v1 and "snow was soft" in v2
+    # the combined draft is not appended after the sections
+    assert v2.count("The descent was slower") == 1
+
+
+def test_diff_view_marks_edits(state):
+    md = render_text(state, "md", "diff")
+    assert "<del>hard.</del><ins>soft.</ins>" in md
+    assert "<del>" not in md.split("### BEAT: B2")[1]
+
+
+def test_html_escapes_text(state):
+    state.set_beat_text("B2", "The <wind> & the col.")
+    out = render_text(state, "html", "v2")
+    assert out.startswith("<!DOCTYPE html>") and out.rstrip().endswith("</html>")
+    assert "The &lt;wind&gt; &amp; the col." in out
+    assert '<section id="B1">' in out
+
+
+def test_cross_beat_edit_exports_single_section(state):
+    state.draft_v2_concat = state.draft_v1_concat.replace("hard.\n\nAt the col", "hard at the col")
+    secs = list(sections(state, "v2"))
+    assert len(secs) == 1 and secs[0][0] is None
+    assert "hard at the col" in secs[0][1]
+    # v1 still has its beats
+    assert [b for b, _ in sections(state, "v1")] == list(BEATS)
+
+
+def test_beat_stream_orders_late_beats(tmp_path):
+    path = tmp_path / "v1.md"
+    stream = BeatStream(path, list(BEATS), "Story")
+    stream.add("B2", BEATS["B2"])
+    stream.add("B1", BEATS["B1"])
+    assert not path.exists()  # moved into place on close
+    stream.add("B3", BEATS["B3"])
+    stream.close()
+    text = path.read_text(encoding="utf-8")
+    assert text.index("BEAT: B1") < text.index("BEAT: B2") < text.index("BEAT: B3")
+
+
+def test_failed_draft_stage_aborts_the_stream(tmp_path, monkeypatch, state):
+    from storygraph import router
+
+    def failing_draft(state, on_beat=None, **kwargs):
+        on_beat("B1", state.drafts["B1"])
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(router.draft, "run", failing_draft)
+    path = tmp_path / "story_v1.md"
+    path.write_text("previous run", encoding="utf-8")
+    pipe = router.Pipeline(stream_path=path)
+    with pytest.raises(RuntimeError, match="provider down"):
+        pipe.resume(state, after="planner")
+    assert path.read_text(encoding="utf-8") == "previous run"
+    assert not list(tmp_path.glob(".*.tmp"))
+
+
+def test_export_state_picks_format_from_suffix(tmp_path, state):
+    out = export_state(state, tmp_path / "story.html")
+    assert out.read_text(encoding="utf-8").startswith("<!DOCTYPE html>")
+    assert not list(tmp_path.glob(".*.tmp"))
+
+
+def test_export_persisted_runs(tmp_path, make_state):
+    db = tmp_path / "runs.sqlite"
+    with RunStore(db) as store:
+        ids = [store.save_run(make_state(beats=BEATS, v2=V2)) for _ in range(2)]
+    paths = export_run(ids[0], tmp_path / "out", formats=("md", "html"), db_path=db)
+    assert sorted(p.rsplit("_", 1)[-1] for p in paths) == ["v1.html", "v1.md", "v2.html", "v2.md"]
+
+    written = export_runs(ids, tmp_path / "many", views=("diff",), db_path=db, processes=2)
+    assert set(written) == set(ids)
+    for rid in ids:
+        assert "<ins>soft.</ins>" in (tmp_path / "many" / f"{rid}_diff.md").read_text(encoding="utf-8")
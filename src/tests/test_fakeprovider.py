@@ -0,0 +1,96 @@
+"""
+Tests for the fake provider server, driven through LLMClient.
+"""
+import json
+import random
+import urllib.error
+import urllib.request
+
+import pytest
+
+from storygraph import hooks, llm
+from storygraph.fakeprovider import FakeProvider, ProviderConfig, classify, client_env, parse_latency
+from storygraph.llm import LLMClient, LLMConfig
+from storygraph.prompts import get_prompt
+
+
+@pytest.fixture
+def provider(monkeypatch, request):
+    cfg = getattr(request, "param", None) or ProviderConfig(latency="0", seed=1)
+    with FakeProvider(cfg) as server:
+        for k, v in client_env(server.url).items():
+            monkeypatch.setenv(k, v)
+        yield server
+
+
+def _draft_request():
+    prompt = get_prompt("draft")
+    user = prompt.render(beat_id="B2", purpose="the col", n=120, motifs="", codex="", notes_fragments="")
+    return prompt.system, user, prompt.schema
+
+
+def test_latency_specs():
+    rng = random.Random(0)
+    assert parse_latency("0.25")(rng) == parse_latency("fixed:0.25")(rng) == 0.25
+    assert all(0.1 <= parse_latency("uniform:0.1:0.2")(rng) <= 0.2 for _ in range(50))
+    assert min(parse_latency("normal:0:1")(rng) for _ in range(50)) == 0.0
+    assert parse_latency("lognormal:0.3:0")(rng) == pytest.approx(0.3)
+    with pytest.raises(ValueError, match="bad latency"):
+        parse_latency("gamma:1:2")
+
+
+@pytest.mark.parametrize("model", ["anthropic/claude-x", "openai/gpt-5", "openai/gpt-4o"])
+def test_every_endpoint_answers_the_stage(provider, model):
+    obj = LLMClient(LLMConfig(model=model)).complete_json(*_draft_request())
+    assert obj["scene_id"] == "B2"
+    assert 100 <= len(obj["text"].split()) <= 150
+    assert provider.stats()["stage:draft"] == 1
+
+
+def test_stage_is_recognized_from_each_prompt():
+    renders = {
+        "planner": dict(premise="p", venue="v", preferred="braided", codex="", notes_fragments=""),
+        "fact": dict(scene_id="B1", scene_text="t", quotes="[]"),
+        "resize": dict(beat_id="B1", purpose="p", actual=10, n=100, lo=85, hi=115, direction="Expand", text="t"),
+        "revision": dict(g=1, c=1, w=1, i=1, r=1, scope="story", text="t"),
+    }
+    for stage, values in renders.items():
+        assert classify(get_prompt(stage).render(**values, strict=False)) == stage
+    assert classify(_draft_request()[1]) == "draft"
+
+
+@pytest.mark.parametrize("provider", [ProviderConfig(latency="0", rate_limit=1.0, retry_after_s=2)], indirect=True)
+def test_rate_limit_is_retried_then_raised(provider, monkeypatch):
+    monkeypatch.setattr(llm.time, "sleep", lambda s: None)
+    seen = []
+    with hooks.get_hooks().subscribe(seen.append, ("retry", "llm_call_finished")):
+        with pytest.raises(Exception, match="429"):
+            LLMClient(LLMConfig(model="anthropic/claude-x", retries=2)).complete_json(*_draft_request())
+    assert [e.kind for e in seen] == ["retry", "retry", "llm_call_finished"]
+    assert seen[-1].ok is False and seen[-1].attempts == 3 and "429" in seen[-1].error
+    req = urllib.request.Request(provider.url + "/v1/chat/completions", data=b"{}", method="POST")
+    with pytest.raises(urllib.error.HTTPError) as http:
+        urllib.request.urlopen(req)
+    assert http.value.code == 429 and http.value.headers["Retry-After"] == "2"
+
+
+@pytest.mark.parametrize("provider", [ProviderConfig(latency="0", overload=1.0)], indirect=True)
+def test_overload_status_per_provider(provider):
+    for path, status in (("/v1/messages", 529), ("/v1/responses", 503)):
+        code, body, _ = provider.handle(path, b"{}")
+        assert code == status and "Overloaded" in json.dumps(body)
+
+
+@pytest.mark.parametrize("provider", [ProviderConfig(latency="0", malformed=1.0)], indirect=True)
+def test_malformed_json_is_recovered_by_the_sanitizer(provider):
+    obj = LLMClient(LLMConfig(model="anthropic/claude-x")).complete_json(*_draft_request())
+    assert obj["scene_id"] == "B2"
+    assert provider.stats()["fault:malformed"] == 1
+
+
+@pytest.mark.parametrize("provider", [ProviderConfig(latency="0", truncate=1.0)], indirect=True)
+def test_truncated_response_fails_the_call(provider):
+    code, body, _ = provider.handle("/v1/chat/completions", json.dumps({"messages": [{"role": "user", "content": _draft_request()[1]}]}).encode())
+    assert code == 200 and body["choices"][0]["finish_reason"] == "length"
+    with pytest.raises(RuntimeError, match="invalid JSON"):
+        LLMClient(LLMConfig(model="openai/gpt-5")).complete_json(*_draft_request())
@@ -0,0 +1,188 @@
+"""
+Tests for the lifecycle hooks: bus, scope propagation, sinks, and the
+events a full pipeline run emits against the fake provider.
+"""
+import asyncio
+import json
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from storygraph import hooks, llm
+from storygraph.fakeprovider import FakeProvider, ProviderConfig, client_env
+from storygraph.hooks import HookBus, JSONLSink, PrometheusSink
+from storygraph.llm import LLMClient, LLMConfig
+from storygraph.writer import BackgroundWriter
+
+
+def test_no_subscriber_builds_no_event(monkeypatch):
+    bus = HookBus()
+    built = []
+    monkeypatch.setattr(hooks.StageStarted, "__init__", lambda self, **kw: built.append(kw))
+    with hooks.scope(bus, run_id="r1"):
+        assert not hooks.wants(hooks.StageStarted)
+        hooks.emit(hooks.StageStarted, stage="draft")
+    assert built == []
+
+
+def test_subscribe_by_kind_and_unsubscribe():
+    parent, seen, everything = HookBus(), [], []
+    bus = HookBus(parent=parent)
+    with pytest.raises(ValueError, match="unknown event kind"):
+        bus.subscribe(seen.append, ["stage_done"])
+    sub = bus.subscribe(seen.append, [hooks.StageFinished])
+    parent.subscribe(everything.append)
+    bus.emit(hooks.StageStarted(run_id="r1", stage="draft"))
+    bus.emit(hooks.StageFinished(run_id="r1", stage="draft", duration_s=1.5))
+    assert [e.kind for e in seen] == ["stage_finished"]
+    assert [e.kind for e in everything] == ["stage_started", "stage_finished"]
+    sub.close()
+    bus.emit(hooks.StageFinished(run_id="r1", stage="fact", duration_s=0.1))
+    assert len(seen) == 1 and len(everything) == 3
+    assert seen[0].as_dict() == {"type": "stage_finished", "run_id": "r1", "stage": "draft",
+                                 "t": seen[0].t, "duration_s": 1.5}
+
+
+def test_failing_subscriber_does_not_stop_the_others(capsys):
+    bus, seen = HookBus(), []
+
+    def broken(event):
+        raise KeyError("boom")
+    bus.subscribe(broken)
+    bus.subscribe(seen.append)
+    bus.emit(hooks.RunStarted(run_id="r1", premise="p", venue="v", stages=("planner",)))
+    assert len(seen) == 1 and "[HOOKS]" in capsys.readouterr().out
+
+
+def test_bind_carries_run_and_stage_into_worker_threads():
+    bus, seen = HookBus(), []
+    bus.subscribe(seen.append, ["retry"])
+
+    def work(i):
+        hooks.emit(hooks.Retry, model="m", attempt=i, delay_s=0.0, error="x")
+        return threading.current_thread().name
+
+    with hooks.scope(bus, run_id="r1"), hooks.scope(stage="fact"):
+        with ThreadPoolExecutor(2) as pool:
+            names = list(pool.map(hooks.bind(work), range(4)))
+        with ThreadPoolExecutor(1) as pool:
+            pool.submit(work, 9).result()   # unbound: the process-wide bus, no run
+    assert all(n != threading.current_thread().name for n in names)
+    assert sorted(e.attempt for e in seen) == [0, 1, 2, 3]
+    assert {(e.run_id, e.stage) for e in seen} == {("r1", "fact")}
+
+
+class FakeLLM(LLMClient):
+    def __init__(self, cfg, fail=0):
+        self.calls, self.fail = 0, fail
+        super().__init__(cfg)
+
+    def _select_backend(self, model):
+        return ("fake", None)
+
+    def _complete(self, system, user, schema_hint):
+        self.calls += 1
+        if self.calls <= self.fail:
+            raise RuntimeError("overloaded")
+        return {"text": user}
+
+
+def test_llm_client_emits_call_retry_and_cache_events(monkeypatch):
+    monkeypatch.setattr(llm.time, "sleep", lambda s: None)
+    monkeypatch.setattr(llm, "_memory_cache", llm.OrderedDict())
+    bus, seen = HookBus(), []
+    bus.subscribe(seen.append)
+    client = FakeLLM(LLMConfig(model="fake/m", retries=2, cache="memory"), fail=1)
+    with hooks.scope(bus, run_id="r1", stage="draft"):
+        client.complete_json("s", "u", "{}")
+        client.complete_json("s", "u", "{}")
+    assert [e.kind for e in seen] == ["llm_call_started", "retry", "llm_call_finished",
+                                      "llm_call_started", "cache_hit", "llm_call_finished"]
+    first, second = seen[2], seen[5]
+    assert first.ok and first.attempts == 2 and not first.cached
+    assert second.cached and second.attempts == 0 and seen[4].policy == "memory"
+    assert {e.stage for e in seen} == {"draft"}
+
+
+def test_checkpoint_written_reports_size(tmp_path):
+    seen = []
+    with BackgroundWriter(fsync=False) as w:
+        w.write(tmp_path / "c.sgst", b"12345", on_written=lambda path, size, s: seen.append((path.name, size)))
+        assert w.flush(timeout=5)
+    assert seen == [("c.sgst", 5)]
+
+
+def test_pipeline_run_emits_lifecycle_events(monkeypatch, tmp_path):
+    from storygraph.config_loader import load_profile
+    from storygraph.router import Pipeline
+
+    settings = load_profile(None)
+    for stage in list(settings.stages):
+        settings = settings.with_stage(stage, cache="off", retry_backoff_s=0.0)
+    cfg = ProviderConfig(latency="0", beats=3, words=60, rate_limit=0.2, seed=5)
+    with FakeProvider(cfg) as server:
+        for k, v in client_env(server.url).items():
+            monkeypatch.setenv(k, v)
+        pipe = Pipeline(seed=3, settings=settings, run_id="r1",
+                        writer=BackgroundWriter(fsync=False), checkpoint_path=tmp_path / "checkpoint.sgst")
+        seen, trace = [], JSONLSink(tmp_path / "trace.jsonl")
+        pipe.hooks.subscribe(seen.append)
+        with hooks.get_hooks().subscribe(trace):
+            pipe.run_minimal("Ice", "Granta", models=settings.models())
+            pipe.writer.close()   # checkpoints are written (and reported) on the writer thread
+        trace.close()
+    kinds = [e.kind for e in seen]
+    run = [k for k in kinds if k != "checkpoint_written"]
+    assert run[0] == "run_started" and run[-1] == "run_finished"
+    assert kinds.count("beat_started") == kinds.count("beat_finished") == kinds.count("beat_drafted") == 3
+    assert 1 <= kinds.count("checkpoint_written") <= 4   # writes to one path coalesce
+    calls = [e for e in seen if e.kind == "llm_call_finished"]
+    assert kinds.count("llm_call_started") == len(calls)
+    assert server.stats()["requests"] == sum(e.attempts for e in calls)
+    assert kinds.count("retry") == sum(e.attempts - 1 for e in calls)
+    assert all(e.run_id == "r1" for e in seen)
+    # calls made on the fact and resize worker threads keep their stage
+    assert {e.stage for e in calls} == {"planner", "draft", "fact", "revision"}
+
+    lines = [json.loads(line) for line in (tmp_path / "trace.jsonl").read_text().splitlines()]
+    assert [d["type"] for d in lines if d["type"] != "checkpoint_written"] == run
+    assert all("text" not in d for d in lines if d["type"] == "beat_drafted")
+
+
+def test_prometheus_sink_renders_counters_and_histograms():
+    bus, sink = HookBus(), PrometheusSink()
+    sink.attach(bus)
+    bus.emit(hooks.LLMCallStarted(run_id="r1", stage="draft", model='a/"x"'))
+    bus.emit(hooks.LLMCallFinished(run_id="r1", stage="draft", model='a/"x"', attempts=2, duration_s=0.3))
+    bus.emit(hooks.Retry(run_id="r1", stage="draft", model='a/"x"', attempt=0, delay_s=0.1, error="429"))
+    bus.emit(hooks.StageFinished(run_id="r1", stage="draft", duration_s=7.0))
+    text = sink.render()
+    assert '# TYPE storygraph_llm_calls_total counter' in text
+    assert 'storygraph_llm_calls_total{model="a/\\"x\\"",outcome="ok",stage="draft"} 1' in text
+    assert 'storygraph_llm_requests_total{model="a/\\"x\\""} 2' in text
+    assert 'storygraph_llm_calls_in_flight{model="a/\\"x\\""} 0' in text
+    assert 'storygraph_stage_duration_seconds_bucket{stage="draft",le="5"} 0' in text
+    assert 'storygraph_stage_duration_seconds_bucket{stage="draft",le="10"} 1' in text
+    assert 'storygraph_stage_duration_seconds_count{stage="draft"} 1' in text
+
+
+def test_service_serves_metrics(tmp_path):
+    from storygraph.runstore import RunStore
+    from storygraph.service import StoryService
+
+    async def scenario():
+        with RunStore(tmp_path / "runs.sqlite") as store:
+            service = StoryService(store=store, runner=lambda *a: None)
+            await service.start(port=0)
+            hooks.get_hooks().emit(hooks.RunStarted(run_id="r1", premise="p", venue="v", stages=()))
+            url = f"http://127.0.0.1:{service.port}/metrics"
+            try:
+                resp = await asyncio.to_thread(urllib.request.urlopen, url)
+                return resp.headers["Content-Type"], resp.read().decode()
+            finally:
+                await service.close()
+
+    ctype, body = asyncio.run(scenario())
+    assert ctype.startswith("text/plain") and 'storygraph_runs_total{status="started"} 1' in body
@@ -0,0 +1,130 @@
+"""
+Unit tests for the SQLite job queue and worker.
+"""
+import threading
+import time
+
+from storygraph.cli import main
+from storygraph.jobs import JobQueue, Worker
+
+
+def test_claims_follow_priority_then_submission_order(tmp_path):
+    with JobQueue(tmp_path / "jobs.sqlite") as q:
+        low = q.submit_many([{"premise": "a"}, {"premise": "b"}])
+        high = q.submit("c", priority=5)
+        order = [q.claim("w").job_id for _ in range(3)]
+        assert order == [high, *low]
+        assert q.claim("w") is None
+        assert q.counts() == {"queued": 0, "running": 3, "done": 0, "failed": 0}
+
+
+def test_profile_limit_holds_across_workers(tmp_path):
+    with JobQueue(tmp_path / "jobs.sqlite") as q:
+        q.set_limit("slow", 1)
+        q.submit_many([{"premise": "s1"}, {"premise": "s2"}], profile="slow", priority=1)
+        fast = q.submit("f1", profile="fast")
+        first = q.claim("w1")
+        assert first.profile == "slow"
+        # the second slow job waits for the first; other profiles are not blocked
+        assert q.claim("w2").job_id == fast
+        assert q.claim("w3") is None
+        assert q.claim("w3", profiles=["slow"]) is None
+        assert q.complete(first.job_id, "w1", run_id="r1")
+        assert q.claim("w3").profile == "slow"
+
+
+def test_expired_lease_is_requeued_until_attempts_run_out(tmp_path):
+    with JobQueue(tmp_path / "jobs.sqlite") as q:
+        job_id = q.submit("a", max_attempts=2)
+        assert q.claim("dead", lease_s=0.01).attempts == 1
+        time.sleep(0.05)
+        job = q.claim("w2", lease_s=60)
+        assert job.job_id == job_id and job.attempts == 2 and job.lease_owner == "w2"
+        # the crashed worker can neither renew nor finish the job any more
+        assert not q.heartbeat(job_id, "dead")
+        assert not q.complete(job_id, "dead")
+        assert q.heartbeat(job_id, "w2")
+        assert q.fail(job_id, "w2", "RuntimeError: boom", delay_s=0)
+        job = q.get(job_id)
+        assert job.status == "failed" and job.error == "RuntimeError: boom"
+
+
+def test_failed_attempt_is_retried_after_delay(tmp_path):
+    with JobQueue(tmp_path / "jobs.sqlite") as q:
+        job_id = q.submit("a")
+        q.claim("w")
+        assert q.fail(job_id, "w", "timeout", delay_s=60)
+        assert q.get(job_id).status == "queued"
+        assert q.claim("w") is None  # not before the retry delay
+
+
+def test_concurrent_claims_hand_out_each_job_once(tmp_path):
+    path = tmp_path / "jobs.sqlite"
+    with JobQueue(path) as q:
+        q.submit_many([{"premise": str(i)} for i in range(40)])
+    claimed, lock = [], threading.Lock()
+
+    def work(n):
+        with JobQueue(path) as q:  # one connection per worker, as in separate processes
+            while (job := q.claim(f"w{n}")) is not None:
+                with lock:
+                    claimed.append(job.job_id)
+                q.complete(job.job_id, f"w{n}")
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(claimed) == len(set(claimed)) == 40
+
+
+def test_worker_runs_jobs_and_records_failures(tmp_path):
+    seen = []
+
+    def runner(job, run_id):
+        seen.append((job.payload["premise"], run_id))
+        if job.payload["premise"] == "bad":
+            raise RuntimeError("provider down")
+        time.sleep(0.05)  # long enough for a heartbeat
+
+    with JobQueue(tmp_path / "jobs.sqlite") as q:
+        ok, bad = q.submit("good"), q.submit("bad", max_attempts=1)
+        worker = Worker(q, runner=runner, lease_s=0.06, poll_s=0.01)
+        assert worker.run(drain=True) == 2
+        assert q.get(ok).status == "done" and q.get(ok).run_id == seen[0][1]
+        failed = q.get(bad)
+        assert failed.status == "failed" and "provider down" in failed.error
+
+
+def test_drain_waits_for_retries(tmp_path):
+    calls = []
+
+    def runner(job, run_id):
+        calls.append(run_id)
+        if len(calls) == 1:
+            raise RuntimeError("rate limited")
+
+    with JobQueue(tmp_path / "jobs.sqlite") as q:
+        job_id = q.submit("a", max_attempts=3)
+        worker = Worker(q, runner=runner, poll_s=1.0, retry_delay_s=0.2)
+        t0 = time.perf_counter()
+        assert worker.run(drain=True) == 2
+        assert time.perf_counter() - t0 < 1.0   # woke up when the retry was due, not a poll later
+        job = q.get(job_id)
+        assert job.status == "done" and job.attempts == 2 and len(calls) == 2
+        assert q.counts()["queued"] == 0
+
+
+def test_submit_and_jobs_commands(tmp_path, capsys):
+    queue = str(tmp_path / "jobs.sqlite")
+    premises = tmp_path / "premises.txt"
+    premises.write_text("First premise\nSecond premise\n")
+    assert main(["submit", str(premises), "--queue", queue, "--priority", "2"]) == 0
+    ids = capsys.readouterr().out.split()
+    assert len(ids) == 2
+    assert main(["jobs", "--queue", queue, "--set-limit", "default=1"]) == 0
+    out = capsys.readouterr().out
+    assert "queued: 2" in out and "limits: default=1" in out and "Second premise" in out
+    assert main(["jobs", "--queue", queue, "--cancel", ids[0]]) == 0
+    assert "cancelled" in capsys.readouterr().out
@@ -0,0 +1,59 @@
+"""
+Unit tests for the codex entity linker.
+"""
+from storygraph.codex import build_codex
+from storygraph.linker import EntityLinker, aliases_for, get_linker, link_scene
+from storygraph.state import SceneDraft
+
+
+def _codex():
+    return build_codex({
+        "people": [("P1", "Nikita Marwah — climber"), ("P2", "Chris — partner"),
+                   ("P5", "Nikita’s family — relatives"), ("R1", "P1 ↔ P2 — shared climbs")],
+        "places": [("PL1", "Canadian Border Peak — final climb"), ("PL4", "Mount Baker — Easton Glacier"),
+                   ("PL5", "Forbidden Peak West Ridge — attempt")],
+        "claims": [("CL1", "P2 (Chris) died on PL1.")],
+    })
+
+
+class TestAliases:
+    def test_person_first_name(self):
+        assert aliases_for("Nikita Marwah", "people") == ["Nikita Marwah", "Nikita"]
+
+    def test_place_variants(self):
+        assert aliases_for("Mount Baker", "places") == ["Mount Baker", "Baker"]
+        assert aliases_for("Forbidden Peak West Ridge", "places") == [
+            "Forbidden Peak West Ridge", "Forbidden Peak", "Forbidden"]
+
+
+class TestEntityLinker:
+    def test_finds_offsets_case_insensitively(self):
+        linker = get_linker(_codex())
+        text = "At dawn nikita looked toward Canadian Border Peak."
+        mentions = linker.find(text)
+        assert [(m.entity_id, text[m.start:m.end]) for m in mentions] == [
+            ("P1", "nikita"), ("PL1", "Canadian Border Peak")]
+
+    def test_longest_match_wins(self):
+        linker = get_linker(_codex())
+        assert linker.entity_ids("Nikita’s family waited; Nikita Marwah did not.") == ["P5", "P1"]
+
+    def test_word_boundaries(self):
+        linker = EntityLinker({"P2": ["Chris"]})
+        assert linker.find("Christmas on the ridge") == []
+        assert len(linker.find("Chris, tired.")) == 1
+
+    def test_relationship_rows_are_not_linked(self):
+        linker = get_linker(_codex())
+        assert "R1" not in set(linker.patterns.values())
+
+    def test_linker_cached_per_codex(self):
+        codex = _codex()
+        assert get_linker(codex) is get_linker(codex)
+
+
+def test_link_scene_populates_entities():
+    scene = SceneDraft(scene_id="B1", text="Chris turned back below Mount Baker.")
+    link_scene(scene, _codex())
+    assert scene.entity_ids() == ["P2", "PL4"]
+    assert scene.entities[1] == {"id": "PL4", "start": 24, "end": 35, "text": "Mount Baker"}
@@ -0,0 +1,72 @@
+"""
+Unit tests for LLMClient request policies: retries, response cache, rate limit.
+"""
+import time
+
+import pytest
+
+from storygraph import llm
+from storygraph.config_loader import StageSettings
+from storygraph.llm import LLMClient, LLMConfig, RateLimiter
+
+
+class FakeLLM(LLMClient):
+    """LLMClient with the provider call replaced; fails the first `fail` calls."""
+
+    def __init__(self, cfg, fail=0):
+        self.calls = 0
+        self.fail = fail
+        super().__init__(cfg)
+
+    def _select_backend(self, model):
+        return ("fake", None)
+
+    def _complete(self, system, user, schema_hint):
+        self.calls += 1
+        if self.calls <= self.fail:
+            raise RuntimeError("overloaded")
+        return {"text": user, "call": self.calls}
+
+
+def test_for_stage_threads_settings():
+    s = StageSettings(model="anthropic/x", max_tokens=512, temperature=0.7, retries=3, cache="memory", seed=5)
+    cfg = LLMConfig.for_stage("anthropic/x", 137, s)
+    assert (cfg.max_tokens, cfg.temperature, cfg.retries, cfg.cache, cfg.seed) == (512, 0.7, 3, "memory", 5)
+    assert LLMConfig.for_stage("anthropic/x", 9).seed == 9
+
+
+def test_retries_with_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(llm.time, "sleep", sleeps.append)
+    client = FakeLLM(LLMConfig(model="fake/m", retries=2, retry_backoff_s=0.5), fail=2)
+    assert client.complete_json("s", "u", "{}")["call"] == 3
+    assert sleeps == [0.5, 1.0]
+    with pytest.raises(RuntimeError, match="overloaded"):
+        FakeLLM(LLMConfig(model="fake/m", retries=1), fail=2).complete_json("s", "u", "{}")
+
+
+def test_memory_and_disk_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(llm, "_memory_cache", llm.OrderedDict())
+    client = FakeLLM(LLMConfig(model="fake/m", cache="memory"))
+    first = client.complete_json("s", "u", "{}")
+    first["text"] = "mutated by an agent"
+    assert client.complete_json("s", "u", "{}") == {"text": "u", "call": 1}
+    client.complete_json("s", "other", "{}")
+    assert client.calls == 2
+    assert FakeLLM(LLMConfig(model="fake/m")).complete_json("s", "u", "{}")["call"] == 1  # cache off
+
+    disk = FakeLLM(LLMConfig(model="fake/m", cache="disk", temperature=0.9))
+    disk.complete_json("s", "u", "{}")
+    assert len(list(tmp_path.glob("*.json"))) == 1
+    llm._memory_cache.clear()
+    assert disk.complete_json("s", "u", "{}")["call"] == 1 and disk.calls == 1
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(rpm=1200)  # one every 50 ms
+    t0 = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+    assert time.monotonic() - t0 >= 0.14
+    assert llm.rate_limiter("fake/m", 60) is llm.rate_limiter("fake/m", 60)
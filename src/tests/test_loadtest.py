@@ -0,0 +1,30 @@
+"""
+Tests for the load-test harness (full pipelines against the fake provider).
+"""
+from storygraph.cli import main
+from storygraph.fakeprovider import ProviderConfig
+from storygraph.loadtest import percentile, run_load
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert (percentile(values, 50), percentile(values, 95), percentile(values, 99)) == (50, 95, 99)
+    assert percentile([3.0], 99) == 3.0
+
+
+def test_concurrent_runs_report_stages_and_retries():
+    cfg = ProviderConfig(latency="0.001", rate_limit=0.1, malformed=0.1, beats=3, words=60, seed=3)
+    report = run_load(runs=4, concurrency=2, provider=cfg, backoff_s=0.0)
+    assert report["ok"] + report["failed"] == 4
+    assert set(report["stages"]) <= {"planner", "draft", "fact", "revision"}
+    assert report["stages"]["planner"]["n"] == 4
+    assert report["provider"]["requests"] == report["llm"]["attempts"]
+    assert report["provider"].get("fault:rate_limit", 0) <= report["llm"]["retries"] + report["llm"]["failures"]
+
+
+def test_loadtest_command_fails_when_runs_fail(capsys):
+    # every request is rate limited: each run fails after its retries
+    args = ["loadtest", "--runs", "2", "--concurrency", "2", "--latency", "0", "--rate-limit", "1", "--backoff", "0"]
+    assert main(args) == 1
+    out = capsys.readouterr().out
+    assert "2 failed" in out and "429" in out
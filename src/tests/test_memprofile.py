@@ -0,0 +1,130 @@
+"""
+Tests for per-stage memory profiling and budgets.
+"""
+import json
+
+import pytest
+
+from storygraph import cli, memprofile
+from storygraph.fakeprovider import FakeProvider, ProviderConfig, client_env
+from storygraph.memprofile import MemoryProfiler, parse_budgets
+from storygraph.router import Pipeline
+from storygraph.state import Beat, Outline
+
+HELD = []
+
+
+def _allocate():
+    HELD.append([bytearray(1024) for _ in range(4096)])  # ~4 MB held past the stage
+
+
+def test_stage_records_growth_peak_and_call_site():
+    mem = MemoryProfiler(budgets={"alloc": 1, "traced": 100, "rss": 1e6})
+    try:
+        with mem.stage("alloc"):
+            _allocate()
+            transient = bytearray(8 * 1024 * 1024)
+            del transient
+        with mem.stage("idle"):
+            pass
+    finally:
+        mem.stop()
+        HELD.clear()
+    alloc, idle = mem.stages
+    assert alloc.growth_mb == pytest.approx(4.2, abs=0.5)
+    assert alloc.peak_mb >= alloc.traced_mb + 7   # the transient buffer counts toward the peak only
+    assert "test_memprofile.py:" in alloc.top[0]["site"] and "bytearray(1024)" in alloc.top[0]["code"]
+    assert abs(idle.growth_mb) < 0.5
+    assert mem.violations() == [f"alloc: {alloc.peak_mb:.1f} MB > budget 1 MB"]
+
+
+def test_parse_budgets():
+    assert parse_budgets(["rss=1500", "draft=250.5"]) == {"rss": 1500.0, "draft": 250.5}
+    with pytest.raises(RuntimeError, match="KEY=MB"):
+        parse_budgets(["draft"])
+
+
+def test_pipeline_profiles_each_stage(monkeypatch):
+    from storygraph.agents import draft, fact, planner, revision
+
+    def plan(s, **kw):
+        s.outline = Outline(template="t", beats=[Beat(id="B1", purpose="p", target_words=5)])
+        return s
+
+    monkeypatch.setattr(planner, "run", plan)
+    for agent in (draft, fact, revision):
+        monkeypatch.setattr(agent, "run", lambda s, **kw: (_allocate(), s)[1])
+    mem = MemoryProfiler()
+    try:
+        Pipeline(memory=mem).run_minimal("p", "v", models={}, context={})
+    finally:
+        mem.stop()
+        HELD.clear()
+    assert [s.stage for s in mem.stages] == ["planner", "draft", "fact", "revision"]
+    assert all(s.growth_mb > 3 for s in mem.stages[1:])
+
+
+def test_rss_budget_charges_each_run_its_own_peak(monkeypatch):
+    rss = {"now": 200.0, "peak": 300.0}
+    monkeypatch.setattr(memprofile, "rss_mb", lambda: rss["now"])
+    monkeypatch.setattr(memprofile, "rss_peak_mb", lambda: rss["peak"])
+    mem = MemoryProfiler(budgets={"rss": 500})
+    try:
+        with mem.stage("draft"):
+            rss["now"] = rss["peak"] = 900.0   # this run sets the process high-water mark
+        assert mem.violations() == ["rss: 900.0 MB > budget 500 MB"]
+        mem.reset()
+        rss["now"] = 250.0
+        with mem.stage("draft"):
+            rss["now"] = 400.0
+        rss["now"] = 100.0
+    finally:
+        mem.stop()
+    assert mem.stages[0].rss_peak_mb == 400.0   # sampled at its boundaries, not the old 900 MB mark
+    assert mem.violations() == [] and mem.report()["rss_peak_mb"] == 400.0
+
+
+def test_failed_stage_is_recorded_and_reset_forgets_open_stages(monkeypatch):
+    from storygraph.agents import draft, planner
+
+    def plan(s, **kw):
+        s.outline = Outline(template="t", beats=[Beat(id="B1", purpose="p", target_words=5)])
+        return s
+
+    def broken(s, **kw):
+        _allocate()
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(planner, "run", plan)
+    monkeypatch.setattr(draft, "run", broken)
+    mem = MemoryProfiler()
+    try:
+        with pytest.raises(RuntimeError, match="provider down"):
+            Pipeline(memory=mem).run_minimal("p", "v", models={}, context={})
+        assert [(s.stage, s.failed) for s in mem.stages] == [("planner", False), ("draft", True)]
+        assert mem.stages[1].growth_mb > 3 and not mem._open
+        mem.begin("fact")
+        mem.reset()
+    finally:
+        mem.stop()
+        HELD.clear()
+    assert mem.stages == [] and not mem._open
+
+
+def test_batch_fails_runs_over_budget(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(cli, "CHECKPOINT", tmp_path / "checkpoint.sgst")
+    premises = tmp_path / "premises.txt"
+    premises.write_text("First premise\n")
+    with FakeProvider(ProviderConfig(latency="0", beats=2, words=40)) as provider:
+        for k, v in client_env(provider.url).items():
+            monkeypatch.setenv(k, v)
+        args = ["batch", str(premises), "--db", str(tmp_path / "runs.sqlite"), "--out", str(tmp_path)]
+        assert cli.main(args + ["--memory"]) == 0
+        assert cli.main(args + ["--memory-budget", "draft=0.001"]) == 1
+    out = capsys.readouterr().out
+    assert "over budget: draft:" in out and "exceeded its memory budget" in out
+    reports = [json.loads(p.read_text()) for p in tmp_path.glob("*_memory.json")]
+    assert len(reports) == 2
+    for report in reports:
+        assert [s["stage"] for s in report["stages"]] == ["context", "planner", "draft", "fact", "revision", "export"]
+    assert sorted(bool(r["violations"]) for r in reports) == [False, True]
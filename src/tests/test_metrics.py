@@ -0,0 +1,47 @@
+"""
+Unit tests for the stylometrics panel.
+"""
+from storygraph.metrics import sentence_lengths, style_metrics, style_panel, style_panels
+
+
+class TestStylePanel:
+    def test_sentence_lengths_match_legacy_helper(self):
+        text = "The wind moved. She climbed the ridge without a rope! Was it late?"
+        panel = style_panel(text)
+        lens = sentence_lengths(text)
+        assert panel["sentences"] == len(lens)
+        assert panel["sentence_length_mean"] == round(sum(lens) / len(lens), 3)
+        assert panel["words"] == 13
+
+    def test_type_token_ratio(self):
+        panel = style_panel("snow snow snow rock")
+        assert panel["type_token_ratio"] == 0.5
+
+    def test_passive_voice(self):
+        panel = style_panel("The helmet was forgotten. She climbed. The rope was quickly coiled.")
+        assert panel["passive_ratio"] == round(2 / 3, 4)
+
+    def test_concrete_and_dialogue(self):
+        panel = style_panel('“Take my helmet,” he said. The snow was soft.')
+        assert panel["concrete_density"] > 0
+        assert 0 < panel["dialogue_ratio"] < 1
+
+    def test_function_word_profile(self):
+        panel = style_panel("the rock and the snow")
+        assert panel["function_words"]["the"] == 400.0
+        assert panel["function_word_rate"] == 0.6
+
+    def test_empty_text(self):
+        assert style_panel("")["words"] == 0
+
+
+def test_batch_matches_individual_panels():
+    texts = ["Snow fell. The ridge was climbed.", "", "Rope, helmet, stove. Dawn came slowly."]
+    batch = style_panels(texts)
+    assert batch == [style_panel(t) for t in texts]
+
+
+def test_style_metrics_beats_and_story():
+    result = style_metrics({"B1": "Wind on the ridge.", "B2": "Coffee in Whistler."})
+    assert set(result["beats"]) == {"B1", "B2"}
+    assert result["story"]["words"] == 7
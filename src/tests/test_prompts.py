@@ -0,0 +1,64 @@
+"""
+Unit tests for the prompt registry and single-pass template rendering.
+"""
+import os
+
+import pytest
+
+from storygraph.agents import planner
+from storygraph.prompts import PROMPTS_DIR, PromptError, PromptRegistry, Template, parse_sections
+
+PROMPT = "[system]\nBe brief.\n[output_schema]\n{\"text\":\"...\"}\n[user]\nBeat {beat_id}: {text}\n"
+
+
+def test_render_is_single_pass():
+    t = Template("Beat {beat_id}: {text} ({beat_id})")
+    out = t.render(beat_id="B1", text="she wrote {beat_id} on the map")
+    assert out == "Beat B1: she wrote {beat_id} on the map (B1)"
+
+
+def test_strict_placeholders():
+    t = Template("{a} and {b}")
+    with pytest.raises(PromptError, match="missing prompt values: b"):
+        t.render(a=1)
+    with pytest.raises(PromptError, match="unknown prompt values: c"):
+        t.render(a=1, b=2, c=3)
+    assert t.render({"a": 1, "b": 2, "c": 3}, strict=False) == "1 and 2"
+
+
+def test_non_identifier_braces_are_literal():
+    t = Template('JSON like {"k": 1} stays; {n} words')
+    assert t.fields == {"n"}
+    assert t.render(n=5) == 'JSON like {"k": 1} stays; 5 words'
+
+
+def test_sections_match_repo_prompts():
+    for path in PROMPTS_DIR.glob("*.txt"):
+        sections = parse_sections(path.read_text(encoding="utf-8"), path.name)
+        assert sections["system"] and sections["output_schema"] and sections["user"]
+    with pytest.raises(PromptError, match="missing \\[user\\]"):
+        parse_sections("[system]\nx\n[output_schema]\ny\n")
+
+
+def test_registry_hot_reload_and_fingerprint(tmp_path):
+    path = tmp_path / "scene.txt"
+    path.write_text(PROMPT, encoding="utf-8")
+    reg = PromptRegistry(tmp_path, check_interval=0.0)
+    p1 = reg.get("scene")
+    assert reg.get("scene") is p1
+    assert p1.schema == '{"text":"..."}' and p1.fields == {"beat_id", "text"}
+
+    path.write_text(PROMPT.replace("{text}", "{text} [{n} words]"), encoding="utf-8")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    p2 = reg.get("scene")
+    assert p2 is not p1 and p2.fingerprint != p1.fingerprint
+    assert p2.render(beat_id="B1", text="x", n=3) == "Beat B1: x [3 words]"
+    assert reg.loaded() == {"scene": p2.fingerprint}
+    with pytest.raises(PromptError, match="not found"):
+        reg.get("missing")
+
+
+def test_planner_render_accepts_partial_templates():
+    out = planner.render("Premise: {premise}", premise="P {venue}", venue="V")
+    assert out == "Premise: P {venue}"
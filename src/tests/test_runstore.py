@@ -0,0 +1,162 @@
+"""
+Unit tests for the SQLite run store.
+"""
+import pytest
+
+from storygraph.persistence import load_state, save_state
+from storygraph.runstore import RunStore, config_fingerprint, flatten_metrics
+
+
+@pytest.fixture
+def store(tmp_path):
+    with RunStore(tmp_path / "runs.sqlite") as s:
+        yield s
+
+
+@pytest.fixture
+def run_state(make_state):
+    """A one-beat state with nested metrics reporting `words` V2 words."""
+    def build(words=3200):
+        return make_state(metrics={
+            "word_count_v2": words,
+            "within_band": True,
+            "beat_within": {"B1": False},
+            "style": {"story": {"words": 4}, "beats": {"B1": {"words": 4}}},
+        })
+    return build
+
+
+def test_flatten_metrics_depth(run_state):
+    flat = flatten_metrics(run_state().metrics)
+    assert flat["word_count_v2"] == 3200.0
+    assert flat["within_band"] == 1.0
+    assert flat["beat_within.B1"] == 0.0
+    assert flat["style.story.words"] == 4.0
+    assert "style.beats.B1.words" not in flat
+
+
+def test_runs_in_same_second_do_not_collide(store, run_state):
+    ids = {store.save_run(run_state()) for _ in range(5)}
+    assert len(ids) == 5
+    assert len(store.list_runs(premise="Youth, mountains")) == 5
+
+
+def test_stage_outputs_and_final_state(store, run_state):
+    config = {"draft": "anthropic/x", "params": {"temperature": 0.2}}
+    s = run_state()
+    run_id = store.begin_run(s.premise, s.venue, "default", s.seed, config)
+    store.record_stage(run_id, "planner", s, duration_s=1.5)
+    store.record_stage(run_id, "draft", s, duration_s=2.5)
+    store.finish_run(run_id, s)
+
+    record = store.get_run(run_id)
+    assert record.status == "done"
+    assert record.profile == "default"
+    assert record.config_fingerprint == config_fingerprint(config)
+    assert store.get_json(record.config_fingerprint) == config
+    assert [st["stage"] for st in store.stages(run_id)] == ["planner", "draft"]
+    assert store.stage_output(run_id, "planner")["outline"]["beats"][0]["id"] == "B1"
+    assert set(store.stage_output(run_id, "draft")) == {"drafts", "draft_v1_concat"}
+    assert store.load_state(run_id) == s
+
+
+def test_identical_payloads_share_blobs(store):
+    a = store.put_blob({"x": 1, "y": [1, 2]})
+    b = store.put_blob({"y": [1, 2], "x": 1})
+    assert a == b
+
+
+def test_metric_queries(store, run_state):
+    small = store.save_run(run_state(words=2000))
+    big = store.save_run(run_state(words=5000))
+    assert store.query_metric("word_count_v2", min_value=3000) == [(big, 5000.0)]
+    table = store.compare([small, big], ["word_count_v2"])
+    assert table[small]["word_count_v2"] == 2000.0
+
+
+def test_filters_by_profile_and_failure(store, run_state):
+    ok = store.save_run(run_state(), profile="fast")
+    failed = store.begin_run("p", "v", profile="fast")
+    store.fail_run(failed, "RuntimeError: boom")
+    assert [r.run_id for r in store.list_runs(profile="fast", status="done")] == [ok]
+    assert store.get_run(failed).error == "RuntimeError: boom"
+    with pytest.raises(KeyError):
+        store.load_state(failed)
+
+
+def test_persistence_round_trip(tmp_path, run_state):
+    s = run_state()
+    run_id = save_state(s, runs_dir=str(tmp_path))
+    assert load_state(run_id, runs_dir=str(tmp_path)) == s
+
+
+def _claims_state(run_state):
+    s = run_state()
+    s.claim_graph = {"claims_by_scene": [
+        {"scene_id": f"S{i}", "entities": ["P_nikita"] if i % 2 else ["L_baker"],
+         "claims": [{"claim": f"claim {i}.{n}", "substantiated": n % 2 == 0, "evidence_ids": ["q1"] if n == 0 else []}
+                    for n in range(3)]}
+        for i in range(4)
+    ]}
+    return s
+
+
+def test_claim_pages_filter_and_continue(store, run_state):
+    run_id = store.save_run(_claims_state(run_state))
+    page, cursor, total = store.page_claims(run_id, limit=5)
+    assert total == 12 and len(page) == 5 and page[0]["claim_id"] == "S0.1"
+    rest, end, _ = store.page_claims(run_id, after=cursor, limit=50)
+    assert end is None and [c["seq"] for c in page + rest] == list(range(12))
+
+    assert store.page_claims(run_id, scene_id="S2")[2] == 3
+    unsub, _, n = store.page_claims(run_id, substantiated=False)
+    assert n == 4 and all(c["substantiated"] is False for c in unsub)
+    assert store.page_claims(run_id, entity="P_nikita", evidence="q1")[2] == 2
+    facets = store.claim_facets(run_id)
+    assert facets["scene"] == {"S0": 3, "S1": 3, "S2": 3, "S3": 3}
+    assert facets["status"] == {"substantiated": 8, "unsubstantiated": 4}
+    assert facets["entity"] == {"L_baker": 6, "P_nikita": 6} and facets["evidence"] == {"q1": 4}
+
+
+def test_beat_and_metric_pages(store, run_state):
+    run_id = store.save_run(run_state())
+    beats, cursor = store.page_beats(run_id, "v1")
+    assert cursor is None and beats == [{"seq": 0, "beat_id": "B1", "words": 4, "text": "We left before dawn."}]
+    names = list(store.metrics(run_id))
+    page, cursor = store.page_metrics(run_id, limit=2)
+    rest, end = store.page_metrics(run_id, after=cursor)
+    assert end is None and sorted(names) == list(page) + list(rest)
+    assert list(store.page_metrics(run_id, prefix="style.")[0]) == ["style.story.words"]
+
+
+def test_beat_words_match_the_shared_tokenizer(store, run_state):
+    from storygraph.tokens import word_count
+
+    s = run_state()
+    text = "Nikita’s rope — frayed, frozen — didn't hold at 3,200 m."
+    s.drafts["B1"].text = text
+    s.draft_v1_concat = text
+    beats, _ = store.page_beats(store.save_run(s), "v1")
+    assert beats[0]["words"] == word_count(text) == s.drafts["B1"].word_count != len(text.split())
+
+
+def test_results_are_reindexed_after_schema_upgrade(tmp_path, run_state):
+    path = tmp_path / "runs.sqlite"
+    with RunStore(path) as store:
+        run_id = store.save_run(run_state())
+        store.result_digest(run_id)
+        store._conn.execute("UPDATE meta SET value = '2' WHERE key = 'schema_version'")
+        store._conn.execute("UPDATE beats SET words = 99")
+    with RunStore(path) as store:
+        assert store.page_beats(run_id, "v1")[0][0]["words"] == 4
+
+
+def test_results_of_older_runs_are_indexed_on_access(store, run_state):
+    run_id = store.save_run(_claims_state(run_state))
+    with store._lock:
+        for table in ("beats", "claims", "claim_refs", "results"):
+            store._conn.execute(f"DELETE FROM {table}")
+    assert store.page_claims(run_id)[2] == 12
+    running = store.begin_run("p", "v")
+    with pytest.raises(KeyError):
+        store.page_beats(running)
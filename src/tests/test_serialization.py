@@ -0,0 +1,76 @@
+"""
+Unit tests for the sectioned binary StoryState format.
+"""
+import threading
+
+import pytest
+
+from storygraph import serialization as ser
+
+BEATS = {f"B{i}": f"Beat {i}. " * 200 for i in range(3)}
+STATE = dict(
+    beats=BEATS, seed=11, target_words=100, v2="\n\n".join(BEATS.values()).replace("Beat", "Scene"),
+    claim_graph={"B0": {"claims": [{"text": "c", "status": "ok"}]}},
+    metrics={"word_count_v2": 1200, "within_band": False},
+)
+
+
+@pytest.fixture
+def state(make_state):
+    return make_state(**STATE)
+
+
+@pytest.mark.parametrize("fmt", ["json", "orjson"])
+def test_round_trip(fmt, state):
+    if fmt == "orjson" and ser.orjson is None:
+        pytest.skip("orjson not installed")
+    assert ser.loads(ser.dumps(state, fmt=fmt, codec="zlib")) == state
+
+
+def test_joined_v1_is_not_stored_twice(state):
+    reader = ser.StateReader(ser.dumps(state))
+    assert reader.section_size("draft_v1")[1] < 64
+    assert reader.to_state().draft_v1_concat == state.draft_v1_concat
+
+    state.draft_v1_concat = "edited by hand"
+    assert ser.loads(ser.dumps(state)).draft_v1_concat == "edited by hand"
+
+
+def test_sections_load_lazily(tmp_path, state):
+    path = ser.save(state, tmp_path / "run.sgst")
+    reader = ser.open_state(path)
+    assert reader.metrics == state.metrics
+    assert reader.claim_graph == state.claim_graph
+    assert "drafts" not in reader._cache
+    assert reader.outline["beats"][0]["id"] == "B0"
+
+
+def test_concurrent_saves_to_one_path(tmp_path, make_state):
+    path, states = tmp_path / "run.sgst", [make_state(**{**STATE, "seed": i}) for i in range(4)]
+
+    def save(s):
+        for _ in range(10):
+            ser.save(s, path)
+
+    threads = [threading.Thread(target=save, args=(s,)) for s in states]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert ser.loads(path.read_bytes()) in states   # one complete save won; no interleaved or stray temp files
+    assert [p.name for p in tmp_path.iterdir()] == ["run.sgst"]
+
+
+def test_smaller_than_pretty_json(state):
+    assert len(ser.dumps(state)) < len(state.model_dump_json(indent=2).encode("utf-8")) / 2
+
+
+def test_rejects_foreign_bytes():
+    with pytest.raises(ValueError):
+        ser.StateReader(b"{\"seed\": 1}".ljust(16))
+
+
+def test_benchmark_reports_all_paths(state):
+    report = ser.benchmark(state, repeat=1)
+    assert set(report) == {"json_pretty", "json", "binary", "binary_metrics_only"}
+    assert report["binary"]["bytes"] < report["json_pretty"]["bytes"]
@@ -0,0 +1,257 @@
+"""
+Tests for the asyncio run service: SSE progress stream and run-store endpoints.
+"""
+import asyncio
+import json
+import threading
+
+import pytest
+
+from storygraph.runstore import RunStore
+from storygraph.service import StoryService, replay_events
+
+BEATS = {"B1": "We left before dawn.", "B2": "The wind rose at the col."}
+
+
+STATE = dict(
+    beats=BEATS, metrics={"word_count_v2": 9},
+    claim_graph={"claims_by_scene": [{"scene_id": "B1", "claims": [{"id": "c1", "text": "dawn"}]}]},
+)
+
+
+class FakeRunner:
+    """Emits pipeline-shaped events; blocks after the first beat until `release` is set."""
+
+    def __init__(self, store, make_state, fail=False):
+        self.store = store
+        self.make_state = make_state
+        self.fail = fail
+        self.release = threading.Event()
+        self.waiting = threading.Semaphore(0)
+
+    def __call__(self, run_id, request, on_event):
+        s = self.make_state(request["premise"], **STATE)
+        self.store.begin_run(s.premise, s.venue, run_id=run_id)
+        on_event({"type": "run_started", "run_id": run_id, "premise": s.premise})
+        on_event({"type": "beat_drafted", "run_id": run_id, "beat_id": "B1", "text": BEATS["B1"]})
+        self.waiting.release()
+        self.release.wait(10)
+        if self.fail:
+            raise RuntimeError("provider down")
+        on_event({"type": "beat_drafted", "run_id": run_id, "beat_id": "B2", "text": BEATS["B2"]})
+        self.store.finish_run(run_id, s)
+        on_event({"type": "run_finished", "run_id": run_id})
+
+
+async def _request(port, method, path, body=None, headers=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    head = f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(data)}\r\n"
+    head += "".join(f"{k}: {v}\r\n" for k, v in (headers or {}).items())
+    writer.write(head.encode() + b"\r\n" + data)
+    raw = await asyncio.wait_for(reader.read(), 10)
+    writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    return int(head.split()[1]), payload
+
+
+def _events(payload):
+    out = []
+    for block in payload.decode().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line and not line.startswith(":"))
+        if "event" in fields:
+            out.append((fields["event"], json.loads(fields["data"])))
+    return out
+
+
+def _serve(tmp_path, test, make_state, **kwargs):
+    async def main():
+        with RunStore(tmp_path / "runs.sqlite") as store:
+            runner = kwargs.pop("runner", None) or FakeRunner(store, make_state)
+            service = StoryService(store, runner=runner, ui_dir=tmp_path, **kwargs)
+            await service.start("127.0.0.1", 0)
+            try:
+                await test(service, runner, store)
+            finally:
+                runner.release.set()
+                await service.close()
+
+    asyncio.run(main())
+
+
+def test_live_stream_and_late_subscriber(tmp_path, make_state):
+    async def test(service, runner, store):
+        status, body = await _request(service.port, "POST", "/api/runs", {"premise": "Ice"})
+        assert status == 202
+        run_id = json.loads(body)["run_id"]
+        stream = asyncio.ensure_future(_request(service.port, "GET", f"/api/runs/{run_id}/events"))
+        await asyncio.to_thread(runner.waiting.acquire)
+        # the loop keeps serving while the run blocks its worker thread
+        status, body = await _request(service.port, "GET", f"/api/runs/{run_id}")
+        assert status == 200 and json.loads(body)["run"]["status"] == "running"
+        runner.release.set()
+        kinds = [k for k, _ in _events((await stream)[1])]
+        assert kinds == ["queued", "run_started", "beat_drafted", "beat_drafted", "run_finished"]
+        # reconnect with Last-Event-ID resumes after that event
+        _, late = await _request(service.port, "GET", f"/api/runs/{run_id}/events", headers={"Last-Event-ID": "2"})
+        assert [d.get("beat_id") for k, d in _events(late) if k == "beat_drafted"] == ["B2"]
+
+    _serve(tmp_path, test, make_state)
+
+
+def test_runs_execute_concurrently(tmp_path, make_state):
+    async def test(service, runner, store):
+        ids = []
+        for premise in ("A", "B"):
+            _, body = await _request(service.port, "POST", "/api/runs", {"premise": premise})
+            ids.append(json.loads(body)["run_id"])
+        for _ in ids:  # both runs reach their first beat before either is released
+            assert await asyncio.to_thread(runner.waiting.acquire, True, 5)
+        runner.release.set()
+        for run_id in ids:
+            _, payload = await _request(service.port, "GET", f"/api/runs/{run_id}/events")
+            assert _events(payload)[-1][0] == "run_finished"
+        _, body = await _request(service.port, "GET", "/api/runs?status=done")
+        assert {r["run_id"] for r in json.loads(body)["runs"]} == set(ids)
+
+    _serve(tmp_path, test, make_state, max_runs=2)
+
+
+def test_runner_error_ends_stream(tmp_path, make_state):
+    async def main():
+        with RunStore(tmp_path / "runs.sqlite") as store:
+            runner = FakeRunner(store, make_state, fail=True)
+            runner.release.set()
+            service = StoryService(store, runner=runner, ui_dir=tmp_path)
+            await service.start("127.0.0.1", 0)
+            _, body = await _request(service.port, "POST", "/api/runs", {"premise": "Ice"})
+            _, payload = await _request(service.port, "GET", f"/api/runs/{json.loads(body)['run_id']}/events")
+            kind, data = _events(payload)[-1]
+            assert kind == "run_failed" and "provider down" in data["error"]
+            status, _ = await _request(service.port, "POST", "/api/runs", {"venue": "x"})
+            assert status == 400
+            await service.close()
+
+    asyncio.run(main())
+
+
+def test_malformed_requests_are_rejected(tmp_path, make_state):
+    async def test(service, runner, store):
+        for body in ([1], "Ice", {"premise": "Ice", "seed": "abc"}, {"premise": "Ice", "seed": [7]}):
+            status, payload = await _request(service.port, "POST", "/api/runs", body)
+            assert status == 400, body
+        assert json.loads(payload) == {"error": "seed must be an integer"}
+        status, payload = await _request(service.port, "GET", "/api/runs?limit=abc")
+        assert status == 400 and "limit" in json.loads(payload)["error"]
+        assert not service.channels   # nothing was queued
+
+    _serve(tmp_path, test, make_state)
+
+
+def test_stored_run_is_replayed_and_exported(tmp_path, make_state):
+    (tmp_path / "index.html").write_text("<html>ui</html>")
+
+    async def test(service, runner, store):
+        run_id = store.save_run(make_state(**STATE))
+        _, payload = await _request(service.port, "GET", f"/api/runs/{run_id}/events")
+        events = _events(payload)
+        assert [k for k, _ in events] == [k for k, _ in replay_events(store, run_id)]
+        # finished runs are summarized; their results are paged from the result endpoints
+        assert events[0][1]["paged"] and ("claims_extracted", {"run_id": run_id, "scene_id": "B1", "count": 1}) in events
+        assert not [k for k, _ in events if k == "beat_drafted"]
+        assert events[-1][0] == "run_finished"
+
+        status, body = await _request(service.port, "GET", f"/api/runs/{run_id}/state")
+        assert status == 200 and json.loads(body)["drafts"]["B2"]["text"] == BEATS["B2"]
+        status, body = await _request(service.port, "GET", f"/api/runs/{run_id}/export?format=html&view=v1")
+        assert status == 200 and body.startswith(b"<!DOCTYPE html>")
+        status, body = await _request(service.port, "GET", "/")
+        assert status == 200 and body == b"<html>ui</html>"
+
+        assert (await _request(service.port, "GET", "/api/runs/nope/events"))[0] == 404
+        assert (await _request(service.port, "GET", "/../runs.sqlite"))[0] == 404
+        assert (await _request(service.port, "GET", f"/api/runs/{run_id}/export?format=pdf"))[0] == 400
+
+    _serve(tmp_path, test, make_state)
+
+
+def test_result_pages_with_cursor_and_etag(tmp_path, make_state):
+    async def test(service, runner, store):
+        run_id = store.save_run(make_state(**STATE))
+        base = f"/api/runs/{run_id}"
+        status, body = await _request(service.port, "GET", f"{base}/beats?view=v1&limit=1")
+        page = json.loads(body)
+        assert status == 200 and [b["beat_id"] for b in page["items"]] == ["B1"] and page["next"]
+        _, body = await _request(service.port, "GET", f"{base}/beats?view=v1&limit=1&cursor={page['next']}")
+        last = json.loads(body)
+        assert [b["text"] for b in last["items"]] == [BEATS["B2"]] and last["next"] is None
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", service.port)
+        writer.write(f"GET {base}/claims?scene=B1 HTTP/1.1\r\n\r\n".encode())
+        raw = await reader.read()
+        writer.close()
+        etag = next(line.split(": ", 1)[1] for line in raw.decode().splitlines() if line.startswith("ETag:"))
+        assert json.loads(raw.partition(b"\r\n\r\n")[2])["total"] == 1
+        status, body = await _request(service.port, "GET", f"{base}/claims?scene=B1", headers={"If-None-Match": etag})
+        assert status == 304 and body == b""
+        status, _ = await _request(service.port, "GET", f"{base}/claims?scene=B2", headers={"If-None-Match": etag})
+        assert status == 200
+
+        _, body = await _request(service.port, "GET", f"{base}/claims/facets")
+        assert json.loads(body)["scene"] == {"B1": 1}
+        _, body = await _request(service.port, "GET", f"{base}/metrics?prefix=word")
+        assert json.loads(body)["items"] == {"word_count_v2": 9.0}
+        assert (await _request(service.port, "GET", f"{base}/claims?cursor=!!"))[0] == 400
+        running = store.begin_run("p", "v")
+        assert (await _request(service.port, "GET", f"/api/runs/{running}/claims"))[0] == 409
+
+    _serve(tmp_path, test, make_state)
+
+
+def _fake_stages(monkeypatch, make_state):
+    from storygraph import router
+
+    done = make_state(**STATE)
+
+    def fake_stage(self, name, s, models, context):
+        def fn(state):
+            if name == "planner":
+                state.outline = done.outline
+            elif name == "draft":
+                state.drafts = done.drafts
+            elif name == "revision":
+                state.draft_v2_concat = done.draft_v2_concat
+            state.metrics[name] = 1
+            return state
+        return self._stage(name, fn, s)
+
+    monkeypatch.setattr(router.Pipeline, "_run_stage", fake_stage)
+    return router
+
+
+def test_pipeline_emits_progress_events(tmp_path, monkeypatch, make_state):
+    router = _fake_stages(monkeypatch, make_state)
+    events = []
+    with RunStore(tmp_path / "runs.sqlite") as store:
+        pipe = router.Pipeline(store=store, run_id="r1", on_event=events.append)
+        pipe.run_minimal("Ice", "Granta")
+        assert store.get_run("r1").status == "done"
+    kinds = [e["type"] for e in events]
+    assert kinds[0] == "run_started" and kinds[-1] == "run_finished"
+    assert kinds.count("stage_finished") == 4 and all(e["run_id"] == "r1" for e in events)
+    assert [e["stage"] for e in events if e["type"] == "metrics"][-1] == "final"
+
+
+def test_final_metrics_failure_fails_the_run(tmp_path, monkeypatch, make_state):
+    router = _fake_stages(monkeypatch, make_state)
+
+    def broken(*args, **kwargs):
+        raise ValueError("no style")
+    monkeypatch.setattr(router, "style_metrics", broken)
+    events = []
+    with RunStore(tmp_path / "runs.sqlite") as store:
+        pipe = router.Pipeline(store=store, run_id="r1", on_event=events.append)
+        with pytest.raises(ValueError, match="no style"):
+            pipe.run_minimal("Ice", "Granta")
+        assert store.get_run("r1").status == "failed"
+    assert events[-1]["type"] == "run_failed" and "no style" in events[-1]["error"]
@@ -0,0 +1,96 @@
+"""
+Unit tests for copy-on-write StoryState snapshots.
+"""
+import pytest
+
+from storygraph.snapshots import Checkpoints, FrozenDict, Snapshot, freeze, thaw
+from storygraph.state import Beat, Outline, SceneDraft, StoryState
+
+TEXT = "We left the trailhead before dawn. " * 50
+
+
+def _planned():
+    s = StoryState(premise="Youth, mountains", venue="Granta")
+    s.outline = Outline(template="t", beats=[Beat(id="B1", purpose="open", target_words=100)])
+    return s
+
+
+def _drafted(s):
+    s.drafts = {"B1": SceneDraft(scene_id="B1", text=TEXT), "B2": SceneDraft(scene_id="B2", text=TEXT.upper())}
+    s.draft_v1_concat = "\n\n".join(d.text for d in s.drafts.values())
+    s.metrics["voice"] = {"accepted": 2}
+    return s
+
+
+def test_freeze_shares_strings_and_thaws():
+    value = {"a": [TEXT, {"b": 1}], "c": None}
+    frozen = freeze(value)
+    assert isinstance(frozen, FrozenDict)
+    assert frozen["a"][0] is TEXT
+    assert thaw(frozen) == value
+    assert hash(frozen) == hash(freeze(value))
+    with pytest.raises(TypeError):
+        frozen["x"] = 1
+
+
+def test_unchanged_fields_are_shared_with_parent():
+    cp = Checkpoints()
+    s = _planned()
+    first = cp.take(s, "planner")
+    second = cp.take(_drafted(s), "draft")
+    assert second.fields["outline"] is first.fields["outline"]
+    assert second.changed == {"drafts", "metrics", "draft_v1_concat", "draft_v2_concat"}
+    assert second.fields["drafts"]["B1"]["text"] is TEXT
+
+
+def test_snapshot_survives_in_place_mutation():
+    s = _drafted(_planned())
+    snap = Snapshot.take(s, "draft")
+    s.metrics["voice"]["accepted"] = 99
+    s.drafts["B1"].flags.append({"type": "cliche"})
+    assert snap["metrics"]["voice"]["accepted"] == 2
+    assert snap["drafts"]["B1"]["flags"] == ()
+
+
+def test_diff_and_changed_keys():
+    cp = Checkpoints()
+    s = _drafted(_planned())
+    cp.take(s, "draft")
+    s.drafts["B2"].entities = [{"id": "P1", "start": 0, "end": 2, "text": "WE"}]
+    s.claim_graph = {"B2": {"claims": []}}
+    cp.take(s, "fact")
+    diff = cp.diff("draft", "fact")
+    assert set(diff) == {"drafts", "claim_graph"}
+    assert cp["draft"].changed_keys(cp["fact"], "drafts") == ["B2"]
+
+
+def test_delta_holds_only_changed_fields():
+    cp = Checkpoints()
+    s = _drafted(_planned())
+    cp.take(s, "draft")
+    s.draft_v2_concat = s.draft_v1_concat.replace("dawn", "first light")
+    snap = cp.take(s, "revision")
+    assert set(snap.delta()) == {"draft_v1_concat", "draft_v2_concat", "draft_v2_deltas"}
+    assert snap.delta()["draft_v2_concat"] == s.draft_v2_concat
+    assert snap.delta()["draft_v2_deltas"] == s.draft_v2_deltas
+
+
+def test_restore_branches_independently():
+    s = _drafted(_planned())
+    snap = Snapshot.take(s, "draft")
+    branch = snap.restore()
+    assert branch == s
+    branch.draft_v2_concat = "alternative ending"
+    branch.metrics["voice"]["accepted"] = 0
+    assert s.draft_v2_concat == ""
+    assert s.metrics["voice"]["accepted"] == 2
+
+
+def test_replay_from_records():
+    cp = Checkpoints()
+    s = _planned()
+    cp.take(s, "planner")
+    cp.take(_drafted(s), "draft")
+    records = cp.to_records()
+    assert Checkpoints.replay(records) == s
+    assert Checkpoints.replay(records, upto="planner").drafts == {}
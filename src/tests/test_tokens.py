@@ -0,0 +1,50 @@
+"""
+Unit tests for the shared tokenization cache.
+"""
+from storygraph.state import SceneDraft
+from storygraph.tokens import tokenize, word_count
+from storygraph.validators import audit_beats, total_words
+
+
+class TestTokenize:
+    def test_offsets_and_counts(self):
+        tok = tokenize("Nikita’s helmet. Don't stop!")
+        assert tok.word_count == 4
+        assert tok.words == ["nikita's", "helmet", "don't", "stop"]
+        assert tok.text[tok.starts[1]:tok.ends[1]] == "helmet"
+        assert tok.sentence_count == 2
+        assert tok.sentence_ids.tolist() == [0, 0, 1, 1]
+
+    def test_cached_by_content(self):
+        a = "Wind on the ridge. " * 3
+        b = "".join(["Wind on the ridge. "] * 3)
+        assert a is not b
+        assert tokenize(a) is tokenize(b)
+
+    def test_empty(self):
+        tok = tokenize("")
+        assert tok.word_count == 0
+        assert tok.sentence_count == 0
+
+
+class TestSceneDraftTokens:
+    def test_tokens_follow_text_changes(self):
+        scene = SceneDraft(scene_id="B1", text="one two three")
+        first = scene.tokens
+        assert scene.word_count == 3
+        assert scene.tokens is first
+        scene.text = "one two"
+        assert scene.word_count == 2
+
+    def test_tokens_not_serialized(self):
+        scene = SceneDraft(scene_id="B1", text="one two")
+        scene.tokens
+        assert "_tokens" not in scene.model_dump_json()
+
+
+def test_validators_and_agents_agree_on_word_counts():
+    text = "She didn’t look back—she kept climbing. 2020–2023."
+    scene = SceneDraft(scene_id="B1", text=text)
+    assert total_words(text) == word_count(text) == scene.word_count
+    assert audit_beats({"B1": scene}, {"B1": scene.word_count}) == {"B1": True}
+    assert audit_beats({"B1": text}, {"B1": scene.word_count}) == {"B1": True}
@@ -0,0 +1,64 @@
+"""
+Unit tests for the voice-drift monitor.
+"""
+import numpy as np
+
+from storygraph.voice import VoiceMonitor, voice_features
+
+BEATS = [
+    "We left the trailhead before dawn, the snow still hard under our boots. Nikita walked ahead of me "
+    "with her pack cinched high, and I watched her breath rise in the cold air. The ridge was a dark line "
+    "against the sky, and neither of us said much as the light came up over the valley.",
+    "By the time we reached the col the wind had picked up. I remember the sound of it in the rocks, a low "
+    "steady noise that made it hard to hear her. She turned back once and pointed at the summit, and I "
+    "nodded, and we kept moving up the slope with our hands on the cold stone.",
+    "At the top we sat for a while and ate the bread we had carried. The clouds were below us now, and the "
+    "peaks to the south were bright in the morning sun. I took a photograph of her looking out at the "
+    "glacier, and later it was the one her family chose for the service.",
+    "The descent was slower than we had planned. Her knee was sore, and I carried the rope for the last part "
+    "of the gully. We stopped at the creek to fill our bottles, and she laughed at something I said about "
+    "the map, and that is how I still hear her when I think of that day.",
+]
+OFF_VOICE = (
+    "WHEREAS the Licensor shall indemnify and hold harmless the Licensee pursuant to Section 4(b) "
+    "hereunder, notwithstanding any provision herein to the contrary. "
+) * 3
+
+
+class TestFeatures:
+    def test_fixed_size_and_deterministic(self):
+        a = voice_features(BEATS[0])
+        b = voice_features(BEATS[0])
+        assert a.shape == voice_features("short").shape
+        assert np.array_equal(a, b)
+
+    def test_empty_text(self):
+        vec = voice_features("")
+        assert not vec.any()
+
+
+class TestVoiceMonitor:
+    def test_consistent_beats_pass(self):
+        monitor = VoiceMonitor()
+        checks = [monitor.observe(f"B{i}", text) for i, text in enumerate(BEATS)]
+        assert not any(c.outlier for c in checks)
+        assert monitor.accepted == len(BEATS)
+
+    def test_off_voice_beat_is_flagged_and_not_absorbed(self):
+        monitor = VoiceMonitor()
+        for i, text in enumerate(BEATS):
+            monitor.observe(f"B{i}", text)
+        threshold = monitor.threshold()
+        check = monitor.observe("X", OFF_VOICE)
+        assert check.outlier
+        assert monitor.accepted == len(BEATS)
+        assert monitor.threshold() == threshold
+        flag = check.as_flag()
+        assert flag["type"] == "voice_drift"
+        assert flag["span"].startswith("WHEREAS")
+        assert monitor.summary()["outliers"] == ["X"]
+
+    def test_nothing_flagged_before_min_beats(self):
+        monitor = VoiceMonitor(min_beats=2)
+        assert not monitor.observe("B0", BEATS[0]).outlier
+        assert not monitor.observe("X", OFF_VOICE).outlier
@@ -0,0 +1,52 @@
+"""
+Unit tests for the background writer.
+"""
+import threading
+
+import pytest
+
+from storygraph.writer import BackgroundWriter, atomic_write
+
+
+def test_atomic_write_leaves_no_temp_files(tmp_path):
+    path = atomic_write(tmp_path / "out" / "a.json", "{}")
+    assert path.read_text() == "{}"
+    assert [p.name for p in path.parent.iterdir()] == ["a.json"]
+
+
+def test_writes_and_flushes(tmp_path):
+    with BackgroundWriter() as w:
+        w.write(tmp_path / "a.md", "alpha")
+        w.write(tmp_path / "b.bin", b"\x00\x01")
+        w.write(tmp_path / "c.txt", lambda: "rendered")
+        assert w.flush(timeout=5)
+    assert (tmp_path / "a.md").read_text() == "alpha"
+    assert (tmp_path / "b.bin").read_bytes() == b"\x00\x01"
+    assert (tmp_path / "c.txt").read_text() == "rendered"
+
+
+def test_rapid_writes_to_one_path_coalesce(tmp_path):
+    gate = threading.Event()
+    w = BackgroundWriter(fsync=False)
+    w.write(tmp_path / "block", lambda: gate.wait(5) and "x")
+    for i in range(50):
+        w.write(tmp_path / "state.json", f"v{i}")
+    gate.set()
+    w.close(timeout=5)
+    assert (tmp_path / "state.json").read_text() == "v49"
+    assert w.coalesced == 49
+    assert w.writes == 2
+
+
+def test_errors_surface_on_flush(tmp_path):
+    w = BackgroundWriter(fsync=False)
+
+    def boom():
+        raise ValueError("render failed")
+
+    w.write(tmp_path / "bad", boom)
+    with pytest.raises(RuntimeError, match="render failed"):
+        w.flush(timeout=5, raise_errors=True)
+    w.close()
+    with pytest.raises(RuntimeError):
+        w.write(tmp_path / "late", "x")
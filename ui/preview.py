@@ -1,17 +1,15 @@
+"""
+Serve the UI with the run/progress API (same as `python -m storygraph serve`).
 
-import http.server
-import socketserver
+    python ui/preview.py [--port 8000] [--max-runs 4]
+"""
 import os
+import sys
 
-PORT = 8000
+# storygraph lives in src/ next to this directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
 
-# This will change the current working directory to the directory where this script is located.
-# So the server will serve files from this directory.
-web_dir = os.path.dirname(os.path.abspath(__file__))
-os.chdir(web_dir)
+from storygraph.cli import main
 
-Handler = http.server.SimpleHTTPRequestHandler
-
-with socketserver.TCPServer(("", PORT), Handler) as httpd:
-    print(f"Serving at: http://localhost:{PORT}")
-    httpd.serve_forever()
+if __name__ == "__main__":
+    sys.exit(main(["serve", *sys.argv[1:]]))
@@ -1,34 +1,211 @@
+// Starts runs through the storygraph service and renders progress from its
+// Server-Sent Events stream. Results of finished runs (beats, claims,
+// metrics) are fetched a page at a time. Open ?run=<run_id> to view a
+// stored run.
 document.addEventListener("DOMContentLoaded", () => {
-    const generateBtn = document.getElementById("generate-btn");
-    const premiseInput = document.getElementById("premise");
-    const venueInput = document.getElementById("venue");
-    const storyOutput = document.getElementById("story-output");
-    const metricsOutput = document.getElementById("metrics-output");
-    const claimsOutput = document.getElementById("claims-output");
-
-    generateBtn.addEventListener("click", () => {
-        const premise = premiseInput.value;
-        const venue = venueInput.value;
-
-        // Dummy data for demonstration
-        const dummyStory = {
-            story: `This is a generated story based on the premise: "${premise}" for the venue: "${venue}". It is a story about youth, mountains, and the stillness that follows ascent. The narrative explores the complexities of memory and loss, set against the backdrop of a vast, unforgiving landscape. The protagonist, a young climber, grapples with a past trauma that resurfaces during a challenging expedition. The story is written in a literary style, suitable for a publication like The New Yorker.`,
-            metrics: {
-                word_count: 4500,
-                within_band: true,
-                grit_score: 0.85,
-                specificity: 0.72,
-                passive_ratio: 0.15
-            },
-            claims: [
-                { claim: "The protagonist is a young climber.", source: "Character description" },
-                { claim: "The story is set in the mountains.", source: "Setting details" },
-                { claim: "The protagonist is dealing with past trauma.", source: "Plot point" }
-            ]
+    const $ = (id) => document.getElementById(id);
+    const generateBtn = $("generate-btn");
+    const premiseInput = $("premise");
+    const venueInput = $("venue");
+    const statusLine = $("run-status");
+    const storyOutput = $("story-output");
+    const metricsOutput = $("metrics-output");
+    const claimsSummary = $("claims-summary");
+    const claimsOutput = $("claims-output");
+    const claimFilters = { scene: $("claims-scene"), status: $("claims-status"), entity: $("claims-entity"), evidence: $("claims-evidence") };
+    const runsList = $("runs-list");
+
+    let source = null;
+    let currentRun = null;
+    let claimCounts = {};
+
+    // -------------------------------------------------------------------------
+    // Paged results: each list keeps the cursor of its next page
+    // -------------------------------------------------------------------------
+    function pager(button, url, render) {
+        let next = null;
+        let params = {};
+        async function load(reset) {
+            if (reset) next = null;
+            const query = new URLSearchParams(Object.entries(params).filter(([, v]) => v));
+            if (next) query.set("cursor", next);
+            const res = await fetch(`${url()}?${query}`);
+            if (!res.ok) return;
+            const page = await res.json();
+            render(page, reset);
+            next = page.next;
+            button.hidden = !next;
+        }
+        button.addEventListener("click", () => load(false));
+        return {
+            load: (p = {}) => { params = p; return load(true); },
+            hide: () => { button.hidden = true; },
         };
+    }
+
+    const runUrl = (suffix) => `/api/runs/${encodeURIComponent(currentRun)}/${suffix}`;
+
+    const beats = pager($("beats-more"), () => runUrl("beats"), (page, reset) => {
+        if (reset) storyOutput.textContent = "";
+        page.items.forEach((b) => showBeat(b.beat_id || `section ${b.seq + 1}`, b.text, b.words));
+    });
 
-        storyOutput.textContent = dummyStory.story;
-        metricsOutput.textContent = JSON.stringify(dummyStory.metrics, null, 2);
-        claimsOutput.textContent = JSON.stringify(dummyStory.claims, null, 2);
+    const metrics = pager($("metrics-more"), () => runUrl("metrics"), (page, reset) => {
+        if (reset) metricsOutput.textContent = "";
+        metricsOutput.textContent += Object.entries(page.items).map(([k, v]) => `${k}: ${v}\n`).join("");
     });
+
+    const claims = pager($("claims-more"), () => runUrl("claims"), (page, reset) => {
+        if (reset) claimsOutput.textContent = "";
+        claimsSummary.textContent = `${page.total} claim(s) match`;
+        page.items.forEach((c) => {
+            const li = document.createElement("li");
+            const scene = document.createElement("span");
+            scene.className = "scene";
+            scene.textContent = c.scene_id;
+            const text = document.createElement("span");
+            text.textContent = c.claim;
+            if (c.substantiated === false) text.className = "unsubstantiated";
+            li.append(scene, text);
+            const evidence = (c.data.evidence_ids || []).join(", ");
+            if (evidence) li.title = `evidence: ${evidence}`;
+            claimsOutput.appendChild(li);
+        });
+    });
+
+    const claimParams = () => Object.fromEntries(Object.entries(claimFilters).map(([k, el]) => [k, el.value]));
+    Object.values(claimFilters).forEach((el) => el.addEventListener("change", () => claims.load(claimParams())));
+
+    function fillSelect(select, counts) {
+        const first = select.options[0];
+        select.textContent = "";
+        select.appendChild(first);
+        Object.entries(counts).forEach(([value, n]) => {
+            const option = document.createElement("option");
+            option.value = value;
+            option.textContent = `${value} (${n})`;
+            select.appendChild(option);
+        });
+    }
+
+    async function loadResults(withBeats) {
+        const res = await fetch(runUrl("claims/facets"));
+        if (res.ok) {
+            const facets = await res.json();
+            fillSelect(claimFilters.scene, facets.scene);
+            fillSelect(claimFilters.entity, facets.entity);
+            fillSelect(claimFilters.evidence, facets.evidence);
+        }
+        if (withBeats) await beats.load({ view: "v2" });
+        await Promise.all([metrics.load(), claims.load(claimParams())]);
+    }
+
+    // -------------------------------------------------------------------------
+    // Live progress
+    // -------------------------------------------------------------------------
+    function reset() {
+        storyOutput.textContent = "";
+        metricsOutput.textContent = "";
+        claimsOutput.textContent = "";
+        claimsSummary.textContent = "";
+        claimCounts = {};
+        [beats, metrics, claims].forEach((p) => p.hide());
+    }
+
+    // one element per beat, in outline order; redrafts overwrite in place
+    function showBeat(beatId, text, words) {
+        let el = document.getElementById(`beat-${beatId}`);
+        if (!el) {
+            el = document.createElement("div");
+            el.id = `beat-${beatId}`;
+            el.className = "beat";
+            el.append(document.createElement("h3"), document.createElement("p"));
+            storyOutput.appendChild(el);
+        }
+        el.querySelector("h3").textContent = words === undefined ? beatId : `${beatId} (${words} words)`;
+        if (text !== undefined) el.querySelector("p").textContent = text;
+    }
+
+    function watch(runId) {
+        if (source) source.close();
+        reset();
+        currentRun = runId;
+        let paged = false;
+        history.replaceState(null, "", `?run=${encodeURIComponent(runId)}`);
+        statusLine.textContent = `Run ${runId}: connecting…`;
+        source = new EventSource(`/api/runs/${encodeURIComponent(runId)}/events`);
+
+        const on = (type, fn) => source.addEventListener(type, (e) => fn(JSON.parse(e.data)));
+        on("queued", () => { statusLine.textContent = `Run ${runId}: queued`; });
+        on("run_started", (d) => {
+            paged = Boolean(d.paged);
+            statusLine.textContent = `Run ${runId}: ${d.replayed ? "loaded from the run store" : "started"}`;
+            if (d.premise) premiseInput.value = d.premise;
+            if (d.venue) venueInput.value = d.venue;
+        });
+        on("stage_started", (d) => { statusLine.textContent = `Run ${runId}: ${d.stage}…`; });
+        on("outline", (d) => d.beats.forEach((b) => showBeat(b.id)));
+        on("beat_drafted", (d) => showBeat(d.beat_id, d.text, d.words));
+        on("claims_extracted", (d) => {
+            claimCounts[d.scene_id] = d.count ?? d.claims.length;
+            const total = Object.values(claimCounts).reduce((a, b) => a + b, 0);
+            claimsSummary.textContent = `${total} claim(s) in ${Object.keys(claimCounts).length} scene(s)`;
+        });
+        on("metrics", (d) => { metricsOutput.textContent = JSON.stringify(d.metrics, null, 2); });
+        on("run_finished", () => {
+            finish(`Run ${runId}: done`);
+            loadResults(paged);
+        });
+        on("run_failed", (d) => finish(`Run ${runId}: failed (${d.error || "unknown error"})`));
+        // a replayed run that is still in progress elsewhere ends without a terminal
+        // event; EventSource reconnects on its own and the replay is refreshed
+    }
+
+    function finish(message) {
+        statusLine.textContent = message;
+        if (source) source.close();
+        source = null;
+        generateBtn.disabled = false;
+        loadRuns();
+    }
+
+    async function loadRuns() {
+        const res = await fetch("/api/runs?limit=10");
+        if (!res.ok) return;
+        const { runs } = await res.json();
+        runsList.textContent = "";
+        runs.forEach((r) => {
+            const li = document.createElement("li");
+            const link = document.createElement("a");
+            link.href = `?run=${encodeURIComponent(r.run_id)}`;
+            link.textContent = `${new Date(r.created_at * 1000).toLocaleString()} · ${r.status} · ${r.premise}`;
+            link.addEventListener("click", (e) => { e.preventDefault(); watch(r.run_id); });
+            li.appendChild(link);
+            runsList.appendChild(li);
+        });
+    }
+
+    generateBtn.addEventListener("click", async () => {
+        const premise = premiseInput.value.trim();
+        if (!premise) {
+            statusLine.textContent = "Enter a premise first.";
+            return;
+        }
+        generateBtn.disabled = true;
+        const res = await fetch("/api/runs", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ premise, venue: venueInput.value.trim() }),
+        });
+        const body = await res.json();
+        if (!res.ok) {
+            finish(`Could not start the run: ${body.error}`);
+            return;
+        }
+        watch(body.run_id);
+    });
+
+    const runId = new URLSearchParams(location.search).get("run");
+    if (runId) watch(runId);
+    loadRuns();
 });